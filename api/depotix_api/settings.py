@@ -144,7 +144,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'inventory.middleware.SessionJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -185,6 +185,49 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Session validation cache (inventory.session_cache)
+# SESSION_CACHE_ALIAS names a shared cache from CACHES (e.g. Redis) for all workers.
+# In-process entries are reused for SESSION_CACHE_LOCAL_TTL seconds (0 disables);
+# a logout only reaches other workers through the shared cache, so without one
+# the default is 0.
+SESSION_CACHE_ALIAS = os.getenv("SESSION_CACHE_ALIAS") or None
+SESSION_CACHE_LOCAL_TTL = int(os.getenv("SESSION_CACHE_LOCAL_TTL", "30" if SESSION_CACHE_ALIAS else "0"))
+SESSION_CACHE_LOCAL_SIZE = 10000
+SESSION_CACHE_SHARED_TTL = 300
+
+# Barcode lookup cache (inventory.ean_lookup): found codes per owner, in-process.
+# Item changes reach all workers at once through EAN_LOOKUP_CACHE_ALIAS (a shared
+# cache from CACHES); without one, entries are only kept for a few seconds.
+EAN_LOOKUP_CACHE_ALIAS = os.getenv("EAN_LOOKUP_CACHE_ALIAS") or SESSION_CACHE_ALIAS
+EAN_LOOKUP_CACHE_TTL = int(os.getenv("EAN_LOOKUP_CACHE_TTL", "60" if EAN_LOOKUP_CACHE_ALIAS else "5"))
+EAN_LOOKUP_CACHE_SIZE = 5000
+
+# OCR result cache (inventory.ocr_cache): total size of stored results before LRU eviction
+OCR_RESULT_CACHE_MAX_BYTES = int(os.getenv("OCR_RESULT_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+
+# PDF OCR (inventory.ocr_service): pages are rasterized in chunks at OCR_PDF_DPI,
+# capped per page by OCR_PDF_MAX_PAGE_PIXELS; OCR_PDF_WORKERS > 1 uses a process pool
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "200"))
+OCR_PDF_CHUNK_PAGES = 2
+OCR_PDF_MAX_PAGES = int(os.getenv("OCR_PDF_MAX_PAGES", "30"))
+OCR_PDF_MAX_PAGE_PIXELS = 8_000_000
+OCR_PDF_WORKERS = int(os.getenv("OCR_PDF_WORKERS", "1"))
+
+# OCR image preprocessing (inventory.ocr_preprocessing); PDF pages are not cropped or deskewed
+OCR_PREPROCESS_STAGES = ['crop', 'downscale', 'deskew', 'denoise', 'threshold']
+OCR_PDF_PREPROCESS_STAGES = ['downscale', 'denoise', 'threshold']
+OCR_PREPROCESS_MAX_SIDE = int(os.getenv("OCR_PREPROCESS_MAX_SIDE", "2000"))
+
+# Batch receipt upload (inventory.ocr_jobs): files per batch (ZIP members count
+# individually), total uncompressed size and entries incl. unsupported files
+OCR_BATCH_MAX_FILES = int(os.getenv("OCR_BATCH_MAX_FILES", "100"))
+OCR_BATCH_MAX_BYTES = int(os.getenv("OCR_BATCH_MAX_BYTES", str(200 * 1024 * 1024)))
+OCR_BATCH_MAX_ENTRIES = int(os.getenv("OCR_BATCH_MAX_ENTRIES", "1000"))
+DATA_UPLOAD_MAX_NUMBER_FILES = OCR_BATCH_MAX_FILES
+
+# Seconds POST /ocr/process-receipt/ waits for an ocr_worker before answering 202 with the job
+OCR_SYNC_TIMEOUT = int(os.getenv("OCR_SYNC_TIMEOUT", "30"))
+
 # CORS configuration
 CORS_ALLOWED_ORIGINS_DEFAULT = [
     "http://localhost:3000",  # Next.js frontend
@@ -221,6 +264,19 @@ STORAGES = {
     },
 }
 
+# Rendered invoice PDFs (inventory.pdf_cache), below MEDIA_ROOT
+INVOICE_PDF_CACHE_DIR = 'invoice_pdfs'
+# Render processes per web worker (inventory.pdf_render, 0 renders in the request)
+# and seconds a download waits for a render before answering 202 (client polls)
+INVOICE_PDF_WORKERS = int(os.getenv("INVOICE_PDF_WORKERS", "1"))
+INVOICE_PDF_RENDER_TIMEOUT = int(os.getenv("INVOICE_PDF_RENDER_TIMEOUT", "20"))
+# Compiled user invoice templates kept per process (inventory.invoice_templates)
+INVOICE_TEMPLATE_CACHE_SIZE = 256
+
+# Parquet export for analytics (inventory.analytics_export), outside MEDIA_ROOT (not public)
+ANALYTICS_EXPORT_ROOT = Path(os.getenv("ANALYTICS_EXPORT_ROOT", BASE_DIR / 'analytics'))
+ANALYTICS_EXPORT_BATCH_ROWS = 20_000
+
 # Logging configuration
 LOGGING = {
     'version': 1,
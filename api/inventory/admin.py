@@ -3,7 +3,7 @@ from .models import (
     Category, Supplier, Customer, InventoryItem, 
     Expense, InventoryLog, InventoryItemSupplier,
     StockMovement, SalesOrder, SalesOrderItem, Invoice, DocumentSequence,
-    CompanyProfile
+    CompanyProfile, OCRJob, OCRBatch
 )
 
 
@@ -156,7 +156,7 @@ class InventoryLogAdmin(admin.ModelAdmin):
     list_filter = ['action', 'timestamp', 'user']
     search_fields = ['item__name', 'item__sku', 'notes']
     ordering = ['-timestamp']
-    readonly_fields = ['timestamp', 'item_name', 'username']
+    readonly_fields = ['timestamp', 'item_name', 'username', 'owner']
     
     def has_add_permission(self, request):
         # Inventory logs should be created automatically, not manually
@@ -317,6 +317,25 @@ class DocumentSequenceAdmin(admin.ModelAdmin):
         return False
 
 
+@admin.register(OCRJob)
+class OCRJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'file_name', 'owner', 'status', 'attempts', 'created_at', 'finished_at']
+    list_filter = ['status', 'file_type']
+    search_fields = ['file_name', 'owner__username']
+    readonly_fields = [
+        'result', 'error', 'suggestions', 'expense_draft', 'attempts', 'created_at', 'started_at', 'finished_at'
+    ]
+    raw_id_fields = ['owner', 'batch']
+
+
+@admin.register(OCRBatch)
+class OCRBatchAdmin(admin.ModelAdmin):
+    list_display = ['id', 'owner', 'created_at']
+    search_fields = ['owner__username']
+    readonly_fields = ['skipped', 'created_at']
+    raw_id_fields = ['owner']
+
+
 @admin.register(CompanyProfile)
 class CompanyProfileAdmin(admin.ModelAdmin):
     list_display = ['name', 'user', 'city', 'country', 'email', 'phone', 'created_at']
@@ -0,0 +1,369 @@
+"""
+Partitioned Parquet export of the stock ledger, order lines and expenses.
+
+For analytics (pandas, DuckDB, Spark) instead of paging the REST API or
+parsing CSV. Files are Hive-partitioned by owner and month:
+
+    <ANALYTICS_EXPORT_ROOT>/<dataset>/owner_id=<id>/month=<YYYY-MM>/part-0.parquet
+
+so `pandas.read_parquet('<root>/stock_movements', filters=[('owner_id', '=', 7)])`
+only opens that owner's files. Column types follow the model fields:
+integers stay integers, DecimalFields become decimal128 with the field's
+precision, DateTimeFields tz-aware timestamps (TIME_ZONE), FKs int64 ids.
+
+Only closed months (before the current month in TIME_ZONE) are written:
+each run appends the months after the owner's latest partition. Ledger
+rows and expenses are assigned to the month in which they were recorded
+(created_at), so they never land in an already exported month and those
+partitions are never rewritten. Order lines belong to the month of their
+order (order_date), but lines of DRAFT/CONFIRMED orders still change: a
+partition records the open orders it holds (Parquet key-value metadata
+OPEN_GROUPS_KEY) and is rewritten by every run until a run finds all of
+them closed. Other edits and deletions in exported months are not picked
+up; `--full` rewrites everything.
+
+Rows are read through a server-side cursor (values_list().iterator()) and
+written in record batches of ANALYTICS_EXPORT_BATCH_ROWS rows, so memory
+stays bounded regardless of the table size. pyarrow is imported on first
+use; it is only needed by the export itself.
+
+A full export takes longer than a web request may run, so it only runs in
+`manage.py export_parquet` (scheduled, see scripts/nightly-jobs.sh); the
+API lists and downloads the written partitions.
+"""
+import os
+import shutil
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from .models import Expense, SalesOrderItem, StockMovement
+
+DEFAULT_BATCH_ROWS = 20_000
+PARTITION_FILE = 'part-0.parquet'
+PARQUET_CONTENT_TYPE = 'application/vnd.apache.parquet'
+# Parquet metadata: ids of the open groups (orders) whose rows may still change
+OPEN_GROUPS_KEY = b'depotix.open_groups'
+
+
+class AnalyticsExportError(Exception):
+    """pyarrow missing or an unknown dataset / partition"""
+
+
+@dataclass(frozen=True)
+class Dataset:
+    name: str
+    model: type
+    owner_lookup: str
+    month_lookup: str
+    # (column name, values_list lookup)
+    columns: Tuple[Tuple[str, str], ...]
+    # Rows of groups matching open_filter (e.g. lines of draft orders) can still change
+    open_group: Optional[str] = None
+    open_filter: Optional[Tuple[Tuple[str, object], ...]] = None
+
+
+DATASETS = {
+    dataset.name: dataset for dataset in [
+        Dataset('stock_movements', StockMovement, 'owner_id', 'created_at', (
+            ('id', 'id'),
+            ('created_at', 'created_at'),
+            ('movement_timestamp', 'movement_timestamp'),
+            ('type', 'type'),
+            ('item_id', 'item_id'),
+            ('unit', 'unit'),
+            ('quantity', 'quantity'),
+            ('purchase_price', 'purchase_price'),
+            ('currency', 'currency'),
+            ('supplier_id', 'supplier_id'),
+            ('customer_id', 'customer_id'),
+            ('created_by_id', 'created_by_id'),
+            ('note', 'note'),
+        )),
+        Dataset('sales_order_items', SalesOrderItem, 'order__created_by_id', 'order__order_date', (
+            ('id', 'id'),
+            ('order_id', 'order_id'),
+            ('order_number', 'order__order_number'),
+            ('order_date', 'order__order_date'),
+            ('order_status', 'order__status'),
+            ('customer_id', 'order__customer_id'),
+            ('item_id', 'item_id'),
+            ('qty_base', 'qty_base'),
+            ('qty_display', 'qty_display'),
+            ('selected_unit', 'selected_unit'),
+            ('unit_price', 'unit_price'),
+            ('tax_rate', 'tax_rate'),
+            ('currency', 'order__currency'),
+        ), open_group='order_id', open_filter=(('order__status__in', ('DRAFT', 'CONFIRMED')),)),
+        Dataset('expenses', Expense, 'owner_id', 'created_at', (
+            ('id', 'id'),
+            ('created_at', 'created_at'),
+            ('date', 'date'),
+            ('description', 'description'),
+            ('amount', 'amount'),
+            ('category', 'category'),
+            ('supplier_id', 'supplier_id'),
+            ('stock_movement_id', 'stock_movement_id'),
+            ('receipt_number', 'receipt_number'),
+        )),
+    ]
+}
+
+
+def pyarrow_modules():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise AnalyticsExportError('pyarrow is not installed (pip install pyarrow)') from e
+    return pyarrow, pyarrow.parquet
+
+
+def export_root() -> Path:
+    return Path(getattr(settings, 'ANALYTICS_EXPORT_ROOT', settings.BASE_DIR / 'analytics'))
+
+
+def batch_rows() -> int:
+    return int(getattr(settings, 'ANALYTICS_EXPORT_BATCH_ROWS', DEFAULT_BATCH_ROWS))
+
+
+def get_dataset(name: str) -> Dataset:
+    if name not in DATASETS:
+        raise AnalyticsExportError(f"Unknown dataset '{name}' ({', '.join(DATASETS)})")
+    return DATASETS[name]
+
+
+def _model_field(model, lookup: str) -> models.Field:
+    """Model field behind a values_list lookup ('order__status', 'item_id')"""
+    *relations, name = lookup.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    field = next(f for f in model._meta.concrete_fields if name in (f.name, f.attname))
+    return field.target_field if field.is_relation else field
+
+
+def arrow_type(field: models.Field):
+    pa, _ = pyarrow_modules()
+    if isinstance(field, models.DecimalField):
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if isinstance(field, (models.AutoField, models.BigAutoField, models.BigIntegerField)):
+        return pa.int64()
+    if isinstance(field, models.IntegerField):
+        return pa.int32()
+    if isinstance(field, models.DateTimeField):
+        return pa.timestamp('us', tz=settings.TIME_ZONE)
+    if isinstance(field, models.DateField):
+        return pa.date32()
+    if isinstance(field, models.BooleanField):
+        return pa.bool_()
+    return pa.string()
+
+
+def arrow_schema(dataset: Dataset):
+    pa, _ = pyarrow_modules()
+    return pa.schema([
+        pa.field(column, arrow_type(_model_field(dataset.model, lookup)))
+        for column, lookup in dataset.columns
+    ])
+
+
+def month_key(value) -> str:
+    return timezone.localtime(value).strftime('%Y-%m')
+
+
+def month_start(key: str) -> datetime:
+    return timezone.make_aware(datetime.strptime(key, '%Y-%m'))
+
+
+def next_month(key: str) -> str:
+    year, month = map(int, key.split('-'))
+    return f'{year + month // 12}-{month % 12 + 1:02d}'
+
+
+def owner_dir(dataset: Dataset, owner_id: int, root: Optional[Path] = None) -> Path:
+    return (root or export_root()) / dataset.name / f'owner_id={owner_id}'
+
+
+def partition_path(dataset: Dataset, owner_id: int, month: str, root: Optional[Path] = None) -> Path:
+    return owner_dir(dataset, owner_id, root) / f'month={month}' / PARTITION_FILE
+
+
+def exported_months(dataset: Dataset, owner_id: int, root: Optional[Path] = None) -> List[str]:
+    directory = owner_dir(dataset, owner_id, root)
+    if not directory.is_dir():
+        return []
+    return sorted(
+        path.parent.name.split('=', 1)[1]
+        for path in directory.glob(f'month=*/{PARTITION_FILE}')
+    )
+
+
+def list_partitions(owner_id: int, root: Optional[Path] = None) -> List[Dict]:
+    """Exported partitions of an owner (dataset, month, size)"""
+    return [
+        {
+            'dataset': dataset.name,
+            'month': month,
+            'bytes': partition_path(dataset, owner_id, month, root).stat().st_size,
+        }
+        for dataset in DATASETS.values()
+        for month in exported_months(dataset, owner_id, root)
+    ]
+
+
+class PartitionWriter:
+    """Writes one month of one owner to a temporary file, renamed into place when complete"""
+
+    def __init__(self, schema, path: Path):
+        _, pq = pyarrow_modules()
+        self.path = path
+        # Unique per writer: concurrent runs never write to the same temporary file
+        self.tmp_path = path.with_name(f'{path.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.writer = pq.ParquetWriter(self.tmp_path, schema, compression='zstd')
+        self.rows = 0
+
+    def write(self, batch):
+        self.writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def close(self, open_groups: Sequence[int] = ()):
+        if open_groups:
+            self.writer.add_key_value_metadata({OPEN_GROUPS_KEY: ','.join(map(str, sorted(open_groups)))})
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+
+def recorded_open_groups(path: Path) -> List[int]:
+    """Open groups recorded in a partition when it was written"""
+    _, pq = pyarrow_modules()
+    value = (pq.read_metadata(path).metadata or {}).get(OPEN_GROUPS_KEY)
+    return [int(group) for group in value.decode().split(',')] if value else []
+
+
+def open_groups(dataset: Dataset, owner_id: int, until: datetime) -> Dict[str, set]:
+    """month -> ids of the owner's open groups with rows in that month"""
+    if not dataset.open_filter:
+        return {}
+    filters = {dataset.owner_lookup: owner_id, f'{dataset.month_lookup}__lt': until, **dict(dataset.open_filter)}
+    groups: Dict[str, set] = {}
+    for timestamp, group in dataset.model.objects.filter(**filters).order_by().values_list(
+        dataset.month_lookup, dataset.open_group
+    ).distinct():
+        groups.setdefault(month_key(timestamp), set()).add(group)
+    return groups
+
+
+def _record_batch(schema, rows: Sequence[tuple]):
+    pa, _ = pyarrow_modules()
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def _rows(dataset: Dataset, owner_id: int, since: Optional[datetime], until: datetime) -> Iterator[tuple]:
+    """(month lookup value, *columns) of the owner's rows in [since, until), oldest first"""
+    filters = {dataset.owner_lookup: owner_id, f'{dataset.month_lookup}__lt': until}
+    if since is not None:
+        filters[f'{dataset.month_lookup}__gte'] = since
+    return dataset.model.objects.filter(**filters).order_by(dataset.month_lookup, 'id').values_list(
+        dataset.month_lookup, *(lookup for _, lookup in dataset.columns)
+    ).iterator(chunk_size=batch_rows())
+
+
+def export_owner(dataset: Dataset, owner_id: int, until: datetime, root: Optional[Path] = None) -> List[Dict]:
+    """
+    Write the owner's closed months after the latest exported one and
+    rewrite exported months with open groups; returns the written partitions
+    """
+    months = exported_months(dataset, owner_id, root)
+    groups = open_groups(dataset, owner_id, until)
+    written = []
+    if dataset.open_filter:
+        for month in months:
+            path = partition_path(dataset, owner_id, month, root)
+            if month in groups or recorded_open_groups(path):
+                rewritten = _write_months(
+                    dataset, owner_id, month_start(month), month_start(next_month(month)), groups, root
+                )
+                if not rewritten:
+                    # All rows of the month were deleted meanwhile
+                    path.unlink()
+                written.extend(rewritten)
+    since = month_start(next_month(months[-1])) if months else None
+    written.extend(_write_months(dataset, owner_id, since, until, groups, root))
+    return written
+
+
+def _write_months(dataset: Dataset, owner_id: int, since: Optional[datetime], until: datetime,
+                  groups: Dict[str, set], root: Optional[Path]) -> List[Dict]:
+    """One partition per month of the owner's rows in [since, until)"""
+    schema = arrow_schema(dataset)
+    size = batch_rows()
+
+    written = []
+    writer = None
+    current = None
+    pending = []
+
+    def flush():
+        if pending:
+            writer.write(_record_batch(schema, pending))
+            pending.clear()
+
+    def finish():
+        flush()
+        writer.close(groups.get(current, ()))
+        written.append({'dataset': dataset.name, 'owner_id': owner_id, 'month': current, 'rows': writer.rows})
+
+    try:
+        for timestamp, *row in _rows(dataset, owner_id, since, until):
+            month = month_key(timestamp)
+            if month != current:
+                if writer is not None:
+                    finish()
+                current = month
+                writer = PartitionWriter(schema, partition_path(dataset, owner_id, month, root))
+            pending.append(row)
+            if len(pending) >= size:
+                flush()
+        if writer is not None:
+            finish()
+    except BaseException:
+        if writer is not None and writer.tmp_path.exists():
+            writer.writer.close()
+            writer.tmp_path.unlink()
+        raise
+    return written
+
+
+def owner_ids(dataset: Dataset, until: datetime) -> List[int]:
+    return list(
+        dataset.model.objects.filter(**{f'{dataset.month_lookup}__lt': until})
+        .exclude(**{f'{dataset.owner_lookup}__isnull': True})
+        .order_by().values_list(dataset.owner_lookup, flat=True).distinct()
+    )
+
+
+def export(datasets: Optional[Sequence[str]] = None, owner_id: Optional[int] = None,
+           full: bool = False, root: Optional[Path] = None) -> List[Dict]:
+    """Incremental export of the given datasets (default: all) for one or all owners"""
+    pyarrow_modules()
+    until = month_start(timezone.localtime().strftime('%Y-%m'))
+    written = []
+    for name in datasets or DATASETS:
+        dataset = get_dataset(name)
+        owners = [owner_id] if owner_id is not None else owner_ids(dataset, until)
+        for owner in owners:
+            if full:
+                shutil.rmtree(owner_dir(dataset, owner, root), ignore_errors=True)
+            written.extend(export_owner(dataset, owner, until, root))
+    return written
@@ -8,6 +8,7 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.utils import timezone
 from .models import UserSession
+from .session_cache import session_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -82,6 +83,8 @@ class CustomTokenObtainPairView(TokenObtainPairView):
                     user_agent=user_agent
                 )
 
+                session_cache.invalidate(user.id)
+
                 logger.info(f"New session created for user {user.username}: {session_key[:8]}...")
 
             except Exception as e:
@@ -0,0 +1,174 @@
+"""
+Resolve scanned barcodes (EAN/GTIN) to the owner's items.
+
+A code matches an item's ean_unit (one Stück) or ean_pack (one Verpackung);
+both are indexed per owner, so one query resolves a whole batch of scans.
+
+Results are kept in a small in-process TTL LRU keyed by (owner,
+generation, code), so repeated scans during a pick need no database query.
+Only found codes are cached, and only the item's master data (no stock), so
+stock bookings never make an entry stale. Saving or deleting an item bumps
+the owner's generation:
+
+    - with EAN_LOOKUP_CACHE_ALIAS (a shared Django cache, e.g. Redis) the
+      generation lives there and is read on every lookup, so a change is
+      seen by all workers at once
+    - without one it is per process; other workers may serve the old master
+      data for at most EAN_LOOKUP_CACHE_TTL seconds, which then defaults to
+      a few seconds
+
+EAN_LOOKUP_CACHE_TTL = 0 disables the cache.
+"""
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db.models import Q
+from django.dispatch import receiver
+
+from .models import InventoryItem
+from .session_cache import TTLCache
+
+DEFAULT_CACHE_TTL = 60
+# Without a shared generation, other workers only notice item changes when entries expire
+DEFAULT_LOCAL_CACHE_TTL = 5
+DEFAULT_CACHE_SIZE = 5000
+MAX_BATCH_CODES = 500
+
+MATCH_UNIT = 'unit'
+MATCH_PACK = 'pack'
+
+# Master data returned with a match; saves touching none of them keep the cache
+ITEM_FIELDS = [
+    'id', 'name', 'sku', 'brand', 'ean_unit', 'ean_pack', 'volume_ml', 'deposit_chf', 'is_active',
+    'stueck_pro_verpackung', 'verpackungen_pro_palette', 'unit_base', 'unit_package_factor', 'unit_pallet_factor',
+]
+
+
+def normalize_code(code) -> str:
+    """Scanners may send surrounding whitespace; codes are compared as stored"""
+    return str(code or '').strip()
+
+
+def _item_data(item: InventoryItem) -> dict:
+    data = {field: getattr(item, field) for field in ITEM_FIELDS}
+    data['deposit_chf'] = str(item.deposit_chf)
+    return data
+
+
+def _match(code: str, item: InventoryItem) -> dict:
+    """Lookup result: which EAN matched and what one scan of it means in Stück"""
+    match = MATCH_UNIT if item.ean_unit == code else MATCH_PACK
+    return {
+        'code': code,
+        'match': match,
+        'stueck_per_scan': 1 if match == MATCH_UNIT else item.stueck_pro_verpackung,
+        'item': _item_data(item),
+    }
+
+
+class EANLookup:
+    """Barcode -> item resolution with a per-process hot-code cache"""
+
+    generation_prefix = 'depotix:ean-generation:'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.configure()
+
+    def configure(self):
+        """(Re)read the settings; drops the cached codes"""
+        self.shared_alias = getattr(settings, 'EAN_LOOKUP_CACHE_ALIAS', None)
+        ttl = getattr(settings, 'EAN_LOOKUP_CACHE_TTL', None)
+        if ttl is None:
+            ttl = DEFAULT_CACHE_TTL if self.shared_alias else DEFAULT_LOCAL_CACHE_TTL
+        self.cache = TTLCache(maxsize=getattr(settings, 'EAN_LOOKUP_CACHE_SIZE', DEFAULT_CACHE_SIZE), ttl=ttl)
+        # Bumped per owner on item changes; old keys are never read again and age out of the LRU
+        self._generations: Dict[int, int] = {}
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def _generation_key(self, owner_id: int) -> str:
+        return f'{self.generation_prefix}{owner_id}'
+
+    def generation(self, owner_id: int) -> int:
+        """Current generation of the owner's items (shared by all workers if configured)"""
+        shared = self.shared
+        if shared is not None:
+            return shared.get(self._generation_key(owner_id), 0)
+        return self._generations.get(owner_id, 0)
+
+    def resolve(self, owner, codes: Iterable[str]) -> Dict[str, dict]:
+        """Matches of the given codes by code; unknown codes are missing from the result"""
+        codes = list(dict.fromkeys(code for code in map(normalize_code, codes) if code))
+        generation = self.generation(owner.pk)
+        results = {}
+        missing = []
+        for code in codes:
+            cached = self.cache.get((owner.pk, generation, code))
+            if cached is not None:
+                results[code] = cached
+            else:
+                missing.append(code)
+        if not missing:
+            return results
+
+        # Active items first, then the oldest, so duplicate EANs resolve deterministically
+        items = InventoryItem.objects.filter(owner=owner).filter(
+            Q(ean_unit__in=missing) | Q(ean_pack__in=missing)
+        ).only(*ITEM_FIELDS).order_by('-is_active', 'id')
+
+        found = {}
+        for item in items:
+            # A unit EAN wins over another item's pack EAN with the same digits
+            if item.ean_unit in missing and found.get(item.ean_unit, {}).get('match') != MATCH_UNIT:
+                found[item.ean_unit] = _match(item.ean_unit, item)
+            if item.ean_pack in missing and item.ean_pack not in found:
+                found[item.ean_pack] = _match(item.ean_pack, item)
+
+        # Results of a query that raced with an item change are not cached
+        if generation == self.generation(owner.pk):
+            for code, result in found.items():
+                self.cache.set((owner.pk, generation, code), result)
+        results.update(found)
+        return results
+
+    def lookup(self, owner, code: str) -> Optional[dict]:
+        return self.resolve(owner, [code]).get(normalize_code(code))
+
+    def resolve_batch(self, owner, codes: List[str]) -> dict:
+        """Batch response: matches in scan order (duplicates once) and the unknown codes"""
+        results = self.resolve(owner, codes)
+        ordered = list(dict.fromkeys(code for code in map(normalize_code, codes) if code))
+        return {
+            'results': [results[code] for code in ordered if code in results],
+            'not_found': [code for code in ordered if code not in results],
+        }
+
+    def invalidate_owner(self, owner_id: int):
+        """Forget the owner's cached codes (an item was created, changed or deleted)"""
+        shared = self.shared
+        if shared is not None:
+            key = self._generation_key(owner_id)
+            # No expiry: a generation that fell back to 0 could match old entries
+            if not shared.add(key, 1, timeout=None):
+                shared.incr(key)
+            return
+        with self._lock:
+            self._generations[owner_id] = self._generations.get(owner_id, 0) + 1
+
+    def clear(self):
+        self.cache.clear()
+
+
+ean_lookup = EANLookup()
+
+
+@receiver(setting_changed)
+def _reconfigure(setting, **kwargs):
+    if setting.startswith('EAN_LOOKUP_'):
+        ean_lookup.configure()
@@ -11,9 +11,11 @@ class InsufficientStockError(Exception):
 
 class IdempotencyConflictError(Exception):
     """Exception raised when idempotency key already exists (retry safe)"""
-    def __init__(self, message, existing_movement=None):
+    def __init__(self, message, existing_movement=None, existing_movements=None):
         self.message = message
         self.existing_movement = existing_movement
+        # Set for batch bookings: all movements of the already processed batch
+        self.existing_movements = existing_movements
         super().__init__(self.message)
 
 
@@ -0,0 +1,155 @@
+"""
+Streaming CSV / JSON Lines exports of the ledger, expenses and invoices.
+
+The list endpoints are paginated (PAGE_SIZE 50, one COUNT per page); an
+export streams the whole filtered queryset instead. Rows are read with
+values_list().iterator(), so neither the queryset nor the file is held in
+memory, and written in blocks of EXPORT_BLOCK_ROWS rows. `compress=gzip`
+compresses the stream on the fly (Content-Encoding: gzip).
+"""
+import csv
+import io
+import zlib
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+CHUNK_SIZE = 2000
+EXPORT_BLOCK_ROWS = 500
+
+FORMAT_CSV = 'csv'
+FORMAT_JSONL = 'jsonl'
+CONTENT_TYPES = {
+    FORMAT_CSV: 'text/csv; charset=utf-8',
+    FORMAT_JSONL: 'application/x-ndjson; charset=utf-8',
+}
+
+# (column name, values_list lookup) per export
+STOCK_MOVEMENT_COLUMNS = [
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('movement_timestamp', 'movement_timestamp'),
+    ('type', 'type'),
+    ('item_id', 'item_id'),
+    ('item_name', 'item__name'),
+    ('item_sku', 'item__sku'),
+    ('unit', 'unit'),
+    ('quantity', 'quantity'),
+    ('purchase_price', 'purchase_price'),
+    ('currency', 'currency'),
+    ('supplier', 'supplier__name'),
+    ('customer', 'customer__name'),
+    ('note', 'note'),
+    ('created_by', 'created_by__username'),
+]
+
+EXPENSE_COLUMNS = [
+    ('id', 'id'),
+    ('date', 'date'),
+    ('description', 'description'),
+    ('amount', 'amount'),
+    ('category', 'category'),
+    ('supplier', 'supplier__name'),
+    ('receipt_number', 'receipt_number'),
+    ('notes', 'notes'),
+    ('created_at', 'created_at'),
+]
+
+INVOICE_COLUMNS = [
+    ('invoice_number', 'invoice_number'),
+    ('issue_date', 'issue_date'),
+    ('delivery_date', 'delivery_date'),
+    ('due_date', 'due_date'),
+    ('order_number', 'order__order_number'),
+    ('customer', 'order__customer__name'),
+    ('total_net', 'total_net'),
+    ('total_tax', 'total_tax'),
+    ('total_gross', 'total_gross'),
+    ('currency', 'currency'),
+    ('is_archived', 'is_archived'),
+]
+
+
+class ExportError(ValueError):
+    """Unsupported export format or compression"""
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _blocks(rows: Iterable[tuple], size: int = EXPORT_BLOCK_ROWS) -> Iterator[List[tuple]]:
+    block = []
+    for row in rows:
+        block.append(row)
+        if len(block) == size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def csv_stream(header: Sequence[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    """CSV with BOM (Excel opens it as UTF-8), written block by block"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+
+    for block in _blocks(rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in block)
+        yield buffer.getvalue().encode('utf-8')
+
+
+def jsonl_stream(header: Sequence[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    """One JSON object per line (decimals as strings, dates in ISO format)"""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for block in _blocks(rows):
+        yield ''.join(encoder.encode(dict(zip(header, row))) + '\n' for row in block).encode('utf-8')
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def queryset_rows(queryset, columns: Sequence[Tuple[str, str]]) -> Iterator[tuple]:
+    """Rows of the given lookups, fetched in chunks (server-side cursor on PostgreSQL)"""
+    return queryset.prefetch_related(None).values_list(
+        *(lookup for _, lookup in columns)
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def export_response(queryset, columns: Sequence[Tuple[str, str]], name: str,
+                    file_format: str = FORMAT_CSV, compress: str = '') -> StreamingHttpResponse:
+    """Stream the queryset as `<name>-<date>.<format>`; raises ExportError for bad options"""
+    file_format = (file_format or FORMAT_CSV).lower()
+    if file_format not in CONTENT_TYPES:
+        raise ExportError(f"Unsupported format '{file_format}' (csv or jsonl)")
+    if compress not in ('', 'gzip'):
+        raise ExportError(f"Unsupported compression '{compress}' (gzip)")
+
+    header = [column for column, _ in columns]
+    writer = csv_stream if file_format == FORMAT_CSV else jsonl_stream
+    content = writer(header, queryset_rows(queryset, columns))
+    if compress:
+        content = gzip_stream(content)
+
+    response = StreamingHttpResponse(content, content_type=CONTENT_TYPES[file_format])
+    filename = f"{name}-{timezone.localdate().isoformat()}.{file_format}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    return response
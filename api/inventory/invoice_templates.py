@@ -0,0 +1,68 @@
+"""
+Compiled user invoice templates, cached per process.
+
+InvoiceTemplate.save() stores the HTML with the CSS inlined
+(compiled_html). Rendering looks up the owner's active template version,
+one indexed query on (user, updated_at) that loads no template text, and
+takes the compiled django Template from a per-process LRU keyed by
+(user_id, updated_at, generation). Only a new version loads and compiles
+the source once.
+
+A save bumps updated_at, so every process picks up the new version on its
+next render. The post_save/post_delete signal also bumps the user's
+generation in this process, so replaced entries are never read again and
+age out of the LRU.
+"""
+import threading
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.template import Template
+
+from .models import InvoiceTemplate
+from .session_cache import TTLCache
+
+DEFAULT_CACHE_SIZE = 256
+# Versions are immutable; the TTL only bounds how long unused entries are kept
+DEFAULT_CACHE_TTL = 24 * 3600
+
+
+class CompiledTemplateCache:
+    """(user_id, updated_at) -> compiled django Template of the user's active invoice template"""
+
+    def __init__(self):
+        self.cache = TTLCache(
+            maxsize=getattr(settings, 'INVOICE_TEMPLATE_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+            ttl=DEFAULT_CACHE_TTL,
+        )
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Optional[Template]:
+        """Compiled active template of the user, None if the user has none"""
+        version = InvoiceTemplate.objects.filter(
+            user_id=user_id, is_active=True
+        ).values_list('pk', 'updated_at').first()
+        if version is None:
+            return None
+
+        pk, updated_at = version
+        key = (user_id, updated_at, self._generations.get(user_id, 0))
+        template = self.cache.get(key)
+        if template is None:
+            row = InvoiceTemplate.objects.only('html_content', 'css_content', 'compiled_html').get(pk=pk)
+            # Rows saved before compiled_html existed are compiled here until their next save
+            template = Template(row.compiled_html or row.compile_html())
+            self.cache.set(key, template)
+        return template
+
+    def invalidate(self, user_id: int):
+        """Forget the user's compiled templates (the template was saved or deleted)"""
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    def clear(self):
+        self.cache.clear()
+
+
+invoice_templates = CompiledTemplateCache()
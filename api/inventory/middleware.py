@@ -4,8 +4,10 @@ Middleware for session validation and concurrent login prevention
 from django.utils.deprecation import MiddlewareMixin
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from django.http import JsonResponse
-from .models import UserSession
+from .session_cache import session_cache
+import copy
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,6 +17,11 @@ class SessionValidationMiddleware(MiddlewareMixin):
     """
     Middleware to validate that the user's session is still active.
     If another user logged in with the same credentials, this session will be invalidated.
+
+    The active session comes from the session cache, so the check normally
+    runs without a database query, and the validated token and user are
+    passed on to DRF (SessionJWTAuthentication) instead of being verified
+    and loaded a second time.
     """
 
     # Paths that don't require session validation
@@ -40,10 +47,10 @@ class SessionValidationMiddleware(MiddlewareMixin):
             return None
 
         try:
-            # Extract and validate JWT token
+            # Validate the JWT once; the user comes from the session cache
             jwt_auth = JWTAuthentication()
             validated_token = jwt_auth.get_validated_token(auth_header.split(' ')[1])
-            user = jwt_auth.get_user(validated_token)
+            user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
 
             # Get session_key from token
             session_key = validated_token.get('session_key')
@@ -51,36 +58,38 @@ class SessionValidationMiddleware(MiddlewareMixin):
             if not session_key:
                 # Token doesn't have session_key (old token format)
                 # Allow it to pass but log warning
-                logger.warning(f"Token for user {user.username} missing session_key")
+                logger.warning(f"Token for user id {user_id} missing session_key")
                 return None
 
-            # Check if this session is still active in database
-            try:
-                active_session = UserSession.objects.get(user=user)
-
-                if active_session.session_key != session_key:
-                    # Session has been replaced by a new login
-                    logger.info(
-                        f"Session invalidated for user {user.username}. "
-                        f"Current session: {active_session.session_key[:8]}..., "
-                        f"Request session: {session_key[:8]}..."
-                    )
-                    return JsonResponse({
-                        'detail': 'Your session has been terminated because another user logged in with your credentials.',
-                        'code': 'session_terminated'
-                    }, status=401)
-
-                # Update last activity (optional - can be expensive on high traffic)
-                # active_session.save(update_fields=['last_activity'])
-
-            except UserSession.DoesNotExist:
+            # Check if this session is still active (cache, database on miss)
+            active_session = session_cache.get(user_id)
+
+            if active_session is None:
                 # No active session found - user was logged out or session expired
-                logger.info(f"No active session found for user {user.username}")
+                logger.info(f"No active session found for user id {user_id}")
                 return JsonResponse({
                     'detail': 'Your session has expired. Please log in again.',
                     'code': 'session_expired'
                 }, status=401)
 
+            active_session_key, user = active_session
+            if active_session_key != session_key:
+                # Session has been replaced by a new login
+                logger.info(
+                    f"Session invalidated for user {user.username}. "
+                    f"Current session: {active_session_key[:8]}..., "
+                    f"Request session: {session_key[:8]}..."
+                )
+                return JsonResponse({
+                    'detail': 'Your session has been terminated because another user logged in with your credentials.',
+                    'code': 'session_terminated'
+                }, status=401)
+
+            if user.is_active:
+                # Hand the validated token and user to SessionJWTAuthentication
+                # (a copy, the cached instance is shared between requests)
+                request.validated_auth = (copy.copy(user), validated_token)
+
         except (InvalidToken, TokenError) as e:
             # Invalid token - let the normal authentication handle it
             logger.debug(f"Token validation error in middleware: {str(e)}")
@@ -91,3 +100,17 @@ class SessionValidationMiddleware(MiddlewareMixin):
             pass
 
         return None
+
+
+class SessionJWTAuthentication(JWTAuthentication):
+    """
+    DRF authentication that reuses the token and user already validated by
+    SessionValidationMiddleware; falls back to regular JWT authentication.
+    (Lives here rather than in authentication.py, which imports DRF views.)
+    """
+
+    def authenticate(self, request):
+        validated_auth = getattr(request._request, 'validated_auth', None)
+        if validated_auth is not None:
+            return validated_auth
+        return super().authenticate(request)
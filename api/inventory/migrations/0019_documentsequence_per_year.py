@@ -0,0 +1,21 @@
+# Allow one DocumentSequence row per document type and year
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0018_add_purchase_price_and_stockmovement_ref'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='documentsequence',
+            name='document_type',
+            field=models.CharField(
+                choices=[('LS', 'Sales Order'), ('INV', 'Invoice')],
+                max_length=10
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Stored total stock (in Verpackungen) and low-stock flag for SQL filtering
+
+from django.db import migrations, models
+from django.db.models import F, Q, ExpressionWrapper
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0019_documentsequence_per_year'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='total_verpackungen',
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=F('palette_quantity') * F('verpackungen_pro_palette') + F('verpackung_quantity'),
+                output_field=models.IntegerField(),
+            ),
+        ),
+        migrations.AddField(
+            model_name='inventoryitem',
+            name='low_stock',
+            field=models.GeneratedField(
+                db_persist=True,
+                expression=ExpressionWrapper(
+                    Q(min_stock_level__gte=F('palette_quantity') * F('verpackungen_pro_palette') + F('verpackung_quantity')),
+                    output_field=models.BooleanField()
+                ),
+                output_field=models.BooleanField(),
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(
+                condition=Q(is_active=True),
+                fields=['owner', 'low_stock'],
+                name='inv_item_owner_low_stock_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['owner', 'total_verpackungen'], name='inv_item_owner_total_vpk_idx'),
+        ),
+    ]
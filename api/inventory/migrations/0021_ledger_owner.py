@@ -0,0 +1,81 @@
+# Denormalized owner on StockMovement and InventoryLog (backfilled from the item)
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_owner(apps, schema_editor):
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    item_owner = Subquery(InventoryItem.objects.filter(pk=OuterRef('item_id')).values('owner_id')[:1])
+
+    for model_name in ('StockMovement', 'InventoryLog'):
+        model = apps.get_model('inventory', model_name)
+        model.objects.filter(owner__isnull=True).update(owner=item_owner)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0020_inventoryitem_total_verpackungen_low_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='owner',
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='owned_stock_movements',
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddField(
+            model_name='inventorylog',
+            name='owner',
+            field=models.ForeignKey(
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='owned_inventory_logs',
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.RunPython(backfill_owner, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='owner',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='owned_stock_movements',
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AlterField(
+            model_name='inventorylog',
+            name='owner',
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='owned_inventory_logs',
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='stock_mov_owner_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['owner', 'item', 'created_at'], name='stock_mov_owner_item_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorylog',
+            index=models.Index(fields=['owner', '-timestamp', '-id'], name='inv_log_owner_ts_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventorylog',
+            index=models.Index(fields=['owner', 'item', 'timestamp'], name='inv_log_owner_item_ts_idx'),
+        ),
+    ]
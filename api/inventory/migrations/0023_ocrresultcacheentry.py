@@ -0,0 +1,39 @@
+# Content-hash cache for OCR results
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0022_ocrjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OCRResultCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(help_text='SHA-256 der hochgeladenen Datei', max_length=64)),
+                ('file_type', models.CharField(max_length=10)),
+                ('engine', models.CharField(max_length=50)),
+                ('pipeline_version', models.CharField(max_length=20)),
+                ('result', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('size', models.PositiveIntegerField(help_text='Grösse des Ergebnisses in Bytes')),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used_at'], name='ocr_cache_last_used_idx')],
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('content_hash', 'file_type', 'engine', 'pipeline_version'),
+                        name='ocr_cache_key_unique'
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Batch receipt upload: several OCR jobs grouped in one batch
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0023_ocrresultcacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OCRBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('skipped', models.JSONField(blank=True, default=list, help_text='Nicht verarbeitete Dateien mit Grund')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ocr_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='ocrjob',
+            name='batch',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to='inventory.ocrbatch'),
+        ),
+        migrations.AddField(
+            model_name='ocrjob',
+            name='suggestions',
+            field=models.JSONField(blank=True, help_text='Passende Lieferanten und Artikel (nur Batch-Jobs)', null=True),
+        ),
+        migrations.AddField(
+            model_name='ocrjob',
+            name='expense_draft',
+            field=models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Vorbereitete Ausgabe (nur Batch-Jobs)', null=True),
+        ),
+    ]
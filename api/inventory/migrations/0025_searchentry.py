@@ -0,0 +1,90 @@
+# Search index of items, suppliers and customers (inventory.search)
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_trigram_index(apps, schema_editor):
+    # SQLite gets its FTS5 mirror after migrate (inventory.search.install_fts_index)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS search_entry_text_trgm_idx '
+        'ON inventory_searchentry USING gin (text gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS search_entry_text_trgm_idx')
+
+
+def _join(*values):
+    return ' '.join(str(value).strip() for value in values if value).lower()
+
+
+def backfill_entries(apps, schema_editor):
+    SearchEntry = apps.get_model('inventory', 'SearchEntry')
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    InventoryItemSupplier = apps.get_model('inventory', 'InventoryItemSupplier')
+    Supplier = apps.get_model('inventory', 'Supplier')
+    Customer = apps.get_model('inventory', 'Customer')
+
+    supplier_skus = {}
+    for item_id, supplier_sku in InventoryItemSupplier.objects.exclude(
+        supplier_sku__isnull=True
+    ).values_list('item_id', 'supplier_sku'):
+        supplier_skus.setdefault(item_id, []).append(supplier_sku)
+
+    documents = {
+        'item': (
+            InventoryItem,
+            lambda i: _join(i.name, i.brand, i.sku, i.ean_unit, i.ean_pack, *supplier_skus.get(i.pk, ())),
+        ),
+        'supplier': (Supplier, lambda s: _join(s.name, s.contact_name, s.email, s.tax_id)),
+        'customer': (
+            Customer,
+            lambda c: _join(c.name, c.customer_number, c.contact_name, c.email, c.phone),
+        ),
+    }
+    for kind, (model, text) in documents.items():
+        entries = [
+            SearchEntry(owner_id=obj.owner_id, kind=kind, object_id=obj.pk, name=obj.name[:200], text=text(obj))
+            for obj in model.objects.iterator(chunk_size=2000)
+        ]
+        SearchEntry.objects.bulk_create(entries, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0024_ocrbatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('item', 'Artikel'), ('supplier', 'Lieferant'), ('customer', 'Kunde')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('name', models.CharField(max_length=200)),
+                ('text', models.TextField(help_text='Name, Marke, SKU, EAN, Lieferanten-SKU usw. in Kleinbuchstaben')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('kind', 'object_id'), name='search_entry_object_unique'),
+                ],
+                'indexes': [
+                    models.Index(fields=['owner', 'kind'], name='search_entry_owner_kind_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+        migrations.RunPython(backfill_entries, migrations.RunPython.noop),
+    ]
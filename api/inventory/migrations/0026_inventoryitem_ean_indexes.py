@@ -0,0 +1,21 @@
+# Barcode lookup (inventory.ean_lookup) by owner and unit / pack EAN
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0025_searchentry'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['owner', 'ean_unit'], name='inv_item_owner_ean_unit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['owner', 'ean_pack'], name='inv_item_owner_ean_pack_idx'),
+        ),
+    ]
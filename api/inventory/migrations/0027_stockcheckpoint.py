@@ -0,0 +1,42 @@
+# Ledger checkpoints for point-in-time stock (inventory.stock_history)
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.comparison
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0026_inventoryitem_ean_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(models.F('owner'), django.db.models.functions.comparison.Coalesce('movement_timestamp', 'created_at'), name='stock_mov_owner_effective_idx'),
+        ),
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_end', models.DateTimeField(help_text='Bestand nach allen Bewegungen vor diesem Zeitpunkt')),
+                ('palette_quantity', models.IntegerField(default=0)),
+                ('verpackung_quantity', models.IntegerField(default=0)),
+                ('defective_qty', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoints', to='inventory.inventoryitem')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoints', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(fields=('item', 'period_end'), name='stock_checkpoint_item_period_unique'),
+                ],
+                'indexes': [
+                    models.Index(fields=['owner', 'period_end'], name='stock_checkpoint_owner_idx'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0027_stockcheckpoint'),
+    ]
+
+    operations = [
+        # Existing templates are compiled on first use and stored on their next save
+        migrations.AddField(
+            model_name='invoicetemplate',
+            name='compiled_html',
+            field=models.TextField(blank=True, default='', editable=False, help_text='HTML mit eingebettetem CSS (beim Speichern erzeugt)'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Invalidation watermark of the ledger checkpoints (inventory.stock_history)
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('inventory', '0028_invoicetemplate_compiled_html'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockHistoryVersion',
+            fields=[
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stock_history_version', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('version', models.PositiveIntegerField(default=0, help_text='Erhöht bei jeder rückdatierten Buchung')),
+            ],
+        ),
+    ]
@@ -1,7 +1,10 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Q, ExpressionWrapper
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
 from decimal import Decimal
 
@@ -220,6 +223,22 @@ class InventoryItem(models.Model):
     last_updated = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
 
+    # Stored, DB-computed stock columns so queries can filter/sort on them
+    # (the Python properties below compute the same values for in-memory items)
+    total_verpackungen = models.GeneratedField(
+        expression=F('palette_quantity') * F('verpackungen_pro_palette') + F('verpackung_quantity'),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
+    low_stock = models.GeneratedField(
+        expression=ExpressionWrapper(
+            Q(min_stock_level__gte=F('palette_quantity') * F('verpackungen_pro_palette') + F('verpackung_quantity')),
+            output_field=models.BooleanField()
+        ),
+        output_field=models.BooleanField(),
+        db_persist=True,
+    )
+
     class Meta:
         ordering = ['name']
         indexes = [
@@ -227,6 +246,10 @@ class InventoryItem(models.Model):
             models.Index(fields=['name', 'owner']),
             models.Index(fields=['category']),
             models.Index(fields=['min_stock_level', 'palette_quantity']),
+            models.Index(fields=['owner', 'low_stock'], condition=Q(is_active=True), name='inv_item_owner_low_stock_idx'),
+            models.Index(fields=['owner', 'total_verpackungen'], name='inv_item_owner_total_vpk_idx'),
+            models.Index(fields=['owner', 'ean_unit'], name='inv_item_owner_ean_unit_idx'),
+            models.Index(fields=['owner', 'ean_pack'], name='inv_item_owner_ean_pack_idx'),
         ]
 
     @property
@@ -328,6 +351,8 @@ class InventoryLog(models.Model):
     ]
     
     item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE)
+    # Denormalized item owner so tenant-scoped ledger queries need no join
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_inventory_logs')
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
     action = models.CharField(max_length=10, choices=ACTION_CHOICES)
     quantity_change = models.IntegerField()
@@ -346,6 +371,15 @@ class InventoryLog(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['owner', '-timestamp', '-id'], name='inv_log_owner_ts_id_idx'),
+            models.Index(fields=['owner', 'item', 'timestamp'], name='inv_log_owner_item_ts_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.owner_id is None:
+            self.owner_id = self.item.owner_id
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.action} - {self.item.name if self.item else 'Unknown'}"
@@ -388,6 +422,8 @@ class StockMovement(models.Model):
     ]
 
     item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='stock_movements')
+    # Denormalized item owner so tenant-scoped ledger queries need no join
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='owned_stock_movements')
     type = models.CharField(max_length=20, choices=MOVEMENT_TYPE_CHOICES)
 
     # Neue Struktur: Einheit + Menge
@@ -443,6 +479,10 @@ class StockMovement(models.Model):
             models.Index(fields=['type', 'created_at']),
             models.Index(fields=['created_by', 'created_at']),
             models.Index(fields=['item', 'type', 'created_at']),
+            models.Index(fields=['owner', '-created_at', '-id'], name='stock_mov_owner_created_id_idx'),
+            models.Index(fields=['owner', 'item', 'created_at'], name='stock_mov_owner_item_idx'),
+            # Ledger tail by effective booking time (inventory.stock_history)
+            models.Index(F('owner'), Coalesce('movement_timestamp', 'created_at'), name='stock_mov_owner_effective_idx'),
         ]
 
     def clean(self):
@@ -474,137 +514,30 @@ class StockMovement(models.Model):
             raise ValidationError("IN movements should reference a supplier or include a note.")
 
     def save(self, *args, **kwargs):
+        """
+        Book the movement through the stock booking engine (inventory.services).
+
+        New movements update the item balance and write the InventoryLog entry,
+        changed movements correct the balance by the difference.
+        """
         # Note: Validation is handled by the serializer, not here
         # self.clean() is intentionally not called to avoid ValidationErrors during save
 
-        # Check if quantity update should be skipped (when ViewSet already handled it)
-        skip_quantity_update = kwargs.pop('skip_quantity_update', False)
-
-        # IMPORTANT: Reload item from database to get the latest conversion factors
-        # This ensures we always use the current verpackungen_pro_palette value
-        self.item.refresh_from_db()
-
-        # Store previous quantities for logging
-        previous_palette_qty = self.item.palette_quantity
-        previous_verpackung_qty = self.item.verpackung_quantity
+        if self.owner_id is None:
+            self.owner_id = self.item.owner_id
 
-        # Save the movement first
-        super().save(*args, **kwargs)
-
-        # Prepare for logging
-        log_action = 'UPDATE'
-        log_unit = self.unit
-        log_quantity_change = self.quantity
-
-        if not skip_quantity_update:
-            # Get conversion factor
-            vpk = self.item.verpackungen_pro_palette
-
-            # Helper function to normalize inventory (consolidate packages into palettes)
-            def normalize_inventory(palette_qty, verpackung_qty, verpackungen_pro_palette):
-                """
-                Consolidate loose packages into full palettes.
-                Returns (palette_quantity, verpackung_quantity)
-                """
-                # Calculate total packages
-                total_verpackungen = (palette_qty * verpackungen_pro_palette) + verpackung_qty
-
-                # Split into full palettes and remaining packages
-                new_palette_qty = total_verpackungen // verpackungen_pro_palette
-                new_verpackung_qty = total_verpackungen % verpackungen_pro_palette
-
-                return new_palette_qty, new_verpackung_qty
-
-            # Update item quantities based on movement type and unit
-            if self.type == 'IN':
-                log_action = 'ADD'
-                if self.unit == 'palette':
-                    # Adding palettes is straightforward
-                    self.item.palette_quantity += self.quantity
-                elif self.unit == 'verpackung':
-                    # Add packages and consolidate into palettes if possible
-                    self.item.verpackung_quantity += self.quantity
-                    self.item.palette_quantity, self.item.verpackung_quantity = normalize_inventory(
-                        self.item.palette_quantity,
-                        self.item.verpackung_quantity,
-                        vpk
-                    )
+        # The booking engine itself saves with skip_quantity_update=True
+        if kwargs.pop('skip_quantity_update', False):
+            super().save(*args, **kwargs)
+            return
 
-            elif self.type == 'OUT':
-                log_action = 'REMOVE'
-                if self.unit == 'palette':
-                    # Remove palettes (cannot go below 0)
-                    self.item.palette_quantity = max(0, self.item.palette_quantity - self.quantity)
-                elif self.unit == 'verpackung':
-                    # Calculate total available packages
-                    total_verpackungen = (self.item.palette_quantity * vpk) + self.item.verpackung_quantity
-
-                    # Subtract requested packages
-                    remaining_verpackungen = max(0, total_verpackungen - self.quantity)
-
-                    # Recalculate palettes and packages
-                    self.item.palette_quantity = remaining_verpackungen // vpk
-                    self.item.verpackung_quantity = remaining_verpackungen % vpk
-
-            elif self.type == 'RETURN':
-                log_action = 'ADD'
-                if self.unit == 'palette':
-                    # Returning palettes is straightforward
-                    self.item.palette_quantity += self.quantity
-                elif self.unit == 'verpackung':
-                    # Return packages and consolidate into palettes if possible
-                    self.item.verpackung_quantity += self.quantity
-                    self.item.palette_quantity, self.item.verpackung_quantity = normalize_inventory(
-                        self.item.palette_quantity,
-                        self.item.verpackung_quantity,
-                        vpk
-                    )
+        from .services import book_stock_movement, rebook_stock_movement
 
-            elif self.type == 'DEFECT':
-                log_action = 'REMOVE'
-                if self.unit == 'palette':
-                    # Mark palettes as defective
-                    transfer_qty = min(self.quantity, self.item.palette_quantity)
-                    self.item.palette_quantity -= transfer_qty
-                    self.item.defective_qty += transfer_qty * vpk
-                elif self.unit == 'verpackung':
-                    # Mark packages as defective (may need to break palettes)
-                    total_verpackungen = (self.item.palette_quantity * vpk) + self.item.verpackung_quantity
-                    transfer_qty = min(self.quantity, total_verpackungen)
-
-                    remaining_verpackungen = total_verpackungen - transfer_qty
-
-                    # Recalculate inventory
-                    self.item.palette_quantity = remaining_verpackungen // vpk
-                    self.item.verpackung_quantity = remaining_verpackungen % vpk
-                    self.item.defective_qty += transfer_qty
-
-            elif self.type == 'ADJUST':
-                log_action = 'UPDATE'
-                if self.unit == 'palette':
-                    # Direct palette adjustment
-                    self.item.palette_quantity = max(0, self.quantity)
-                    # Keep existing loose packages
-                elif self.unit == 'verpackung':
-                    # Direct package adjustment
-                    self.item.verpackung_quantity = max(0, self.quantity)
-                    # Keep existing palettes
-
-            self.item.save()
-
-        # Always create InventoryLog entry for backward compatibility
-        new_palette_qty = self.item.palette_quantity
-        new_verpackung_qty = self.item.verpackung_quantity
-
-        InventoryLog.objects.create(
-            item=self.item,
-            user=self.created_by,
-            action=log_action,
-            quantity_change=abs(log_quantity_change),
-            previous_quantity=previous_palette_qty + previous_verpackung_qty,  # Simplified for legacy
-            new_quantity=new_palette_qty + new_verpackung_qty,  # Simplified for legacy
-            notes=f"{self.get_type_display()} ({log_quantity_change} {log_unit}): {self.note}" if self.note else f"{self.get_type_display()} ({log_quantity_change} {log_unit})"
-        )
+        if self.pk is None:
+            book_stock_movement(self)
+        else:
+            previous = StockMovement.objects.get(pk=self.pk)
+            rebook_stock_movement(self, previous)
 
     def __str__(self):
         return f"{self.type} - {self.item.name} - {self.quantity} {self.unit}"
@@ -646,25 +579,15 @@ class SalesOrder(models.Model):
     def save(self, *args, **kwargs):
         if not self.order_number:
             # Generate order number: LS-YYYY-####
-            year = timezone.now().year
-            last_order = SalesOrder.objects.filter(
-                order_number__startswith=f'LS-{year}-'
-            ).order_by('order_number').last()
-            
-            if last_order:
-                last_num = int(last_order.order_number.split('-')[-1])
-                new_num = last_num + 1
-            else:
-                new_num = 1
-            
-            self.order_number = f'LS-{year}-{new_num:04d}'
+            self.order_number = DocumentSequence.next_number(DocumentSequence.SALES_ORDER)
         
         super().save(*args, **kwargs)
 
     def calculate_totals(self):
         """Recalculate order totals from line items"""
-        total_net = sum(item.line_total_net for item in self.items.all())
-        total_tax = sum(item.line_tax for item in self.items.all())
+        items = list(self.items.all())
+        total_net = sum(item.line_total_net for item in items)
+        total_tax = sum(item.line_tax for item in items)
         
         self.total_net = total_net
         self.total_tax = total_tax
@@ -757,17 +680,7 @@ class Invoice(models.Model):
     def save(self, *args, **kwargs):
         if not self.invoice_number:
             # Generate invoice number: RE######
-            last_invoice = Invoice.objects.filter(
-                invoice_number__startswith='RE'
-            ).order_by('invoice_number').last()
-
-            if last_invoice:
-                last_num = int(last_invoice.invoice_number[2:])
-                new_num = last_num + 1
-            else:
-                new_num = 1
-
-            self.invoice_number = f'RE{new_num:06d}'
+            self.invoice_number = DocumentSequence.next_number(DocumentSequence.INVOICE)
         
         # Copy totals from order if not set
         if not self.total_net:
@@ -792,11 +705,15 @@ class Invoice(models.Model):
         return f"{self.invoice_number} - {self.order.customer.name}"
 
 
-# TODO: DocumentSequence for atomic number generation
 class DocumentSequence(models.Model):
     """Atomic document number sequence generation"""
-    
-    document_type = models.CharField(max_length=10, unique=True,
+
+    SALES_ORDER = 'LS'
+    INVOICE = 'INV'
+    # Invoices are numbered continuously and use a single row with year 0
+    CONTINUOUS_YEAR = 0
+
+    document_type = models.CharField(max_length=10,
                                     choices=[('LS', 'Sales Order'), ('INV', 'Invoice')])
     year = models.IntegerField()
     last_number = models.IntegerField(default=0)
@@ -807,6 +724,61 @@ class DocumentSequence(models.Model):
     def __str__(self):
         return f"{self.document_type}-{self.year} (last: {self.last_number})"
 
+    @classmethod
+    def allocate(cls, document_type, year, count=1):
+        """
+        Reserve `count` consecutive numbers and return the first one.
+
+        The counter is incremented with a single UPDATE ... SET last_number =
+        last_number + count, which row-locks the sequence until the surrounding
+        transaction commits, so concurrent callers never get the same number.
+        """
+        sequence = cls.objects.filter(document_type=document_type, year=year)
+        with transaction.atomic():
+            if not sequence.update(last_number=F('last_number') + count):
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(
+                            document_type=document_type,
+                            year=year,
+                            last_number=cls._highest_issued(document_type, year) + count
+                        )
+                except IntegrityError:
+                    # A concurrent request created the row first
+                    sequence.update(last_number=F('last_number') + count)
+            last_number = sequence.values_list('last_number', flat=True).get()
+        return last_number - count + 1
+
+    @classmethod
+    def next_numbers(cls, document_type, count=1):
+        """Allocate `count` formatted numbers: LS-YYYY-#### (yearly) or RE###### (continuous)"""
+        if document_type == cls.SALES_ORDER:
+            year = timezone.now().year
+            first = cls.allocate(document_type, year, count)
+            return [f'LS-{year}-{number:04d}' for number in range(first, first + count)]
+
+        first = cls.allocate(cls.INVOICE, cls.CONTINUOUS_YEAR, count)
+        return [f'RE{number:06d}' for number in range(first, first + count)]
+
+    @classmethod
+    def next_number(cls, document_type):
+        """Allocate a single formatted document number"""
+        return cls.next_numbers(document_type)[0]
+
+    @classmethod
+    def _highest_issued(cls, document_type, year):
+        """Highest number issued before the sequence row existed (one-time scan)"""
+        if document_type == cls.SALES_ORDER:
+            last_order = SalesOrder.objects.filter(
+                order_number__startswith=f'LS-{year}-'
+            ).order_by('order_number').last()
+            return int(last_order.order_number.split('-')[-1]) if last_order else 0
+
+        last_invoice = Invoice.objects.filter(
+            invoice_number__startswith='RE'
+        ).order_by('invoice_number').last()
+        return int(last_invoice.invoice_number[2:]) if last_invoice else 0
+
 
 class CompanyProfile(models.Model):
     """Company profile for supplier firm data"""
@@ -839,9 +811,15 @@ class CompanyProfile(models.Model):
 class InvoiceTemplate(models.Model):
     """Custom invoice template for PDF generation"""
 
+    STYLES_INCLUDE = '{% include "pdf/_styles.css" %}'
+
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='invoice_template')
     html_content = models.TextField(help_text="HTML template für Rechnung")
     css_content = models.TextField(help_text="CSS Styles für Rechnung")
+    compiled_html = models.TextField(
+        blank=True, default='', editable=False,
+        help_text="HTML mit eingebettetem CSS (beim Speichern erzeugt)"
+    )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -851,6 +829,23 @@ class InvoiceTemplate(models.Model):
             models.Index(fields=['user']),
         ]
 
+    def compile_html(self) -> str:
+        """Template source with the CSS inlined (replaces the default styles include, else into <head>)"""
+        html_template = self.html_content
+        if self.css_content:
+            if self.STYLES_INCLUDE in html_template:
+                html_template = html_template.replace(self.STYLES_INCLUDE, self.css_content)
+            elif '<style>' not in html_template:
+                html_template = html_template.replace('</head>', f'<style>{self.css_content}</style></head>')
+        return html_template
+
+    def save(self, *args, **kwargs):
+        self.compiled_html = self.compile_html()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'compiled_html'}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Invoice Template for {self.user.username}"
 
@@ -873,4 +868,168 @@ class UserSession(models.Model):
         ]
 
     def __str__(self):
-        return f"Session for {self.user.username} - {self.session_key[:8]}..."
\ No newline at end of file
+        return f"Session for {self.user.username} - {self.session_key[:8]}..."
+
+class OCRBatch(models.Model):
+    """Several receipts uploaded at once (files or ZIP), one OCRJob per file"""
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ocr_batches')
+    skipped = models.JSONField(
+        default=list, blank=True,
+        help_text="Nicht verarbeitete Dateien mit Grund"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"OCR batch {self.pk}"
+
+
+class OCRJob(models.Model):
+    """Receipt OCR job, processed asynchronously by the ocr_worker command"""
+
+    STATUS_PENDING = 'PENDING'
+    STATUS_RUNNING = 'RUNNING'
+    STATUS_DONE = 'DONE'
+    STATUS_FAILED = 'FAILED'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='ocr_jobs')
+    batch = models.ForeignKey(
+        OCRBatch, on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='jobs'
+    )
+    file = models.FileField(upload_to='ocr_jobs/')
+    file_name = models.CharField(max_length=255)
+    file_type = models.CharField(max_length=10, help_text="'pdf' oder 'image'")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, default='')
+    suggestions = models.JSONField(
+        null=True, blank=True,
+        help_text="Passende Lieferanten und Artikel (nur Batch-Jobs)"
+    )
+    expense_draft = models.JSONField(
+        null=True, blank=True, encoder=DjangoJSONEncoder,
+        help_text="Vorbereitete Ausgabe (nur Batch-Jobs)"
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # Worker queue: oldest pending job first
+            models.Index(fields=['status', 'created_at'], name='ocr_job_status_created_idx'),
+            models.Index(fields=['owner', '-created_at'], name='ocr_job_owner_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"OCR job {self.pk} ({self.status}) - {self.file_name}"
+
+
+class OCRResultCacheEntry(models.Model):
+    """Cached OCR result of an uploaded file (see inventory.ocr_cache)"""
+
+    content_hash = models.CharField(max_length=64, help_text="SHA-256 der hochgeladenen Datei")
+    file_type = models.CharField(max_length=10)
+    engine = models.CharField(max_length=50)
+    pipeline_version = models.CharField(max_length=20)
+    result = models.JSONField(encoder=DjangoJSONEncoder)
+    size = models.PositiveIntegerField(help_text="Grösse des Ergebnisses in Bytes")
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['content_hash', 'file_type', 'engine', 'pipeline_version'],
+                name='ocr_cache_key_unique'
+            ),
+        ]
+        indexes = [
+            # LRU eviction
+            models.Index(fields=['last_used_at'], name='ocr_cache_last_used_idx'),
+        ]
+
+    def __str__(self):
+        return f"OCR cache {self.content_hash[:12]}... ({self.engine}, {self.hits} hits)"
+
+
+class SearchEntry(models.Model):
+    """Search document of an item, supplier or customer (see inventory.search)"""
+
+    KIND_ITEM = 'item'
+    KIND_SUPPLIER = 'supplier'
+    KIND_CUSTOMER = 'customer'
+    KIND_CHOICES = [
+        (KIND_ITEM, 'Artikel'),
+        (KIND_SUPPLIER, 'Lieferant'),
+        (KIND_CUSTOMER, 'Kunde'),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_entries')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    name = models.CharField(max_length=200)
+    text = models.TextField(help_text="Name, Marke, SKU, EAN, Lieferanten-SKU usw. in Kleinbuchstaben")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='search_entry_object_unique'),
+        ]
+        indexes = [
+            # The trigram (PostgreSQL) / FTS5 (SQLite) index on text is
+            # created by migration 0025 and inventory.search
+            models.Index(fields=['owner', 'kind'], name='search_entry_owner_kind_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.name}"
+
+
+class StockCheckpoint(models.Model):
+    """Stock of an item at a month boundary, replayed from the ledger (see inventory.stock_history)"""
+
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='stock_checkpoints')
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_checkpoints')
+    period_end = models.DateTimeField(help_text="Bestand nach allen Bewegungen vor diesem Zeitpunkt")
+    palette_quantity = models.IntegerField(default=0)
+    verpackung_quantity = models.IntegerField(default=0)
+    defective_qty = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'period_end'], name='stock_checkpoint_item_period_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', 'period_end'], name='stock_checkpoint_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id} @ {self.period_end:%Y-%m-%d}: {self.palette_quantity}P + {self.verpackung_quantity}V"
+
+
+class StockHistoryVersion(models.Model):
+    """Per-owner count of checkpoint invalidations; a build discards its result if it changed meanwhile"""
+
+    owner = models.OneToOneField(
+        User, on_delete=models.CASCADE, primary_key=True, related_name='stock_history_version'
+    )
+    version = models.PositiveIntegerField(default=0, help_text="Erhöht bei jeder rückdatierten Buchung")
+
+    def __str__(self):
+        return f"{self.owner_id}: v{self.version}"
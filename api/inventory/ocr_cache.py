@@ -0,0 +1,126 @@
+"""
+Content-hash cache for OCR results.
+
+Re-uploads of the same receipt (second device, failed match, edited
+expense) are answered from the OCRResultCacheEntry table instead of running
+preprocessing and OCR again. The key is the SHA-256 of the uploaded bytes
+plus file type, OCR engine and preprocessing pipeline version, so engine or
+pipeline changes never serve stale results.
+
+The table is bounded by OCR_RESULT_CACHE_MAX_BYTES (sum of stored result
+sizes); the least recently used entries are evicted first.
+"""
+import hashlib
+import json
+import logging
+import threading
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import OCRResultCacheEntry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+# Evict down to this share of the limit, so not every insert evicts
+EVICT_TO = 0.9
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_content_hash(uploaded_file) -> str:
+    """SHA-256 of an uploaded file, read in chunks"""
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+
+class OCRResultCache:
+    """DB-backed LRU of OCR results with hit/miss counters of this process"""
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+    def get_max_bytes(self) -> int:
+        if self.max_bytes is not None:
+            return self.max_bytes
+        return getattr(settings, 'OCR_RESULT_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES)
+
+    def _count(self, counter: str, amount: int = 1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def get(self, digest: str, file_type: str, engine: str, pipeline_version: str) -> Optional[Dict]:
+        entry = OCRResultCacheEntry.objects.filter(
+            content_hash=digest, file_type=file_type, engine=engine, pipeline_version=pipeline_version
+        ).values('id', 'result').first()
+        if entry is None:
+            self._count('misses')
+            return None
+
+        OCRResultCacheEntry.objects.filter(pk=entry['id']).update(
+            hits=F('hits') + 1, last_used_at=timezone.now()
+        )
+        self._count('hits')
+        return entry['result']
+
+    def set(self, digest: str, file_type: str, engine: str, pipeline_version: str, result: Dict):
+        encoded = json.dumps(result, cls=DjangoJSONEncoder)
+        try:
+            with transaction.atomic():
+                OCRResultCacheEntry.objects.create(
+                    content_hash=digest, file_type=file_type, engine=engine,
+                    pipeline_version=pipeline_version, result=json.loads(encoded), size=len(encoded)
+                )
+        except IntegrityError:
+            # Stored concurrently by another worker
+            return
+        self._count('stores')
+        self.evict()
+
+    def evict(self) -> int:
+        """Delete least recently used entries while the cache exceeds its size limit"""
+        max_bytes = self.get_max_bytes()
+        total = OCRResultCacheEntry.objects.aggregate(total=Sum('size'))['total'] or 0
+        if total <= max_bytes:
+            return 0
+
+        excess = total - int(max_bytes * EVICT_TO)
+        doomed = []
+        freed = 0
+        for entry_id, size in OCRResultCacheEntry.objects.order_by('last_used_at').values_list('id', 'size').iterator():
+            if freed >= excess:
+                break
+            doomed.append(entry_id)
+            freed += size
+
+        deleted, _ = OCRResultCacheEntry.objects.filter(id__in=doomed).delete()
+        self._count('evictions', deleted)
+        logger.info(f"OCR result cache: evicted {deleted} entries ({freed} bytes)")
+        return deleted
+
+    def stats(self) -> Dict:
+        """Table size and total hits, plus the counters of this process"""
+        table = OCRResultCacheEntry.objects.aggregate(total_bytes=Sum('size'), total_hits=Sum('hits'))
+        with self._lock:
+            counters = dict(self.counters)
+        lookups = counters['hits'] + counters['misses']
+        return {
+            'entries': OCRResultCacheEntry.objects.count(),
+            'total_bytes': table['total_bytes'] or 0,
+            'max_bytes': self.get_max_bytes(),
+            'total_hits': table['total_hits'] or 0,
+            'process': counters,
+            'process_hit_ratio': counters['hits'] / lookups if lookups else None,
+        }
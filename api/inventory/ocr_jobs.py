@@ -0,0 +1,282 @@
+"""
+Asynchronous OCR job queue.
+
+Uploads are stored as OCRJob rows (file in MEDIA_ROOT/ocr_jobs/) and
+processed by `manage.py ocr_worker` processes, so OCR never runs inside a
+web worker (the synchronous process-receipt endpoint queues a job too and
+waits for it a bounded time). Workers claim jobs with SELECT ... FOR UPDATE SKIP LOCKED;
+any number of them can run side by side. Files already in the OCR result
+cache are done as soon as they are uploaded.
+
+A batch upload (several files or a ZIP) becomes one OCRBatch with a job
+per file, so all running workers process the batch in parallel. Batch jobs
+also store supplier/item suggestions and an Expense draft when done.
+"""
+import logging
+import os
+import time
+import zipfile
+from datetime import timedelta
+from typing import Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OCRBatch, OCRJob
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+# A RUNNING job whose worker died is picked up again after this long
+STALE_AFTER = timedelta(minutes=10)
+MAX_ATTEMPTS = 3
+
+DEFAULT_BATCH_MAX_FILES = 100
+DEFAULT_BATCH_MAX_BYTES = 200 * 1024 * 1024
+# All entries of an upload incl. unsupported files and ZIP members
+DEFAULT_BATCH_MAX_ENTRIES = 1000
+# Unsupported files listed one by one in batch.skipped, the rest are counted
+MAX_SKIPPED_LISTED = 50
+
+# Waiting for a job in a request (POST /ocr/process-receipt/)
+DEFAULT_SYNC_TIMEOUT = 30
+POLL_INTERVAL = 0.5
+
+
+class BatchUploadError(Exception):
+    """Batch upload rejected as a whole (too many files, too large, broken ZIP)"""
+
+
+def file_type_for(file_name: str) -> Optional[str]:
+    """'pdf' or 'image' for supported uploads, None otherwise"""
+    file_name = file_name.lower()
+    if file_name.endswith('.pdf'):
+        return 'pdf'
+    if file_name.endswith(IMAGE_EXTENSIONS):
+        return 'image'
+    return None
+
+
+def enqueue_ocr_job(user, uploaded_file, file_type: str, batch: Optional[OCRBatch] = None) -> OCRJob:
+    """Store the upload and queue it for the OCR workers (done at once on a result cache hit)"""
+    from .ocr_cache import file_content_hash
+    from .ocr_service import ocr_service
+
+    job = OCRJob(owner=user, batch=batch, file_name=uploaded_file.name[:255], file_type=file_type)
+
+    cached = ocr_service.cached_result(file_content_hash(uploaded_file), file_type)
+    if cached is not None:
+        now = timezone.now()
+        job.status = OCRJob.STATUS_DONE
+        job.result = cached
+        job.started_at = now
+        job.finished_at = now
+        if batch is not None:
+            prepare_expense(job)
+
+    # Copied to storage in chunks, never read into memory as a whole
+    job.file.save(uploaded_file.name, uploaded_file, save=False)
+    try:
+        job.save()
+    except Exception:
+        job.file.delete(save=False)
+        raise
+    return job
+
+
+def wait_for_job(job: OCRJob, timeout: Optional[float] = None) -> OCRJob:
+    """
+    Wait until an OCR worker finished the job (DONE or FAILED), at most
+    `timeout` seconds (default OCR_SYNC_TIMEOUT); the job is reloaded in place.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'OCR_SYNC_TIMEOUT', DEFAULT_SYNC_TIMEOUT)
+    deadline = time.monotonic() + timeout
+    while job.status not in (OCRJob.STATUS_DONE, OCRJob.STATUS_FAILED) and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        job.refresh_from_db(fields=['status', 'result', 'error', 'started_at', 'finished_at'])
+    return job
+
+
+def batch_setting(name: str) -> int:
+    defaults = {
+        'OCR_BATCH_MAX_FILES': DEFAULT_BATCH_MAX_FILES,
+        'OCR_BATCH_MAX_BYTES': DEFAULT_BATCH_MAX_BYTES,
+        'OCR_BATCH_MAX_ENTRIES': DEFAULT_BATCH_MAX_ENTRIES,
+    }
+    return getattr(settings, name, defaults[name])
+
+
+def _zip_members(uploaded_file) -> Iterable:
+    """(name, size, opener) of the files in an uploaded ZIP, without extracting it"""
+    try:
+        archive = zipfile.ZipFile(uploaded_file)
+        members = archive.infolist()
+    except (zipfile.BadZipFile, OSError) as e:
+        raise BatchUploadError(f'Invalid ZIP file {uploaded_file.name}: {e}')
+
+    for info in members:
+        name = os.path.basename(info.filename)
+        if info.is_dir() or info.filename.startswith('__MACOSX/') or not name or name.startswith('.'):
+            continue
+        yield name, info.file_size, (lambda info=info, name=name: _zip_member_file(archive, info, name))
+
+
+def _zip_member_file(archive, info, name) -> File:
+    member = File(archive.open(info), name=name)
+    member.size = info.file_size
+    return member
+
+
+def _batch_entries(uploaded_files) -> Iterable:
+    for uploaded_file in uploaded_files:
+        if uploaded_file.name.lower().endswith('.zip'):
+            yield from _zip_members(uploaded_file)
+        else:
+            yield uploaded_file.name, uploaded_file.size, (lambda uploaded_file=uploaded_file: uploaded_file)
+
+
+def enqueue_ocr_batch(user, uploaded_files) -> OCRBatch:
+    """
+    Queue one job per receipt: plain files and the members of ZIP archives.
+    Unsupported files are recorded in `batch.skipped` (the first
+    MAX_SKIPPED_LISTED by name); the whole upload is rejected with
+    BatchUploadError if it exceeds the entry, file count or size limit.
+    """
+    max_files = batch_setting('OCR_BATCH_MAX_FILES')
+    max_bytes = batch_setting('OCR_BATCH_MAX_BYTES')
+    max_entries = batch_setting('OCR_BATCH_MAX_ENTRIES')
+
+    accepted = []
+    skipped = []
+    skipped_count = 0
+    total_bytes = 0
+    for entries, (name, size, opener) in enumerate(_batch_entries(uploaded_files), start=1):
+        if entries > max_entries:
+            raise BatchUploadError(f'Too many entries in upload, at most {max_entries} per batch')
+        file_type = file_type_for(name)
+        if file_type is None:
+            skipped_count += 1
+            if len(skipped) < MAX_SKIPPED_LISTED:
+                skipped.append({'file_name': name, 'reason': 'Unsupported file type'})
+            continue
+        total_bytes += size
+        accepted.append((name, file_type, opener))
+        if len(accepted) > max_files:
+            raise BatchUploadError(f'Too many files, at most {max_files} per batch')
+
+    if not accepted:
+        raise BatchUploadError('No PDF or image files in upload')
+    if total_bytes > max_bytes:
+        raise BatchUploadError(f'Upload too large ({total_bytes} bytes), at most {max_bytes} bytes per batch')
+    if skipped_count > len(skipped):
+        skipped.append({'file_name': '', 'reason': f'{skipped_count - len(skipped)} more unsupported files'})
+
+    jobs = []
+    try:
+        with transaction.atomic():
+            batch = OCRBatch.objects.create(owner=user, skipped=skipped)
+            for name, file_type, opener in accepted:
+                jobs.append(enqueue_ocr_job(user, opener(), file_type, batch=batch))
+    except Exception:
+        # The job rows were rolled back, their stored files would be orphaned
+        for job in jobs:
+            job.file.delete(save=False)
+        raise
+    return batch
+
+
+def batch_summary(jobs) -> Dict[str, object]:
+    """Overall status and per-status counts of a batch's jobs"""
+    counts = {code: 0 for code, _ in OCRJob.STATUS_CHOICES}
+    for job in jobs:
+        counts[job.status] += 1
+
+    finished = counts[OCRJob.STATUS_DONE] + counts[OCRJob.STATUS_FAILED]
+    if finished == len(jobs):
+        overall = OCRJob.STATUS_DONE
+    elif counts[OCRJob.STATUS_PENDING] == len(jobs):
+        overall = OCRJob.STATUS_PENDING
+    else:
+        overall = OCRJob.STATUS_RUNNING
+    return {'status': overall, 'total': len(jobs), 'counts': counts}
+
+
+def prepare_expense(job: OCRJob) -> OCRJob:
+    """Store supplier/item suggestions and an Expense draft for a successful job"""
+    from .ocr_matching import expense_draft, suggest_matches
+
+    try:
+        job.suggestions = suggest_matches(job.result or {}, job.owner_id)
+        job.expense_draft = expense_draft(job.result or {}, job.suggestions, job.file_name)
+    except Exception as e:
+        # OCR result stays usable without suggestions
+        logger.warning(f"Preparing expense for OCR job {job.pk} failed: {e}")
+    return job
+
+
+def claim_next_job(stale_after: timedelta = STALE_AFTER) -> Optional[OCRJob]:
+    """Lock the oldest pending (or stale running) job and mark it RUNNING"""
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            OCRJob.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(status=OCRJob.STATUS_PENDING)
+                | Q(status=OCRJob.STATUS_RUNNING, started_at__lt=now - stale_after, attempts__lt=MAX_ATTEMPTS)
+            )
+            .order_by('created_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = OCRJob.STATUS_RUNNING
+        job.started_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'started_at', 'attempts'])
+    return job
+
+
+def fail_abandoned_jobs(stale_after: timedelta = STALE_AFTER) -> int:
+    """Give up on jobs whose worker died MAX_ATTEMPTS times"""
+    return OCRJob.objects.filter(
+        status=OCRJob.STATUS_RUNNING,
+        started_at__lt=timezone.now() - stale_after,
+        attempts__gte=MAX_ATTEMPTS,
+    ).update(status=OCRJob.STATUS_FAILED, error='Worker abgebrochen', finished_at=timezone.now())
+
+
+def run_job(job: OCRJob) -> OCRJob:
+    """Run OCR for a claimed job and store result or error"""
+    from .ocr_service import ocr_service
+
+    try:
+        with job.file.open('rb') as f:
+            data = f.read()
+        result = ocr_service.process_receipt(data, job.file_type)
+    except Exception as e:
+        logger.error(f"OCR job {job.pk} failed: {e}")
+        result = {'error': str(e), 'processing_success': False, 'confidence': 0.0}
+
+    job.result = result
+    job.error = result.get('error', '')
+    job.status = OCRJob.STATUS_FAILED if job.error else OCRJob.STATUS_DONE
+    job.finished_at = timezone.now()
+    update_fields = ['result', 'error', 'status', 'finished_at']
+    if job.batch_id and job.status == OCRJob.STATUS_DONE:
+        prepare_expense(job)
+        update_fields += ['suggestions', 'expense_draft']
+    job.save(update_fields=update_fields)
+    return job
+
+
+def process_next_job(stale_after: timedelta = STALE_AFTER) -> Optional[OCRJob]:
+    """Claim and run one job; None if the queue is empty"""
+    job = claim_next_job(stale_after)
+    if job is None:
+        return None
+    return run_job(job)
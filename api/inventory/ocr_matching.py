@@ -0,0 +1,90 @@
+"""
+Match OCR results to existing suppliers and items and prepare expenses.
+
+Used by the suggest-matches endpoint and by batch OCR jobs, which store
+the suggestions and an Expense draft next to the OCR result.
+"""
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Optional
+
+from django.utils import timezone
+
+from . import search
+from .models import InventoryItem, SearchEntry
+
+MAX_SUGGESTIONS = 5
+
+
+def suggest_matches(ocr_data: Dict[str, Any], owner) -> Dict[str, list]:
+    """The owner's suppliers and items most similar to the OCR supplier / article name"""
+    supplier_name = (ocr_data.get('supplier') or '').strip()
+    article_name = (ocr_data.get('article_name') or '').strip()
+
+    suggestions = {
+        'suppliers': [],
+        'items': []
+    }
+
+    if supplier_name:
+        hits = search.search(owner, supplier_name, kinds=[SearchEntry.KIND_SUPPLIER], limit=MAX_SUGGESTIONS)
+        suggestions['suppliers'] = [
+            {'id': hit.object_id, 'name': hit.name}
+            for hit in hits
+        ]
+
+    if article_name:
+        hits = search.search(owner, article_name, kinds=[SearchEntry.KIND_ITEM], limit=MAX_SUGGESTIONS)
+        items = InventoryItem.objects.filter(owner=owner).only(
+            'id', 'name', 'sku', 'palette_quantity', 'verpackung_quantity'
+        ).in_bulk([hit.object_id for hit in hits])
+        suggestions['items'] = [
+            {
+                'id': item.id,
+                'name': item.name,
+                'sku': item.sku,
+                'current_stock': {
+                    'palettes': item.palette_quantity,
+                    'verpackungen': item.verpackung_quantity
+                }
+            }
+            for item in (items.get(hit.object_id) for hit in hits)
+            if item is not None
+        ]
+
+    return suggestions
+
+
+def _decimal(value) -> Optional[Decimal]:
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def expense_amount(ocr_data: Dict[str, Any]) -> Optional[Decimal]:
+    """Receipt total, or unit price x quantity; None if neither was recognized"""
+    total = _decimal(ocr_data.get('total_price'))
+    if total and total > 0:
+        return total.quantize(Decimal('0.01'))
+
+    unit_price = _decimal(ocr_data.get('unit_price'))
+    quantity = _decimal(ocr_data.get('quantity'))
+    if unit_price and quantity and unit_price > 0 and quantity > 0:
+        return (unit_price * quantity).quantize(Decimal('0.01'))
+    return None
+
+
+def expense_draft(ocr_data: Dict[str, Any], suggestions: Dict[str, list], file_name: str) -> Dict[str, Any]:
+    """Expense fields prefilled from an OCR result, ready to POST to /expenses/ after review"""
+    suppliers = suggestions.get('suppliers') or []
+    description = (ocr_data.get('article_name') or ocr_data.get('supplier') or file_name).strip()
+
+    return {
+        'date': timezone.localdate(),
+        'description': description[:500],
+        'amount': expense_amount(ocr_data),
+        'category': 'PURCHASE',
+        'supplier': suppliers[0]['id'] if suppliers else None,
+        'receipt_number': None,
+        'notes': f"Beleg {file_name} (OCR)",
+    }
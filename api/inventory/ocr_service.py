@@ -1,51 +1,139 @@
 import re
+import hashlib
 import logging
+import math
+import multiprocessing
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from importlib import import_module
+from importlib.util import find_spec
 from typing import Dict, List, Optional, Tuple
 from decimal import Decimal
-import cv2
-import numpy as np
 from PIL import Image
 import io
 import base64
 
-try:
-    from paddleocr import PaddleOCR
-    PADDLE_AVAILABLE = True
-except ImportError:
-    PADDLE_AVAILABLE = False
-    logging.warning("PaddleOCR not available, falling back to Tesseract")
-
-try:
-    import pytesseract
-    TESSERACT_AVAILABLE = True
-except ImportError:
-    TESSERACT_AVAILABLE = False
-    logging.warning("Tesseract not available")
-
-try:
-    from pdf2image import convert_from_bytes
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
-    logging.warning("pdf2image not available")
+from django.conf import settings
+
+from .ocr_cache import OCRResultCache, content_hash
+from .ocr_preprocessing import PDF_STAGES, PreprocessingPipeline
 
 logger = logging.getLogger(__name__)
 
+# Bump whenever preprocessing or parsing changes, so cached results are recomputed
+PIPELINE_VERSION = '5'
+
+# cv2, numpy and the OCR engines are imported on first use, not at import
+# time: views import this module, and loading PaddleOCR models would slow
+# down (and bloat) every worker and manage.py command.
+
+
+@lru_cache(maxsize=None)
+def optional_import(module_name: str, attribute: Optional[str] = None):
+    """Import an optional OCR dependency once; None if it is not installed"""
+    try:
+        module = import_module(module_name)
+    except ImportError:
+        logger.warning(f"{module_name} not available")
+        return None
+    return getattr(module, attribute) if attribute else module
+
+
+PDF_DEFAULTS = {
+    'OCR_PDF_DPI': 200,
+    'OCR_PDF_CHUNK_PAGES': 2,
+    'OCR_PDF_MAX_PAGES': 30,
+    'OCR_PDF_MAX_PAGE_PIXELS': 8_000_000,
+    'OCR_PDF_WORKERS': 1,
+}
+
+
+def pdf_setting(name: str) -> int:
+    return int(getattr(settings, name, PDF_DEFAULTS[name]))
+
+
+def pdf_dpi(page_size: str) -> int:
+    """OCR_PDF_DPI, lowered so a page of `page_size` ('595 x 842 pts') stays below the pixel cap"""
+    dpi = pdf_setting('OCR_PDF_DPI')
+    match = re.match(r'\s*([\d.]+) x ([\d.]+) pts', page_size)
+    if match:
+        width_in = float(match.group(1)) / 72
+        height_in = float(match.group(2)) / 72
+        max_dpi = math.sqrt(pdf_setting('OCR_PDF_MAX_PAGE_PIXELS') / (width_in * height_in))
+        dpi = min(dpi, int(max_dpi))
+    return max(dpi, 1)
+
+
 class ReceiptOCRService:
     """OCR service for extracting data from receipts and delivery notes"""
     
-    def __init__(self):
-        self.paddle_ocr = None
-        if PADDLE_AVAILABLE:
-            try:
-                self.paddle_ocr = PaddleOCR(use_angle_cls=True, lang='de')
-            except Exception as e:
-                logger.warning(f"Failed to initialize PaddleOCR: {e}")
-                self.paddle_ocr = None
+    def __init__(self, result_cache: Optional[OCRResultCache] = None,
+                 pipeline: Optional[PreprocessingPipeline] = None,
+                 pdf_pipeline: Optional[PreprocessingPipeline] = None):
+        self.result_cache = result_cache
+        self.pipeline = pipeline or PreprocessingPipeline()
+        # Rasterized PDF pages: no crop or deskew
+        self.pdf_pipeline = pdf_pipeline or PreprocessingPipeline(
+            stages=getattr(settings, 'OCR_PDF_PREPROCESS_STAGES', PDF_STAGES)
+        )
+        self._paddle_ocr = None
+        self._paddle_loaded = False
+        self._pdf_pool = None
+        self._lock = threading.Lock()
+
+    @property
+    def paddle_ocr(self):
+        """PaddleOCR instance, created on first use (None if unavailable)"""
+        if not self._paddle_loaded:
+            with self._lock:
+                if not self._paddle_loaded:
+                    self._paddle_ocr = self._create_paddle_ocr()
+                    self._paddle_loaded = True
+        return self._paddle_ocr
+
+    @paddle_ocr.setter
+    def paddle_ocr(self, engine):
+        self._paddle_ocr = engine
+        self._paddle_loaded = True
+
+    def _create_paddle_ocr(self):
+        PaddleOCR = optional_import('paddleocr', 'PaddleOCR')
+        if PaddleOCR is None:
+            logger.warning("PaddleOCR not available, falling back to Tesseract")
+            return None
+        try:
+            return PaddleOCR(use_angle_cls=True, lang='de')
+        except Exception as e:
+            logger.warning(f"Failed to initialize PaddleOCR: {e}")
+            return None
+
+    @property
+    def engine_id(self) -> str:
+        """Engine that produces results, without loading it if it is not loaded yet"""
+        if self._paddle_loaded:
+            return 'paddleocr' if self._paddle_ocr else 'tesseract'
+        return 'paddleocr' if find_spec('paddleocr') else 'tesseract'
+
+    @property
+    def pipeline_version(self) -> str:
+        """PIPELINE_VERSION plus the configured preprocessing stages (result cache key)"""
+        versions = f'{self.pipeline.version};{self.pdf_pipeline.version}'
+        stages = hashlib.sha1(versions.encode()).hexdigest()[:8]
+        return f"{PIPELINE_VERSION}-{stages}"
+
+    def warm_up(self) -> bool:
+        """Load the OCR engine now (e.g. in a dedicated OCR worker); True if PaddleOCR is ready"""
+        optional_import('cv2')
+        optional_import('numpy')
+        return self.paddle_ocr is not None
     
     def extract_text_from_image(self, image_data: bytes) -> str:
         """Extract text from image using available OCR engines"""
         try:
+            import numpy as np
+
             # Convert bytes to PIL Image
             image = Image.open(io.BytesIO(image_data))
             
@@ -53,10 +141,19 @@ class ReceiptOCRService:
             if image.mode != 'RGB':
                 image = image.convert('RGB')
             
+            return self.extract_text_from_array(np.asarray(image))
+            
+        except Exception as e:
+            logger.error(f"OCR extraction failed: {e}")
+            return ""
+
+    def extract_text_from_array(self, image) -> str:
+        """Extract text from an image array (RGB or grayscale) using available OCR engines"""
+        try:
             # Try PaddleOCR first (better for German text)
             if self.paddle_ocr:
                 try:
-                    result = self.paddle_ocr.ocr(np.array(image), cls=True)
+                    result = self.paddle_ocr.ocr(image, cls=True)
                     if result and result[0]:
                         text_lines = []
                         for line in result[0]:
@@ -67,7 +164,8 @@ class ReceiptOCRService:
                     logger.warning(f"PaddleOCR failed: {e}")
             
             # Fallback to Tesseract
-            if TESSERACT_AVAILABLE:
+            pytesseract = optional_import('pytesseract')
+            if pytesseract is not None:
                 try:
                     return pytesseract.image_to_string(image, lang='deu+eng')
                 except Exception as e:
@@ -80,48 +178,102 @@ class ReceiptOCRService:
             return ""
     
     def extract_text_from_pdf(self, pdf_data: bytes) -> str:
-        """Extract text from PDF using pdf2image + OCR"""
-        if not PDF_AVAILABLE:
+        """
+        Extract text from PDF using pdf2image + OCR.
+
+        Pages are rasterized in chunks of OCR_PDF_CHUNK_PAGES (first_page/
+        last_page), preprocessed and passed to the engine as arrays. With
+        OCR_PDF_WORKERS > 1 the chunks run in a process pool. At most
+        OCR_PDF_MAX_PAGES pages are read, and the DPI is lowered for large
+        pages so one page stays below OCR_PDF_MAX_PAGE_PIXELS.
+        """
+        pdf2image = optional_import('pdf2image')
+        if pdf2image is None:
             return ""
         
         try:
-            # Convert PDF to images
-            images = convert_from_bytes(pdf_data)
-            all_text = []
-            
-            for image in images:
-                # Convert PIL to bytes for OCR
-                img_bytes = io.BytesIO()
-                image.save(img_bytes, format='PNG')
-                img_bytes.seek(0)
-                
-                text = self.extract_text_from_image(img_bytes.getvalue())
-                if text.strip():
-                    all_text.append(text)
+            with tempfile.NamedTemporaryFile(suffix='.pdf') as pdf_file:
+                pdf_file.write(pdf_data)
+                pdf_file.flush()
+
+                info = pdf2image.pdfinfo_from_path(pdf_file.name)
+                page_count = int(info.get('Pages', 0))
+                max_pages = pdf_setting('OCR_PDF_MAX_PAGES')
+                if page_count > max_pages:
+                    logger.warning(f"PDF has {page_count} pages, only the first {max_pages} are processed")
+                    page_count = max_pages
+
+                dpi = pdf_dpi(info.get('Page size', ''))
+                chunk = pdf_setting('OCR_PDF_CHUNK_PAGES')
+                chunks = [
+                    (pdf_file.name, first, min(first + chunk - 1, page_count), dpi)
+                    for first in range(1, page_count + 1, chunk)
+                ]
+
+                pool = self.pdf_pool() if len(chunks) > 1 else None
+                if pool is not None:
+                    texts = pool.map(_ocr_pdf_chunk, *zip(*chunks))
+                else:
+                    texts = (self.ocr_pdf_pages(*args) for args in chunks)
+                all_text = [text for text in texts if text.strip()]
             
             return '\n'.join(all_text)
             
         except Exception as e:
             logger.error(f"PDF OCR extraction failed: {e}")
             return ""
+
+    def ocr_pdf_pages(self, pdf_path: str, first_page: int, last_page: int, dpi: int) -> str:
+        """Rasterize, preprocess and OCR one chunk of pages"""
+        import numpy as np
+
+        pdf2image = optional_import('pdf2image')
+        pages = pdf2image.convert_from_path(pdf_path, dpi=dpi, first_page=first_page, last_page=last_page)
+        page_texts = []
+        while pages:
+            page = pages.pop(0)
+            image = self.preprocess_array(np.asarray(page.convert('RGB')), pipeline=self.pdf_pipeline)
+            text = self.extract_text_from_array(image)
+            page.close()
+            if text.strip():
+                page_texts.append(text)
+        return '\n'.join(page_texts)
+
+    def pdf_pool(self):
+        """Process pool for PDF pages (None if OCR_PDF_WORKERS <= 1), created once"""
+        workers = pdf_setting('OCR_PDF_WORKERS')
+        if workers <= 1:
+            return None
+        if self._pdf_pool is None:
+            with self._lock:
+                if self._pdf_pool is None:
+                    # fork: the pool processes inherit the configured Django setup
+                    self._pdf_pool = ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context('fork'),
+                        initializer=_init_pdf_worker,
+                    )
+        return self._pdf_pool
     
+    def decode_image(self, image_data: bytes):
+        """BGR array of an encoded image, None if OpenCV cannot decode it"""
+        import cv2
+        import numpy as np
+
+        image = cv2.imdecode(np.frombuffer(image_data, np.uint8), cv2.IMREAD_COLOR)
+        return image if image is not None and image.size else None
+
     def preprocess_image(self, image_data: bytes) -> bytes:
         """Preprocess image to improve OCR accuracy"""
         try:
+            import cv2
+            import numpy as np
+
             # Convert to OpenCV format
             nparr = np.frombuffer(image_data, np.uint8)
             image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
             
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Apply denoising
-            denoised = cv2.fastNlMeansDenoising(gray)
-            
-            # Apply adaptive thresholding
-            thresh = cv2.adaptiveThreshold(
-                denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-            )
+            thresh = self.preprocess_array(image, color_order='BGR')
             
             # Convert back to PIL Image
             pil_image = Image.fromarray(thresh)
@@ -134,15 +286,21 @@ class ReceiptOCRService:
         except Exception as e:
             logger.warning(f"Image preprocessing failed: {e}")
             return image_data
-    
+
+    def preprocess_array(self, image, color_order: str = 'RGB', pipeline: Optional[PreprocessingPipeline] = None):
+        """Run the preprocessing pipeline (default: the photo pipeline with crop and deskew) on an image array"""
+        try:
+            return (pipeline or self.pipeline).run(image, color_order=color_order)
+        except Exception as e:
+            logger.warning(f"Image preprocessing failed: {e}")
+            return image
+
     def parse_receipt_data(self, text: str) -> Dict[str, any]:
         """Parse extracted text to extract structured receipt data"""
-        if not text.strip():
-            return {}
-        
-        # Clean and normalize text
-        text = re.sub(r'\s+', ' ', text.strip())
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
+        # Clean and normalize text (whitespace within lines; the line breaks delimit the fields)
+        lines = [re.sub(r'[ \t]+', ' ', line).strip() for line in text.splitlines()]
+        lines = [line for line in lines if line]
+        text = '\n'.join(lines)
         
         result = {
             'supplier': '',
@@ -155,14 +313,17 @@ class ReceiptOCRService:
             'raw_text': text
         }
         
+        if not lines:
+            return result
+        
+        # Weights of the fields found; all fields found gives 1.0
         confidence_score = 0.0
-        total_checks = 0
         
         # Extract supplier name (look for common patterns)
         supplier_patterns = [
-            r'(?:Lieferant|Supplier|From|Von):\s*([^\n\r]+)',
-            r'^([A-Z][a-z\s&]+(?:GmbH|AG|Ltd|Inc|Co\.?))',
-            r'^([A-Z][a-z\s]+(?:Brewery|Brauerei|Bier))',
+            r'(?:Lieferant|Supplier|From|Von):[ \t]*([^\n\r]+)',
+            r'^([A-Z][a-z \t&]+[ \t](?:GmbH|AG|Ltd|Inc|Co\.?))\b',
+            r'^([A-Z][a-z \t]+(?:Brewery|Brauerei|Bier))\b',
         ]
         
         for pattern in supplier_patterns:
@@ -171,13 +332,18 @@ class ReceiptOCRService:
                 result['supplier'] = match.group(1).strip()
                 confidence_score += 0.3
                 break
-        total_checks += 1
+        else:
+            # Delivery notes print the supplier as their heading (often in capitals)
+            heading = lines[0]
+            if ':' not in heading and not re.search(r'\d', heading):
+                result['supplier'] = heading.title() if heading.isupper() else heading
+                confidence_score += 0.3
         
         # Extract article name (look for product descriptions)
         article_patterns = [
-            r'(?:Artikel|Product|Item):\s*([^\n\r]+)',
-            r'^([A-Z][a-z\s]+(?:Ice Tea|Bier|Beer|Softdrink))',
-            r'^([A-Z][a-z\s]+(?:0\.\d+\s*L|0\.\d+\s*ml))',
+            r'(?:Artikel\w*|Product|Item)(?:[ \t]*\([^)\n]*\))?:[ \t]*([^\n\r]+)',
+            r'^([A-Z][a-z \t]+(?:Ice Tea|Bier|Beer|Softdrink))',
+            r'^([A-Z][a-z \t]+(?:0\.\d+[ \t]*L|0\.\d+[ \t]*ml))',
         ]
         
         for pattern in article_patterns:
@@ -186,13 +352,13 @@ class ReceiptOCRService:
                 result['article_name'] = match.group(1).strip()
                 confidence_score += 0.2
                 break
-        total_checks += 1
         
-        # Extract quantities (look for numbers with units)
+        # Extract quantities (look for numbers with units; stock is counted in packages)
         quantity_patterns = [
-            r'(?:Menge|Quantity|Anzahl):\s*(\d+)',
-            r'(\d+)\s*(?:Stück|Pieces|Packages|Verpackungen)',
-            r'(\d+)\s*(?:Paletten|Pallets)',
+            r'(?:Packages|Verpackungen)[ \t]*\([^)\n]*\):[ \t]*(\d+)',
+            r'(?:Menge|Quantity|Anzahl)(?:[ \t]*\([^)\n]*\))?:[ \t]*(\d+)',
+            r'(\d+)[ \t]*(?:Stück|Pieces|Packages|Verpackungen)',
+            r'(\d+)[ \t]*(?:Paletten|Pallets)',
         ]
         
         for pattern in quantity_patterns:
@@ -201,12 +367,12 @@ class ReceiptOCRService:
                 result['quantity'] = int(match.group(1))
                 confidence_score += 0.2
                 break
-        total_checks += 1
         
         # Extract prices (look for currency amounts)
         price_patterns = [
-            r'(?:Preis|Price|EUR|CHF):\s*([\d,\.]+)',
-            r'([\d,\.]+)\s*(?:EUR|CHF|\€|\$)',
+            r'(?:Preis|Price)[^:\n]*:[ \t]*([\d,\.]+)',
+            r'(?:EUR|CHF):[ \t]*([\d,\.]+)',
+            r'([\d,\.]+)[ \t]*(?:EUR|CHF|\€|\$)',
             r'Total[:\s]*([\d,\.]+)\s*(?:EUR|CHF|\€|\$)',
         ]
         
@@ -226,7 +392,6 @@ class ReceiptOCRService:
                     except:
                         continue
                 break
-        total_checks += 1
         
         # Extract currency
         currency_match = re.search(r'(EUR|CHF|\€|\$)', text, re.IGNORECASE)
@@ -237,24 +402,52 @@ class ReceiptOCRService:
             else:
                 result['currency'] = currency
             confidence_score += 0.1
-        total_checks += 1
         
-        # Calculate total confidence
-        if total_checks > 0:
-            result['confidence'] = min(confidence_score / total_checks, 1.0)
+        result['confidence'] = min(confidence_score, 1.0)
         
         return result
     
-    def process_receipt(self, file_data: bytes, file_type: str) -> Dict[str, any]:
-        """Main method to process receipt and extract data"""
+    def cached_result(self, digest: str, file_type: str) -> Optional[Dict[str, any]]:
+        """Cached result for a file's SHA-256, or None"""
+        if self.result_cache is None:
+            return None
+        result = self.result_cache.get(digest, file_type, self.engine_id, self.pipeline_version)
+        if result is not None:
+            result['cached'] = True
+        return result
+
+    def process_receipt(self, file_data: bytes, file_type: str, digest: Optional[str] = None) -> Dict[str, any]:
+        """Main method to process receipt and extract data (served from the result cache if possible)"""
+        if self.result_cache is None:
+            return self._process_receipt(file_data, file_type)
+
+        digest = digest or content_hash(file_data)
+        cached = self.cached_result(digest, file_type)
+        if cached is not None:
+            return cached
+
+        result = self._process_receipt(file_data, file_type)
+        # Failures are not cached, the next upload tries again
+        if result.get('processing_success'):
+            try:
+                self.result_cache.set(digest, file_type, self.engine_id, self.pipeline_version, result)
+            except Exception as e:
+                logger.warning(f"Storing OCR result in cache failed: {e}")
+        return result
+
+    def _process_receipt(self, file_data: bytes, file_type: str) -> Dict[str, any]:
+        """Run preprocessing, OCR and parsing"""
         try:
             # Determine file type and extract text
             if file_type.lower() == 'pdf':
                 text = self.extract_text_from_pdf(file_data)
             else:
-                # Preprocess image for better OCR
-                processed_data = self.preprocess_image(file_data)
-                text = self.extract_text_from_image(processed_data)
+                # Preprocess image for better OCR (arrays, no re-encoding)
+                image = self.decode_image(file_data)
+                if image is None:
+                    text = self.extract_text_from_image(file_data)
+                else:
+                    text = self.extract_text_from_array(self.preprocess_array(image, color_order='BGR'))
             
             # Parse the extracted text
             parsed_data = self.parse_receipt_data(text)
@@ -274,4 +467,16 @@ class ReceiptOCRService:
             }
 
 # Global instance
-ocr_service = ReceiptOCRService()
\ No newline at end of file
+ocr_service = ReceiptOCRService(result_cache=OCRResultCache())
+
+# Service of a PDF pool process (own OCR engine, no result cache)
+_pdf_worker_service = None
+
+
+def _init_pdf_worker():
+    global _pdf_worker_service
+    _pdf_worker_service = ReceiptOCRService()
+
+
+def _ocr_pdf_chunk(pdf_path: str, first_page: int, last_page: int, dpi: int) -> str:
+    return (_pdf_worker_service or ocr_service).ocr_pdf_pages(pdf_path, first_page, last_page, dpi)
\ No newline at end of file
@@ -0,0 +1,184 @@
+"""
+Pagination for large, append-only lists (stock movements, logs, invoices).
+
+Clients that send ?cursor= (empty for the first page) get keyset pagination:
+each page is `WHERE (created_at, id) < (last row)` on a fixed ordering, so
+deep pages cost the same as the first one and no COUNT(*) is run. Clients
+without ?cursor keep the page-number format ({count, next, previous, results}).
+
+?count=estimate replaces the exact COUNT(*) with the planner's row estimate
+(PostgreSQL EXPLAIN); other backends fall back to an exact count.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_count(queryset) -> int:
+    """Row estimate of the query planner (exact count on non-PostgreSQL backends)"""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.get_compiler(using=queryset.db).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    """Django paginator whose count is the planner's row estimate"""
+
+    @cached_property
+    def count(self):
+        return estimate_count(self.object_list)
+
+
+class HybridPagination(BasePagination):
+    """
+    Keyset (cursor) pagination with page-number fallback for old clients.
+
+    Subclasses set `keyset_ordering`, e.g. ('-created_at', '-id'). The last
+    field must be unique so the keyset is a total order. Cursor mode pages
+    forward only (`previous` is always null) and ignores ?ordering=.
+    """
+    keyset_ordering = ('-id',)
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+
+    def __init__(self):
+        self.page_number_pagination = PageNumberPagination()
+        self.page_number_pagination.page_size_query_param = self.page_size_query_param
+        self.page_number_pagination.max_page_size = self.max_page_size
+        self.use_cursor = False
+
+    def wants_estimate(self, request):
+        return request.query_params.get(self.count_query_param) == 'estimate'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.use_cursor = self.cursor_query_param in request.query_params
+
+        if not self.use_cursor:
+            if self.wants_estimate(request):
+                self.page_number_pagination.django_paginator_class = EstimatedCountPaginator
+            return self.page_number_pagination.paginate_queryset(queryset, request, view)
+
+        self.page_size = self.get_page_size(request)
+        self.estimated_count = estimate_count(queryset) if self.wants_estimate(request) else None
+
+        queryset = queryset.order_by(*self.keyset_ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(queryset.model, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def keyset_filter(self, model, position):
+        """(a, b) < (x, y) written as a < x OR (a = x AND b < y), per ordering direction"""
+        condition = Q()
+        equal = Q()
+        for field, value in zip(self.keyset_ordering, position):
+            name = field.lstrip('-')
+            try:
+                value = model._meta.get_field(name).to_python(value)
+            except (DjangoValidationError, TypeError, ValueError):
+                raise NotFound('Ungültiger Cursor.')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, row):
+        position = [getattr(row, field.lstrip('-')) for field in self.keyset_ordering]
+        position = [value.isoformat() if hasattr(value, 'isoformat') else value for value in position]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+        except (TypeError, ValueError):
+            raise NotFound('Ungültiger Cursor.')
+        if not isinstance(position, list) or len(position) != len(self.keyset_ordering):
+            raise NotFound('Ungültiger Cursor.')
+        return position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return self.page_number_pagination.get_paginated_response(data)
+
+        response = OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', None),
+            ('results', data),
+        ])
+        if self.estimated_count is not None:
+            response['count'] = self.estimated_count
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_pagination.get_paginated_response_schema(schema)
+
+
+class StockMovementPagination(HybridPagination):
+    keyset_ordering = ('-created_at', '-id')
+
+
+class InventoryLogPagination(HybridPagination):
+    keyset_ordering = ('-timestamp', '-id')
+
+
+class InvoicePagination(HybridPagination):
+    # issue_date is nullable, so invoices page on the id alone
+    keyset_ordering = ('-id',)
+
+
+class ReportPagination(PageNumberPagination):
+    """Page-number pagination of report rows; the report's totals cover all rows"""
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def get_report_response(self, rows, totals):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('items', rows),
+            ('totals', totals),
+        ]))
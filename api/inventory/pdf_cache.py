@@ -0,0 +1,155 @@
+"""
+Rendered invoice PDFs cached on disk, keyed by a hash of their content.
+
+Rendering an invoice (template, logo, QR bill, WeasyPrint layout) takes
+seconds of CPU, but the PDF only depends on data that rarely changes. The
+key is a SHA-256 over:
+
+    - the invoice, its order, customer and order lines (incl. item name,
+      description and SKU; not the item's stock)
+    - the company profile (incl. the logo file name)
+    - the active InvoiceTemplate's updated_at
+    - RENDERER_VERSION and the default template files
+
+The file is written to MEDIA_ROOT/<INVOICE_PDF_CACHE_DIR>/<owner>/ with the
+key in its name (tmp file + rename, by inventory.pdf_render) and recorded in
+Invoice.pdf_file when first served. A download whose file exists is served
+from disk; the key doubles as the ETag. Any change of the inputs yields a new key
+and the next download re-renders and replaces the file. Saving the company
+profile or the template deletes the owner's files right away (signals).
+"""
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import models
+from django.db.models import prefetch_related_objects
+
+from .models import CompanyProfile, Invoice, InvoiceTemplate
+
+# Bump when the rendering code changes the output for the same data
+RENDERER_VERSION = '1'
+DEFAULT_CACHE_DIR = 'invoice_pdfs'
+DEFAULT_TEMPLATE_FILES = ('invoice.html', '_styles.css')
+
+# Bookkeeping fields that do not appear on the document
+IGNORED_FIELDS = {'pdf_file', 'is_archived', 'created_at', 'updated_at'}
+# Item data printed on a line (not the stock, which changes with every booking)
+ITEM_FIELDS = ('name', 'description', 'sku')
+
+
+def cache_dir() -> str:
+    return getattr(settings, 'INVOICE_PDF_CACHE_DIR', DEFAULT_CACHE_DIR)
+
+
+def absolute_path(name: str) -> Path:
+    return Path(settings.MEDIA_ROOT) / name
+
+
+@lru_cache(maxsize=None)
+def renderer_digest() -> str:
+    """Version of the renderer including the shipped default template"""
+    digest = hashlib.sha256(RENDERER_VERSION.encode())
+    template_dir = Path(settings.BASE_DIR) / 'inventory' / 'templates' / 'pdf'
+    for name in DEFAULT_TEMPLATE_FILES:
+        path = template_dir / name
+        if path.exists():
+            digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def _field_values(instance: Optional[models.Model]) -> dict:
+    if instance is None:
+        return {}
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.name not in IGNORED_FIELDS
+    }
+
+
+def invoice_key(invoice: Invoice, profile: CompanyProfile) -> str:
+    """Content hash of everything the rendered PDF depends on"""
+    order = invoice.order
+    customer = order.customer
+    # No-op if the caller's queryset prefetched them already (the invoice viewset does)
+    prefetch_related_objects([order], 'items__item')
+    template_version = InvoiceTemplate.objects.filter(
+        user_id=customer.owner_id if customer else None, is_active=True
+    ).values_list('updated_at', flat=True).first()
+
+    payload = {
+        'renderer': renderer_digest(),
+        'invoice': _field_values(invoice),
+        'order': _field_values(order),
+        'customer': _field_values(customer),
+        'lines': [
+            [_field_values(line), [getattr(line.item, field) for field in ITEM_FIELDS]]
+            for line in sorted(order.items.all(), key=lambda line: line.pk)
+        ],
+        'profile': _field_values(profile),
+        'template': template_version,
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def file_name(invoice: Invoice, key: str) -> str:
+    """MEDIA_ROOT-relative path; the full hash keeps the name unguessable"""
+    return f'{cache_dir()}/{invoice.order.created_by_id}/{invoice.invoice_number}-{key}.pdf'
+
+
+def write(path: Path, pdf_bytes: bytes) -> None:
+    """Write a PDF atomically (readers never see a partial file)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    tmp_path.write_bytes(pdf_bytes)
+    os.replace(tmp_path, path)
+
+
+def _remove(name: str) -> None:
+    if name and name.startswith(f'{cache_dir()}/'):
+        try:
+            absolute_path(name).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def entry(invoice: Invoice, profile: CompanyProfile) -> Tuple[str, str]:
+    """(key, MEDIA_ROOT-relative file name) of the invoice's current PDF"""
+    key = invoice_key(invoice, profile)
+    return key, file_name(invoice, key)
+
+
+def cached_path(invoice: Invoice, name: str) -> Optional[Path]:
+    """
+    Path of the rendered file `name` if it exists; records it in pdf_file
+    (and deletes the invoice's previous file) the first time it is served.
+    """
+    path = absolute_path(name)
+    if not path.exists():
+        return None
+    if invoice.pdf_file != name:
+        _remove(invoice.pdf_file)
+        invoice.pdf_file = name
+        Invoice.objects.filter(pk=invoice.pk).update(pdf_file=name)
+    return path
+
+
+def forget(invoice: Invoice) -> None:
+    """Delete the invoice's cached file (the invoice row is left alone)"""
+    _remove(invoice.pdf_file)
+
+
+def invalidate_owner(user_id: int) -> int:
+    """Delete the cached PDFs of the user's invoices; returns the number removed"""
+    invoices = Invoice.objects.filter(order__created_by_id=user_id).exclude(pdf_file='')
+    names = list(invoices.values_list('pdf_file', flat=True))
+    for name in names:
+        _remove(name)
+    invoices.update(pdf_file='')
+    return len(names)
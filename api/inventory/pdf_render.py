@@ -0,0 +1,262 @@
+"""
+Invoice PDF rendering in a pool of warm worker processes.
+
+WeasyPrint layout is CPU-bound and takes seconds; inside a sync web worker
+a burst of downloads blocks the whole API. With INVOICE_PDF_WORKERS > 0
+each web worker forks that many render processes once (on the first
+render). They preload WeasyPrint, the font configuration and the parsed
+default stylesheet (pdf/_styles.css), and take jobs over the executor's
+local call queue. The default template is then rendered without its
+inline <style> and laid out with the pre-parsed stylesheet.
+
+A job writes the PDF straight to its file in the PDF cache
+(inventory.pdf_cache), so any web worker can serve it once done:
+
+    - sync:  wait up to INVOICE_PDF_RENDER_TIMEOUT seconds for the file
+    - async: return at once; the client polls the download until it is ready
+
+A job still running after the timeout keeps running. Jobs are de-duplicated
+per file: the web worker that submits one creates <file>.rendering next to
+the target (O_EXCL) and removes it when the job is done; other web workers
+seeing the marker wait for the file instead of rendering it again. A marker
+older than MARKER_MAX_AGE was left by a killed worker and is taken over.
+INVOICE_PDF_WORKERS = 0 renders inline in the request (the previous
+behaviour).
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional
+
+from django.conf import settings
+
+from . import pdf_cache
+from .utils.pdf import default_stylesheet, html_to_pdf
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 1
+DEFAULT_TIMEOUT = 20
+# Seconds after which a render marker counts as abandoned (no render takes that long)
+MARKER_MAX_AGE = 300
+# Interval of the file checks while another web worker renders
+FILE_POLL_INTERVAL = 0.1
+
+
+def render_setting(name: str, default: int) -> int:
+    return int(getattr(settings, name, default))
+
+
+def preload() -> Dict[str, object]:
+    """WeasyPrint state reused by every render of a pool process"""
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    font_config = FontConfiguration()
+    stylesheet = CSS(string=default_stylesheet(), font_config=font_config)
+    # One throwaway layout loads fontconfig/Pango and WeasyPrint's lazy code paths
+    html_to_pdf('<p>Rechnung</p>', [stylesheet], font_config)
+    return {'stylesheet': stylesheet, 'font_config': font_config}
+
+
+# Preloaded state of a pool process
+_worker_state: Dict[str, object] = {}
+
+
+def _init_render_worker():
+    _worker_state.update(preload())
+
+
+def marker_path(path: Path) -> Path:
+    """Marker of a render in progress for `path` (in any web worker)"""
+    return path.with_name(f'{path.name}.rendering')
+
+
+def _claim(path: Path) -> bool:
+    """Create the render marker of `path`; False if a live one exists"""
+    marker = marker_path(path)
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    for _ in range(2):
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            if _marker_alive(marker):
+                return False
+            _release(path)
+    return False
+
+
+def _marker_alive(marker: Path) -> bool:
+    try:
+        return time.time() - marker.stat().st_mtime < MARKER_MAX_AGE
+    except FileNotFoundError:
+        return False
+
+
+def _release(path: Path) -> None:
+    try:
+        marker_path(path).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def _render_to_file(html_string: str, path: str, default_styles: bool) -> int:
+    """Pool job: lay out the HTML and write the PDF to `path`; returns its size"""
+    stylesheets = [_worker_state['stylesheet']] if default_styles else None
+    pdf_bytes = html_to_pdf(html_string, stylesheets, _worker_state.get('font_config'))
+    pdf_cache.write(Path(path), pdf_bytes)
+    return len(pdf_bytes)
+
+
+class PDFRenderService:
+    """Submits invoice renders to the warm process pool of this web worker"""
+
+    def __init__(self):
+        self._pool = None
+        self._lock = threading.Lock()
+        # Jobs by target file; failed jobs stay until their error was reported once
+        self._jobs: Dict[str, Future] = {}
+
+    @property
+    def pooled(self) -> bool:
+        """Renders run in the pool (the default stylesheet is passed pre-parsed)"""
+        return render_setting('INVOICE_PDF_WORKERS', DEFAULT_WORKERS) > 0
+
+    def pool(self) -> Optional[ProcessPoolExecutor]:
+        """Process pool (None if INVOICE_PDF_WORKERS <= 0), created once"""
+        workers = render_setting('INVOICE_PDF_WORKERS', DEFAULT_WORKERS)
+        if workers <= 0:
+            return None
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # fork: the pool processes inherit the configured Django setup
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context('fork'),
+                        initializer=_init_render_worker,
+                    )
+        return self._pool
+
+    def _reset_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Drop a pool whose process died; the next job forks a new one"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def job(self, path: Path) -> Optional[Future]:
+        """Running job for `path` in this web worker, or its failure (reported once)"""
+        with self._lock:
+            future = self._jobs.get(str(path))
+            if future is not None and future.done():
+                del self._jobs[str(path)]
+                # Cancelled with a broken pool: rendered again by the caller
+                if future.cancelled() or future.exception() is None:
+                    return None
+            return future
+
+    def rendering(self, path: Path) -> bool:
+        """Another web worker (or this one) is rendering `path`"""
+        return self.pooled and _marker_alive(marker_path(path))
+
+    def submit(self, path: Path, html_string: str, default_styles: bool) -> Optional[Future]:
+        """
+        Start rendering `html_string` to `path` (at once, inline, without a
+        pool). None if another web worker started rendering it meanwhile.
+        """
+        pool = self.pool()
+        if pool is None:
+            future = Future()
+            try:
+                future.set_result(_render_to_file(html_string, str(path), False))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        if not _claim(path):
+            return None
+        try:
+            try:
+                future = pool.submit(_render_to_file, html_string, str(path), default_styles)
+            except BrokenProcessPool:
+                self._reset_pool(pool)
+                pool = self.pool()
+                future = pool.submit(_render_to_file, html_string, str(path), default_styles)
+        except Exception:
+            _release(path)
+            raise
+
+        with self._lock:
+            self._jobs[str(path)] = future
+        future.add_done_callback(lambda done: self._finished(path, done, pool))
+        return future
+
+    def _finished(self, path: Path, future: Future, pool: ProcessPoolExecutor) -> None:
+        _release(path)
+        key = str(path)
+        error = future.exception() if not future.cancelled() else None
+        if error is None:
+            with self._lock:
+                if self._jobs.get(key) is future:
+                    del self._jobs[key]
+            return
+        logger.error(f"Invoice PDF render failed for {key}: {error}")
+        if isinstance(error, BrokenProcessPool):
+            self._reset_pool(pool)
+
+    def wait(self, future: Future, timeout: float) -> bool:
+        """
+        True once the job is done, False if it is still running after
+        `timeout` seconds (0: don't wait) or was cancelled.
+
+        Raises:
+            Exception: The render error of a failed job (reported once)
+        """
+        try:
+            future.result(timeout=timeout)
+        except FutureTimeout:
+            return False
+        except CancelledError:
+            return False
+        except Exception:
+            self._forget(future)
+            raise
+        return True
+
+    def wait_for_file(self, path: Path, timeout: float) -> bool:
+        """
+        True once `path` exists, False if it doesn't after `timeout` seconds
+        or its render (in another web worker) ended without it.
+        """
+        deadline = time.monotonic() + timeout
+        while not path.exists():
+            if time.monotonic() >= deadline or not self.rendering(path):
+                return path.exists()
+            time.sleep(FILE_POLL_INTERVAL)
+        return True
+
+    def _forget(self, future: Future) -> None:
+        with self._lock:
+            for key, job in list(self._jobs.items()):
+                if job is future:
+                    del self._jobs[key]
+
+    def timeout(self) -> int:
+        return render_setting('INVOICE_PDF_RENDER_TIMEOUT', DEFAULT_TIMEOUT)
+
+    def warm_up(self) -> None:
+        """Fork and preload the pool processes now instead of on the first render"""
+        pool = self.pool()
+        if pool is not None:
+            pool.submit(int).result()
+
+
+# Global instance (one pool per web worker process)
+pdf_renderer = PDFRenderService()
@@ -0,0 +1,221 @@
+"""
+Report aggregations computed in SQL.
+
+Every report is scoped to the owner and runs one aggregate query (two for
+reports that also return totals), independent of the number of items.
+
+The stock reports take an optional `as_of` (exclusive end, see
+inventory.stock_history): quantities are then the ledger balances at that
+time and the rows are aggregated in Python; prices are current.
+"""
+from decimal import Decimal
+from typing import Dict, Any, List, Optional
+
+from django.db.models import (
+    F, Q, Sum, Count, Avg, Value, ExpressionWrapper, IntegerField, DecimalField
+)
+from django.db.models.functions import Coalesce, TruncDate, TruncDay, TruncMonth, TruncYear
+
+from .models import InventoryItem, Invoice, Expense
+from . import stock_history
+
+
+# Gesamtbestand in Verpackungen (Paletten * Verpackungen pro Palette + lose Verpackungen)
+STOCK_IN_VERPACKUNGEN = ExpressionWrapper(
+    F('palette_quantity') * F('verpackungen_pro_palette') + F('verpackung_quantity'),
+    output_field=IntegerField()
+)
+
+STOCK_VALUE = ExpressionWrapper(
+    STOCK_IN_VERPACKUNGEN * F('price'),
+    output_field=DecimalField(max_digits=16, decimal_places=2)
+)
+
+PERIODS = {
+    'day': TruncDay,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+ZERO = Value(Decimal('0.00'), output_field=DecimalField(max_digits=16, decimal_places=2))
+
+
+def _items(user, category=None):
+    queryset = InventoryItem.objects.filter(owner=user)
+    if category:
+        queryset = queryset.filter(category_id=category)
+    return queryset
+
+
+def _historic_rows(user, category, as_of) -> List[Dict[str, Any]]:
+    """Item rows with quantity (Verpackungen) and value from the ledger balances before `as_of`"""
+    rows = list(
+        _items(user, category).order_by('name').values(
+            'id', 'name', 'sku', 'price', 'category_id', 'min_stock_level', 'is_active',
+            category_name=F('category__name')
+        )
+    )
+    balances = stock_history.balances_as_of(user, as_of)
+    for row in rows:
+        balance = balances.get(row['id'])
+        row['quantity'] = (
+            balance.palette_quantity * balance.verpackungen_pro_palette + balance.verpackung_quantity
+            if balance else 0
+        )
+        row['value'] = row['quantity'] * row['price']
+    return rows
+
+
+def inventory_value(user, category=None, as_of=None) -> Dict[str, Any]:
+    """Stock and value per item plus totals"""
+    if as_of is not None:
+        rows = _historic_rows(user, category, as_of)
+        fields = ['id', 'name', 'sku', 'price', 'quantity', 'value', 'category_name']
+        return {
+            'items': [{field: row[field] for field in fields} for row in rows],
+            'totals': {
+                'total_items': len(rows),
+                'total_quantity': sum(row['quantity'] for row in rows),
+                'total_value': sum((row['value'] for row in rows), Decimal('0.00')),
+            },
+        }
+
+    queryset = _items(user, category).annotate(
+        quantity=STOCK_IN_VERPACKUNGEN,
+        value=STOCK_VALUE,
+    )
+    # Left lazy: the view pages it (LIMIT/OFFSET in SQL)
+    items = queryset.order_by('name', 'id').values(
+        'id', 'name', 'sku', 'price', 'quantity', 'value', category_name=F('category__name')
+    )
+    totals = queryset.aggregate(
+        total_items=Count('id'),
+        total_quantity=Coalesce(Sum('quantity'), 0),
+        total_value=Coalesce(Sum('value'), ZERO),
+    )
+    return {'items': items, 'totals': totals}
+
+
+def _historic_categories(user, category, as_of) -> List[Dict[str, Any]]:
+    categories = {}
+    for row in _historic_rows(user, category, as_of):
+        entry = categories.setdefault(row['category_id'], {
+            'category_id': row['category_id'], 'category_name': row['category_name'], 'item_count': 0,
+            'total_quantity': 0, 'total_value': Decimal('0.00'), 'price_sum': Decimal('0.00'),
+        })
+        entry['item_count'] += 1
+        entry['total_quantity'] += row['quantity']
+        entry['total_value'] += row['value']
+        entry['price_sum'] += row['price']
+    for entry in categories.values():
+        entry['avg_price'] = entry.pop('price_sum') / entry['item_count']
+    # Same order as the SQL version (NULL category last)
+    return sorted(categories.values(), key=lambda entry: (entry['category_name'] is None, entry['category_name'] or ''))
+
+
+def category_summary(user, category=None, as_of=None) -> Dict[str, Any]:
+    """Item count, stock value and average price per category"""
+    if as_of is not None:
+        categories = _historic_categories(user, category, as_of)
+    else:
+        categories = list(
+            _items(user, category).values(
+                'category_id', category_name=F('category__name')
+            ).annotate(
+                item_count=Count('id'),
+                total_quantity=Coalesce(Sum(STOCK_IN_VERPACKUNGEN), 0),
+                total_value=Coalesce(Sum(STOCK_VALUE), ZERO),
+                avg_price=Avg('price'),
+            ).order_by('category__name')
+        )
+    totals = {
+        'total_categories': len(categories),
+        'total_items': sum(row['item_count'] for row in categories),
+        'total_value': sum((row['total_value'] for row in categories), Decimal('0.00')),
+    }
+    return {'categories': categories, 'totals': totals}
+
+
+def low_stock(user, category=None, as_of=None) -> Dict[str, Any]:
+    """Items at or below their minimum stock level (in Verpackungen)"""
+    if as_of is not None:
+        items = sorted(
+            (
+                {
+                    'id': row['id'], 'name': row['name'], 'sku': row['sku'],
+                    'needed': row['min_stock_level'] - row['quantity'], 'quantity': row['quantity'],
+                    'threshold': row['min_stock_level'], 'category_name': row['category_name'],
+                }
+                for row in _historic_rows(user, category, as_of)
+                if row['is_active'] and row['quantity'] <= row['min_stock_level']
+            ),
+            key=lambda row: (-row['needed'], row['name'])
+        )
+        return {
+            'items': items,
+            'totals': {'total_items': len(items), 'total_needed': sum(row['needed'] for row in items)},
+        }
+
+    # Stored low_stock / total_verpackungen columns (partial index on active items)
+    items = list(
+        _items(user, category).filter(
+            low_stock=True, is_active=True
+        ).annotate(
+            needed=ExpressionWrapper(F('min_stock_level') - F('total_verpackungen'), output_field=IntegerField())
+        ).order_by('-needed', 'name').values(
+            'id', 'name', 'sku', 'needed',
+            quantity=F('total_verpackungen'), threshold=F('min_stock_level'), category_name=F('category__name')
+        )
+    )
+    totals = {
+        'total_items': len(items),
+        'total_needed': sum(row['needed'] for row in items),
+    }
+    return {'items': items, 'totals': totals}
+
+
+def financials(user, period: str = 'month', date_from=None, date_to=None) -> Dict[str, Any]:
+    """Revenue (invoices, gross) and expenses summed per period"""
+    trunc = PERIODS[period]
+
+    invoices = Invoice.objects.filter(order__created_by=user)
+    expenses = Expense.objects.filter(owner=user)
+
+    # Invoices without a document date count on their order date
+    invoices = invoices.annotate(invoice_date=Coalesce('issue_date', TruncDate('order__order_date')))
+    date_filter = Q()
+    expense_filter = Q()
+    if date_from:
+        date_filter &= Q(invoice_date__gte=date_from)
+        expense_filter &= Q(date__gte=date_from)
+    if date_to:
+        date_filter &= Q(invoice_date__lte=date_to)
+        expense_filter &= Q(date__lte=date_to)
+
+    revenue_rows = invoices.filter(date_filter).annotate(
+        period=trunc('invoice_date')
+    ).values('period').annotate(total=Sum('total_gross')).order_by('period')
+    expense_rows = expenses.filter(expense_filter).annotate(
+        period=trunc('date')
+    ).values('period').annotate(total=Sum('amount')).order_by('period')
+
+    periods: Dict[Any, Dict[str, Any]] = {}
+    for key, rows in (('revenue', revenue_rows), ('expenses', expense_rows)):
+        for row in rows:
+            entry = periods.setdefault(row['period'], {
+                'period': row['period'], 'revenue': Decimal('0.00'), 'expenses': Decimal('0.00')
+            })
+            entry[key] = row['total']
+
+    series = [periods[key] for key in sorted(periods)]
+    revenue_total = sum((entry['revenue'] for entry in series), Decimal('0.00'))
+    expense_total = sum((entry['expenses'] for entry in series), Decimal('0.00'))
+    return {
+        'period': period,
+        'periods': series,
+        'totals': {
+            'revenue': revenue_total,
+            'expenses': expense_total,
+            'balance': revenue_total - expense_total,
+        },
+    }
@@ -0,0 +1,408 @@
+"""
+Owner-scoped fuzzy search over items, suppliers and customers.
+
+Every object has one SearchEntry with its name and a lower-cased search
+text (items: name, brand, SKU, EANs and supplier SKUs). The entries are
+kept in sync by signals (inventory.signals) and are matched through an
+index instead of LIKE '%x%' scans of the source tables:
+
+    PostgreSQL  pg_trgm GIN index on `text`; the `<%` (word similarity)
+                operator uses the index, ranked by word_similarity();
+                list filters use ILIKE '%x%' (substring), also served by
+                the index
+    SQLite      FTS5 table with the trigram tokenizer, an external-content
+                mirror of the entries maintained by triggers (created after
+                migrate); the best CANDIDATES by bm25 are re-ranked in
+                Python with the same trigram similarity as pg_trgm
+    other       icontains on the entries, ranked in Python
+
+`search()` returns ranked hits for typeahead and OCR matching,
+`matching_ids()` filters list endpoints (IndexedSearchFilter).
+"""
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import BooleanField, F, FloatField, Func, Value
+from django.db.models.expressions import RawSQL
+
+from .models import Customer, InventoryItem, InventoryItemSupplier, SearchEntry, Supplier
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'inventory_searchentry_fts'
+
+# Hits below this similarity (0-1) are dropped on the Python-ranked backends
+MIN_SCORE = 0.3
+# FTS candidates (best bm25 rank first) re-ranked in Python per query
+CANDIDATES = 50
+# Typeahead result limit
+DEFAULT_LIMIT = 10
+# Trigram postings a ranked typo query may touch on SQLite
+FUZZY_MAX_POSTINGS = 5000
+
+MODEL_KINDS = {
+    InventoryItem: SearchEntry.KIND_ITEM,
+    Supplier: SearchEntry.KIND_SUPPLIER,
+    Customer: SearchEntry.KIND_CUSTOMER,
+}
+
+# Fields that end up in a document; saves touching none of them skip reindexing
+INDEXED_FIELDS = {
+    SearchEntry.KIND_ITEM: {'name', 'brand', 'sku', 'ean_unit', 'ean_pack', 'owner', 'owner_id'},
+    SearchEntry.KIND_SUPPLIER: {'name', 'contact_name', 'email', 'tax_id', 'owner', 'owner_id'},
+    SearchEntry.KIND_CUSTOMER: {
+        'name', 'customer_number', 'contact_name', 'email', 'phone', 'owner', 'owner_id'
+    },
+}
+
+
+@dataclass
+class SearchHit:
+    kind: str
+    object_id: int
+    name: str
+    score: float
+
+
+# Documents
+
+def _join(*values) -> str:
+    return ' '.join(str(value).strip() for value in values if value).lower()
+
+
+def document_text(instance, supplier_skus: Iterable[str] = ()) -> str:
+    """Search text of an item, supplier or customer"""
+    if isinstance(instance, InventoryItem):
+        return _join(
+            instance.name, instance.brand, instance.sku, instance.ean_unit, instance.ean_pack, *supplier_skus
+        )
+    if isinstance(instance, Supplier):
+        return _join(instance.name, instance.contact_name, instance.email, instance.tax_id)
+    return _join(
+        instance.name, instance.customer_number, instance.contact_name, instance.email, instance.phone
+    )
+
+
+def _item_supplier_skus(item_ids: Sequence[int]) -> Dict[int, List[str]]:
+    skus = {}
+    rows = InventoryItemSupplier.objects.filter(item_id__in=item_ids).exclude(supplier_sku__isnull=True)
+    for item_id, supplier_sku in rows.values_list('item_id', 'supplier_sku'):
+        skus.setdefault(item_id, []).append(supplier_sku)
+    return skus
+
+
+def index_object(instance, update_fields=None):
+    """Create or update the SearchEntry of a saved item, supplier or customer"""
+    kind = MODEL_KINDS[type(instance)]
+    if update_fields is not None and not INDEXED_FIELDS[kind] & set(update_fields):
+        return
+
+    supplier_skus = ()
+    if kind == SearchEntry.KIND_ITEM:
+        supplier_skus = _item_supplier_skus([instance.pk]).get(instance.pk, ())
+
+    values = {
+        'owner_id': instance.owner_id,
+        'name': instance.name[:200],
+        'text': document_text(instance, supplier_skus),
+    }
+    # Concurrent saves of the same object: the loser of the insert race updates instead
+    SearchEntry.objects.update_or_create(kind=kind, object_id=instance.pk, defaults=values)
+
+
+def remove_object(instance):
+    SearchEntry.objects.filter(kind=MODEL_KINDS[type(instance)], object_id=instance.pk).delete()
+
+
+def reindex_item(item_id: int):
+    """Refresh an item's document after its supplier SKUs changed"""
+    item = InventoryItem.objects.filter(pk=item_id).first()
+    if item is not None:
+        index_object(item)
+
+
+def rebuild(owner=None, batch_size: int = 2000) -> int:
+    """Rebuild all entries (of one owner); for data written without signals (bulk_create, raw SQL)"""
+    total = 0
+    for model, kind in MODEL_KINDS.items():
+        objects = model.objects.all() if owner is None else model.objects.filter(owner=owner)
+        stale = SearchEntry.objects.filter(kind=kind)
+        if owner is not None:
+            stale = stale.filter(owner=owner)
+        stale.delete()
+
+        batch = []
+        for instance in objects.order_by('pk').iterator(chunk_size=batch_size):
+            batch.append(instance)
+            if len(batch) >= batch_size:
+                total += _create_entries(kind, batch)
+                batch = []
+        if batch:
+            total += _create_entries(kind, batch)
+    return total
+
+
+def _create_entries(kind: str, instances: List) -> int:
+    skus = _item_supplier_skus([i.pk for i in instances]) if kind == SearchEntry.KIND_ITEM else {}
+    SearchEntry.objects.bulk_create([
+        SearchEntry(
+            owner_id=instance.owner_id, kind=kind, object_id=instance.pk,
+            name=instance.name[:200], text=document_text(instance, skus.get(instance.pk, ())),
+        )
+        for instance in instances
+    ])
+    return len(instances)
+
+
+# Similarity (pg_trgm semantics, used where the database cannot rank)
+
+WORD_RE = re.compile(r'\w+')
+
+
+def _word_trigrams(word: str) -> set:
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigrams(value: str) -> set:
+    """pg_trgm trigrams: per word, padded with two spaces in front and one behind"""
+    grams = set()
+    for word in WORD_RE.findall(value.lower()):
+        grams |= _word_trigrams(word)
+    return grams
+
+
+def _jaccard(first: set, second: set) -> float:
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def similarity(a: str, b: str) -> float:
+    return _jaccard(trigrams(a), trigrams(b))
+
+
+class Scorer:
+    """Similarity of one query to many candidates (query trigrams computed once)"""
+
+    def __init__(self, query: str):
+        self.grams = trigrams(query)
+        self.size = max(1, len(WORD_RE.findall(query)))
+
+    def word_similarity(self, text: str) -> float:
+        """Best similarity to a run of as many consecutive words of the text as the query has"""
+        words = [_word_trigrams(word) for word in WORD_RE.findall(text.lower())]
+        if len(words) <= self.size:
+            return _jaccard(self.grams, set().union(*words))
+        return max(
+            _jaccard(self.grams, set().union(*words[i:i + self.size]))
+            for i in range(len(words) - self.size + 1)
+        )
+
+    def score(self, name: str, text: str) -> float:
+        # Whole-name matches rank above matches on a code or brand
+        return max(_jaccard(self.grams, trigrams(name)), self.word_similarity(text) * 0.95)
+
+
+def word_similarity(query: str, text: str) -> float:
+    return Scorer(query).word_similarity(text)
+
+
+def score(query: str, name: str, text: str) -> float:
+    return Scorer(query).score(name, text)
+
+
+# Backends
+
+def _vendor() -> str:
+    return connection.vendor
+
+
+def _phrase(value: str) -> str:
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _substring_query(cursor, query: str) -> Optional[str]:
+    """FTS5 trigram query for the whole query as a substring"""
+    text = query.strip().lower()
+    return _phrase(text) if len(text) >= 3 else None
+
+
+def _words_query(cursor, query: str) -> Optional[str]:
+    """All words (3+ characters) in any order"""
+    words = [word for word in re.findall(r'\w+', query.lower()) if len(word) >= 3]
+    return ' AND '.join(_phrase(word) for word in words) if len(words) > 1 else None
+
+
+def _fuzzy_query(cursor, query: str) -> Optional[str]:
+    """Any of the query's rarest trigrams (typos); ranking many common ones would scan most of the index"""
+    grams = sorted({word[i:i + 3] for word in re.findall(r'\w+', query.lower()) for i in range(len(word) - 2)})
+    if not grams:
+        return None
+    cursor.execute(
+        f"SELECT term, doc FROM {FTS_TABLE}_vocab WHERE term IN ({', '.join(['%s'] * len(grams))})", grams
+    )
+    chosen = []
+    postings = 0
+    for term, docs in sorted(cursor.fetchall(), key=lambda row: row[1]):
+        if chosen and postings + docs > FUZZY_MAX_POSTINGS:
+            break
+        chosen.append(term)
+        postings += docs
+    return ' OR '.join(_phrase(term) for term in chosen) or None
+
+
+def install_fts_index(using: str = DEFAULT_DB_ALIAS) -> bool:
+    """
+    Create the FTS5 mirror and its triggers on SQLite (run after migrate, see
+    inventory.signals). False if FTS5 with the trigram tokenizer is unavailable.
+    """
+    db = connections[using]
+    if db.vendor != 'sqlite':
+        return False
+    with db.cursor() as cursor:
+        if not _fts_table_exists(cursor):
+            if not _create_fts_table(cursor):
+                return False
+        # Document frequency per trigram, to leave common ones out of typo queries
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}_vocab USING fts5vocab({FTS_TABLE}, 'row')")
+    return True
+
+
+def _create_fts_table(cursor) -> bool:
+    try:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+            f"text, content='inventory_searchentry', content_rowid='id', tokenize='trigram')"
+        )
+    except Exception as e:
+        logger.warning(f"SQLite FTS5 trigram index unavailable, search falls back to LIKE: {e}")
+        return False
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON inventory_searchentry BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON inventory_searchentry BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); END"
+    )
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON inventory_searchentry BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); "
+        f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END"
+    )
+    cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def _fts_table_exists(cursor) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+    return cursor.fetchone() is not None
+
+
+def _use_fts() -> bool:
+    if _vendor() != 'sqlite':
+        return False
+    # Not created inside a request: a rolled back CREATE VIRTUAL TABLE breaks the connection
+    with connection.cursor() as cursor:
+        return _fts_table_exists(cursor)
+
+
+def _trigram_match(query: str) -> RawSQL:
+    # Uses the GIN index (as text %> query)
+    return RawSQL('%s <%% "inventory_searchentry"."text"', (query,), output_field=BooleanField())
+
+
+def _substring_match(query: str) -> RawSQL:
+    # Plain ILIKE on the column (icontains would wrap it in UPPER()), so the GIN index is used
+    pattern = '%' + re.sub(r'([\\%_])', r'\\\1', query.lower()) + '%'
+    return RawSQL('"inventory_searchentry"."text" ILIKE %s', (pattern,), output_field=BooleanField())
+
+
+def _entries(owner, kinds: Sequence[str]):
+    return SearchEntry.objects.filter(owner=owner, kind__in=kinds)
+
+
+def search(owner, query: str, kinds: Optional[Sequence[str]] = None, limit: int = DEFAULT_LIMIT) -> List[SearchHit]:
+    """Best matches of `query` among the owner's objects, best first"""
+    query = (query or '').strip()
+    kinds = list(kinds or MODEL_KINDS.values())
+    if not query:
+        return []
+
+    if _vendor() == 'postgresql':
+        rows = (
+            _entries(owner, kinds)
+            .filter(_trigram_match(query))
+            .annotate(
+                score=Func(Value(query), F('text'), function='word_similarity', output_field=FloatField()),
+                name_score=Func(Value(query), F('name'), function='similarity', output_field=FloatField()),
+            )
+            .order_by('-score', '-name_score', 'name')
+            .values_list('kind', 'object_id', 'name', 'score')[:limit]
+        )
+        return [SearchHit(*row) for row in rows]
+
+    scorer = Scorer(query)
+    hits = [
+        SearchHit(kind, object_id, name, scorer.score(name, text))
+        for kind, object_id, name, text in _candidates(owner, query, kinds)
+    ]
+    hits = [hit for hit in hits if hit.score >= MIN_SCORE or query.lower() in hit.name.lower()]
+    hits.sort(key=lambda hit: (-hit.score, hit.name))
+    return hits[:limit]
+
+
+def _candidates(owner, query: str, kinds: Sequence[str]):
+    """(kind, object_id, name, text) rows to rank in Python"""
+    # Queries under 3 characters have no trigrams
+    if len(query) >= 3 and _use_fts():
+        return _fts_candidates(getattr(owner, 'pk', owner), query, kinds)
+    fields = ('kind', 'object_id', 'name', 'text')
+    return _entries(owner, kinds).filter(text__icontains=query.lower()).values_list(*fields)[:CANDIDATES]
+
+
+def _fts_candidates(owner_id: int, query: str, kinds: Sequence[str]):
+    """
+    Substring matches, else all words in any order, else any of the rarest
+    trigrams; the first step with matches wins. Each step takes its best
+    CANDIDATES by bm25 rank, not the first ones found.
+    """
+    rows = []
+    placeholders = ', '.join(['%s'] * len(kinds))
+    with connection.cursor() as cursor:
+        for build in (_substring_query, _words_query, _fuzzy_query):
+            fts_query = build(cursor, query)
+            if not fts_query:
+                continue
+            # CROSS JOIN keeps SQLite from scanning the owner's entries and probing the FTS table
+            cursor.execute(
+                f"SELECT e.kind, e.object_id, e.name, e.text FROM {FTS_TABLE} "
+                f"CROSS JOIN inventory_searchentry e ON e.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH %s AND e.owner_id = %s AND e.kind IN ({placeholders}) "
+                f"ORDER BY {FTS_TABLE}.rank LIMIT %s",
+                [fts_query, owner_id, *kinds, CANDIDATES]
+            )
+            rows = cursor.fetchall()
+            if rows:
+                break
+    return rows
+
+
+def matching_ids(owner, kind: str, query: str):
+    """Object ids of the owner's objects matching `query`, as a subquery for `pk__in`"""
+    query = (query or '').strip()
+    entries = _entries(owner, [kind])
+
+    if _vendor() == 'postgresql':
+        return entries.filter(_substring_match(query)).values('object_id')
+
+    fts_query = _substring_query(None, query)
+    if fts_query and _use_fts():
+        return entries.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (fts_query,))
+        ).values('object_id')
+    return entries.filter(text__icontains=query.lower()).values('object_id')
@@ -1,11 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from datetime import datetime, date
+from decimal import Decimal
 from .models import (
     Category, Supplier, Customer, InventoryItem,
     Expense, InventoryLog, InventoryItemSupplier,
     StockMovement, SalesOrder, SalesOrderItem, Invoice, DocumentSequence,
-    CompanyProfile, InvoiceTemplate
+    CompanyProfile, InvoiceTemplate, OCRJob, OCRBatch
 )
 
 
@@ -371,15 +372,8 @@ class StockMovementSerializer(serializers.ModelSerializer):
         # Auto-assign created_by from request user
         validated_data['created_by'] = self.context['request'].user
 
-        # Extract skip_quantity_update from context if present
-        # This is passed via serializer.save(skip_quantity_update=True)
-        skip_quantity_update = self.context.get('skip_quantity_update', False)
-
-        # Create the movement instance, passing the flag to the model's save()
-        instance = self.Meta.model(**validated_data)
-        instance.save(skip_quantity_update=skip_quantity_update)
-
-        return instance
+        # Saving a new movement books it through the stock booking engine
+        return super().create(validated_data)
 
     def validate(self, data):
         """Validate stock availability and business rules"""
@@ -419,6 +413,61 @@ class StockMovementSerializer(serializers.ModelSerializer):
         return data
 
 
+class StockMovementBatchLineSerializer(serializers.Serializer):
+    """Single line of a batch stock booking (ids are resolved in bulk by the service)"""
+    item = serializers.IntegerField()
+    type = serializers.ChoiceField(choices=StockMovement.MOVEMENT_TYPE_CHOICES)
+    unit = serializers.ChoiceField(choices=StockMovement.UNIT_CHOICES, default='verpackung')
+    quantity = serializers.IntegerField(min_value=0)
+    purchase_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.00'),
+                                              required=False, allow_null=True)
+    currency = serializers.ChoiceField(choices=['CHF', 'EUR'], required=False, default='CHF')
+    note = serializers.CharField(required=False, allow_blank=True, default='')
+    supplier = serializers.IntegerField(required=False, allow_null=True)
+    customer = serializers.IntegerField(required=False, allow_null=True)
+    movement_timestamp = serializers.DateTimeField(required=False, allow_null=True)
+
+
+class StockMovementBatchSerializer(serializers.Serializer):
+    """Batch of stock movements booked in one transaction under one idempotency key"""
+    MAX_LINES = 500
+
+    # Leaves room for the ":<line>" suffix within the 64 char column
+    idempotency_key = serializers.CharField(max_length=56, required=False, allow_blank=True)
+    # Defaults applied to every line that doesn't set its own value
+    supplier = serializers.IntegerField(required=False, allow_null=True)
+    customer = serializers.IntegerField(required=False, allow_null=True)
+    note = serializers.CharField(required=False, allow_blank=True)
+    movement_timestamp = serializers.DateTimeField(required=False, allow_null=True)
+    movements = StockMovementBatchLineSerializer(many=True)
+
+    def validate_movements(self, value):
+        if not value:
+            raise serializers.ValidationError("Mindestens eine Position ist erforderlich.")
+        if len(value) > self.MAX_LINES:
+            raise serializers.ValidationError(f"Maximal {self.MAX_LINES} Positionen pro Buchung.")
+        return value
+
+    def validate(self, data):
+        """Apply batch defaults to the lines and check per-line business rules"""
+        for index, line in enumerate(data['movements'], start=1):
+            for field in ['supplier', 'customer', 'movement_timestamp']:
+                if line.get(field) is None and data.get(field) is not None:
+                    line[field] = data[field]
+            if not line.get('note') and data.get('note'):
+                line['note'] = data['note']
+
+            if line['type'] == 'RETURN' and not line.get('customer'):
+                raise serializers.ValidationError(
+                    f"Position {index}: RETURN movements should reference a customer."
+                )
+            if line['type'] == 'IN' and not line.get('supplier') and not line.get('note'):
+                raise serializers.ValidationError(
+                    f"Position {index}: IN movements should reference a supplier or include a note."
+                )
+        return data
+
+
 class SalesOrderItemSerializer(serializers.ModelSerializer):
     """Sales order item serializer with calculated totals"""
     item_name = serializers.CharField(source='item.name', read_only=True)
@@ -443,6 +492,16 @@ class SalesOrderItemSerializer(serializers.ModelSerializer):
         return value
 
 
+class SalesOrderLineSerializer(serializers.Serializer):
+    """Order line for order creation and bulk import (item by id)"""
+    item = serializers.IntegerField()
+    qty_base = serializers.IntegerField(min_value=1)
+    qty_display = serializers.IntegerField(min_value=1, default=1)
+    selected_unit = serializers.ChoiceField(choices=SalesOrderItem.UNIT_CHOICES, default='verpackung')
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal('0.00'))
+    tax_rate = serializers.DecimalField(max_digits=5, decimal_places=2, default=Decimal('0.00'))
+
+
 class SalesOrderSerializer(serializers.ModelSerializer):
     """Sales order serializer with items and totals"""
     customer_name = serializers.CharField(source='customer.name', read_only=True)
@@ -470,28 +529,27 @@ class SalesOrderSerializer(serializers.ModelSerializer):
             'items'
         ]
 
+    def validate_items_data(self, value):
+        """Validate order lines (item ids, quantities, prices)"""
+        lines = SalesOrderLineSerializer(data=value, many=True)
+        lines.is_valid(raise_exception=True)
+        return lines.validated_data
+
     def create(self, validated_data):
-        # Extract items data
-        items_data = validated_data.pop('items_data', [])
-        
-        # Auto-assign created_by from request user
-        validated_data['created_by'] = self.context['request'].user
-        
-        # Create the order
-        order = super().create(validated_data)
-        
-        # Create order items
-        for item_data in items_data:
-            # Get the InventoryItem instance
-            item_id = item_data.pop('item')
-            try:
-                item_instance = InventoryItem.objects.get(id=item_id)
-                item_data['item'] = item_instance
-                SalesOrderItem.objects.create(order=order, **item_data)
-            except InventoryItem.DoesNotExist:
-                raise serializers.ValidationError(f"Item with id {item_id} does not exist")
-        
-        return order
+        from .services import create_sales_orders
+
+        # Order and lines are written in bulk with totals computed once
+        order = create_sales_orders(self.context['request'].user, [{
+            'customer': validated_data['customer'].id,
+            'status': validated_data.get('status'),
+            'delivery_date': validated_data.get('delivery_date'),
+            'currency': validated_data.get('currency'),
+            'items': validated_data.get('items_data', []),
+        }])[0]
+        # Prefetch lines for the response (item_name per line)
+        return SalesOrder.objects.select_related('customer', 'created_by').prefetch_related(
+            'items__item'
+        ).get(pk=order.pk)
 
     def validate_delivery_date(self, value):
         """Validate delivery date - allow past, present, and future dates"""
@@ -500,6 +558,32 @@ class SalesOrderSerializer(serializers.ModelSerializer):
         return value
 
 
+class SalesOrderImportOrderSerializer(serializers.Serializer):
+    """Single order of a bulk import"""
+    customer = serializers.IntegerField()
+    status = serializers.ChoiceField(
+        choices=['DRAFT', 'CONFIRMED', 'DELIVERED'], default='DRAFT',
+        help_text="Stock is only booked on invoicing, so INVOICED cannot be imported"
+    )
+    delivery_date = serializers.DateField(required=False, allow_null=True)
+    currency = serializers.CharField(max_length=3, default='CHF')
+    items = SalesOrderLineSerializer(many=True, allow_empty=False)
+
+
+class SalesOrderImportSerializer(serializers.Serializer):
+    """Bulk import of sales orders (JSON body or parsed CSV)"""
+    MAX_ORDERS = 500
+
+    orders = SalesOrderImportOrderSerializer(many=True)
+
+    def validate_orders(self, value):
+        if not value:
+            raise serializers.ValidationError("Mindestens ein Auftrag ist erforderlich.")
+        if len(value) > self.MAX_ORDERS:
+            raise serializers.ValidationError(f"Maximal {self.MAX_ORDERS} Aufträge pro Import.")
+        return value
+
+
 class InvoiceSerializer(serializers.ModelSerializer):
     """Invoice serializer with order and customer details"""
     customer_name = serializers.CharField(source='order.customer.name', read_only=True)
@@ -526,6 +610,13 @@ class InvoiceSerializer(serializers.ModelSerializer):
         return value
 
 
+class ReportPeriodSerializer(serializers.Serializer):
+    """Query parameters of the financial report"""
+    period = serializers.ChoiceField(choices=['day', 'month', 'year'], default='month')
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+
 class DocumentSequenceSerializer(serializers.ModelSerializer):
     """Document sequence serializer (read-only for monitoring)"""
     
@@ -603,3 +694,63 @@ class InvoiceTemplateSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'user', 'created_at', 'updated_at']
+
+
+class OCRJobSerializer(serializers.ModelSerializer):
+    """Status and result of an asynchronous OCR job"""
+
+    class Meta:
+        model = OCRJob
+        fields = [
+            'id', 'file_name', 'file_type', 'status', 'result', 'error',
+            'attempts', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class OCRBatchJobSerializer(serializers.ModelSerializer):
+    """One file of an OCR batch with its suggestions and Expense draft"""
+
+    class Meta:
+        model = OCRJob
+        fields = [
+            'id', 'file_name', 'file_type', 'status', 'result', 'error',
+            'suggestions', 'expense_draft', 'finished_at'
+        ]
+        read_only_fields = fields
+
+
+class OCRBatchSerializer(serializers.ModelSerializer):
+    """Batch OCR upload: overall status plus per-file status"""
+    status = serializers.SerializerMethodField()
+    total = serializers.SerializerMethodField()
+    counts = serializers.SerializerMethodField()
+    jobs = serializers.SerializerMethodField()
+
+    class Meta:
+        model = OCRBatch
+        fields = ['id', 'status', 'total', 'counts', 'jobs', 'skipped', 'created_at']
+        read_only_fields = fields
+
+    def _summary(self, obj):
+        from .ocr_jobs import batch_summary
+
+        if not hasattr(obj, '_batch_summary'):
+            obj._batch_summary = batch_summary(self._jobs(obj))
+        return obj._batch_summary
+
+    def _jobs(self, obj):
+        # Upload order; uses the prefetched jobs
+        return sorted(obj.jobs.all(), key=lambda job: job.pk)
+
+    def get_status(self, obj):
+        return self._summary(obj)['status']
+
+    def get_total(self, obj):
+        return self._summary(obj)['total']
+
+    def get_counts(self, obj):
+        return self._summary(obj)['counts']
+
+    def get_jobs(self, obj):
+        return OCRBatchJobSerializer(self._jobs(obj), many=True).data
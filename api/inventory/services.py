@@ -1,151 +1,574 @@
-from django.db import transaction
+from django.db import transaction, IntegrityError
 from django.core.exceptions import ValidationError
+from django.utils import timezone
+from datetime import date
 from decimal import Decimal
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 import logging
 
-from .models import InventoryItem, StockMovement
+from .models import (
+    InventoryItem, StockMovement, InventoryLog, Expense, Supplier, Customer,
+    SalesOrder, SalesOrderItem, DocumentSequence
+)
+from .exceptions import InsufficientStockError, IdempotencyConflictError
+from . import stock_history
 from django.contrib.auth.models import User
 
 logger = logging.getLogger(__name__)
 
+# Maps movement types to the legacy InventoryLog action
+LOG_ACTIONS = {
+    'IN': 'ADD',
+    'RETURN': 'ADD',
+    'OUT': 'REMOVE',
+    'DEFECT': 'REMOVE',
+    'ADJUST': 'UPDATE',
+}
+
+ITEM_STOCK_FIELDS = ['palette_quantity', 'verpackung_quantity', 'defective_qty', 'last_updated']
+
+
 class StockOperationError(Exception):
     """Custom exception for stock operation errors with German messages"""
     pass
 
-def book_stock_change(
-    item_id: int,
-    delta: Decimal,
-    movement_type: str,
-    note: str = "",
-    actor_id: int = None,
-    supplier_id: Optional[int] = None,
-    customer_id: Optional[int] = None,
-    qty_pallets: Optional[int] = None,
-    qty_packages: Optional[int] = None,
-    qty_singles: Optional[int] = None
-) -> Dict[str, Any]:
-    """
-    Atomically updates item stock and creates movement log with row-level locking.
+
+def apply_movement(item: InventoryItem, movement_type: str, unit: str, quantity: int,
+                   check_stock: bool = True) -> None:
+    """
+    Apply a stock movement to an (already locked) item in memory.
+
+    Balances are computed in Verpackungen (base units) and split back into
+    full Paletten + lose Verpackungen. The item is NOT saved. Ledger replays
+    (inventory.stock_history) pass check_stock=False.
+
+    Raises:
+        InsufficientStockError: If an OUT/DEFECT movement exceeds available stock
+    """
+    vpk = item.verpackungen_pro_palette
+    total = (item.palette_quantity * vpk) + item.verpackung_quantity
+
+    if check_stock and movement_type in ['OUT', 'DEFECT']:
+        if unit == 'palette' and quantity > item.palette_quantity:
+            raise InsufficientStockError(
+                f"Nicht genügend Paletten für {item.name}. "
+                f"Verfügbar: {item.palette_quantity}, Angefordert: {quantity}"
+            )
+        if unit == 'verpackung' and quantity > total:
+            raise InsufficientStockError(
+                f"Nicht genügend Verpackungen für {item.name}. "
+                f"Verfügbar: {total} ({item.palette_quantity}P + {item.verpackung_quantity}V), Angefordert: {quantity}"
+            )
+
+    base_qty = quantity * vpk if unit == 'palette' else quantity
+
+    if movement_type in ['IN', 'RETURN']:
+        total += base_qty
+    elif movement_type == 'OUT':
+        total -= base_qty
+    elif movement_type == 'DEFECT':
+        total -= base_qty
+        item.defective_qty += base_qty
+    elif movement_type == 'ADJUST':
+        if unit == 'palette':
+            # Korrektur: Paletten auf exakten Wert setzen, lose Verpackungen bleiben
+            total = (max(0, quantity) * vpk) + item.verpackung_quantity
+        else:
+            # Korrektur: GESAMTMENGE auf exakten Wert setzen
+            total = max(0, quantity)
+    else:
+        raise StockOperationError(f"Ungültiger Bewegungstyp: {movement_type}")
+
+    item.palette_quantity, item.verpackung_quantity = divmod(total, vpk)
+
+
+def build_inventory_log(movement: StockMovement, previous_palette_qty: int, previous_verpackung_qty: int) -> InventoryLog:
+    """Build (unsaved) legacy InventoryLog entry for a booked movement"""
+    label = f"{movement.get_type_display()} ({movement.quantity} {movement.unit})"
+    return InventoryLog(
+        item=movement.item,
+        owner_id=movement.item.owner_id,
+        user=movement.created_by,
+        action=LOG_ACTIONS.get(movement.type, 'UPDATE'),
+        quantity_change=abs(movement.quantity),
+        previous_quantity=previous_palette_qty + previous_verpackung_qty,  # Simplified for legacy
+        new_quantity=movement.item.palette_quantity + movement.item.verpackung_quantity,  # Simplified for legacy
+        notes=f"{label}: {movement.note}" if movement.note else label
+    )
+
+
+def build_purchase_expense(movement: StockMovement, owner: User) -> Expense:
+    """Build (unsaved) PURCHASE expense for an IN movement with purchase price"""
+    return Expense(
+        date=date.today(),
+        description=f"Wareneingang: {movement.item.name} ({movement.quantity} {movement.unit})",
+        amount=movement.purchase_price,
+        category='PURCHASE',
+        supplier=movement.supplier,
+        stock_movement=movement,
+        owner=owner,
+        notes=movement.note if movement.note else None
+    )
+
+
+def book_stock_movements_batch(user: User, lines: List[Dict[str, Any]], idempotency_key: str) -> List[StockMovement]:
+    """
+    Book many stock movements in one transaction with a single idempotency key.
+
+    All affected items are locked with one SELECT ... FOR UPDATE in id order,
+    balances are computed in memory and movements, logs and expenses are
+    written with bulk_create. Line i gets the idempotency key "<key>:<i>".
 
     Args:
-        item_id: ID of the inventory item
-        delta: Change in quantity (positive for IN/RETURN, negative for OUT)
-        movement_type: Type of movement ('IN', 'OUT', 'RETURN')
-        note: Optional note for the movement
-        actor_id: ID of the user performing the action
-        supplier_id: Optional supplier ID for IN movements
-        customer_id: Optional customer ID for OUT/RETURN movements
-        qty_pallets: Optional pallet quantity for UoM tracking
-        qty_packages: Optional package quantity for UoM tracking
-        qty_singles: Optional singles quantity for UoM tracking
+        user: Acting user (owner of the items)
+        lines: Validated movement lines (item, type, unit, quantity, ...)
+        idempotency_key: Client key for the whole batch
 
     Returns:
-        Dict with movement details and new quantity
+        List of created StockMovement instances in line order
 
     Raises:
-        StockOperationError: If operation would result in negative stock or validation fails
-        ValidationError: If item not found or invalid parameters
+        IdempotencyConflictError: If the batch was already booked (existing_movements set)
+        InsufficientStockError: If a line exceeds available stock
+        ValidationError: If an item, supplier or customer is unknown
     """
+    line_keys = [f"{idempotency_key}:{index}" for index in range(len(lines))]
+
+    def existing_batch():
+        # Only the user's own movements are replayed
+        movements = StockMovement.objects.filter(
+            idempotency_key__in=line_keys, created_by=user
+        ).select_related('item', 'supplier', 'customer', 'created_by')
+        by_key = {movement.idempotency_key: movement for movement in movements}
+        return [by_key[key] for key in line_keys if key in by_key]
+
+    def key_conflict(message):
+        existing = existing_batch()
+        if not existing:
+            # Keys are unique across users: another user's batch holds this key
+            return ValidationError("Idempotency-Key wird bereits verwendet.")
+        return IdempotencyConflictError(message, existing_movements=existing)
+
+    if StockMovement.objects.filter(idempotency_key=line_keys[0]).exists():
+        raise key_conflict(f"Batch already processed with key {idempotency_key}")
+
+    item_ids = sorted({line['item'] for line in lines})
+    supplier_ids = {line['supplier'] for line in lines if line.get('supplier')}
+    customer_ids = {line['customer'] for line in lines if line.get('customer')}
 
-    with transaction.atomic():
-        try:
-            # Row-level lock on the item to prevent concurrent modifications
-            item = InventoryItem.objects.select_for_update().get(id=item_id)
-
-            # Calculate new quantity
-            previous_qty = item.quantity or Decimal('0')
-            new_qty = previous_qty + delta
-
-            # Validate that quantity doesn't go negative
-            if new_qty < 0:
-                raise StockOperationError(
-                    "Buchung abgelehnt: Bestand würde negativ werden. "
-                    f"Verfügbar: {previous_qty}, Angefordert: {abs(delta)}"
+    try:
+        with transaction.atomic():
+            # One lock statement for all items, always in id order to avoid deadlocks
+            items = {
+                item.id: item
+                for item in InventoryItem.objects.select_for_update().filter(
+                    owner=user, id__in=item_ids
+                ).order_by('id')
+            }
+            missing = [item_id for item_id in item_ids if item_id not in items]
+            if missing:
+                raise ValidationError(f"Artikel nicht gefunden: {', '.join(map(str, missing))}")
+
+            suppliers = Supplier.objects.filter(owner=user).in_bulk(supplier_ids) if supplier_ids else {}
+            customers = Customer.objects.filter(owner=user).in_bulk(customer_ids) if customer_ids else {}
+            if len(suppliers) != len(supplier_ids):
+                raise ValidationError("Lieferant nicht gefunden.")
+            if len(customers) != len(customer_ids):
+                raise ValidationError("Kunde nicht gefunden.")
+
+            movements = []
+            logs = []
+            for index, line in enumerate(lines):
+                item = items[line['item']]
+                previous_palette_qty, previous_verpackung_qty = item.palette_quantity, item.verpackung_quantity
+                try:
+                    apply_movement(item, line['type'], line['unit'], line['quantity'])
+                except InsufficientStockError as e:
+                    raise InsufficientStockError(f"Position {index + 1}: {e}")
+
+                movement = StockMovement(
+                    item=item,
+                    owner_id=item.owner_id,
+                    type=line['type'],
+                    unit=line['unit'],
+                    quantity=line['quantity'],
+                    purchase_price=line.get('purchase_price'),
+                    currency=line.get('currency') or 'CHF',
+                    idempotency_key=line_keys[index],
+                    movement_timestamp=line.get('movement_timestamp'),
+                    note=line.get('note') or '',
+                    supplier=suppliers.get(line.get('supplier')),
+                    customer=customers.get(line.get('customer')),
+                    created_by=user,
                 )
+                movements.append(movement)
+                # Log reflects the balance right after this line
+                logs.append(build_inventory_log(movement, previous_palette_qty, previous_verpackung_qty))
+
+            movements = StockMovement.objects.bulk_create(movements)
+
+            now = timezone.now()
+            for item in items.values():
+                item.last_updated = now
+            InventoryItem.objects.bulk_update(list(items.values()), ITEM_STOCK_FIELDS)
+
+            InventoryLog.objects.bulk_create(logs)
+
+            expenses = [
+                build_purchase_expense(movement, user)
+                for movement in movements
+                if movement.type == 'IN' and movement.purchase_price
+            ]
+            if expenses:
+                Expense.objects.bulk_create(expenses)
+
+            # Backdated lines make later ledger checkpoints stale
+            backdated = [movement.movement_timestamp for movement in movements if movement.movement_timestamp]
+            if backdated:
+                stock_history.invalidate(user.id, min(backdated))
+
+    except IntegrityError as e:
+        # Race condition: a concurrent request booked the same batch
+        if 'idempotency_key' in str(e) or 'unique constraint' in str(e).lower():
+            raise key_conflict(f"Concurrent request detected for key {idempotency_key}")
+        raise
+
+    logger.info(
+        f"Stock movement batch {idempotency_key} booked: {len(movements)} lines, "
+        f"{len(items)} items, {len(expenses)} expenses"
+    )
+    return movements
+
+def book_stock_movement(movement: StockMovement) -> StockMovement:
+    """
+    Book a single (unsaved) stock movement.
 
-            # Validate movement type
-            if movement_type not in ['IN', 'OUT', 'RETURN']:
-                raise StockOperationError(
-                    f"Ungültiger Bewegungstyp: {movement_type}. "
-                    "Erlaubt: IN, OUT, RETURN"
-                )
+    Locks the item, computes the new balance in memory and writes exactly one
+    item UPDATE, the movement INSERT and its InventoryLog INSERT. IN movements
+    with a purchase price additionally create the matching Expense.
 
-            # Update item quantity atomically
-            item.quantity = new_qty
-            item.save(update_fields=['quantity', 'last_updated'])
+    Args:
+        movement: Unsaved StockMovement with item, type, unit and quantity set
 
-            # Get actor user if provided
-            actor = None
-            if actor_id:
-                try:
-                    actor = User.objects.get(id=actor_id)
-                except User.DoesNotExist:
-                    logger.warning(f"User {actor_id} not found for stock movement")
-
-            # Create movement log entry
-            movement_data = {
-                'item': item,
-                'type': movement_type,
-                'qty_base': abs(delta),  # Store absolute value, type indicates direction
-                'note': note or '',
-                'created_by': actor,
-            }
+    Returns:
+        The saved movement (movement.item is the updated, locked item)
 
-            # Add optional fields
-            if supplier_id:
-                try:
-                    from .models import Supplier
-                    movement_data['supplier'] = Supplier.objects.get(id=supplier_id)
-                except Supplier.DoesNotExist:
-                    pass
-            if customer_id:
-                try:
-                    from .models import Customer
-                    movement_data['customer'] = Customer.objects.get(id=customer_id)
-                except Customer.DoesNotExist:
-                    pass
-            if qty_pallets is not None:
-                movement_data['qty_pallets'] = qty_pallets
-            if qty_packages is not None:
-                movement_data['qty_packages'] = qty_packages
-            if qty_singles is not None:
-                movement_data['qty_singles'] = qty_singles
-
-            movement = StockMovement.objects.create(**movement_data)
-
-            logger.info(
-                f"Stock movement completed: Item {item_id}, "
-                f"Type {movement_type}, Delta {delta}, "
-                f"Previous {previous_qty} -> New {new_qty}, "
-                f"Movement ID {movement.id}"
+    Raises:
+        InsufficientStockError: If an OUT/DEFECT movement exceeds available stock
+    """
+    with transaction.atomic():
+        # Row-level lock on the item to prevent concurrent modifications
+        item = InventoryItem.objects.select_for_update().get(id=movement.item_id)
+        previous_palette_qty, previous_verpackung_qty = item.palette_quantity, item.verpackung_quantity
+
+        apply_movement(item, movement.type, movement.unit, movement.quantity)
+        item.save(update_fields=ITEM_STOCK_FIELDS)
+
+        movement.item = item
+        movement.owner_id = item.owner_id
+        movement.save(skip_quantity_update=True)
+        build_inventory_log(movement, previous_palette_qty, previous_verpackung_qty).save()
+
+        if movement.type == 'IN' and movement.purchase_price:
+            build_purchase_expense(movement, movement.created_by or item.owner).save()
+
+        stock_history.invalidate(item.owner_id, movement.movement_timestamp)
+
+    logger.info(
+        f"Stock movement booked: Item {item.id}, Type {movement.type}, "
+        f"{movement.quantity} {movement.unit}, "
+        f"{previous_palette_qty}P + {previous_verpackung_qty}V -> "
+        f"{item.palette_quantity}P + {item.verpackung_quantity}V, Movement ID {movement.id}"
+    )
+    return movement
+
+
+def reverse_movement(item: InventoryItem, movement_type: str, unit: str, quantity: int) -> bool:
+    """
+    Undo a stock movement on an (already locked) item in memory.
+
+    Stock never goes below zero. ADJUST movements cannot be reversed because
+    the previous balance is unknown.
+
+    Returns:
+        False if the movement type cannot be reversed, True otherwise
+    """
+    vpk = item.verpackungen_pro_palette
+    total = (item.palette_quantity * vpk) + item.verpackung_quantity
+    base_qty = quantity * vpk if unit == 'palette' else quantity
+
+    if movement_type in ['IN', 'RETURN']:
+        total = max(0, total - base_qty)
+    elif movement_type == 'OUT':
+        total += base_qty
+    elif movement_type == 'DEFECT':
+        # Restore from defective stock
+        transfer_qty = min(base_qty, item.defective_qty)
+        item.defective_qty -= transfer_qty
+        total += transfer_qty
+    else:
+        return False
+
+    item.palette_quantity, item.verpackung_quantity = divmod(total, vpk)
+    return True
+
+
+def reverse_stock_movement(movement: StockMovement) -> bool:
+    """
+    Reverse the stock effect of a booked movement (used when it is deleted).
+
+    Returns:
+        False if the movement could not be reversed (ADJUST), True otherwise
+    """
+    with transaction.atomic():
+        item = InventoryItem.objects.select_for_update().get(id=movement.item_id)
+        previous_palette_qty, previous_verpackung_qty = item.palette_quantity, item.verpackung_quantity
+        # The movement leaves the ledger (also ADJUST, which can't be reversed on the item)
+        stock_history.invalidate(item.owner_id, stock_history.effective_time(movement))
+
+        if not reverse_movement(item, movement.type, movement.unit, movement.quantity):
+            logger.warning(
+                f"Cannot automatically reverse {movement.type} movement for item {item.name}. "
+                f"Manual inventory check recommended."
             )
+            return False
 
-            return {
-                'success': True,
-                'movement_id': movement.id,
-                'item_id': item_id,
-                'previous_qty': float(previous_qty),
-                'new_qty': float(new_qty),
-                'delta': float(delta),
-                'movement_type': movement_type,
-                'note': note,
-                'timestamp': movement.created_at.isoformat(),
-            }
+        item.save(update_fields=ITEM_STOCK_FIELDS)
 
-        except InventoryItem.DoesNotExist:
-            raise ValidationError(f"Artikel mit ID {item_id} wurde nicht gefunden.")
+    logger.info(
+        f"Stock reversed for item {item.name}: "
+        f"Paletten: {previous_palette_qty} -> {item.palette_quantity}, "
+        f"Verpackungen: {previous_verpackung_qty} -> {item.verpackung_quantity}"
+    )
+    return True
+
+
+def rebook_stock_movement(movement: StockMovement, previous: StockMovement) -> StockMovement:
+    """
+    Save changes to a booked movement, correcting the item balance.
+
+    The previous state is reversed and the new state applied in memory, so
+    each affected item is still written with a single UPDATE. An edit is
+    logged like a booking (InventoryLog of the movement's item).
+    """
+    with transaction.atomic():
+        # Old and new item locked with one statement in id order (edits swapping items can't deadlock)
+        items = {
+            item.id: item
+            for item in InventoryItem.objects.select_for_update().filter(
+                id__in={movement.item_id, previous.item_id}
+            ).order_by('id')
+        }
+        item = items[movement.item_id]
+        previous_item = items[previous.item_id]
+        previous_palette_qty, previous_verpackung_qty = item.palette_quantity, item.verpackung_quantity
+
+        if not reverse_movement(previous_item, previous.type, previous.unit, previous.quantity):
+            logger.warning(
+                f"Cannot reverse previous {previous.type} state of movement {movement.pk}; "
+                f"applying the new state on top of the current balance."
+            )
+        if previous_item is not item:
+            # Item changed: the stock went back to the old item
+            previous_item.save(update_fields=ITEM_STOCK_FIELDS)
+
+        apply_movement(item, movement.type, movement.unit, movement.quantity)
+        item.save(update_fields=ITEM_STOCK_FIELDS)
+
+        movement.item = item
+        movement.owner_id = item.owner_id
+        movement.save(skip_quantity_update=True)
+        build_inventory_log(movement, previous_palette_qty, previous_verpackung_qty).save()
+
+        stock_history.invalidate(previous_item.owner_id, stock_history.effective_time(previous))
+        stock_history.invalidate(item.owner_id, min(
+            filter(None, [stock_history.effective_time(previous), stock_history.effective_time(movement)])
+        ))
+    return movement
+
+
+def restore_order_stock(order_items) -> None:
+    """
+    Give the stock of sales order lines back (qty_base is in Verpackungen).
+
+    All affected items are locked with one query in id order.
+    """
+    order_items = list(order_items)
+    if not order_items:
+        return
 
-        except StockOperationError:
-            # Re-raise our custom errors as-is
-            raise
+    with transaction.atomic():
+        items = {
+            item.id: item
+            for item in InventoryItem.objects.select_for_update().filter(
+                id__in={order_item.item_id for order_item in order_items}
+            ).order_by('id')
+        }
+        for order_item in order_items:
+            reverse_movement(items[order_item.item_id], 'OUT', 'verpackung', order_item.qty_base)
+
+        now = timezone.now()
+        for item in items.values():
+            item.last_updated = now
+        InventoryItem.objects.bulk_update(list(items.values()), ITEM_STOCK_FIELDS)
+
+    for item in items.values():
+        logger.info(
+            f"Stock restored for item {item.name}: "
+            f"Paletten: {item.palette_quantity}, Verpackungen: {item.verpackung_quantity}"
+        )
+
+
+def book_order_shipment(order, user: User) -> List[StockMovement]:
+    """
+    Book the Warenausgang (OUT movements) for all lines of a sales order.
+
+    All affected items are locked with one SELECT ... FOR UPDATE in id order,
+    so concurrent invoices sharing items cannot deadlock. Availability is
+    checked in memory; movements and logs are written with bulk_create and
+    the items with one bulk_update. Must run inside the caller's transaction.
+
+    Args:
+        order: SalesOrder to ship (qty_base of its lines is in Verpackungen)
+        user: Acting user
+
+    Returns:
+        List of created StockMovement instances in line order
+
+    Raises:
+        InsufficientStockError: If a line exceeds available stock
+        InventoryItem.DoesNotExist: If an item of the order no longer exists
+    """
+    order_items = list(order.items.all())
+    if not order_items:
+        return []
+
+    items = {
+        item.id: item
+        for item in InventoryItem.objects.select_for_update().filter(
+            id__in={order_item.item_id for order_item in order_items}
+        ).order_by('id')
+    }
+
+    movements = []
+    logs = []
+    for order_item in order_items:
+        item = items.get(order_item.item_id)
+        if item is None:
+            raise InventoryItem.DoesNotExist(f"Artikel {order_item.item_id} nicht gefunden")
+        previous_palette_qty, previous_verpackung_qty = item.palette_quantity, item.verpackung_quantity
+
+        # Verkauf ist immer in Verpackungen
+        apply_movement(item, 'OUT', 'verpackung', order_item.qty_base)
+
+        movement = StockMovement(
+            item=item,
+            owner_id=item.owner_id,
+            type='OUT',
+            unit='verpackung',
+            quantity=order_item.qty_base,
+            customer_id=order.customer_id,
+            note=f'Warenausgang für Rechnung {order.order_number}',
+            created_by=user,
+        )
+        movements.append(movement)
+        logs.append(build_inventory_log(movement, previous_palette_qty, previous_verpackung_qty))
+
+    movements = StockMovement.objects.bulk_create(movements)
+
+    now = timezone.now()
+    for item in items.values():
+        item.last_updated = now
+    InventoryItem.objects.bulk_update(list(items.values()), ITEM_STOCK_FIELDS)
+
+    InventoryLog.objects.bulk_create(logs)
+
+    logger.info(
+        f"Order {order.order_number} shipped: {len(movements)} lines, {len(items)} items"
+    )
+    return movements
+
+
+def create_sales_orders(user: User, orders: List[Dict[str, Any]]) -> List[SalesOrder]:
+    """
+    Create many sales orders with their lines in one transaction.
+
+    Items and customers are resolved with one query each, order numbers are
+    reserved as one DocumentSequence block, totals are computed in a single
+    in-memory pass and orders and lines are written with bulk_create
+    (SalesOrderItem.save and its per-line calculate_totals are bypassed).
 
-        except Exception as e:
-            logger.error(f"Unexpected error in stock operation: {str(e)}")
-            raise StockOperationError(
-                "Unerwarteter Fehler beim Buchen der Lagerbewegung. "
-                "Bitte versuchen Sie es erneut oder kontaktieren Sie den Support."
+    Args:
+        user: Acting user (non-staff users may only use their own items/customers)
+        orders: Validated orders (customer id, status, delivery_date, currency,
+            items: [{item id, qty_base, qty_display, selected_unit, unit_price, tax_rate}])
+
+    Returns:
+        List of created SalesOrder instances in input order
+
+    Raises:
+        ValidationError: If an item or customer is unknown
+    """
+    if not orders:
+        return []
+
+    item_ids = {line['item'] for order in orders for line in order['items']}
+    customer_ids = {order['customer'] for order in orders}
+
+    item_queryset = InventoryItem.objects.all() if user.is_staff else InventoryItem.objects.filter(owner=user)
+    customer_queryset = Customer.objects.all() if user.is_staff else Customer.objects.filter(owner=user)
+    items = item_queryset.in_bulk(item_ids)
+    customers = customer_queryset.in_bulk(customer_ids)
+
+    missing = sorted(item_ids - items.keys())
+    if missing:
+        raise ValidationError(f"Artikel nicht gefunden: {', '.join(map(str, missing))}")
+    missing = sorted(customer_ids - customers.keys())
+    if missing:
+        raise ValidationError(f"Kunde nicht gefunden: {', '.join(map(str, missing))}")
+
+    with transaction.atomic():
+        order_numbers = DocumentSequence.next_numbers(DocumentSequence.SALES_ORDER, count=len(orders))
+
+        sales_orders = []
+        order_lines = []
+        for order_data, order_number in zip(orders, order_numbers):
+            order = SalesOrder(
+                order_number=order_number,
+                customer=customers[order_data['customer']],
+                status=order_data.get('status') or 'DRAFT',
+                delivery_date=order_data.get('delivery_date'),
+                currency=order_data.get('currency') or 'CHF',
+                created_by=user,
             )
+            lines = [
+                SalesOrderItem(
+                    order=order,
+                    item=items[line['item']],
+                    qty_base=line['qty_base'],
+                    qty_display=line.get('qty_display') or 1,
+                    selected_unit=line.get('selected_unit') or 'verpackung',
+                    unit_price=line['unit_price'],
+                    tax_rate=line.get('tax_rate') or Decimal('0.00'),
+                )
+                for line in order_data['items']
+            ]
+            order.total_net = sum((line.line_total_net for line in lines), Decimal('0.00'))
+            order.total_tax = sum((line.line_tax for line in lines), Decimal('0.00'))
+            order.total_gross = order.total_net + order.total_tax
+
+            sales_orders.append(order)
+            order_lines.extend(lines)
+
+        # Lines pick up the primary keys of their (now saved) orders
+        sales_orders = SalesOrder.objects.bulk_create(sales_orders)
+        SalesOrderItem.objects.bulk_create(order_lines)
+
+    logger.info(
+        f"Sales orders created: {len(sales_orders)} orders, {len(order_lines)} lines "
+        f"({order_numbers[0]} - {order_numbers[-1]})"
+    )
+    return sales_orders
 
 
 def validate_stock_movement_data(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -0,0 +1,144 @@
+"""
+Cache of the active login session per user.
+
+SessionValidationMiddleware checks on every API call that the token's
+session_key is still the user's active UserSession. The cache keeps
+(session_key, user) per user id so that check, and loading the user for
+DRF, normally needs no database query.
+
+Two levels:
+- an in-process TTL LRU (SESSION_CACHE_LOCAL_TTL seconds, SESSION_CACHE_LOCAL_SIZE entries)
+- optionally a shared Django cache (SESSION_CACHE_ALIAS, e.g. Redis), so all
+  workers see a new login immediately
+
+Login and logout invalidate the entry in this process and the shared cache.
+Another worker's in-process copy may stay valid for at most
+SESSION_CACHE_LOCAL_TTL seconds, so without a shared cache the in-process
+level is off by default (TTL 0): a logout or a login elsewhere must reach
+every worker at once, and only the database is shared then.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .models import UserSession
+
+DEFAULT_LOCAL_TTL = 30
+DEFAULT_LOCAL_SIZE = 10000
+DEFAULT_SHARED_TTL = 300
+
+
+class TTLCache:
+    """Thread-safe LRU whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SessionCache:
+    """Active (session_key, user) per user id: in-process LRU, shared cache, database"""
+
+    key_prefix = 'depotix:session:'
+
+    def __init__(self):
+        self.configure()
+
+    def configure(self):
+        """(Re)read the settings; drops the in-process entries"""
+        self.shared_alias = getattr(settings, 'SESSION_CACHE_ALIAS', None)
+        self.shared_ttl = getattr(settings, 'SESSION_CACHE_SHARED_TTL', DEFAULT_SHARED_TTL)
+        local_ttl = getattr(settings, 'SESSION_CACHE_LOCAL_TTL', None)
+        if local_ttl is None:
+            # Invalidation only reaches other workers through the shared cache
+            local_ttl = DEFAULT_LOCAL_TTL if self.shared_alias else 0
+        self.local = TTLCache(
+            maxsize=getattr(settings, 'SESSION_CACHE_LOCAL_SIZE', DEFAULT_LOCAL_SIZE),
+            ttl=local_ttl,
+        )
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    def _key(self, user_id) -> str:
+        return f'{self.key_prefix}{user_id}'
+
+    def get(self, user_id) -> Optional[Tuple[str, object]]:
+        """(session_key, user) of the active session, or None if the user has none"""
+        entry = self.local.get(user_id)
+        if entry is not None:
+            return entry
+
+        shared = self.shared
+        if shared is not None:
+            entry = shared.get(self._key(user_id))
+            if entry is not None:
+                self.local.set(user_id, entry)
+                return entry
+
+        session = UserSession.objects.select_related('user').filter(user_id=user_id).first()
+        if session is None:
+            return None
+
+        entry = (session.session_key, session.user)
+        self.local.set(user_id, entry)
+        if shared is not None:
+            shared.set(self._key(user_id), entry, self.shared_ttl)
+        return entry
+
+    def invalidate(self, user_id):
+        """Drop the cached session (login, logout, user changes)"""
+        self.local.delete(user_id)
+        shared = self.shared
+        if shared is not None:
+            shared.delete(self._key(user_id))
+
+    def clear(self):
+        self.local.clear()
+
+
+session_cache = SessionCache()
+
+
+@receiver(setting_changed)
+def _reconfigure(setting, **kwargs):
+    if setting.startswith('SESSION_CACHE_'):
+        session_cache.configure()
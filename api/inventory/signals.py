@@ -1,9 +1,17 @@
 """
 Django signals for automatic stock adjustment on deletion
 """
-from django.db.models.signals import pre_delete, post_delete
+from django.contrib.auth.models import User
+from django.db.models.signals import pre_delete, post_delete, post_save, post_migrate
 from django.dispatch import receiver
-from .models import StockMovement, SalesOrder, Invoice
+from .models import (
+    StockMovement, SalesOrder, Invoice, UserSession,
+    InventoryItem, InventoryItemSupplier, Supplier, Customer, CompanyProfile, InvoiceTemplate
+)
+from . import pdf_cache, search
+from .ean_lookup import ITEM_FIELDS as EAN_LOOKUP_FIELDS, ean_lookup
+from .invoice_templates import invoice_templates
+from .session_cache import session_cache
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,103 +23,12 @@ def reverse_stock_movement_on_delete(sender, instance, **kwargs):
     Reverse stock changes when a StockMovement is deleted.
     This ensures inventory accuracy when movements are removed.
     """
-    try:
-        # Get the item and refresh from DB to get latest quantities
-        item = instance.item
-        item.refresh_from_db()
-
-        # Get conversion factor
-        vpk = item.verpackungen_pro_palette
-
-        # Helper function to normalize inventory
-        def normalize_inventory(palette_qty, verpackung_qty, verpackungen_pro_palette):
-            """Consolidate loose packages into full palettes"""
-            total_verpackungen = (palette_qty * verpackungen_pro_palette) + verpackung_qty
-            new_palette_qty = total_verpackungen // verpackungen_pro_palette
-            new_verpackung_qty = total_verpackungen % verpackungen_pro_palette
-            return new_palette_qty, new_verpackung_qty
-
-        logger.info(
-            f"Reversing stock movement: {instance.type} - {instance.quantity} {instance.unit} "
-            f"for item {item.name} (ID: {item.id})"
-        )
+    from .services import reverse_stock_movement
 
-        # Store previous quantities for logging
-        previous_palette_qty = item.palette_quantity
-        previous_verpackung_qty = item.verpackung_quantity
-
-        # Reverse the stock movement by doing the opposite operation
-        if instance.type == 'IN':
-            # Movement was IN, so we need to remove stock
-            if instance.unit == 'palette':
-                item.palette_quantity = max(0, item.palette_quantity - instance.quantity)
-            elif instance.unit == 'verpackung':
-                total_verpackungen = (item.palette_quantity * vpk) + item.verpackung_quantity
-                remaining_verpackungen = max(0, total_verpackungen - instance.quantity)
-                item.palette_quantity = remaining_verpackungen // vpk
-                item.verpackung_quantity = remaining_verpackungen % vpk
-
-        elif instance.type == 'OUT':
-            # Movement was OUT, so we need to add stock back
-            if instance.unit == 'palette':
-                item.palette_quantity += instance.quantity
-            elif instance.unit == 'verpackung':
-                item.verpackung_quantity += instance.quantity
-                item.palette_quantity, item.verpackung_quantity = normalize_inventory(
-                    item.palette_quantity,
-                    item.verpackung_quantity,
-                    vpk
-                )
-
-        elif instance.type == 'RETURN':
-            # Movement was RETURN, so we need to remove returned stock
-            if instance.unit == 'palette':
-                item.palette_quantity = max(0, item.palette_quantity - instance.quantity)
-            elif instance.unit == 'verpackung':
-                total_verpackungen = (item.palette_quantity * vpk) + item.verpackung_quantity
-                remaining_verpackungen = max(0, total_verpackungen - instance.quantity)
-                item.palette_quantity = remaining_verpackungen // vpk
-                item.verpackung_quantity = remaining_verpackungen % vpk
-
-        elif instance.type == 'DEFECT':
-            # Movement was DEFECT, so we need to restore from defective
-            if instance.unit == 'palette':
-                transfer_qty = min(instance.quantity * vpk, item.defective_qty)
-                item.defective_qty = max(0, item.defective_qty - transfer_qty)
-                # Convert back to verpackungen and normalize
-                item.verpackung_quantity += transfer_qty
-                item.palette_quantity, item.verpackung_quantity = normalize_inventory(
-                    item.palette_quantity,
-                    item.verpackung_quantity,
-                    vpk
-                )
-            elif instance.unit == 'verpackung':
-                transfer_qty = min(instance.quantity, item.defective_qty)
-                item.defective_qty = max(0, item.defective_qty - transfer_qty)
-                item.verpackung_quantity += transfer_qty
-                item.palette_quantity, item.verpackung_quantity = normalize_inventory(
-                    item.palette_quantity,
-                    item.verpackung_quantity,
-                    vpk
-                )
-
-        elif instance.type == 'ADJUST':
-            # For ADJUST, we can't reliably reverse it as we don't know the previous value
-            # Log a warning instead
-            logger.warning(
-                f"Cannot automatically reverse ADJUST movement for item {item.name}. "
-                f"Manual inventory check recommended."
-            )
-            return
-
-        # Save the item with updated quantities
-        item.save()
-
-        logger.info(
-            f"Stock reversed for item {item.name}: "
-            f"Paletten: {previous_palette_qty} -> {item.palette_quantity}, "
-            f"Verpackungen: {previous_verpackung_qty} -> {item.verpackung_quantity}"
-        )
+    try:
+        # The booking engine locks the item and applies the opposite operation.
+        # ADJUST movements cannot be reversed and only log a warning.
+        reverse_stock_movement(instance)
 
     except Exception as e:
         logger.error(f"Error reversing stock movement on delete: {str(e)}")
@@ -125,6 +42,8 @@ def reverse_sales_order_stock_on_delete(sender, instance, **kwargs):
     Reverse stock changes when a SalesOrder is deleted.
     This restores inventory for all items in the order.
     """
+    from .services import restore_order_stock
+
     try:
         # Only reverse stock if order was delivered or invoiced
         # Draft and confirmed orders don't affect stock
@@ -140,41 +59,8 @@ def reverse_sales_order_stock_on_delete(sender, instance, **kwargs):
             f"(status: {instance.status})"
         )
 
-        # Restore stock for each order item
-        for order_item in instance.items.all():
-            item = order_item.item
-            item.refresh_from_db()
-
-            vpk = item.verpackungen_pro_palette
-
-            # Helper function to normalize inventory
-            def normalize_inventory(palette_qty, verpackung_qty, verpackungen_pro_palette):
-                total_verpackungen = (palette_qty * verpackungen_pro_palette) + verpackung_qty
-                new_palette_qty = total_verpackungen // verpackungen_pro_palette
-                new_verpackung_qty = total_verpackungen % verpackungen_pro_palette
-                return new_palette_qty, new_verpackung_qty
-
-            # Add back the quantity that was removed (qty_base is in Verpackungen)
-            quantity_to_restore = order_item.qty_base
-
-            logger.info(
-                f"Restoring {quantity_to_restore} Verpackungen for item {item.name}"
-            )
-
-            # Add back as verpackungen
-            item.verpackung_quantity += quantity_to_restore
-            item.palette_quantity, item.verpackung_quantity = normalize_inventory(
-                item.palette_quantity,
-                item.verpackung_quantity,
-                vpk
-            )
-
-            item.save()
-
-            logger.info(
-                f"Stock restored for item {item.name}: "
-                f"Paletten: {item.palette_quantity}, Verpackungen: {item.verpackung_quantity}"
-            )
+        # Add back the quantities that were removed (qty_base is in Verpackungen)
+        restore_order_stock(instance.items.all())
 
     except Exception as e:
         logger.error(f"Error reversing sales order stock on delete: {str(e)}")
@@ -194,3 +80,67 @@ def warn_on_invoice_delete(sender, instance, **kwargs):
         f"Associated SalesOrder {instance.order.order_number} will also be deleted. "
         f"Stock will be restored automatically."
     )
+
+
+@receiver(post_delete, sender=Invoice)
+def delete_cached_invoice_pdf(sender, instance, **kwargs):
+    pdf_cache.forget(instance)
+
+
+@receiver(post_save, sender=CompanyProfile)
+@receiver(post_save, sender=InvoiceTemplate)
+@receiver(post_delete, sender=InvoiceTemplate)
+def invalidate_invoice_pdfs(sender, instance, **kwargs):
+    """Sender data, logo or template changed: the user's cached invoice PDFs are stale"""
+    pdf_cache.invalidate_owner(instance.user_id)
+
+
+@receiver(post_save, sender=InvoiceTemplate)
+@receiver(post_delete, sender=InvoiceTemplate)
+def invalidate_compiled_invoice_template(sender, instance, **kwargs):
+    invoice_templates.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=UserSession)
+def invalidate_session_cache(sender, instance, **kwargs):
+    """Drop the cached session when the user changes or the session is removed (e.g. in the admin)"""
+    session_cache.invalidate(instance.pk if sender is User else instance.user_id)
+
+
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_save, sender=Supplier)
+@receiver(post_save, sender=Customer)
+def update_search_entry(sender, instance, update_fields=None, **kwargs):
+    """Keep the search index in sync (stock bookings save with update_fields and are skipped)"""
+    search.index_object(instance, update_fields=update_fields)
+
+
+@receiver(post_delete, sender=InventoryItem)
+@receiver(post_delete, sender=Supplier)
+@receiver(post_delete, sender=Customer)
+def delete_search_entry(sender, instance, **kwargs):
+    search.remove_object(instance)
+
+
+@receiver(post_save, sender=InventoryItem)
+@receiver(post_delete, sender=InventoryItem)
+def invalidate_ean_lookup(sender, instance, update_fields=None, **kwargs):
+    """Drop the owner's cached barcode matches (stock bookings don't touch the cached fields)"""
+    if update_fields is None or set(update_fields) & set(EAN_LOOKUP_FIELDS):
+        ean_lookup.invalidate_owner(instance.owner_id)
+
+
+@receiver(post_save, sender=InventoryItemSupplier)
+@receiver(post_delete, sender=InventoryItemSupplier)
+def update_item_supplier_skus(sender, instance, **kwargs):
+    """Supplier SKUs are part of the item's search text"""
+    search.reindex_item(instance.item_id)
+
+
+@receiver(post_migrate)
+def install_search_index(sender, using, **kwargs):
+    """SQLite: create the FTS5 mirror of the search entries (PostgreSQL: migration 0025)"""
+    if sender.name == 'inventory':
+        search.install_fts_index(using)
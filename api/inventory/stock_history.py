@@ -0,0 +1,270 @@
+"""
+Point-in-time stock balances from ledger checkpoints.
+
+The stock of an item at time T is the replay of its StockMovements with an
+effective time (movement_timestamp, else created_at) before T, applied with
+the booking engine's unit rules (services.apply_movement) starting from zero.
+
+StockCheckpoint stores that replay at every month boundary (in TIME_ZONE)
+for each item with a non-zero balance; build_checkpoints() (management
+command build_stock_checkpoints) adds the months since the owner's latest
+boundary. A balance as of T then takes three indexed queries, independent
+of the ledger size:
+
+    1. the owner's latest boundary B <= T
+    2. the checkpoints at B
+    3. the movements in [B, T), replayed in Python
+
+Checkpoints are dense per boundary, so a missing row means an empty item.
+A movement booked, changed or deleted with an effective time before the
+current month would make later checkpoints stale; invalidate() deletes the
+owner's checkpoints after that time (queries then use an earlier boundary
+until the next build recomputes them).
+
+A build replays without blocking bookings, so a backdated booking may
+commit while it runs. invalidate() also bumps the owner's
+StockHistoryVersion; the build writes its checkpoints, then locks that row
+and rolls back if the version moved since it started (and retries). A
+booking that invalidates after that lock waits for the build to commit and
+then deletes the new checkpoints itself.
+
+As with a replay, stock set directly on an item (without a movement) is
+not part of the history; item master data (price, factors) is current.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from django.db import transaction
+from django.db.models import F, Max
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import InventoryItem, StockCheckpoint, StockHistoryVersion, StockMovement
+
+EFFECTIVE_AT = Coalesce('movement_timestamp', 'created_at')
+MOVEMENT_FIELDS = ('effective_at', 'item_id', 'type', 'unit', 'quantity')
+# Builds restarted because a backdated booking invalidated their result
+MAX_BUILD_ATTEMPTS = 3
+
+
+class StaleBuild(Exception):
+    """The ledger changed before the boundary while checkpoints were built"""
+
+
+class Balance:
+    """Stock of one item at a point in time (the attributes apply_movement works on)"""
+    __slots__ = ('name', 'verpackungen_pro_palette', 'palette_quantity', 'verpackung_quantity', 'defective_qty')
+
+    def __init__(self, name: str, verpackungen_pro_palette: int,
+                 palette_quantity: int = 0, verpackung_quantity: int = 0, defective_qty: int = 0):
+        self.name = name
+        self.verpackungen_pro_palette = verpackungen_pro_palette
+        self.palette_quantity = palette_quantity
+        self.verpackung_quantity = verpackung_quantity
+        self.defective_qty = defective_qty
+
+    def is_empty(self) -> bool:
+        return not (self.palette_quantity or self.verpackung_quantity or self.defective_qty)
+
+
+def month_start(value: datetime) -> datetime:
+    local = timezone.localtime(value)
+    return timezone.make_aware(datetime(local.year, local.month, 1))
+
+
+def next_month_start(value: datetime) -> datetime:
+    return month_start(month_start(value) + timedelta(days=32))
+
+
+def parse_as_of(value: str) -> datetime:
+    """
+    Exclusive end of the `as_of` query parameter: a date means the end of
+    that day (all its movements), a datetime that instant.
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    day = parse_date(value)
+    if day is not None:
+        return timezone.make_aware(datetime(day.year, day.month, day.day) + timedelta(days=1))
+    moment = parse_datetime(value)
+    if moment is None:
+        raise ValueError(value)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment + timedelta(microseconds=1)
+
+
+def _movements(owner_id: int, start: Optional[datetime], end: datetime, item_ids=None):
+    """Owner's movements with effective time in [start, end), in booking order"""
+    queryset = StockMovement.objects.filter(owner_id=owner_id).annotate(
+        effective_at=EFFECTIVE_AT
+    ).filter(effective_at__lt=end)
+    if start is not None:
+        queryset = queryset.filter(effective_at__gte=start)
+    if item_ids is not None:
+        queryset = queryset.filter(item_id__in=item_ids)
+    return queryset.order_by('effective_at', 'id')
+
+
+def _replay(balances: Dict[int, Balance], rows: Iterable[tuple], items: Dict[int, tuple]) -> Iterator[datetime]:
+    """
+    Apply (effective_at, item_id, type, unit, quantity) rows to the balances;
+    yields each row's effective time before applying it, so callers can
+    snapshot the balances at boundaries in between.
+    """
+    from .services import apply_movement
+
+    for effective_at, item_id, movement_type, unit, quantity in rows:
+        yield effective_at
+        balance = balances.get(item_id)
+        if balance is None:
+            name, factor = items[item_id]
+            balance = balances[item_id] = Balance(name, factor)
+        apply_movement(balance, movement_type, unit, quantity, check_stock=False)
+
+
+def latest_boundary(owner_id: int, before: Optional[datetime] = None) -> Optional[datetime]:
+    queryset = StockCheckpoint.objects.filter(owner_id=owner_id)
+    if before is not None:
+        queryset = queryset.filter(period_end__lte=before)
+    return queryset.aggregate(latest=Max('period_end'))['latest']
+
+
+def balances_as_of(owner, as_of: datetime, items: Optional[List[InventoryItem]] = None) -> Dict[int, Balance]:
+    """Balances of the owner's items (or the given ones) before `as_of`; items without stock are missing"""
+    item_ids = None if items is None else [item.pk for item in items]
+    boundary = latest_boundary(owner.pk, as_of)
+
+    balances = {}
+    if boundary is not None:
+        checkpoints = StockCheckpoint.objects.filter(owner=owner, period_end=boundary)
+        if item_ids is not None:
+            checkpoints = checkpoints.filter(item_id__in=item_ids)
+        for item_id, name, factor, palettes, verpackungen, defective in checkpoints.values_list(
+            'item_id', 'item__name', 'item__verpackungen_pro_palette',
+            'palette_quantity', 'verpackung_quantity', 'defective_qty'
+        ):
+            balances[item_id] = Balance(name, factor, palettes, verpackungen, defective)
+
+    tail = list(_movements(owner.pk, boundary, as_of, item_ids).values_list(*MOVEMENT_FIELDS))
+    if items is not None:
+        item_data = {item.pk: (item.name, item.verpackungen_pro_palette) for item in items}
+    else:
+        item_data = {
+            pk: (name, factor) for pk, name, factor in InventoryItem.objects.filter(
+                pk__in={row[1] for row in tail} - balances.keys()
+            ).values_list('pk', 'name', 'verpackungen_pro_palette')
+        }
+    for _ in _replay(balances, tail, item_data):
+        pass
+    return balances
+
+
+def apply_as_of(owner, items: List[InventoryItem], as_of: datetime) -> List[InventoryItem]:
+    """Set the stock fields of the (unsaved, in-memory) items to their balance before `as_of`"""
+    balances = balances_as_of(owner, as_of, items)
+    empty = Balance('', 1)
+    for item in items:
+        balance = balances.get(item.pk, empty)
+        item.palette_quantity = balance.palette_quantity
+        item.verpackung_quantity = balance.verpackung_quantity
+        item.defective_qty = balance.defective_qty
+    return items
+
+
+def build_checkpoints(owner, until: Optional[datetime] = None) -> int:
+    """
+    Add the owner's month boundaries after the latest checkpoint up to
+    `until` (default: the start of the current month). Returns the number of
+    checkpoint rows written (0 if backdated bookings kept invalidating it).
+    """
+    until = month_start(until or timezone.now())
+    StockHistoryVersion.objects.get_or_create(owner=owner)
+    for _ in range(MAX_BUILD_ATTEMPTS):
+        try:
+            return _build(owner, until)
+        except StaleBuild:
+            continue
+    return 0
+
+
+def _build(owner, until: datetime) -> int:
+    # Read before the ledger: a booking committing after this is caught by the check below
+    version = StockHistoryVersion.objects.filter(owner=owner).values_list('version', flat=True).get()
+    start = latest_boundary(owner.pk)
+
+    with transaction.atomic():
+        balances = {}
+        if start is None:
+            first = _movements(owner.pk, None, until).values_list('effective_at', flat=True).first()
+            if first is None:
+                return 0
+            boundary = next_month_start(first)
+        else:
+            balances = balances_as_of(owner, start)
+            boundary = next_month_start(start)
+        if boundary > until:
+            return 0
+
+        items = {
+            pk: (name, factor) for pk, name, factor in InventoryItem.objects.filter(
+                owner=owner
+            ).values_list('pk', 'name', 'verpackungen_pro_palette')
+        }
+        rows = _movements(owner.pk, start, until).values_list(*MOVEMENT_FIELDS).iterator(chunk_size=5000)
+
+        written = 0
+        for effective_at in _replay(balances, rows, items):
+            while effective_at >= boundary:
+                written += _write_boundary(owner, boundary, balances)
+                boundary = next_month_start(boundary)
+        while boundary <= until:
+            written += _write_boundary(owner, boundary, balances)
+            boundary = next_month_start(boundary)
+
+        # Locked after the inserts, the order in which bookings take their locks (items, then this row)
+        current = StockHistoryVersion.objects.select_for_update().filter(owner=owner).values_list(
+            'version', flat=True
+        ).get()
+        if current != version:
+            raise StaleBuild()
+    return written
+
+
+def _write_boundary(owner, boundary: datetime, balances: Dict[int, Balance]) -> int:
+    checkpoints = [
+        StockCheckpoint(
+            item_id=item_id, owner=owner, period_end=boundary,
+            palette_quantity=balance.palette_quantity,
+            verpackung_quantity=balance.verpackung_quantity,
+            defective_qty=balance.defective_qty,
+        )
+        for item_id, balance in balances.items()
+        if not balance.is_empty()
+    ]
+    StockCheckpoint.objects.bulk_create(checkpoints, batch_size=2000)
+    return len(checkpoints)
+
+
+def effective_time(movement: StockMovement) -> Optional[datetime]:
+    return movement.movement_timestamp or movement.created_at
+
+
+def invalidate(owner_id: int, effective_at: Optional[datetime]) -> None:
+    """Drop the owner's checkpoints made stale by a movement booked, changed or deleted at `effective_at`"""
+    if effective_at is None or effective_at >= month_start(timezone.now()):
+        return
+    # Bumped first: waits for a build that already checked its version, then deletes what it wrote
+    StockHistoryVersion.objects.get_or_create(owner_id=owner_id)
+    StockHistoryVersion.objects.filter(owner_id=owner_id).update(version=F('version') + 1)
+    StockCheckpoint.objects.filter(owner_id=owner_id, period_end__gt=effective_at).delete()
+
+
+def clear(owner=None) -> None:
+    """Delete the checkpoints (of one owner) so the next build replays the whole ledger"""
+    queryset = StockCheckpoint.objects.all()
+    if owner is not None:
+        queryset = queryset.filter(owner=owner)
+    queryset.delete()
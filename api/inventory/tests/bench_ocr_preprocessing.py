@@ -0,0 +1,153 @@
+"""
+OCR preprocessing benchmark: latency per stage and effect on extraction accuracy.
+
+Compares the previous preprocessing (full-resolution non-local-means
+denoising + threshold) with the configured PreprocessingPipeline.
+
+Samples are either a directory of receipt images, each with a .txt file of
+the same name holding the expected text (--samples DIR), or synthetic
+12-megapixel "phone photos" of a receipt: skewed, on a dark background, with
+sensor noise. Accuracy (similarity of OCR text to the expected text) needs
+PaddleOCR or Tesseract; without an engine only latency is reported.
+
+Run from api/:  python inventory/tests/bench_ocr_preprocessing.py [--samples DIR] [--count 3]
+"""
+import argparse
+import difflib
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'depotix_api.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import cv2  # noqa: E402
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+
+from inventory.ocr_preprocessing import PreprocessingPipeline  # noqa: E402
+from inventory.ocr_service import ReceiptOCRService  # noqa: E402
+
+RECEIPT_LINES = [
+    'Birra Peja GmbH',
+    'Lieferschein 2024-0815',
+    'Artikel: Sola Ice Tea 0.33L',
+    'Menge: 120 Verpackungen',
+    'Preis: 7.92 CHF',
+    'Total: 950.40 CHF',
+]
+
+
+def synthetic_receipt(seed: int):
+    """BGR phone photo of a receipt and its text"""
+    rng = np.random.default_rng(seed)
+    paper = Image.new('L', (1400, 2000), 245)
+    draw = ImageDraw.Draw(paper)
+    try:
+        font = ImageFont.truetype('DejaVuSans.ttf', 56)
+    except OSError:
+        font = ImageFont.load_default()
+    for row, line in enumerate(RECEIPT_LINES):
+        draw.text((100, 150 + row * 110), line, fill=15, font=font)
+
+    angle = float(rng.uniform(-6, 6))
+    photo = Image.new('L', (4000, 3000), 70)
+    photo.paste(paper.rotate(angle, expand=True, fillcolor=70), (1200, 300))
+    pixels = np.asarray(photo).astype(np.float32) + rng.normal(0, 6 + seed * 3, (3000, 4000))
+    gray = np.clip(pixels, 0, 255).astype(np.uint8)
+    return cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR), '\n'.join(RECEIPT_LINES)
+
+
+def load_samples(directory: Path):
+    for path in sorted(directory.iterdir()):
+        truth = path.with_suffix('.txt')
+        if path.suffix.lower() in ('.png', '.jpg', '.jpeg') and truth.exists():
+            yield path.name, cv2.imread(str(path), cv2.IMREAD_COLOR), truth.read_text()
+
+
+def legacy_preprocess(image, timings):
+    """Preprocessing before the pipeline: full resolution, always non-local means"""
+    started = time.perf_counter()
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    timings['grayscale'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    denoised = cv2.fastNlMeansDenoising(gray)
+    timings['denoise'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    result = cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+    timings['threshold'] = time.perf_counter() - started
+    return result
+
+
+def similarity(text: str, expected: str) -> float:
+    normalize = lambda value: ' '.join(value.lower().split())  # noqa: E731
+    return difflib.SequenceMatcher(None, normalize(text), normalize(expected)).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=Path, help='Directory with receipt images and .txt ground truth')
+    parser.add_argument('--count', type=int, default=3, help='Number of synthetic samples (default: 3)')
+    args = parser.parse_args()
+
+    if args.samples:
+        samples = list(load_samples(args.samples))
+    else:
+        samples = [(f'synthetic-{seed}', *synthetic_receipt(seed)) for seed in range(args.count)]
+    if not samples:
+        parser.error('no samples found')
+
+    service = ReceiptOCRService()
+    pipeline = PreprocessingPipeline()
+    has_engine = service.engine_id == 'paddleocr' or service.warm_up() or _tesseract_available()
+
+    configurations = {
+        'legacy': legacy_preprocess,
+        'pipeline': lambda image, timings: pipeline.run(image, color_order='BGR', timings=timings),
+    }
+
+    for name, preprocess in configurations.items():
+        stage_times = {}
+        totals = []
+        scores = []
+        for sample_name, image, expected in samples:
+            timings = {}
+            started = time.perf_counter()
+            processed = preprocess(image, timings)
+            totals.append(time.perf_counter() - started)
+            for stage, seconds in timings.items():
+                stage_times.setdefault(stage, []).append(seconds)
+            if has_engine:
+                scores.append(similarity(service.extract_text_from_array(processed), expected))
+
+        print(f"\n{name} ({len(samples)} samples, output {processed.shape[1]}x{processed.shape[0]})")
+        for stage, values in stage_times.items():
+            print(f"  {stage:<10} {statistics.mean(values) * 1000:>9.1f} ms")
+        print(f"  {'total':<10} {statistics.mean(totals) * 1000:>9.1f} ms")
+        accuracy = f"{statistics.mean(scores):.1%}" if scores else 'n/a (no OCR engine installed)'
+        print(f"  accuracy   {accuracy}")
+
+
+def _tesseract_available() -> bool:
+    from inventory.ocr_service import optional_import
+
+    pytesseract = optional_import('pytesseract')
+    if pytesseract is None:
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+    except Exception:
+        return False
+    return True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Startup benchmark: worker boot time and RSS with and without the OCR engine.
+
+Each scenario runs in a fresh interpreter that sets up Django and imports
+the URLconf (which imports inventory.views, like a gunicorn worker on its
+first request):
+
+    lazy   - what a web worker pays now (OCR engine not loaded)
+    eager  - what every worker paid before: cv2, numpy and PaddleOCR loaded
+             at import time (simulated with ocr_service.warm_up())
+
+Run from api/:  python inventory/tests/bench_ocr_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = r'''
+import json, os, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+import depotix_api.urls
+if sys.argv[1] == 'eager':
+    from inventory.ocr_service import ocr_service
+    ocr_service.warm_up()
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({'seconds': elapsed, 'rss_mb': rss_kb / 1024}))
+'''
+
+
+def run_probe(mode, env):
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, mode],
+        env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'depotix_api.settings')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.getcwd(), env.get('PYTHONPATH')]))
+
+    print(f"{'mode':<8}{'boot s (median)':>18}{'max RSS MB':>14}")
+    for mode in ('lazy', 'eager'):
+        samples = [run_probe(mode, env) for _ in range(args.runs)]
+        seconds = statistics.median(sample['seconds'] for sample in samples)
+        rss_mb = max(sample['rss_mb'] for sample in samples)
+        print(f"{mode:<8}{seconds:>18.3f}{rss_mb:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
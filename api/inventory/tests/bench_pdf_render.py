@@ -0,0 +1,94 @@
+"""
+Render benchmark: invoice PDFs per second per core, inline vs. warm pool.
+
+    inline - what a download paid before: the default template with inline
+             styles laid out in the calling process (render_invoice_pdf)
+    pool   - inventory.pdf_render: pre-forked processes with preloaded fonts
+             and pre-parsed default stylesheet, N jobs in flight
+
+Both render the default template with a synthetic invoice of --lines lines
+(no database needed). Per-core rate = renders/s divided by the processes used.
+
+Run from api/:  python inventory/tests/bench_pdf_render.py [--renders 40] [--workers 2] [--lines 20]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+
+def invoice_context(lines):
+    supplier = {'name': 'Depot AG', 'street': 'Bahnhofstrasse 1', 'postal_code': '8001', 'city': 'Zürich'}
+    return {
+        'supplier': supplier,
+        'customer': {'name': 'Kunde AG', 'address': 'Seestrasse 5\n8002 Zürich'},
+        'invoice': {'invoice_number': 'RE000001', 'total_net': Decimal('100.00'),
+                    'total_tax': Decimal('8.10'), 'total_gross': Decimal('108.10'), 'currency': 'CHF'},
+        'order': {'order_number': 'LS-2025-0001'},
+        'lines': [
+            {'name': f'Artikel {i}', 'sku': f'SKU-{i}', 'qty_display': 2, 'selected_unit': 'Verpackung',
+             'unit_price': Decimal('5.00'), 'tax_rate': Decimal('8.10'), 'line_total_net': Decimal('10.00'),
+             'line_tax': Decimal('0.81'), 'line_total_gross': Decimal('10.81')}
+            for i in range(lines)
+        ],
+    }
+
+
+def bench_inline(context, renders):
+    from inventory.utils.pdf import render_invoice_pdf
+
+    render_invoice_pdf(dict(context))  # import and first-use costs are not counted
+    start = time.perf_counter()
+    for _ in range(renders):
+        render_invoice_pdf(dict(context))
+    return renders / (time.perf_counter() - start)
+
+
+def bench_pool(context, renders, workers, directory):
+    from django.test import override_settings
+    from inventory.pdf_render import PDFRenderService
+    from inventory.utils.pdf import render_invoice_html
+
+    with override_settings(INVOICE_PDF_WORKERS=workers):
+        service = PDFRenderService()
+        service.warm_up()
+        html_string, default_styles = render_invoice_html(dict(context), external_styles=True)
+        start = time.perf_counter()
+        jobs = [
+            service.submit(Path(directory) / f'{i}.pdf', html_string, default_styles)
+            for i in range(renders)
+        ]
+        for job in jobs:
+            job.result()
+        elapsed = time.perf_counter() - start
+        service.pool().shutdown()
+    return renders / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--renders', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--lines', type=int, default=20)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'depotix_api.settings')
+    import django
+    django.setup()
+
+    context = invoice_context(args.lines)
+    inline = bench_inline(context, args.renders)
+    with tempfile.TemporaryDirectory() as directory:
+        pooled = bench_pool(context, args.renders, args.workers, directory)
+
+    print(f"{'mode':<8}{'processes':>10}{'renders/s':>12}{'per core':>10}")
+    print(f"{'inline':<8}{1:>10}{inline:>12.2f}{inline:>10.2f}")
+    print(f"{'pool':<8}{args.workers:>10}{pooled:>12.2f}{pooled / args.workers:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
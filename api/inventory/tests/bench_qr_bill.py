@@ -0,0 +1,103 @@
+"""
+Micro-benchmark: Swiss QR bill SVG generation for an invoice.
+
+    tempfile - the previous path: SVG written to a NamedTemporaryFile, read
+               back and deleted, style attributes counted and rewritten
+    memory   - _qr_bill_svg without memoization: SVG written to a StringIO,
+               one regex pass
+    memo     - _qr_svg_data_uri for a slip generated before (re-render)
+
+Also checks that all paths produce the same SVG.
+
+Run from api/:  python inventory/tests/bench_qr_bill.py [--runs 200]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+CREDITOR = {'name': 'Depot AG', 'street': 'Bahnhofstrasse 1', 'postal_code': '8001', 'city': 'Zürich', 'country': 'CH'}
+DEBTOR = {'name': 'Kunde AG', 'street': 'Seestrasse 5', 'postal_code': '8002', 'city': 'Zürich', 'country': 'CH'}
+IBAN = 'CH9300762011623852957'
+
+
+def tempfile_svg(amount, reference):
+    """The previous implementation (file round trip, regex with before/after scans)"""
+    from qrbill import QRBill
+
+    qr_bill = QRBill(
+        account=IBAN,
+        creditor={'name': CREDITOR['name'], 'line1': CREDITOR['street'],
+                  'line2': f"{CREDITOR['postal_code']} {CREDITOR['city']}", 'country': 'CH'},
+        amount=f"{float(amount):.2f}", currency='CHF',
+        debtor={'name': DEBTOR['name'], 'line1': DEBTOR['street'],
+                'line2': f"{DEBTOR['postal_code']} {DEBTOR['city']}", 'country': 'CH'},
+        additional_information=f'Rechnung {reference}', language='de',
+    )
+    with tempfile.NamedTemporaryFile(mode='w', suffix='.svg', delete=False) as temp_file:
+        temp_path = temp_file.name
+    try:
+        qr_bill.as_svg(temp_path)
+        with open(temp_path, 'r', encoding='utf-8') as f:
+            svg_content = f.read()
+    finally:
+        os.unlink(temp_path)
+
+    def convert(match):
+        attrs = []
+        for prop in match.group(1).split(';'):
+            if ':' not in prop:
+                continue
+            key, value = (part.strip() for part in prop.split(':', 1))
+            if key in ('fill', 'stroke') and value != 'none' or key in ('fill-opacity', 'fill-rule', 'stroke-width'):
+                attrs.append(f'{key}="{value}"')
+        return ' '.join(attrs)
+
+    svg_content.count('style="')
+    svg_content = re.sub(r'style="([^"]*)"', convert, svg_content)
+    svg_content.count('style="')
+    return svg_content
+
+
+def timed(function, runs):
+    start = time.perf_counter()
+    for i in range(runs):
+        function(i)
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=200)
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.getcwd())
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'depotix_api.settings')
+    import django
+    django.setup()
+    from inventory.utils.pdf import _qr_bill_svg, _qr_svg_data_uri
+
+    amount = Decimal('1234.50')
+
+    def memory(i):
+        return _qr_bill_svg.__wrapped__(
+            IBAN, tuple(sorted(CREDITOR.items())), tuple(sorted(DEBTOR.items())),
+            str(amount), 'CHF', f'RE{i:06d}', f'Rechnung RE{i:06d}'
+        )
+
+    def memo(i):
+        return _qr_svg_data_uri(IBAN, CREDITOR, DEBTOR, amount, 'CHF', 'RE000000', 'Rechnung RE000000')
+
+    assert tempfile_svg(amount, 'RE000000') == memory(0) == memo(0), 'SVG output differs'
+
+    print(f"{'path':<10}{'ms/slip':>10}")
+    for name, function in [('tempfile', lambda i: tempfile_svg(amount, f'RE{i:06d}')),
+                           ('memory', memory), ('memo', memo)]:
+        print(f"{name:<10}{timed(function, args.runs):>10.3f}")
+
+
+if __name__ == '__main__':
+    main()
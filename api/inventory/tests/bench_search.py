@@ -0,0 +1,162 @@
+"""
+Search benchmark: typeahead and OCR matching latency at 100k items.
+
+Creates one user with --items items (name, brand, SKU, EAN, supplier SKU)
+and --suppliers suppliers, then times, per query:
+
+    legacy     - what the endpoints did before: name__icontains scans
+                 (three for OCR item matching, one for suppliers)
+    typeahead  - inventory.search.search() over items
+    ocr        - inventory.ocr_matching.suggest_matches()
+
+Without DATABASE_URL a temporary SQLite file is used (FTS5 trigram index).
+With DATABASE_URL (PostgreSQL, migrated) the pg_trgm index is measured; the
+benchmark user and its data are deleted afterwards.
+
+Run from api/:  python inventory/tests/bench_search.py [--items 100000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'depotix_api.settings')
+
+TEMP_DB = None
+if not os.getenv('DATABASE_URL'):
+    TEMP_DB = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False).name
+    os.environ['DATABASE_URL'] = f'sqlite:///{TEMP_DB}'
+
+from django.conf import settings  # noqa: E402
+
+if TEMP_DB:
+    # Tables straight from the models (the migrations target PostgreSQL)
+    settings.MIGRATION_MODULES = {'inventory': None}
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import User  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from inventory import search  # noqa: E402
+from inventory.models import InventoryItem, InventoryItemSupplier, Supplier  # noqa: E402
+from inventory.ocr_matching import suggest_matches  # noqa: E402
+
+BRANDS = ['Sola', 'Peja', 'Feldschlösschen', 'Rivella', 'Valser', 'Henniez', 'Appenzeller', 'Calanda',
+          'Ramseier', 'Michel', 'Red Bull', 'Coca-Cola', 'Fanta', 'Sprite', 'Schweppes', 'Vittel']
+PRODUCTS = ['Ice Tea', 'Lemon Tea', 'Pils', 'Lager', 'Weizen', 'Mineral', 'Classic', 'Zero', 'Rot',
+            'Blau', 'Apfelschorle', 'Orangensaft', 'Energy', 'Tonic', 'Bitter Lemon', 'Quellwasser']
+SIZES = ['0.33L', '0.5L', '1L', '1.5L', '6x0.33L', '24x0.5L', '20x0.5L', '12x1L']
+SUPPLIER_WORDS = ['Birra', 'Getränke', 'Handel', 'Brauerei', 'Vertrieb', 'Logistik', 'Import', 'Quelle',
+                  'Alpen', 'Berg', 'Tal', 'Zentral', 'Nord', 'Süd', 'Ost', 'West']
+
+
+def typo(value: str, rng) -> str:
+    index = rng.randrange(len(value))
+    return value[:index] + value[index + 1:]
+
+
+def populate(user, items: int, suppliers: int, rng):
+    supplier_objects = Supplier.objects.bulk_create([
+        Supplier(name=f"{rng.choice(SUPPLIER_WORDS)} {rng.choice(SUPPLIER_WORDS)} {n} AG", owner=user)
+        for n in range(suppliers)
+    ])
+    batch = []
+    for n in range(items):
+        brand = rng.choice(BRANDS)
+        batch.append(InventoryItem(
+            name=f"{brand} {rng.choice(PRODUCTS)} {rng.choice(SIZES)} #{n}", brand=brand,
+            sku=f"SKU-{n:06d}", ean_unit=f"76{n:011d}", price=Decimal('1.00'), owner=user,
+        ))
+        if len(batch) == 5000:
+            InventoryItem.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        InventoryItem.objects.bulk_create(batch)
+
+    item_ids = list(InventoryItem.objects.filter(owner=user).values_list('id', flat=True))
+    InventoryItemSupplier.objects.bulk_create([
+        InventoryItemSupplier(
+            item_id=item_id, supplier=rng.choice(supplier_objects),
+            supplier_sku=f"LS-{item_id:07d}", supplier_price=Decimal('0.80'),
+        )
+        for item_id in item_ids[::4]
+    ], batch_size=5000)
+    # bulk_create bypasses the signals
+    search.rebuild(owner=user)
+    return [supplier.name for supplier in supplier_objects]
+
+
+def legacy_suggest(user, supplier_name: str, article_name: str):
+    list(Supplier.objects.filter(owner=user, name__icontains=supplier_name)[:5])
+    words = article_name.split()
+    for term in (article_name, words[0], ' '.join(words[:2])):
+        list(InventoryItem.objects.filter(owner=user, name__icontains=term)[:5])
+
+
+def timed(function, arguments):
+    samples = []
+    for args in arguments:
+        started = time.perf_counter()
+        function(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100_000)
+    parser.add_argument('--suppliers', type=int, default=2_000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    if TEMP_DB:
+        call_command('migrate', run_syncdb=True, verbosity=0)
+    user = User.objects.create_user(username=f'bench-search-{os.getpid()}', password='bench')
+    try:
+        started = time.perf_counter()
+        supplier_names = populate(user, args.items, args.suppliers, rng)
+        print(f"{connection.vendor}: {args.items} items, {args.suppliers} suppliers "
+              f"indexed in {time.perf_counter() - started:.1f} s")
+
+        prefixes = [f"{rng.choice(BRANDS)} {rng.choice(PRODUCTS)}"[:rng.randint(3, 12)] for _ in range(args.queries)]
+        typos = [typo(f"{rng.choice(BRANDS)} {rng.choice(PRODUCTS)}", rng) for _ in range(args.queries)]
+        ocr = [
+            (rng.choice(supplier_names).rsplit(' ', 2)[0], f"{rng.choice(BRANDS)} {rng.choice(PRODUCTS)} {rng.choice(SIZES)}")
+            for _ in range(args.queries)
+        ]
+
+        rows = [
+            ('legacy ocr', timed(legacy_suggest, [(user, s, a) for s, a in ocr])),
+            ('typeahead prefix', timed(search.search, [(user, q, ['item']) for q in prefixes])),
+            ('typeahead typo', timed(search.search, [(user, q, ['item']) for q in typos])),
+            ('typeahead ean', timed(search.search, [(user, f"76{rng.randrange(args.items):011d}", ['item'])
+                                                    for _ in range(args.queries)])),
+            ('ocr matching', timed(
+                suggest_matches, [({'supplier': s, 'article_name': a}, user) for s, a in ocr]
+            )),
+        ]
+        print(f"\n{'query':<18}{'p50 ms':>10}{'p95 ms':>10}")
+        for name, (p50, p95) in rows:
+            print(f"{name:<18}{p50:>10.1f}{p95:>10.1f}")
+    finally:
+        if TEMP_DB:
+            connection.close()
+            os.unlink(TEMP_DB)
+        else:
+            user.delete()
+
+
+if __name__ == '__main__':
+    main()
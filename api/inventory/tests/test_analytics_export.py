@@ -0,0 +1,137 @@
+"""
+Tests for the partitioned Parquet export
+"""
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from inventory import analytics_export
+from inventory.models import Customer, Expense, InventoryItem, SalesOrder, SalesOrderItem, StockMovement
+
+
+def months_ago(count: int):
+    """Mid-month datetime `count` months before the current one"""
+    value = timezone.localtime().replace(day=15, hour=12)
+    for _ in range(count):
+        value = (value.replace(day=1) - timedelta(days=1)).replace(day=15)
+    return value
+
+
+class AnalyticsExportTests(TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        settings_override = override_settings(ANALYTICS_EXPORT_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='analyst', password='pass12345')
+        self.item = InventoryItem.objects.create(name='Lager', price=Decimal('2.00'), owner=self.user)
+
+    def movement(self, created_at, quantity=5, price='1.25'):
+        movement = StockMovement.objects.create(
+            item=self.item, type='IN', unit='verpackung', quantity=quantity,
+            purchase_price=Decimal(price), note='Lieferung', created_by=self.user
+        )
+        StockMovement.objects.filter(pk=movement.pk).update(created_at=created_at)
+        return movement
+
+    def read(self, dataset, month):
+        return pq.read_table(analytics_export.partition_path(
+            analytics_export.get_dataset(dataset), self.user.id, month
+        ))
+
+    def test_closed_months_with_typed_columns(self):
+        self.movement(months_ago(2), quantity=3)
+        self.movement(months_ago(2), quantity=4, price='0.80')
+        self.movement(timezone.now())  # current month, not exported yet
+
+        written = analytics_export.export(datasets=['stock_movements'])
+
+        month = months_ago(2).strftime('%Y-%m')
+        self.assertEqual(written, [{'dataset': 'stock_movements', 'owner_id': self.user.id, 'month': month, 'rows': 2}])
+        table = self.read('stock_movements', month)
+        self.assertEqual(table.schema.field('quantity').type, pa.int32())
+        self.assertEqual(table.schema.field('purchase_price').type, pa.decimal128(10, 2))
+        self.assertEqual(table.schema.field('created_at').type.tz, 'Europe/Zurich')
+        self.assertEqual(table.column('purchase_price').to_pylist(), [Decimal('1.25'), Decimal('0.80')])
+
+    def test_incremental_runs_append_new_months_only(self):
+        self.movement(months_ago(3))
+        analytics_export.export(datasets=['stock_movements'])
+
+        self.movement(months_ago(2), quantity=9)
+        written = analytics_export.export(datasets=['stock_movements'])
+
+        self.assertEqual([p['month'] for p in written], [months_ago(2).strftime('%Y-%m')])
+        self.assertEqual(analytics_export.export(datasets=['stock_movements']), [])
+        self.assertEqual(self.read('stock_movements', months_ago(3).strftime('%Y-%m')).num_rows, 1)
+
+    def test_months_of_open_orders_are_rewritten(self):
+        customer = Customer.objects.create(name='Kunde', owner=self.user)
+        order = SalesOrder.objects.create(customer=customer, created_by=self.user)
+
+        def add_line():
+            SalesOrderItem.objects.create(order=order, item=self.item, qty_base=1, unit_price=Decimal('2.00'),
+                                          tax_rate=Decimal('8.10'))
+            # The line saves its order's totals (with order_date)
+            SalesOrder.objects.filter(pk=order.pk).update(order_date=months_ago(2))
+
+        add_line()
+        month = months_ago(2).strftime('%Y-%m')
+        analytics_export.export(datasets=['sales_order_items'])
+        self.assertEqual(self.read('sales_order_items', month).num_rows, 1)
+
+        # A line added to the draft, which is delivered before the next run
+        add_line()
+        SalesOrder.objects.filter(pk=order.pk).update(status='DELIVERED')
+        written = analytics_export.export(datasets=['sales_order_items'])
+
+        self.assertEqual([p['month'] for p in written], [month])
+        table = self.read('sales_order_items', month)
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(set(table.column('order_status').to_pylist()), {'DELIVERED'})
+        # All orders of the month closed: not rewritten again
+        self.assertEqual(analytics_export.export(datasets=['sales_order_items']), [])
+
+    def test_concurrent_writers_use_separate_temporary_files(self):
+        dataset = analytics_export.get_dataset('expenses')
+        path = analytics_export.partition_path(dataset, self.user.id, '2001-01')
+        schema = analytics_export.arrow_schema(dataset)
+        first = analytics_export.PartitionWriter(schema, path)
+        second = analytics_export.PartitionWriter(schema, path)
+        self.addCleanup(first.writer.close)
+        self.addCleanup(second.writer.close)
+
+        self.assertNotEqual(first.tmp_path, second.tmp_path)
+        self.assertEqual(first.tmp_path.parent, path.parent)
+
+    def test_api_lists_and_downloads_own_partitions(self):
+        expense = Expense.objects.create(date=months_ago(1).date(), description='Miete', amount=Decimal('40.00'),
+                                         category='OTHER', owner=self.user)
+        Expense.objects.filter(pk=expense.pk).update(created_at=months_ago(1))
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        # Exports run in the management command only, never in a web worker
+        response = client.post('/api/inventory/analytics/parquet/', {'datasets': ['expenses']}, format='json')
+        self.assertEqual(response.status_code, 405)
+        call_command('export_parquet', dataset=['expenses'], stdout=io.StringIO())
+        month = months_ago(1).strftime('%Y-%m')
+        self.assertEqual(client.get('/api/inventory/analytics/parquet/').data[0]['month'], month)
+
+        response = client.get(f'/api/inventory/analytics/parquet/expenses/{month}/')
+        table = pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.column('amount').to_pylist(), [Decimal('40.00')])
+        self.assertEqual(client.get('/api/inventory/analytics/parquet/expenses/2001-01/').status_code, 404)
@@ -0,0 +1,101 @@
+"""
+Tests for barcode lookup (single scan, batch, hot-code cache)
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from inventory.ean_lookup import DEFAULT_LOCAL_CACHE_TTL, ean_lookup
+from inventory.models import InventoryItem
+
+
+class EANLookupTests(TestCase):
+
+    def setUp(self):
+        ean_lookup.clear()
+        self.user = User.objects.create_user(username='scanner', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.item = InventoryItem.objects.create(
+            name='Sola Ice Tea 0.33L', price=Decimal('1.00'), owner=self.user,
+            ean_unit='7612345678901', ean_pack='7612345678918', stueck_pro_verpackung=24,
+            verpackungen_pro_palette=60,
+        )
+        InventoryItem.objects.create(name='Fremd', price=Decimal('1.00'), owner=self.other, ean_unit='7600000000001')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_unit_and_pack_codes(self):
+        unit = self.client.get('/api/inventory/items/by-ean/7612345678901/')
+        pack = self.client.get('/api/inventory/items/by-ean/7612345678918/')
+
+        self.assertEqual(unit.status_code, 200)
+        self.assertEqual((unit.data['match'], unit.data['stueck_per_scan']), ('unit', 1))
+        self.assertEqual((pack.data['match'], pack.data['stueck_per_scan']), ('pack', 24))
+        self.assertEqual(pack.data['item']['id'], self.item.pk)
+        self.assertEqual(pack.data['item']['verpackungen_pro_palette'], 60)
+
+    def test_unknown_and_foreign_codes_are_not_found(self):
+        response = self.client.get('/api/inventory/items/by-ean/7600000000001/')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data['error']['code'], 'EAN_NOT_FOUND')
+
+    def test_batch_resolves_in_scan_order(self):
+        with CaptureQueriesContext(connection) as ctx:
+            result = ean_lookup.resolve_batch(
+                self.user, ['7612345678918', ' 7612345678901', '999', '7612345678918']
+            )
+
+        self.assertEqual([(r['code'], r['match']) for r in result['results']],
+                         [('7612345678918', 'pack'), ('7612345678901', 'unit')])
+        self.assertEqual(result['not_found'], ['999'])
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_batch_endpoint_validates_codes(self):
+        response = self.client.post('/api/inventory/items/by-ean/', {'codes': '7612345678901'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/inventory/items/by-ean/', {'codes': ['7612345678901']}, format='json')
+        self.assertEqual(response.data['results'][0]['item']['id'], self.item.pk)
+
+    def test_repeated_scans_hit_the_cache_until_the_item_changes(self):
+        ean_lookup.lookup(self.user, '7612345678901')
+        with CaptureQueriesContext(connection) as ctx:
+            ean_lookup.lookup(self.user, '7612345678901')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        # Stock bookings keep the cached master data
+        self.item.verpackung_quantity = 5
+        self.item.save(update_fields=['verpackung_quantity'])
+        with CaptureQueriesContext(connection) as ctx:
+            ean_lookup.lookup(self.user, '7612345678901')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        self.item.ean_unit = '7612345678925'
+        self.item.save()
+        self.assertIsNone(ean_lookup.lookup(self.user, '7612345678901'))
+        self.assertEqual(ean_lookup.lookup(self.user, '7612345678925')['item']['id'], self.item.pk)
+
+    @override_settings(EAN_LOOKUP_CACHE_ALIAS='default', EAN_LOOKUP_CACHE_TTL=None)
+    def test_item_change_in_another_worker_drops_cached_codes(self):
+        self.addCleanup(cache.clear)
+        ean_lookup.lookup(self.user, '7612345678901')
+
+        # Another worker saved an item: only the shared generation changed, not this process's state
+        cache.set(ean_lookup._generation_key(self.user.pk), 1, timeout=None)
+        InventoryItem.objects.filter(pk=self.item.pk).update(ean_unit='7612345678925')
+
+        self.assertIsNone(ean_lookup.lookup(self.user, '7612345678901'))
+        self.assertEqual(ean_lookup.lookup(self.user, '7612345678925')['item']['id'], self.item.pk)
+
+        # Saves in this worker bump the shared generation
+        self.item.save()
+        self.assertEqual(ean_lookup.generation(self.user.pk), 2)
+
+    @override_settings(EAN_LOOKUP_CACHE_ALIAS=None, EAN_LOOKUP_CACHE_TTL=None)
+    def test_short_ttl_without_shared_cache(self):
+        self.assertEqual(ean_lookup.cache.ttl, DEFAULT_LOCAL_CACHE_TTL)
@@ -0,0 +1,72 @@
+"""
+Tests for the streamed CSV / JSON Lines exports
+"""
+import csv
+import gzip
+import io
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from inventory.models import Expense, InventoryItem, StockMovement
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='exporter', password='pass12345')
+        other = User.objects.create_user(username='other', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        for day, amount, category in [(2, '40.00', 'OTHER'), (15, '12.50', 'PURCHASE'), (28, '7.00', 'PURCHASE')]:
+            Expense.objects.create(date=date(2025, 3, day), description=f'Beleg {day}', amount=Decimal(amount),
+                                   category=category, owner=self.user)
+        Expense.objects.create(date=date(2025, 3, 5), description='Fremd', amount=Decimal('1.00'),
+                               category='OTHER', owner=other)
+
+    def download(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_expense_csv_uses_filters(self):
+        response, body = self.download('/api/inventory/expenses/export/', {
+            'category': 'PURCHASE', 'date_after': '2025-03-10', 'ordering': 'date',
+        })
+
+        rows = list(csv.reader(io.StringIO(body.decode('utf-8-sig'))))
+        self.assertEqual(rows[0][:4], ['id', 'date', 'description', 'amount'])
+        self.assertEqual([row[1:4] for row in rows[1:]],
+                         [['2025-03-15', 'Beleg 15', '12.50'], ['2025-03-28', 'Beleg 28', '7.00']])
+        self.assertIn('expenses-', response['Content-Disposition'])
+
+    def test_jsonl_with_gzip(self):
+        response, body = self.download('/api/inventory/expenses/export/', {
+            'file_format': 'jsonl', 'compress': 'gzip', 'ordering': 'date',
+        })
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(body).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['amount'] for line in lines], ['40.00', '12.50', '7.00'])
+
+    def test_stock_movement_ledger(self):
+        item = InventoryItem.objects.create(name='Lager', price=Decimal('2.00'), owner=self.user)
+        StockMovement.objects.create(item=item, type='IN', unit='verpackung', quantity=4,
+                                     note='Lieferung', created_by=self.user)
+
+        _, body = self.download('/api/inventory/stock-movements/export/', {'file_format': 'jsonl', 'type': 'IN'})
+
+        row = json.loads(body)
+        self.assertEqual((row['item_name'], row['type'], row['quantity'], row['created_by']),
+                         ('Lager', 'IN', 4, 'exporter'))
+
+    def test_invalid_options(self):
+        response = self.client.get('/api/inventory/invoices/export/', {'file_format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error']['code'], 'INVALID_EXPORT')
@@ -0,0 +1,57 @@
+"""
+Tests for the compiled invoice template cache
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from inventory.invoice_templates import invoice_templates
+from inventory.models import Customer, Invoice, InvoiceTemplate, SalesOrder
+from inventory.utils.pdf import render_invoice_html
+
+
+class CompiledInvoiceTemplateTests(TestCase):
+
+    def setUp(self):
+        invoice_templates.clear()
+        self.user = User.objects.create_user(username='designer', password='pass12345')
+        customer = Customer.objects.create(name='Kunde', owner=self.user)
+        order = SalesOrder.objects.create(customer=customer, created_by=self.user, total_gross=Decimal('10.00'))
+        self.invoice = Invoice.objects.select_related('order__customer').get(pk=Invoice.objects.create(order=order).pk)
+
+    def render(self):
+        html_string, _ = render_invoice_html({'invoice': self.invoice})
+        return html_string
+
+    def test_css_is_inlined_at_save(self):
+        template = InvoiceTemplate.objects.create(
+            user=self.user, css_content='h1 { color: red; }',
+            html_content='<html><head><style>{% include "pdf/_styles.css" %}</style></head></html>',
+        )
+        self.assertEqual(template.compiled_html, '<html><head><style>h1 { color: red; }</style></head></html>')
+
+        template.html_content = '<html><head></head><body>{{ invoice.invoice_number }}</body></html>'
+        template.save(update_fields=['html_content'])
+        template.refresh_from_db()
+        self.assertIn('<style>h1 { color: red; }</style></head>', template.compiled_html)
+
+    def test_render_uses_the_compiled_template(self):
+        InvoiceTemplate.objects.create(user=self.user, css_content='', html_content='<p>{{ invoice.invoice_number }}</p>')
+        self.assertEqual(self.render(), f'<p>{self.invoice.invoice_number}</p>')
+
+        # Version lookup only: no template text loaded, nothing compiled
+        with self.assertNumQueries(1):
+            self.assertEqual(self.render(), f'<p>{self.invoice.invoice_number}</p>')
+
+    def test_saved_template_is_picked_up(self):
+        template = InvoiceTemplate.objects.create(user=self.user, css_content='', html_content='<p>alt</p>')
+        self.render()
+
+        template.html_content = '<p>neu</p>'
+        template.save()
+        self.assertEqual(self.render(), '<p>neu</p>')
+
+        template.is_active = False
+        template.save()
+        self.assertIn('<!DOCTYPE html>', self.render())
@@ -0,0 +1,46 @@
+"""
+Tests for document numbering via DocumentSequence.
+"""
+
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from inventory.models import Customer, SalesOrder, Invoice, DocumentSequence
+
+
+class DocumentSequenceTests(TestCase):
+    """Test LS-YYYY-#### and RE###### allocation"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.customer = Customer.objects.create(name='Kunde', owner=self.user)
+        self.year = timezone.now().year
+
+    def test_orders_and_invoices_are_numbered_sequentially(self):
+        """Test that consecutive documents get consecutive numbers"""
+        first = SalesOrder.objects.create(customer=self.customer, created_by=self.user)
+        second = SalesOrder.objects.create(customer=self.customer, created_by=self.user)
+        self.assertEqual(first.order_number, f'LS-{self.year}-0001')
+        self.assertEqual(second.order_number, f'LS-{self.year}-0002')
+
+        invoice = Invoice.objects.create(order=first)
+        self.assertEqual(invoice.invoice_number, 'RE000001')
+
+    def test_sequence_continues_after_existing_numbers(self):
+        """Test that a new sequence row starts after numbers issued before it existed"""
+        SalesOrder.objects.create(
+            customer=self.customer, created_by=self.user, order_number=f'LS-{self.year}-0041'
+        )
+        order = SalesOrder.objects.create(customer=self.customer, created_by=self.user)
+        self.assertEqual(order.order_number, f'LS-{self.year}-0042')
+
+    def test_block_allocation(self):
+        """Test that a block of numbers is reserved with one allocation"""
+        numbers = DocumentSequence.next_numbers(DocumentSequence.SALES_ORDER, count=3)
+        self.assertEqual(numbers, [f'LS-{self.year}-{n:04d}' for n in (1, 2, 3)])
+
+        order = SalesOrder.objects.create(customer=self.customer, created_by=self.user)
+        self.assertEqual(order.order_number, f'LS-{self.year}-0004')
+        self.assertEqual(
+            DocumentSequence.objects.get(document_type='LS', year=self.year).last_number, 4
+        )
@@ -0,0 +1,80 @@
+"""
+Tests for the content-hash OCR result cache
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from inventory.models import OCRResultCacheEntry
+from inventory.ocr_cache import OCRResultCache, content_hash
+from inventory.ocr_service import ReceiptOCRService
+
+OCR_RESULT = {
+    'supplier': 'Birra Peja',
+    'unit_price': Decimal('7.92'),
+    'confidence': 0.5,
+    'file_type': 'image',
+    'processing_success': True,
+}
+
+
+class OCRResultCacheTests(TestCase):
+
+    def setUp(self):
+        self.cache = OCRResultCache()
+        self.service = ReceiptOCRService(result_cache=self.cache)
+
+    def test_second_upload_is_served_from_cache(self):
+        with patch.object(self.service, '_process_receipt', return_value=dict(OCR_RESULT)) as mock_process:
+            first = self.service.process_receipt(b'receipt', 'image')
+            second = self.service.process_receipt(b'receipt', 'image')
+
+        mock_process.assert_called_once()
+        self.assertNotIn('cached', first)
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['supplier'], 'Birra Peja')
+        self.assertEqual(Decimal(second['unit_price']), Decimal('7.92'))
+        self.assertEqual(self.cache.counters['hits'], 1)
+        self.assertEqual(self.cache.counters['misses'], 1)
+        self.assertEqual(OCRResultCacheEntry.objects.get().hits, 1)
+
+    def test_failed_results_are_not_cached(self):
+        failed = {'processing_success': False, 'confidence': 0.0}
+        with patch.object(self.service, '_process_receipt', return_value=failed) as mock_process:
+            self.service.process_receipt(b'blurry', 'image')
+            self.service.process_receipt(b'blurry', 'image')
+
+        self.assertEqual(mock_process.call_count, 2)
+        self.assertFalse(OCRResultCacheEntry.objects.exists())
+
+    def test_pipeline_version_is_part_of_the_key(self):
+        with patch.object(self.service, '_process_receipt', return_value=dict(OCR_RESULT)) as mock_process:
+            self.service.process_receipt(b'receipt', 'image')
+            with patch('inventory.ocr_service.PIPELINE_VERSION', 'next'):
+                self.service.process_receipt(b'receipt', 'image')
+
+        self.assertEqual(mock_process.call_count, 2)
+        self.assertEqual(OCRResultCacheEntry.objects.count(), 2)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        for name in ('old', 'used', 'new'):
+            self.cache.set(content_hash(name.encode()), 'image', 'tesseract', '1', OCR_RESULT)
+        size = OCRResultCacheEntry.objects.first().size
+        OCRResultCacheEntry.objects.filter(content_hash=content_hash(b'old')).update(
+            last_used_at=timezone.now() - timedelta(days=2)
+        )
+        OCRResultCacheEntry.objects.filter(content_hash=content_hash(b'used')).update(
+            last_used_at=timezone.now() - timedelta(days=3)
+        )
+        self.cache.get(content_hash(b'used'), 'image', 'tesseract', '1')
+
+        self.cache.max_bytes = size * 2
+        with patch('inventory.ocr_cache.EVICT_TO', 1.0):
+            self.cache.evict()
+
+        remaining = set(OCRResultCacheEntry.objects.values_list('content_hash', flat=True))
+        self.assertEqual(remaining, {content_hash(b'used'), content_hash(b'new')})
+        self.assertEqual(self.cache.counters['evictions'], 1)
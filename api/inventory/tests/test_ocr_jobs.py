@@ -0,0 +1,311 @@
+"""
+Tests for the asynchronous OCR job queue
+"""
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from inventory.models import InventoryItem, OCRBatch, OCRJob, Supplier
+from inventory.ocr_jobs import claim_next_job, enqueue_ocr_batch, enqueue_ocr_job, process_next_job, MAX_ATTEMPTS
+
+OCR_RESULT = {
+    'supplier': 'Birra Peja',
+    'unit_price': Decimal('7.92'),
+    'confidence': 0.5,
+    'processing_success': True,
+}
+
+
+class OCRJobTestCase(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        # Keep uploads out of MEDIA_ROOT
+        self.storage_patch = patch.object(
+            OCRJob._meta.get_field('file'), 'storage', FileSystemStorage(location=self.media_root)
+        )
+        self.storage_patch.start()
+        self.user = User.objects.create_user(username='ocruser', password='pass12345')
+
+    def tearDown(self):
+        self.storage_patch.stop()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, name='receipt.png'):
+        return SimpleUploadedFile(name, b'image bytes', content_type='image/png')
+
+
+class OCRJobAPITests(OCRJobTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_returns_pending_job(self):
+        response = self.client.post('/api/inventory/ocr/jobs/', {'file': self.upload()}, format='multipart')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], OCRJob.STATUS_PENDING)
+        self.assertEqual(response.data['file_type'], 'image')
+        self.assertTrue(OCRJob.objects.filter(pk=response.data['id'], owner=self.user).exists())
+
+    def test_create_rejects_unsupported_file(self):
+        response = self.client.post(
+            '/api/inventory/ocr/jobs/', {'file': self.upload('notes.txt')}, format='multipart'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OCRJob.objects.exists())
+
+    @patch('inventory.ocr_service.ocr_service.process_receipt', return_value=OCR_RESULT)
+    def test_poll_returns_result(self, mock_process):
+        job_id = self.client.post(
+            '/api/inventory/ocr/jobs/', {'file': self.upload()}, format='multipart'
+        ).data['id']
+
+        process_next_job()
+
+        response = self.client.get(f'/api/inventory/ocr/jobs/{job_id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], OCRJob.STATUS_DONE)
+        self.assertEqual(response.data['result']['supplier'], 'Birra Peja')
+        mock_process.assert_called_once_with(b'image bytes', 'image')
+
+    def test_cached_file_is_done_immediately(self):
+        from inventory.ocr_cache import content_hash
+        from inventory.ocr_service import ocr_service
+
+        ocr_service.result_cache.set(
+            content_hash(b'image bytes'), 'image', ocr_service.engine_id, ocr_service.pipeline_version, OCR_RESULT
+        )
+
+        response = self.client.post('/api/inventory/ocr/jobs/', {'file': self.upload()}, format='multipart')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], OCRJob.STATUS_DONE)
+        self.assertTrue(response.data['result']['cached'])
+
+    @patch('inventory.ocr_service.ocr_service.process_receipt', return_value=OCR_RESULT)
+    def test_process_receipt_waits_for_a_worker(self, mock_process):
+        # The "worker" finishes the job while the request waits
+        with patch('inventory.ocr_jobs.time.sleep', side_effect=lambda seconds: process_next_job()):
+            response = self.client.post(
+                '/api/inventory/ocr/process-receipt/', {'file': self.upload()}, format='multipart'
+            )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['supplier'], 'Birra Peja')
+        self.assertEqual(OCRJob.objects.get().status, OCRJob.STATUS_DONE)
+        mock_process.assert_called_once_with(b'image bytes', 'image')
+
+    @patch('inventory.ocr_service.ocr_service.process_receipt')
+    def test_process_receipt_answers_job_after_timeout(self, mock_process):
+        with self.settings(OCR_SYNC_TIMEOUT=0):
+            response = self.client.post(
+                '/api/inventory/ocr/process-receipt/', {'file': self.upload()}, format='multipart'
+            )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], OCRJob.STATUS_PENDING)
+        self.assertTrue(OCRJob.objects.filter(pk=response.data['job_id'], owner=self.user).exists())
+        mock_process.assert_not_called()
+
+    def test_jobs_of_other_users_are_hidden(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        job = enqueue_ocr_job(other, self.upload(), 'image')
+
+        response = self.client.get(f'/api/inventory/ocr/jobs/{job.pk}/')
+        self.assertEqual(response.status_code, 404)
+
+
+class OCRJobWorkerTests(OCRJobTestCase):
+
+    def test_claims_oldest_pending_job(self):
+        first = enqueue_ocr_job(self.user, self.upload(), 'image')
+        enqueue_ocr_job(self.user, self.upload(), 'image')
+
+        job = claim_next_job()
+
+        self.assertEqual(job.pk, first.pk)
+        self.assertEqual(job.status, OCRJob.STATUS_RUNNING)
+        self.assertEqual(job.attempts, 1)
+
+    def test_stale_running_job_is_reclaimed(self):
+        job = enqueue_ocr_job(self.user, self.upload(), 'image')
+        OCRJob.objects.filter(pk=job.pk).update(
+            status=OCRJob.STATUS_RUNNING, attempts=1, started_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(claim_next_job().pk, job.pk)
+
+        OCRJob.objects.filter(pk=job.pk).update(
+            attempts=MAX_ATTEMPTS, started_at=timezone.now() - timedelta(hours=1)
+        )
+        self.assertIsNone(claim_next_job())
+
+    @patch('inventory.ocr_service.ocr_service.process_receipt', side_effect=RuntimeError('engine crashed'))
+    def test_failed_ocr_marks_job_failed(self, mock_process):
+        job = enqueue_ocr_job(self.user, self.upload(), 'image')
+
+        process_next_job()
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, OCRJob.STATUS_FAILED)
+        self.assertEqual(job.error, 'engine crashed')
+        self.assertIsNotNone(job.finished_at)
+
+    @patch('inventory.ocr_service.ocr_service.warm_up', return_value=False)
+    @patch('inventory.ocr_service.ocr_service.process_receipt', return_value=OCR_RESULT)
+    def test_worker_command_processes_queue(self, mock_process, mock_warm_up):
+        enqueue_ocr_job(self.user, self.upload(), 'image')
+        enqueue_ocr_job(self.user, self.upload('scan.pdf'), 'pdf')
+
+        out = StringIO()
+        call_command('ocr_worker', '--once', stdout=out)
+
+        self.assertEqual(OCRJob.objects.filter(status=OCRJob.STATUS_DONE).count(), 2)
+        self.assertIn('Processed 2 job(s)', out.getvalue())
+
+
+class OCRBatchAPITests(OCRJobTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def zip_upload(self, members):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for name, data in members.items():
+                archive.writestr(name, data)
+        return SimpleUploadedFile('receipts.zip', buffer.getvalue(), content_type='application/zip')
+
+    def test_files_and_zip_become_one_batch(self):
+        archive = self.zip_upload({
+            'march/receipt-1.jpg': b'first',
+            'march/receipt-2.pdf': b'second',
+            'march/readme.txt': b'notes',
+            '__MACOSX/march/._receipt-1.jpg': b'',
+        })
+
+        response = self.client.post(
+            '/api/inventory/ocr/batches/', {'files': [self.upload(), archive]}, format='multipart'
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], OCRJob.STATUS_PENDING)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(
+            [job['file_name'] for job in response.data['jobs']], ['receipt.png', 'receipt-1.jpg', 'receipt-2.pdf']
+        )
+        self.assertEqual(response.data['skipped'], [{'file_name': 'readme.txt', 'reason': 'Unsupported file type'}])
+        job = OCRJob.objects.get(file_name='receipt-2.pdf')
+        self.assertEqual(job.file_type, 'pdf')
+        with job.file.open('rb') as f:
+            self.assertEqual(f.read(), b'second')
+
+    @patch('inventory.ocr_service.ocr_service.process_receipt')
+    def test_batch_reports_per_file_status_and_expense_draft(self, mock_process):
+        supplier = Supplier.objects.create(name='Birra Peja GmbH', owner=self.user)
+        other = User.objects.create_user(username='other', password='pass12345')
+        Supplier.objects.create(name='Birra Peja AG', owner=other)
+        item = InventoryItem.objects.create(name='Sola Ice Tea 0.33L', price=Decimal('1.00'), owner=self.user)
+        mock_process.side_effect = [
+            {**OCR_RESULT, 'supplier': 'Birra Peja', 'article_name': 'Sola Ice Tea', 'quantity': 10},
+            RuntimeError('engine crashed'),
+            OCR_RESULT,
+        ]
+        batch_id = self.client.post(
+            '/api/inventory/ocr/batches/',
+            {'files': [self.upload('a.png'), self.upload('b.png'), self.upload('c.png')]},
+            format='multipart'
+        ).data['id']
+
+        process_next_job()
+        running = self.client.get(f'/api/inventory/ocr/batches/{batch_id}/').data
+        self.assertEqual(running['status'], OCRJob.STATUS_RUNNING)
+        self.assertEqual(running['counts'][OCRJob.STATUS_DONE], 1)
+
+        process_next_job()
+        process_next_job()
+        response = self.client.get(f'/api/inventory/ocr/batches/{batch_id}/')
+
+        self.assertEqual(response.data['status'], OCRJob.STATUS_DONE)
+        self.assertEqual(response.data['counts'][OCRJob.STATUS_FAILED], 1)
+        first, failed, _ = response.data['jobs']
+        self.assertEqual(first['suggestions']['suppliers'], [{'id': supplier.pk, 'name': supplier.name}])
+        self.assertEqual(first['suggestions']['items'][0]['id'], item.pk)
+        draft = first['expense_draft']
+        self.assertEqual(draft['supplier'], supplier.pk)
+        self.assertEqual(Decimal(draft['amount']), Decimal('79.20'))
+        self.assertEqual(draft['description'], 'Sola Ice Tea')
+        self.assertEqual(failed['status'], OCRJob.STATUS_FAILED)
+        self.assertIsNone(failed['expense_draft'])
+
+    def test_too_many_files_are_rejected(self):
+        with self.settings(OCR_BATCH_MAX_FILES=1):
+            response = self.client.post(
+                '/api/inventory/ocr/batches/', {'files': [self.upload('a.png'), self.upload('b.png')]},
+                format='multipart'
+            )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OCRBatch.objects.exists())
+        self.assertFalse(OCRJob.objects.exists())
+
+    def test_entries_are_capped_including_unsupported_files(self):
+        archive = self.zip_upload({f'notes-{i}.txt': b'x' for i in range(5)} | {'receipt.png': b'image'})
+        with self.settings(OCR_BATCH_MAX_ENTRIES=3):
+            response = self.client.post('/api/inventory/ocr/batches/', {'files': [archive]}, format='multipart')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(OCRBatch.objects.exists())
+
+    def test_skipped_list_is_truncated(self):
+        archive = self.zip_upload({f'notes-{i}.txt': b'x' for i in range(5)} | {'receipt.png': b'image'})
+        with patch('inventory.ocr_jobs.MAX_SKIPPED_LISTED', 2):
+            response = self.client.post('/api/inventory/ocr/batches/', {'files': [archive]}, format='multipart')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(
+            [entry['file_name'] for entry in response.data['skipped']], ['notes-0.txt', 'notes-1.txt', '']
+        )
+        self.assertEqual(response.data['skipped'][-1]['reason'], '3 more unsupported files')
+
+    def test_failed_batch_leaves_no_stored_files(self):
+        save = OCRJob.save
+
+        def save_fails_on_third_job(job, *args, **kwargs):
+            if OCRJob.objects.count() == 2:
+                raise DatabaseError('disk full')
+            return save(job, *args, **kwargs)
+
+        with patch.object(OCRJob, 'save', save_fails_on_third_job):
+            with self.assertRaises(DatabaseError):
+                enqueue_ocr_batch(self.user, [self.upload('a.png'), self.upload('b.png'), self.upload('c.png')])
+
+        self.assertFalse(OCRJob.objects.exists())
+        stored = [name for _, _, names in os.walk(self.media_root) for name in names]
+        self.assertEqual(stored, [])
+
+    def test_batches_of_other_users_are_hidden(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        batch = OCRBatch.objects.create(owner=other)
+
+        response = self.client.get(f'/api/inventory/ocr/batches/{batch.pk}/')
+        self.assertEqual(response.status_code, 404)
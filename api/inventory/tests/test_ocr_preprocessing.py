@@ -0,0 +1,115 @@
+"""
+Tests for the OCR image preprocessing pipeline
+"""
+import io
+import unittest
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from inventory.ocr_preprocessing import PreprocessingPipeline, estimate_noise
+from inventory.ocr_service import ReceiptOCRService
+
+
+def text_page(width=600, height=800):
+    """White page with dark text-like lines"""
+    page = Image.new('L', (width, height), 245)
+    draw = ImageDraw.Draw(page)
+    for row in range(12):
+        draw.rectangle((60, 60 + row * 55, width - 60, 80 + row * 55), fill=20)
+    return page
+
+
+def bordered_table_page(width=1240, height=1754):
+    """Delivery note page (A4 at 150 DPI): header, a table with a frame, footer"""
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    for row in range(4):
+        draw.rectangle((100, 80 + row * 40, 700, 95 + row * 40), fill=20)
+    draw.rectangle((80, 400, width - 80, 1300), outline=0, width=4)
+    for row in range(8):
+        draw.rectangle((120, 440 + row * 100, width - 120, 460 + row * 100), fill=20)
+    draw.rectangle((100, 1500, 900, 1515), fill=20)
+    return page
+
+
+class TestPreprocessingPipeline(unittest.TestCase):
+
+    def test_downscale_limits_long_side(self):
+        pipeline = PreprocessingPipeline(stages=['downscale'], max_side=500)
+        result = pipeline.run(np.zeros((3000, 4000), dtype=np.uint8))
+        self.assertEqual(result.shape, (375, 500))
+
+    def test_crop_to_document_contour(self):
+        photo = Image.new('L', (2000, 1500), 60)
+        photo.paste(text_page(), (700, 300))
+        pipeline = PreprocessingPipeline(stages=['crop'])
+
+        result = pipeline.run(np.asarray(photo))
+
+        height, width = result.shape
+        self.assertAlmostEqual(width, 600, delta=15)
+        self.assertAlmostEqual(height, 800, delta=15)
+
+    def test_skew_angle_is_detected(self):
+        pipeline = PreprocessingPipeline()
+        for angle in (4, -3):
+            rotated = np.asarray(text_page().rotate(angle, fillcolor=245))
+            # Correction is the opposite rotation
+            self.assertAlmostEqual(pipeline.skew_angle(rotated), -angle, delta=0.6)
+            self.assertAlmostEqual(pipeline.skew_angle(pipeline.stage_deskew(rotated)), 0, delta=0.6)
+
+    def test_denoiser_depends_on_noise(self):
+        pipeline = PreprocessingPipeline(stages=['denoise'])
+        clean = np.asarray(text_page())
+        noisy = np.clip(
+            clean + np.random.default_rng(0).normal(0, 20, clean.shape), 0, 255
+        ).astype(np.uint8)
+
+        self.assertLess(estimate_noise(clean), 2.0)
+        self.assertIs(pipeline.run(clean), clean)
+        self.assertLess(estimate_noise(pipeline.run(noisy)), estimate_noise(noisy))
+
+    def test_timings_per_stage(self):
+        timings = {}
+        PreprocessingPipeline().run(np.asarray(text_page().convert('RGB')), timings=timings)
+        self.assertEqual(
+            set(timings), {'grayscale', 'crop', 'downscale', 'deskew', 'denoise', 'threshold'}
+        )
+
+    def test_unknown_stage_is_rejected(self):
+        with self.assertRaises(ValueError):
+            PreprocessingPipeline(stages=['sharpen'])
+
+    def test_receipt_image_is_passed_as_array(self):
+        buffer = io.BytesIO()
+        text_page().convert('RGB').save(buffer, format='PNG')
+        service = ReceiptOCRService()
+
+        with patch.object(service, 'extract_text_from_array', return_value='Menge: 5') as mock_extract:
+            result = service.process_receipt(buffer.getvalue(), 'image')
+
+        processed = mock_extract.call_args.args[0]
+        self.assertEqual(processed.ndim, 2)
+        self.assertEqual(set(np.unique(processed)) - {0, 255}, set())
+        self.assertEqual(result['quantity'], 5)
+
+    def test_pdf_page_with_bordered_table_is_not_cropped(self):
+        page = bordered_table_page()
+        # The photo pipeline takes the table frame for the document contour
+        cropped = PreprocessingPipeline(stages=['crop']).run(np.asarray(page))
+        self.assertLess(cropped.shape[0], page.height * 0.6)
+
+        pdf2image = MagicMock()
+        pdf2image.convert_from_path.return_value = [page.convert('RGB')]
+        service = ReceiptOCRService()
+        with patch('inventory.ocr_service.optional_import', return_value=pdf2image), \
+                patch.object(service, 'extract_text_from_array', return_value='Lieferschein') as mock_extract:
+            text = service.ocr_pdf_pages('note.pdf', 1, 1, 150)
+
+        self.assertEqual(text, 'Lieferschein')
+        processed = mock_extract.call_args.args[0]
+        # Header and footer are kept: the whole page reaches the OCR engine
+        self.assertEqual(processed.shape, (page.height, page.width))
+        self.assertEqual(service.pdf_pipeline.stages, ['downscale', 'denoise', 'threshold'])
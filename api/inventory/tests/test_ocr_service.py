@@ -1,7 +1,9 @@
 import unittest
 from unittest.mock import patch, MagicMock
 from decimal import Decimal
-from .ocr_service import ReceiptOCRService
+from django.test import override_settings
+from PIL import Image
+from inventory.ocr_service import ReceiptOCRService, pdf_dpi
 
 
 class TestReceiptOCRService(unittest.TestCase):
@@ -102,8 +104,24 @@ class TestReceiptOCRService(unittest.TestCase):
         self.assertEqual(result['currency'], 'EUR')
         self.assertGreater(result['confidence'], 0.3)
     
-    @patch('inventory.ocr_service.PaddleOCR')
-    def test_extract_text_from_image_paddle_success(self, mock_paddle):
+    def test_engine_not_loaded_on_init(self):
+        """Creating the service must not load any OCR engine"""
+        with patch('inventory.ocr_service.optional_import') as mock_import:
+            service = ReceiptOCRService()
+        mock_import.assert_not_called()
+        self.assertFalse(service._paddle_loaded)
+
+    def test_engine_loaded_once_on_first_use(self):
+        """PaddleOCR is created on first access and reused afterwards"""
+        mock_paddle = MagicMock()
+        with patch('inventory.ocr_service.optional_import', return_value=mock_paddle):
+            service = ReceiptOCRService()
+            first = service.paddle_ocr
+            second = service.paddle_ocr
+        self.assertIs(first, second)
+        mock_paddle.assert_called_once_with(use_angle_cls=True, lang='de')
+
+    def test_extract_text_from_image_paddle_success(self):
         """Test text extraction with PaddleOCR success"""
         # Mock PaddleOCR
         mock_ocr_instance = MagicMock()
@@ -111,31 +129,39 @@ class TestReceiptOCRService(unittest.TestCase):
             [None, ('Test text', 0.9)],
             [None, ('More text', 0.8)]
         ]]
-        mock_paddle.return_value = mock_ocr_instance
+        self.ocr_service.paddle_ocr = mock_ocr_instance
         
         # Create test image data
-        image_data = b'fake_image_data'
+        image_data = self._png_bytes()
         
         result = self.ocr_service.extract_text_from_image(image_data)
         
         self.assertEqual(result, 'Test text\nMore text')
         mock_ocr_instance.ocr.assert_called_once()
     
-    @patch('inventory.ocr_service.pytesseract')
-    def test_extract_text_from_image_tesseract_fallback(self, mock_tesseract):
+    def test_extract_text_from_image_tesseract_fallback(self):
         """Test text extraction with Tesseract fallback"""
-        # Mock PaddleOCR to fail
-        with patch('inventory.ocr_service.PADDLE_AVAILABLE', False):
+        # PaddleOCR not available
+        self.ocr_service.paddle_ocr = None
+        mock_tesseract = MagicMock()
+        with patch('inventory.ocr_service.optional_import', return_value=mock_tesseract):
             # Mock Tesseract
             mock_tesseract.image_to_string.return_value = 'Tesseract text'
             
             # Create test image data
-            image_data = b'fake_image_data'
+            image_data = self._png_bytes()
             
             result = self.ocr_service.extract_text_from_image(image_data)
             
             self.assertEqual(result, 'Tesseract text')
             mock_tesseract.image_to_string.assert_called_once()
+
+    def _png_bytes(self):
+        import io
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (20, 10), 'white').save(buffer, format='PNG')
+        return buffer.getvalue()
     
     def test_preprocess_image(self):
         """Test image preprocessing"""
@@ -199,5 +225,63 @@ class TestReceiptOCRService(unittest.TestCase):
             self.assertEqual(result['confidence'], 0.0)
 
 
+class TestPDFExtraction(unittest.TestCase):
+    def setUp(self):
+        self.ocr_service = ReceiptOCRService()
+        self.pdf2image = MagicMock()
+        self.pdf2image.pdfinfo_from_path.return_value = {'Pages': 5, 'Page size': '595 x 842 pts (A4)'}
+        self.pdf2image.convert_from_path.side_effect = lambda path, dpi, first_page, last_page: [
+            Image.new('RGB', (40, 20), 'white') for _ in range(first_page, last_page + 1)
+        ]
+        import_patch = patch('inventory.ocr_service.optional_import', return_value=self.pdf2image)
+        import_patch.start()
+        self.addCleanup(import_patch.stop)
+
+    def page_ranges(self):
+        return [
+            (call.kwargs['first_page'], call.kwargs['last_page'])
+            for call in self.pdf2image.convert_from_path.call_args_list
+        ]
+
+    def test_pages_are_rasterized_in_chunks(self):
+        """Pages are converted chunk by chunk and passed to the engine as arrays"""
+        with patch.object(self.ocr_service, 'extract_text_from_array', return_value='page text') as mock_extract:
+            with override_settings(OCR_PDF_CHUNK_PAGES=2, OCR_PDF_WORKERS=1):
+                text = self.ocr_service.extract_text_from_pdf(b'%PDF')
+
+        self.assertEqual(self.page_ranges(), [(1, 2), (3, 4), (5, 5)])
+        self.assertEqual(mock_extract.call_count, 5)
+        # Preprocessed (thresholded grayscale) array, no PNG round-trip
+        self.assertEqual(mock_extract.call_args.args[0].ndim, 2)
+        self.assertEqual(text, '\n'.join(['page text'] * 5))
+
+    def test_page_count_is_capped(self):
+        """Only the first OCR_PDF_MAX_PAGES pages are processed"""
+        self.pdf2image.pdfinfo_from_path.return_value = {'Pages': 40, 'Page size': '595 x 842 pts'}
+        with patch.object(self.ocr_service, 'extract_text_from_array', return_value='x'):
+            with override_settings(OCR_PDF_MAX_PAGES=3, OCR_PDF_CHUNK_PAGES=2, OCR_PDF_WORKERS=1):
+                self.ocr_service.extract_text_from_pdf(b'%PDF')
+
+        self.assertEqual(self.page_ranges(), [(1, 2), (3, 3)])
+
+    def test_dpi_is_lowered_for_large_pages(self):
+        """The pixel cap lowers the DPI of large pages"""
+        with override_settings(OCR_PDF_DPI=300, OCR_PDF_MAX_PAGE_PIXELS=1_000_000):
+            self.assertEqual(pdf_dpi('595 x 842 pts (A4)'), 101)
+            self.assertEqual(pdf_dpi('100 x 100 pts'), 300)
+            self.assertEqual(pdf_dpi(''), 300)
+
+    def test_chunks_run_in_process_pool(self):
+        """With OCR_PDF_WORKERS > 1 the chunks are spread over a process pool"""
+        with patch.object(ReceiptOCRService, 'ocr_pdf_pages', side_effect=lambda path, first, last, dpi: f'{first}-{last}'):
+            with override_settings(OCR_PDF_CHUNK_PAGES=2, OCR_PDF_WORKERS=2):
+                text = self.ocr_service.extract_text_from_pdf(b'%PDF')
+                pool = self.ocr_service.pdf_pool()
+
+        self.assertIsNotNone(pool)
+        pool.shutdown()
+        self.assertEqual(text, '1-2\n3-4\n5-5')
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Tests for bulk sales-order creation and import.
+"""
+
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.test import APIClient
+from rest_framework import status
+from inventory.models import InventoryItem, Customer, SalesOrder, SalesOrderItem
+from decimal import Decimal
+
+
+class SalesOrderBulkCreateTests(TestCase):
+    """Test POST /orders/ and POST /orders/import/"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.customer = Customer.objects.create(name='Kunde', owner=self.user)
+        self.items = [
+            InventoryItem.objects.create(name=f'Test Bier {i}', price=Decimal('2.50'), owner=self.user)
+            for i in range(20)
+        ]
+
+    def test_create_order_computes_totals_once(self):
+        """Test that an order with many lines is created with a constant number of queries"""
+        payload = {
+            'customer': self.customer.id,
+            'items_data': [
+                {'item': item.id, 'qty_base': 2, 'unit_price': '10.00', 'tax_rate': '8.10'}
+                for item in self.items
+            ]
+        }
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/inventory/orders/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertLessEqual(len(queries), 20)
+
+        order = SalesOrder.objects.get(id=response.data['id'])
+        self.assertEqual(order.items.count(), 20)
+        self.assertEqual(order.total_net, Decimal('400.00'))
+        self.assertEqual(order.total_tax, Decimal('32.40'))
+        self.assertEqual(order.total_gross, Decimal('432.40'))
+
+    def test_import_json(self):
+        """Test that several orders are imported with consecutive numbers"""
+        payload = {
+            'orders': [
+                {'customer': self.customer.id, 'items': [{'item': self.items[0].id, 'qty_base': 1, 'unit_price': '5.00'}]},
+                {'customer': self.customer.id, 'status': 'CONFIRMED',
+                 'items': [{'item': self.items[1].id, 'qty_base': 3, 'unit_price': '2.00'}]},
+            ]
+        }
+        response = self.client.post('/api/inventory/orders/import/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['count'], 2)
+
+        numbers = [order['order_number'] for order in response.data['orders']]
+        self.assertEqual(int(numbers[1][-4:]), int(numbers[0][-4:]) + 1)
+        self.assertEqual(response.data['orders'][1]['status'], 'CONFIRMED')
+        self.assertEqual(response.data['orders'][1]['total_net'], '6.00')
+
+    def test_import_csv_groups_lines_by_order_ref(self):
+        """Test that CSV rows with the same order_ref become one order"""
+        content = (
+            'order_ref;customer;item;qty_base;unit_price;tax_rate\n'
+            f'A;{self.customer.id};{self.items[0].id};2;3.00;0\n'
+            f'A;{self.customer.id};{self.items[1].id};1;4.00;0\n'
+            f'B;{self.customer.id};{self.items[2].id};5;1.00;0\n'
+        )
+        upload = SimpleUploadedFile('orders.csv', content.encode('utf-8'), content_type='text/csv')
+        response = self.client.post('/api/inventory/orders/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(SalesOrderItem.objects.count(), 3)
+        self.assertEqual(response.data['orders'][0]['total_net'], '10.00')
+
+    def test_import_rejects_foreign_items(self):
+        """Test that items of other users cannot be imported"""
+        other = User.objects.create_user(username='other', password='testpass')
+        foreign_item = InventoryItem.objects.create(name='Fremd', price=Decimal('1.00'), owner=other)
+
+        payload = {
+            'orders': [
+                {'customer': self.customer.id, 'items': [{'item': foreign_item.id, 'qty_base': 1, 'unit_price': '1.00'}]},
+            ]
+        }
+        response = self.client.post('/api/inventory/orders/import/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(SalesOrder.objects.count(), 0)
@@ -0,0 +1,62 @@
+"""
+Tests for cursor (keyset) pagination with page-number fallback.
+"""
+
+import base64
+import json
+from django.test import TestCase
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from inventory.models import InventoryItem, StockMovement
+from decimal import Decimal
+
+
+class StockMovementCursorPaginationTests(TestCase):
+    """Test GET /stock-movements/?cursor="""
+
+    url = '/api/inventory/stock-movements/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        item = InventoryItem.objects.create(name='Test Bier', price=Decimal('1.00'), owner=self.user)
+        for _ in range(7):
+            StockMovement.objects.create(item=item, type='IN', unit='verpackung', quantity=1, created_by=self.user)
+
+    def test_cursor_pages_cover_all_rows_once(self):
+        """Test that following next links returns every movement exactly once, newest first"""
+        ids = []
+        url = f'{self.url}?cursor=&page_size=3'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+
+        expected = list(StockMovement.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_page_number_mode_still_available(self):
+        """Test that old clients keep the page-number format"""
+        response = self.client.get(f'{self.url}?page=2&page_size=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 7)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_estimated_count(self):
+        """Test that ?count=estimate adds a count to cursor pages"""
+        response = self.client.get(f'{self.url}?cursor=&count=estimate')
+        self.assertEqual(response.data['count'], 7)
+
+    def test_invalid_cursor(self):
+        """Test that a tampered cursor is rejected"""
+        response = self.client.get(f'{self.url}?cursor=abc')
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_invalid_values(self):
+        """Test that a well-formed cursor with values of the wrong type is rejected"""
+        cursor = base64.urlsafe_b64encode(json.dumps(['gestern', 'x']).encode()).decode()
+        response = self.client.get(f'{self.url}?cursor={cursor}')
+        self.assertEqual(response.status_code, 404)
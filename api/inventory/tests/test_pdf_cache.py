@@ -0,0 +1,105 @@
+"""
+Tests for the rendered invoice PDF cache
+"""
+import shutil
+import tempfile
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from inventory import pdf_cache
+from inventory.models import (
+    CompanyProfile, Customer, InventoryItem, Invoice, InvoiceTemplate, SalesOrder, SalesOrderItem
+)
+
+
+class InvoicePDFCacheTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, INVOICE_PDF_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='billing', password='pass12345')
+        self.profile = CompanyProfile.objects.create(
+            user=self.user, name='Depot AG', street='Bahnhofstrasse 1', postal_code='8001', city='Zürich',
+            email='info@depot.ch', phone='044 000 00 00', iban='CH9300762011623852957'
+        )
+        customer = Customer.objects.create(name='Kunde', address='Seestrasse 5\n8002 Zürich', owner=self.user)
+        self.item = InventoryItem.objects.create(name='Bier', price=Decimal('2.50'), owner=self.user)
+        self.order = order = SalesOrder.objects.create(customer=customer, created_by=self.user)
+        SalesOrderItem.objects.create(order=order, item=self.item, qty_base=4, unit_price=Decimal('2.50'),
+                                      tax_rate=Decimal('8.10'))
+        self.invoice = Invoice.objects.create(order=order)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        render = mock.patch('inventory.pdf_render.html_to_pdf', return_value=b'%PDF-1.7 test')
+        self.render = render.start()
+        self.addCleanup(render.stop)
+
+    def download(self, **headers):
+        return self.client.get(f'/api/inventory/invoices/{self.invoice.id}/pdf/', **headers)
+
+    def test_repeat_downloads_are_served_from_disk(self):
+        first = self.download()
+        second = self.download()
+
+        self.assertEqual(self.render.call_count, 1)
+        self.assertEqual(b''.join(second.streaming_content), b'%PDF-1.7 test')
+        self.assertEqual(first['ETag'], second['ETag'])
+        self.assertIn('RE', second['Content-Disposition'])
+        self.invoice.refresh_from_db()
+        self.assertTrue(self.invoice.pdf_file.startswith(f'invoice_pdfs/{self.user.id}/{self.invoice.invoice_number}-'))
+        self.assertTrue(pdf_cache.absolute_path(self.invoice.pdf_file).exists())
+
+    def test_etag_revalidation(self):
+        etag = self.download()['ETag']
+
+        response = self.download(HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.render.call_count, 1)
+
+    def test_profile_or_template_change_invalidates(self):
+        self.download()
+        self.invoice.refresh_from_db()
+        old_file = pdf_cache.absolute_path(self.invoice.pdf_file)
+
+        self.profile.street = 'Bahnhofstrasse 2'
+        self.profile.save()
+        self.assertFalse(old_file.exists())
+        self.download()
+        InvoiceTemplate.objects.create(user=self.user, html_content='<html></html>', css_content='')
+        self.download()
+
+        self.assertEqual(self.render.call_count, 3)
+
+    def test_key_ignores_stock_changes(self):
+        self.invoice = Invoice.objects.get(pk=self.invoice.pk)
+        key = pdf_cache.invoice_key(self.invoice, self.profile)
+
+        InventoryItem.objects.filter(pk=self.item.pk).update(verpackung_quantity=99)
+        self.invoice = Invoice.objects.get(pk=self.invoice.pk)
+        self.assertEqual(pdf_cache.invoice_key(self.invoice, self.profile), key)
+
+        self.invoice.due_date = date(2030, 1, 31)
+        self.invoice.save()
+        self.assertNotEqual(pdf_cache.invoice_key(self.invoice, self.profile), key)
+
+    def test_key_queries_do_not_grow_with_lines(self):
+        for index in range(3):
+            item = InventoryItem.objects.create(name=f'Wein {index}', price=Decimal('8.00'), owner=self.user)
+            SalesOrderItem.objects.create(order=self.order, item=item, qty_base=1, unit_price=Decimal('8.00'),
+                                          tax_rate=Decimal('8.10'))
+        invoice = Invoice.objects.get(pk=self.invoice.pk)
+
+        # Order, customer, template version, lines, items
+        with self.assertNumQueries(5):
+            pdf_cache.invoice_key(invoice, self.profile)
@@ -0,0 +1,146 @@
+"""
+Tests for the invoice PDF render pool (sync wait, async jobs)
+"""
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import Future
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from inventory import pdf_cache
+from inventory.models import CompanyProfile, Customer, InventoryItem, Invoice, SalesOrder, SalesOrderItem
+from inventory.pdf_render import MARKER_MAX_AGE, PDFRenderService, marker_path
+
+
+def slow_layout(html_string, stylesheets=None, font_config=None):
+    """Stand-in for WeasyPrint in the pool processes (forked with the patch)"""
+    time.sleep(0.3)
+    styles = b'preloaded' if stylesheets else b'inline'
+    return b'%PDF-1.7 ' + styles
+
+
+class PDFRenderPoolTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, INVOICE_PDF_WORKERS=1)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        for target, replacement in [
+            ('inventory.pdf_render.preload', mock.Mock(return_value={'stylesheet': 'default.css'})),
+            ('inventory.pdf_render.html_to_pdf', slow_layout),
+        ]:
+            patcher = mock.patch(target, replacement)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.renderer = PDFRenderService()
+        self.addCleanup(lambda: self.renderer._pool and self.renderer._pool.shutdown())
+        patcher = mock.patch('inventory.views.pdf_renderer', self.renderer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        user = User.objects.create_user(username='render', password='pass12345')
+        self.profile = CompanyProfile.objects.create(
+            user=user, name='Depot AG', street='Bahnhofstrasse 1', postal_code='8001', city='Zürich',
+            email='info@depot.ch', phone='044 000 00 00', iban='CH9300762011623852957'
+        )
+        customer = Customer.objects.create(name='Kunde', owner=user)
+        item = InventoryItem.objects.create(name='Bier', price=Decimal('2.50'), owner=user)
+        order = SalesOrder.objects.create(customer=customer, created_by=user)
+        SalesOrderItem.objects.create(order=order, item=item, qty_base=4, unit_price=Decimal('2.50'),
+                                      tax_rate=Decimal('8.10'))
+        self.invoice = Invoice.objects.create(order=order)
+        self.client = APIClient()
+        self.client.force_authenticate(user=user)
+
+    def download(self, **params):
+        return self.client.get(f'/api/inventory/invoices/{self.invoice.id}/pdf/', params)
+
+    def target(self):
+        _, name = pdf_cache.entry(Invoice.objects.get(pk=self.invoice.pk), self.profile)
+        return pdf_cache.absolute_path(name)
+
+    def test_sync_download_waits_for_the_pool(self):
+        response = self.download()
+
+        self.assertEqual(response.status_code, 200)
+        # Default template laid out with the stylesheet preloaded in the pool process
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.7 preloaded')
+
+    def test_async_job_is_polled_until_ready(self):
+        response = self.download(**{'async': '1'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '1')
+
+        # Polling while running joins the same job
+        self.assertEqual(self.download(**{'async': '1'}).status_code, 202)
+        self.assertEqual(len(self.renderer._jobs), 1)
+        self.renderer.wait(next(iter(self.renderer._jobs.values())), 5)
+
+        response = self.download(**{'async': '1'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(INVOICE_PDF_RENDER_TIMEOUT=0)
+    def test_timeout_answers_pending(self):
+        self.assertEqual(self.download().status_code, 202)
+
+    def test_failed_job_is_reported_once(self):
+        target = self.target()
+        failed = Future()
+        failed.set_exception(RuntimeError('Layout kaputt'))
+
+        self.renderer._jobs[str(target)] = failed
+        self.assertIs(self.renderer.job(target), failed)
+        self.assertIsNone(self.renderer.job(target))
+
+        # The request that waited on the job reports the error, a later poll renders again
+        self.renderer._jobs[str(target)] = failed
+        with self.assertRaises(RuntimeError):
+            self.renderer.wait(failed, 0)
+        self.assertIsNone(self.renderer.job(target))
+
+    def test_cancelled_job_is_rendered_again(self):
+        target = self.target()
+        cancelled = Future()
+        cancelled.cancel()
+        self.renderer._jobs[str(target)] = cancelled
+
+        self.assertFalse(self.renderer.wait(cancelled, 0))
+        self.assertIsNone(self.renderer.job(target))
+        self.assertEqual(self.download().status_code, 200)
+
+    def test_render_in_another_worker_is_not_repeated(self):
+        target = self.target()
+        target.parent.mkdir(parents=True)
+        marker_path(target).touch()
+
+        self.assertEqual(self.download(**{'async': '1'}).status_code, 202)
+        self.assertEqual(self.renderer._jobs, {})
+
+        # The other worker wrote the file and removed its marker
+        pdf_cache.write(target, b'%PDF-1.7 other worker')
+        marker_path(target).unlink()
+        response = self.download()
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.7 other worker')
+        self.assertEqual(self.renderer._jobs, {})
+
+    def test_abandoned_marker_is_taken_over(self):
+        target = self.target()
+        target.parent.mkdir(parents=True)
+        marker = marker_path(target)
+        marker.touch()
+        abandoned = time.time() - MARKER_MAX_AGE - 1
+        os.utime(marker, (abandoned, abandoned))
+
+        response = self.download()
+
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.7 preloaded')
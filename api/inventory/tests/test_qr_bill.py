@@ -0,0 +1,47 @@
+"""
+Tests for the in-memory, memoized Swiss QR bill SVG
+"""
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from inventory.utils.pdf import _qr_bill_svg, _qr_svg_data_uri
+
+CREDITOR = {'name': 'Depot AG', 'street': 'Bahnhofstrasse 1', 'postal_code': '8001', 'city': 'Zürich', 'country': 'CH'}
+DEBTOR = {'name': 'Kunde AG', 'street': 'Seestrasse 5', 'postal_code': '8002', 'city': 'Zürich', 'country': 'CH'}
+IBAN = 'CH93 0076 2011 6238 5295 7'
+
+
+class QRBillTests(SimpleTestCase):
+
+    def setUp(self):
+        _qr_bill_svg.cache_clear()
+
+    def slip(self, reference='RE000001', amount=Decimal('108.10')):
+        return _qr_svg_data_uri(IBAN, CREDITOR, DEBTOR, amount, 'CHF', reference, f'Rechnung {reference}')
+
+    def test_svg_is_generated_in_memory_with_svg_attributes(self):
+        with mock.patch('tempfile.NamedTemporaryFile') as temp_file:
+            svg = self.slip()
+
+        temp_file.assert_not_called()
+        self.assertTrue(svg.lstrip().startswith('<?xml') or svg.lstrip().startswith('<svg'))
+        self.assertNotIn('style="', svg)
+        self.assertIn('fill="', svg)
+        self.assertIn('108.10', svg)
+
+    def test_slips_are_memoized(self):
+        first = self.slip()
+        self.assertIs(self.slip(), first)
+        self.assertEqual(_qr_bill_svg.cache_info().hits, 1)
+
+        self.assertIsNot(self.slip(amount=Decimal('99.00')), first)
+        self.assertIsNot(self.slip(reference='RE000002'), first)
+        self.assertEqual(_qr_bill_svg.cache_info().misses, 3)
+
+    def test_invalid_iban(self):
+        with self.assertRaises(ValueError):
+            _qr_svg_data_uri('DE89370400440532013000', CREDITOR, DEBTOR, Decimal('1.00'), 'CHF', 'RE1', 'Rechnung RE1')
+        with self.assertRaises(ValueError):
+            _qr_svg_data_uri('', CREDITOR, DEBTOR, Decimal('1.00'), 'CHF', 'RE1', 'Rechnung RE1')
@@ -0,0 +1,156 @@
+"""
+Tests for the report aggregation endpoints.
+"""
+
+from datetime import date
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from inventory.models import InventoryItem, Category, Customer, SalesOrder, Invoice, Expense
+from decimal import Decimal
+
+
+class ReportEndpointTests(TestCase):
+    """Test GET /reports/..."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.beer = Category.objects.create(name='Bier')
+        self.wine = Category.objects.create(name='Wein')
+
+        # 2 Paletten à 10 + 5 Verpackungen = 25 Verpackungen à 2.00
+        InventoryItem.objects.create(
+            name='Lager', price=Decimal('2.00'), owner=self.user, category=self.beer,
+            verpackungen_pro_palette=10, palette_quantity=2, verpackung_quantity=5, min_stock_level=5
+        )
+        # 3 Verpackungen à 10.00, below minimum of 8
+        InventoryItem.objects.create(
+            name='Merlot', price=Decimal('10.00'), owner=self.user, category=self.wine,
+            verpackungen_pro_palette=10, verpackung_quantity=3, min_stock_level=8
+        )
+        # Items of other users are never included
+        other = User.objects.create_user(username='other', password='testpass')
+        InventoryItem.objects.create(
+            name='Fremd', price=Decimal('99.00'), owner=other, category=self.beer,
+            palette_quantity=10, min_stock_level=1000
+        )
+
+    def test_inventory_value(self):
+        """Test per-item values and totals"""
+        response = self.client.get('/api/inventory/reports/inventory-value/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['name'] for item in response.data['items']], ['Lager', 'Merlot'])
+        self.assertEqual(response.data['items'][0]['quantity'], 25)
+        self.assertEqual(response.data['totals']['total_quantity'], 28)
+        self.assertEqual(response.data['totals']['total_value'], Decimal('80.00'))
+
+    def test_inventory_value_is_paginated(self):
+        """Test that the rows are paged while the totals cover all items"""
+        response = self.client.get('/api/inventory/reports/inventory-value/?page_size=1&page=2')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual([item['name'] for item in response.data['items']], ['Merlot'])
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+        self.assertEqual(response.data['totals']['total_items'], 2)
+        self.assertEqual(response.data['totals']['total_value'], Decimal('80.00'))
+
+    def test_category_summary_runs_one_query(self):
+        """Test that the category valuation is a single aggregate query"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/inventory/reports/category-summary/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len([q for q in queries.captured_queries if 'inventory_inventoryitem' in q['sql']]), 1)
+
+        rows = {row['category_name']: row for row in response.data['categories']}
+        self.assertEqual(rows['Bier']['item_count'], 1)
+        self.assertEqual(rows['Bier']['total_value'], Decimal('50.00'))
+        self.assertEqual(rows['Wein']['total_value'], Decimal('30.00'))
+
+    def test_low_stock(self):
+        """Test that only items at or below their minimum are listed"""
+        response = self.client.get(f'/api/inventory/reports/low-stock/?category={self.wine.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['items']), 1)
+        self.assertEqual(response.data['items'][0]['name'], 'Merlot')
+        self.assertEqual(response.data['items'][0]['needed'], 5)
+
+    def test_financials_by_month(self):
+        """Test revenue and expense totals per month"""
+        customer = Customer.objects.create(name='Kunde', owner=self.user)
+        order = SalesOrder.objects.create(customer=customer, created_by=self.user, total_gross=Decimal('100.00'))
+        Invoice.objects.create(order=order, issue_date=date(2025, 3, 10))
+        Expense.objects.create(
+            date=date(2025, 3, 2), description='Miete', amount=Decimal('40.00'), category='OTHER', owner=self.user
+        )
+        Expense.objects.create(
+            date=date(2025, 4, 1), description='Strom', amount=Decimal('10.00'), category='UTILITIES', owner=self.user
+        )
+
+        response = self.client.get('/api/inventory/reports/financials/?period=month&date_from=2025-01-01')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totals']['revenue'], Decimal('100.00'))
+        self.assertEqual(response.data['totals']['expenses'], Decimal('50.00'))
+        self.assertEqual(response.data['totals']['balance'], Decimal('50.00'))
+        self.assertEqual(len(response.data['periods']), 2)
+        self.assertEqual(response.data['periods'][0]['revenue'], Decimal('100.00'))
+
+        response = self.client.get('/api/inventory/reports/financials/?period=week')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_financials_of_staff_are_owner_scoped(self):
+        """Test that staff users only see their own revenue and expenses"""
+        self.user.is_staff = True
+        self.user.save()
+        other = User.objects.get(username='other')
+        customer = Customer.objects.create(name='Kunde', owner=other)
+        order = SalesOrder.objects.create(customer=customer, created_by=other, total_gross=Decimal('100.00'))
+        Invoice.objects.create(order=order, issue_date=date(2025, 3, 10))
+        Expense.objects.create(
+            date=date(2025, 3, 2), description='Miete', amount=Decimal('40.00'), category='OTHER', owner=other
+        )
+
+        response = self.client.get('/api/inventory/reports/financials/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['periods'], [])
+        self.assertEqual(response.data['totals']['revenue'], Decimal('0.00'))
+
+
+class InventoryItemLowStockFilterTests(TestCase):
+    """Test ?low_stock= and ordering on the stored total stock column"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.full = InventoryItem.objects.create(
+            name='Voll', price=Decimal('1.00'), owner=self.user,
+            verpackungen_pro_palette=10, palette_quantity=3, min_stock_level=5
+        )
+        self.low = InventoryItem.objects.create(
+            name='Knapp', price=Decimal('1.00'), owner=self.user,
+            verpackungen_pro_palette=10, verpackung_quantity=5, min_stock_level=5
+        )
+        InventoryItem.objects.create(
+            name='Inaktiv', price=Decimal('1.00'), owner=self.user, min_stock_level=5, is_active=False
+        )
+
+    def test_low_stock_filter(self):
+        """Test that the stored column follows stock bookings"""
+        response = self.client.get('/api/inventory/items/?low_stock=true')
+        self.assertEqual([item['name'] for item in response.data['results']], ['Knapp'])
+
+        self.full.palette_quantity = 0
+        self.full.save()
+        response = self.client.get('/api/inventory/items/?low_stock=true')
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_ordering_on_total_stock(self):
+        """Test that items can be ordered by total stock in Verpackungen"""
+        response = self.client.get('/api/inventory/items/?ordering=-total_verpackungen')
+        self.assertEqual([item['name'] for item in response.data['results']], ['Voll', 'Knapp', 'Inaktiv'])
@@ -0,0 +1,127 @@
+"""
+Tests for the owner-scoped search index
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from inventory import search
+from inventory.models import Customer, InventoryItem, InventoryItemSupplier, SearchEntry, Supplier
+
+
+class SearchTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='searchuser', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.supplier = Supplier.objects.create(name='Birra Peja GmbH', owner=self.user)
+        self.tea = self.item('Sola Ice Tea 0.33L', brand='Sola', sku='SOLA-033', ean_unit='7612345678901')
+        self.beer = self.item('Peja Bier 0.5L', brand='Birra Peja', sku='PEJA-050')
+        self.item('Sola Ice Tea 0.33L', owner=self.other)
+
+    def item(self, name, owner=None, **fields):
+        return InventoryItem.objects.create(name=name, price=Decimal('1.00'), owner=owner or self.user, **fields)
+
+    def ids(self, query, kind=SearchEntry.KIND_ITEM, owner=None):
+        return [hit.object_id for hit in search.search(owner or self.user, query, kinds=[kind])]
+
+
+class SearchIndexTests(SearchTestCase):
+
+    def test_entries_follow_saves_and_deletes(self):
+        self.tea.name = 'Sola Lemon Tea'
+        self.tea.save()
+        self.assertEqual(SearchEntry.objects.get(kind='item', object_id=self.tea.pk).name, 'Sola Lemon Tea')
+
+        self.tea.delete()
+        self.assertFalse(SearchEntry.objects.filter(kind='item', object_id=self.tea.pk).exists())
+
+    def test_stock_updates_do_not_reindex(self):
+        entry = SearchEntry.objects.get(kind='item', object_id=self.tea.pk)
+        self.tea.palette_quantity = 3
+        self.tea.save(update_fields=['palette_quantity'])
+        self.assertEqual(SearchEntry.objects.get(pk=entry.pk).updated_at, entry.updated_at)
+
+    def test_supplier_sku_is_searchable(self):
+        InventoryItemSupplier.objects.create(
+            item=self.tea, supplier=self.supplier, supplier_sku='BP-77812', supplier_price=Decimal('0.80')
+        )
+        self.assertEqual(self.ids('BP-77812'), [self.tea.pk])
+
+    def test_rebuild_restores_missing_entries(self):
+        SearchEntry.objects.all().delete()
+        self.assertEqual(search.rebuild(owner=self.user), 3)
+        self.assertEqual(self.ids('sola'), [self.tea.pk])
+
+
+class SearchRankingTests(SearchTestCase):
+
+    def test_results_are_owner_scoped(self):
+        self.assertEqual(self.ids('Sola Ice Tea'), [self.tea.pk])
+
+    def test_typos_still_match(self):
+        self.assertEqual(self.ids('Sola Ise Tee')[0], self.tea.pk)
+        self.assertEqual(self.ids('Bira Peja', kind=SearchEntry.KIND_SUPPLIER), [self.supplier.pk])
+
+    def test_brand_sku_and_ean_are_searched(self):
+        self.assertEqual(self.ids('7612345678901'), [self.tea.pk])
+        self.assertEqual(self.ids('PEJA-050')[0], self.beer.pk)
+        self.assertEqual(self.ids('birra peja')[0], self.beer.pk)
+
+    def test_short_queries(self):
+        self.assertEqual(self.ids('pe'), [self.beer.pk])
+        self.assertEqual(self.ids(''), [])
+
+    def test_candidates_are_the_best_ranked_matches(self):
+        for number in range(8):
+            self.item(f'Lagerbier Spezial Nr. {number} aus dem Keller der Brauerei')
+        exact = self.item('Bier')
+
+        with patch.object(search, 'CANDIDATES', 3):
+            self.assertEqual(self.ids('bier')[0], exact.pk)
+
+    def test_postgresql_list_filter_is_a_substring_match(self):
+        with patch.object(search, '_vendor', return_value='postgresql'):
+            sql, params = search.matching_ids(self.user, SearchEntry.KIND_ITEM, '50%_Sola').query.sql_with_params()
+
+        self.assertIn('ILIKE', sql)
+        self.assertNotIn('<%', sql)
+        self.assertIn('%50\\%\\_sola%', params)
+
+
+class SearchAPITests(SearchTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_typeahead_returns_ranked_items(self):
+        response = self.client.get('/api/inventory/items/typeahead/', {'q': 'sola tea'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data], [self.tea.pk])
+        self.assertGreater(response.data[0]['search_score'], 0.3)
+
+    def test_list_search_uses_index(self):
+        Customer.objects.create(name='Restaurant Sonne', email='info@sonne.ch', owner=self.user)
+
+        items = self.client.get('/api/inventory/items/', {'search': 'peja'}).data['results']
+        customers = self.client.get('/api/inventory/customers/', {'search': 'sonne.ch'}).data['results']
+
+        self.assertEqual([item['id'] for item in items], [self.beer.pk])
+        self.assertEqual([customer['name'] for customer in customers], ['Restaurant Sonne'])
+
+    def test_ocr_suggestions_use_index(self):
+        response = self.client.post(
+            '/api/inventory/ocr/suggest-matches/',
+            {'ocr_data': {'supplier': 'Birra Peja', 'article_name': 'Sola Ice Tea 0,33'}},
+            format='json'
+        )
+
+        suggestions = response.data['suggestions']
+        self.assertEqual(suggestions['suppliers'], [{'id': self.supplier.pk, 'name': 'Birra Peja GmbH'}])
+        self.assertEqual(suggestions['items'][0]['id'], self.tea.pk)
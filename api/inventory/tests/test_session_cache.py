@@ -0,0 +1,107 @@
+"""
+Tests for the session validation cache and the middleware -> DRF hand-off
+"""
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from inventory.models import UserSession
+from inventory.session_cache import TTLCache, session_cache
+
+# /api/inventory/users/ is excluded from session validation (registration)
+ME_URL = '/api/users/me/'
+
+
+class TTLCacheTests(TestCase):
+
+    def test_expired_entries_are_dropped(self):
+        cache = TTLCache(maxsize=10, ttl=-1)
+        cache.set('a', 1)
+        self.assertIsNone(cache.get('a'))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+
+class SessionValidationCacheTests(TestCase):
+
+    def setUp(self):
+        session_cache.clear()
+        self.user = User.objects.create_user(username='cacheuser', password='pass12345')
+        self.client = APIClient()
+
+    def login(self, client=None):
+        client = client or self.client
+        response = client.post('/api/token/', {'username': 'cacheuser', 'password': 'pass12345'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data['access']
+
+    @override_settings(SESSION_CACHE_ALIAS='default', SESSION_CACHE_LOCAL_TTL=None)
+    def test_authenticated_request_without_queries_once_cached(self):
+        access = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+        # First request fills the cache (one query for session and user)
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, 200)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'cacheuser')
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    @override_settings(SESSION_CACHE_ALIAS=None, SESSION_CACHE_LOCAL_TTL=None)
+    def test_no_local_reuse_without_shared_cache(self):
+        """A login handled by another worker (no invalidation here) is seen at once"""
+        access = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+
+        # update() sends no signals, like a login in another process
+        UserSession.objects.filter(user=self.user).update(session_key='elsewhere')
+
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'session_terminated')
+
+    def test_new_login_terminates_cached_session(self):
+        old_access = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {old_access}')
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+
+        self.login(APIClient())
+
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'session_terminated')
+
+    def test_logout_expires_cached_session(self):
+        access = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+
+        self.assertEqual(self.client.post('/api/users/logout/').status_code, 200)
+
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()['code'], 'session_expired')
+
+    def test_deactivated_user_is_rejected(self):
+        access = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get(ME_URL).status_code, 200)
+
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertEqual(self.client.get(ME_URL).status_code, 401)
@@ -0,0 +1,353 @@
+"""
+Tests for the stock booking services (single and batch bookings).
+
+These tests verify balances, ledger rows and query counts of the set-based
+booking paths.
+"""
+
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework import status
+from inventory.models import (
+    InventoryItem, StockMovement, InventoryLog, Expense, Supplier, Customer, SalesOrder, SalesOrderItem
+)
+from decimal import Decimal
+
+
+class StockBookingEngineTests(TestCase):
+    """Test the single-movement booking engine"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.item = InventoryItem.objects.create(
+            name='Test Bier',
+            price=Decimal('2.50'),
+            owner=self.user,
+            verpackungen_pro_palette=10,
+            palette_quantity=2,
+            verpackung_quantity=5,
+        )
+
+    def test_post_writes_item_once(self):
+        """Test that a single movement locks and writes the item row once"""
+        payload = {'item': self.item.id, 'type': 'OUT', 'unit': 'verpackung', 'quantity': 7}
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/inventory/stock-movements/', payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        item_updates = [
+            q for q in queries.captured_queries
+            if q['sql'].startswith('UPDATE') and 'inventory_inventoryitem' in q['sql']
+        ]
+        self.assertEqual(len(item_updates), 1)
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.palette_quantity, 1)
+        self.assertEqual(self.item.verpackung_quantity, 8)
+
+        log = InventoryLog.objects.get(item=self.item)
+        self.assertEqual(log.action, 'REMOVE')
+        self.assertEqual(log.previous_quantity, 7)
+        self.assertEqual(log.new_quantity, 9)
+
+    def test_ledger_rows_carry_owner(self):
+        """Test that movements and logs are scoped by their own owner column"""
+        self.client.post(
+            '/api/inventory/stock-movements/',
+            {'item': self.item.id, 'type': 'OUT', 'unit': 'verpackung', 'quantity': 1},
+            format='json'
+        )
+        self.assertEqual(StockMovement.objects.get().owner, self.user)
+        self.assertEqual(InventoryLog.objects.get().owner, self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/inventory/stock-movements/?cursor=')
+        self.assertEqual(len(response.data['results']), 1)
+        list_query = [q['sql'] for q in queries.captured_queries if 'inventory_stockmovement' in q['sql']][0]
+        self.assertIn('"inventory_stockmovement"."owner_id" =', list_query)
+
+    def test_delete_reverses_movement(self):
+        """Test that deleting a movement gives the stock back"""
+        movement = StockMovement.objects.create(
+            item=self.item, type='DEFECT', unit='verpackung', quantity=5, created_by=self.user
+        )
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.defective_qty, 5)
+
+        movement.delete()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.palette_quantity, 2)
+        self.assertEqual(self.item.verpackung_quantity, 5)
+        self.assertEqual(self.item.defective_qty, 0)
+
+    def test_update_rebooks_difference(self):
+        """Test that changing a movement corrects the balance instead of booking twice"""
+        response = self.client.post(
+            '/api/inventory/stock-movements/',
+            {'item': self.item.id, 'type': 'IN', 'unit': 'palette', 'quantity': 3, 'note': 'Lieferung'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.patch(
+            f"/api/inventory/stock-movements/{response.data['id']}/", {'quantity': 1}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.palette_quantity, 3)
+        self.assertEqual(self.item.verpackung_quantity, 5)
+
+        # The edit is logged like a booking
+        log = InventoryLog.objects.filter(item=self.item).latest('id')
+        self.assertEqual(InventoryLog.objects.filter(item=self.item).count(), 2)
+        self.assertEqual((log.previous_quantity, log.new_quantity), (5 + 5, 3 + 5))
+
+    def test_moving_to_another_item_locks_both_once(self):
+        """Test that changing the item locks old and new item in one statement and moves the stock"""
+        other = InventoryItem.objects.create(name='Test Wein', price=Decimal('8.00'), owner=self.user,
+                                             verpackungen_pro_palette=10)
+        movement = StockMovement.objects.create(
+            item=self.item, type='IN', unit='verpackung', quantity=4, created_by=self.user
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                f'/api/inventory/stock-movements/{movement.id}/', {'item': other.id}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        item_reads = [
+            q for q in queries.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "inventory_inventoryitem"' in q['sql']
+            and 'ORDER BY "inventory_inventoryitem"."id"' in q['sql']
+        ]
+        self.assertEqual(len(item_reads), 1)
+        self.item.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((self.item.palette_quantity, self.item.verpackung_quantity), (2, 5))
+        self.assertEqual((other.palette_quantity, other.verpackung_quantity), (0, 4))
+        self.assertTrue(InventoryLog.objects.filter(item=other).exists())
+
+    def test_deleting_delivered_order_restores_stock(self):
+        """Test that deleting a delivered order restores all its lines"""
+        customer = Customer.objects.create(name='Kunde', owner=self.user)
+        order = SalesOrder.objects.create(customer=customer, status='DELIVERED', created_by=self.user)
+        SalesOrderItem.objects.create(order=order, item=self.item, qty_base=6, unit_price=Decimal('2.50'))
+        SalesOrderItem.objects.create(order=order, item=self.item, qty_base=4, unit_price=Decimal('2.50'))
+
+        order.delete()
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.palette_quantity, 3)
+        self.assertEqual(self.item.verpackung_quantity, 5)
+
+
+class StockMovementBatchTests(TestCase):
+    """Test POST /stock-movements/batch/"""
+
+    url = '/api/inventory/stock-movements/batch/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.supplier = Supplier.objects.create(name='Brauerei', owner=self.user)
+
+        self.items = [
+            InventoryItem.objects.create(
+                name=f'Test Bier {i}',
+                price=Decimal('2.50'),
+                owner=self.user,
+                verpackungen_pro_palette=10,
+                palette_quantity=1,
+            )
+            for i in range(40)
+        ]
+
+    def test_goods_receipt_books_all_lines(self):
+        """Test that a 40-line goods receipt is booked with a handful of queries"""
+        payload = {
+            'idempotency_key': 'receipt-1',
+            'supplier': self.supplier.id,
+            'movements': [
+                {'item': item.id, 'type': 'IN', 'unit': 'verpackung', 'quantity': 15, 'purchase_price': '10.00'}
+                for item in self.items
+            ]
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertLessEqual(len(queries), 12)
+        self.assertEqual(response.data['count'], 40)
+
+        # 1 Palette + 15 Verpackungen = 2 Paletten + 5 Verpackungen
+        item = InventoryItem.objects.get(id=self.items[0].id)
+        self.assertEqual(item.palette_quantity, 2)
+        self.assertEqual(item.verpackung_quantity, 5)
+
+        self.assertEqual(InventoryLog.objects.count(), 40)
+        self.assertEqual(Expense.objects.filter(stock_movement__isnull=False).count(), 40)
+
+    def test_lines_on_same_item_are_applied_in_order(self):
+        """Test that several lines on one item see each other's balances"""
+        item = self.items[0]
+        payload = {
+            'note': 'Umbuchung',
+            'movements': [
+                {'item': item.id, 'type': 'IN', 'unit': 'palette', 'quantity': 2},
+                {'item': item.id, 'type': 'OUT', 'unit': 'verpackung', 'quantity': 25},
+            ]
+        }
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        item.refresh_from_db()
+        self.assertEqual(item.palette_quantity, 0)
+        self.assertEqual(item.verpackung_quantity, 5)
+
+        logs = InventoryLog.objects.filter(item=item).order_by('id')
+        self.assertEqual([log.new_quantity for log in logs], [3, 5])
+
+    def test_same_idempotency_key_returns_existing_batch(self):
+        """Test that retrying a batch returns the booked movements with 200 OK"""
+        payload = {
+            'idempotency_key': 'receipt-2',
+            'supplier': self.supplier.id,
+            'movements': [
+                {'item': self.items[0].id, 'type': 'IN', 'unit': 'palette', 'quantity': 1},
+                {'item': self.items[1].id, 'type': 'IN', 'unit': 'palette', 'quantity': 1},
+            ]
+        }
+        response1 = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response1.status_code, status.HTTP_201_CREATED)
+
+        response2 = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response2.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [m['id'] for m in response1.data['movements']],
+            [m['id'] for m in response2.data['movements']]
+        )
+
+        self.assertEqual(StockMovement.objects.count(), 2)
+        self.items[0].refresh_from_db()
+        self.assertEqual(self.items[0].palette_quantity, 2)
+
+    def test_idempotency_key_of_another_user_is_not_replayed(self):
+        """Test that a batch key used by another user neither replays nor books"""
+        payload = {
+            'idempotency_key': 'receipt-3',
+            'note': 'Lieferung',
+            'movements': [{'item': self.items[0].id, 'type': 'IN', 'unit': 'palette', 'quantity': 1}],
+        }
+        self.assertEqual(self.client.post(self.url, payload, format='json').status_code, status.HTTP_201_CREATED)
+
+        other = User.objects.create_user(username='otheruser', password='testpass')
+        other_item = InventoryItem.objects.create(name='Fremd', price=Decimal('1.00'), owner=other)
+        client = APIClient()
+        client.force_authenticate(user=other)
+        payload['movements'][0]['item'] = other_item.id
+        response = client.post(self.url, payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('movements', response.data)
+        self.assertFalse(StockMovement.objects.filter(item=other_item).exists())
+
+    def test_insufficient_stock_rolls_back_whole_batch(self):
+        """Test that one failing line books nothing"""
+        payload = {
+            'note': 'Verkauf',
+            'movements': [
+                {'item': self.items[0].id, 'type': 'OUT', 'unit': 'verpackung', 'quantity': 5},
+                {'item': self.items[1].id, 'type': 'OUT', 'unit': 'verpackung', 'quantity': 11},
+            ]
+        }
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 422)
+
+        self.assertEqual(StockMovement.objects.count(), 0)
+        self.items[0].refresh_from_db()
+        self.assertEqual(self.items[0].palette_quantity, 1)
+
+    def test_foreign_items_are_rejected(self):
+        """Test that items of other users cannot be booked"""
+        other = User.objects.create_user(username='other', password='testpass')
+        foreign_item = InventoryItem.objects.create(name='Fremd', price=Decimal('1.00'), owner=other)
+
+        payload = {
+            'note': 'Test',
+            'movements': [{'item': foreign_item.id, 'type': 'IN', 'unit': 'palette', 'quantity': 1}]
+        }
+        response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(StockMovement.objects.count(), 0)
+
+
+class OrderInvoiceBookingTests(TestCase):
+    """Test the Warenausgang booked by POST /orders/{id}/invoice/"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.customer = Customer.objects.create(name='Kunde', owner=self.user)
+
+        self.items = [
+            InventoryItem.objects.create(
+                name=f'Test Bier {i}',
+                price=Decimal('2.50'),
+                owner=self.user,
+                verpackungen_pro_palette=10,
+                palette_quantity=1,
+            )
+            for i in range(30)
+        ]
+
+    def create_order(self, lines):
+        order = SalesOrder.objects.create(customer=self.customer, status='DELIVERED', created_by=self.user)
+        for item, qty in lines:
+            SalesOrderItem.objects.create(order=order, item=item, qty_base=qty, unit_price=Decimal('2.50'))
+        return order
+
+    def invoice_url(self, order):
+        return f'/api/inventory/orders/{order.id}/invoice/'
+
+    def test_invoice_books_all_lines_in_bulk(self):
+        """Test that a 60-line delivery is booked with a constant number of queries"""
+        order = self.create_order([(item, 3) for item in self.items] * 2)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.invoice_url(order))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        item_locks = [q for q in queries.captured_queries if 'inventory_inventoryitem' in q['sql']]
+        self.assertLessEqual(len(item_locks), 3)
+        self.assertLessEqual(len(queries), 30)
+
+        # 1 Palette - 2 x 3 Verpackungen = 0 Paletten + 4 Verpackungen
+        item = InventoryItem.objects.get(id=self.items[0].id)
+        self.assertEqual(item.palette_quantity, 0)
+        self.assertEqual(item.verpackung_quantity, 4)
+
+        self.assertEqual(StockMovement.objects.filter(type='OUT', customer=self.customer).count(), 60)
+        self.assertEqual(InventoryLog.objects.count(), 60)
+
+    def test_insufficient_stock_books_nothing(self):
+        """Test that one short line rolls back the whole invoice"""
+        order = self.create_order([(self.items[0], 5), (self.items[1], 11)])
+
+        response = self.client.post(self.invoice_url(order))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(response.data['error']['code'], 'INSUFFICIENT_STOCK')
+
+        self.assertEqual(StockMovement.objects.count(), 0)
+        self.items[0].refresh_from_db()
+        self.assertEqual(self.items[0].palette_quantity, 1)
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'DELIVERED')
@@ -0,0 +1,165 @@
+"""
+Tests for the ledger checkpoints and point-in-time (as_of) stock balances
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from inventory import stock_history
+from inventory.models import InventoryItem, StockCheckpoint, StockMovement
+from inventory.services import book_stock_movement
+
+
+def months_ago(count: int, day: int = 15):
+    """Datetime on `day` of the month `count` months before the current one"""
+    value = stock_history.month_start(timezone.now())
+    for _ in range(count):
+        value = stock_history.month_start(value - timedelta(days=1))
+    return value + timedelta(days=day - 1, hours=12)
+
+
+class StockHistoryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='historian', password='pass12345')
+        self.item = InventoryItem.objects.create(
+            name='Bier', price=Decimal('2.00'), owner=self.user, verpackungen_pro_palette=10, min_stock_level=5
+        )
+        self.other = InventoryItem.objects.create(
+            name='Wein', price=Decimal('8.00'), owner=self.user, verpackungen_pro_palette=6
+        )
+        # Ledger (in booking order):
+        #   4 months ago: Bier +3 Paletten, Wein +12
+        #   3 months ago: Bier -5, Bier 2 defekt
+        #   2 months ago: Bier korrigiert auf 40
+        #   current month: Bier +1 Palette
+        self.book(self.item, 'IN', 'palette', 3, months_ago(4, day=2))
+        self.book(self.other, 'IN', 'verpackung', 12, months_ago(4, day=20))
+        self.book(self.item, 'OUT', 'verpackung', 5, months_ago(3, day=3))
+        self.book(self.item, 'DEFECT', 'verpackung', 2, months_ago(3, day=28))
+        self.book(self.item, 'ADJUST', 'verpackung', 40, months_ago(2, day=10))
+        self.book(self.item, 'IN', 'palette', 1, timezone.now())
+
+    def book(self, item, movement_type, unit, quantity, when):
+        return book_stock_movement(StockMovement(
+            item=item, type=movement_type, unit=unit, quantity=quantity,
+            movement_timestamp=when, created_by=self.user
+        ))
+
+    def stock(self, as_of, item=None):
+        balance = stock_history.balances_as_of(self.user, as_of).get((item or self.item).pk)
+        if balance is None:
+            return (0, 0, 0)
+        return (balance.palette_quantity, balance.verpackung_quantity, balance.defective_qty)
+
+    def test_checkpoints_match_full_replay(self):
+        now = timezone.now() + timedelta(seconds=1)
+        expected = {when: self.stock(when) for when in [
+            months_ago(4, day=1), months_ago(4, day=10), months_ago(3, day=5), months_ago(3, day=28) + timedelta(hours=1),
+            months_ago(2, day=1), months_ago(2, day=11), months_ago(1), now,
+        ]}
+
+        written = stock_history.build_checkpoints(self.user)
+
+        # Boundaries at the start of months -3, -2, -1 and the current month, two items each
+        self.assertEqual(written, 8)
+        self.assertEqual(self.stock(months_ago(3, day=1)), (3, 0, 0))
+        self.assertEqual({when: self.stock(when) for when in expected}, expected)
+        self.assertEqual(expected[months_ago(3, day=28) + timedelta(hours=1)], (2, 3, 2))
+        self.assertEqual(expected[now], (5, 0, 2))
+        self.assertEqual(self.stock(months_ago(1), self.other), (2, 0, 0))
+        self.assertEqual(stock_history.build_checkpoints(self.user), 0)
+
+    def test_current_balance_matches_item(self):
+        stock_history.build_checkpoints(self.user)
+        self.item.refresh_from_db()
+
+        self.assertEqual(self.stock(timezone.now() + timedelta(seconds=1)),
+                         (self.item.palette_quantity, self.item.verpackung_quantity, self.item.defective_qty))
+
+    def test_backdated_movement_invalidates_later_checkpoints(self):
+        stock_history.build_checkpoints(self.user)
+
+        self.book(self.other, 'OUT', 'verpackung', 6, months_ago(3, day=20))
+
+        self.assertFalse(StockCheckpoint.objects.filter(period_end__gt=months_ago(3, day=20)).exists())
+        self.assertEqual(self.stock(months_ago(1), self.other), (1, 0, 0))
+        stock_history.build_checkpoints(self.user)
+        self.assertEqual(self.stock(months_ago(1), self.other), (1, 0, 0))
+        self.assertEqual(self.stock(months_ago(3, day=19), self.other), (2, 0, 0))
+
+    def test_build_discards_checkpoints_of_a_concurrent_invalidation(self):
+        write_boundary = stock_history._write_boundary
+        calls = []
+
+        def backdated_booking_during_build(owner, boundary, balances):
+            # A backdated booking invalidating while the first build attempt replays
+            if not calls:
+                stock_history.invalidate(self.user.pk, months_ago(4, day=20))
+            calls.append(boundary)
+            return write_boundary(owner, boundary, balances)
+
+        with patch.object(stock_history, '_write_boundary', side_effect=backdated_booking_during_build):
+            written = stock_history.build_checkpoints(self.user)
+
+        # The first attempt's four boundaries were rolled back, the retry replayed the ledger again
+        self.assertEqual(len(calls), 8)
+        self.assertEqual(written, 8)
+        self.assertEqual(StockCheckpoint.objects.filter(owner=self.user).count(), 8)
+        self.assertEqual(self.stock(months_ago(1), self.other), (2, 0, 0))
+
+    def test_build_gives_up_while_invalidated(self):
+        write_boundary = stock_history._write_boundary
+
+        def invalidating(owner, boundary, balances):
+            stock_history.invalidate(self.user.pk, months_ago(4, day=20))
+            return write_boundary(owner, boundary, balances)
+
+        with patch.object(stock_history, '_write_boundary', side_effect=invalidating):
+            self.assertEqual(stock_history.build_checkpoints(self.user), 0)
+        self.assertFalse(StockCheckpoint.objects.exists())
+
+    def test_lookup_queries_do_not_grow_with_history(self):
+        stock_history.build_checkpoints(self.user)
+
+        # Boundary, checkpoints at the boundary, tail movements
+        with self.assertNumQueries(3):
+            stock_history.apply_as_of(self.user, [self.item, self.other], months_ago(1))
+        self.assertEqual((self.item.palette_quantity, self.item.verpackung_quantity), (4, 0))
+
+    def test_api_as_of(self):
+        stock_history.build_checkpoints(self.user)
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        as_of = months_ago(3, day=28).date().isoformat()
+
+        response = client.get('/api/inventory/items/', {'as_of': as_of})
+        rows = response.data['results'] if isinstance(response.data, dict) else response.data
+        bier = next(row for row in rows if row['id'] == self.item.id)
+        self.assertEqual((bier['palette_quantity'], bier['verpackung_quantity'], bier['defective_qty']), (2, 3, 2))
+
+        response = client.get(f'/api/inventory/items/{self.other.id}/', {'as_of': months_ago(5).date().isoformat()})
+        self.assertEqual(response.data['verpackung_quantity'], 0)
+
+        report = client.get('/api/inventory/reports/inventory-value/', {'as_of': as_of}).data
+        self.assertEqual(report['totals']['total_quantity'], 23 + 12)
+        self.assertEqual(report['totals']['total_value'], Decimal('142.00'))
+
+        low = client.get('/api/inventory/reports/low-stock/', {'as_of': months_ago(5).date().isoformat()}).data
+        self.assertEqual([row['name'] for row in low['items']], ['Bier', 'Wein'])
+
+        response = client.get('/api/inventory/items/', {'as_of': 'gestern'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('build_stock_checkpoints', '--rebuild', stdout=out)
+
+        self.assertIn('Wrote 8 checkpoint(s) for 1 user(s)', out.getvalue())
@@ -6,7 +6,7 @@ from .views import (
     UserViewSet, CategoryViewSet, InventoryItemViewSet, InventoryLogViewSet,
     SupplierViewSet, CustomerViewSet, StockMovementViewSet, ExpenseViewSet,
     CompanyProfileView, SalesOrderViewSet, SalesOrderItemViewSet, InvoiceViewSet, InvoiceTemplateView,
-    OCRViewSet
+    OCRViewSet, OCRJobViewSet, OCRBatchViewSet, ReportViewSet, AnalyticsExportViewSet
 )
 
 # Create router and register viewsets
@@ -22,7 +22,11 @@ router.register(r'expenses', ExpenseViewSet, basename='expenses')
 router.register(r'orders', SalesOrderViewSet, basename='orders')
 router.register(r'order-items', SalesOrderItemViewSet, basename='order-items')
 router.register(r'invoices', InvoiceViewSet, basename='invoices')
+router.register(r'ocr/jobs', OCRJobViewSet, basename='ocr-jobs')
+router.register(r'ocr/batches', OCRBatchViewSet, basename='ocr-batches')
 router.register(r'ocr', OCRViewSet, basename='ocr')
+router.register(r'reports', ReportViewSet, basename='reports')
+router.register(r'analytics/parquet', AnalyticsExportViewSet, basename='analytics-parquet')
 
 urlpatterns = [
     # API routes
@@ -0,0 +1,48 @@
+"""CSV parsing for the bulk sales-order import"""
+import csv
+import io
+from typing import Dict, Any, List
+
+
+ORDER_FIELDS = ['customer', 'status', 'delivery_date', 'currency']
+LINE_FIELDS = ['item', 'qty_base', 'qty_display', 'selected_unit', 'unit_price', 'tax_rate']
+
+
+def parse_orders_csv(content: str) -> List[Dict[str, Any]]:
+    """
+    Group CSV rows (one row per order line) into orders.
+
+    Rows with the same `order_ref` form one order; order fields are taken
+    from its first row. Both ',' and ';' (Excel, CH locale) are accepted as
+    delimiter. Values are returned as strings for serializer validation.
+
+    Expected columns:
+        order_ref, customer, status, delivery_date, currency,
+        item, qty_base, qty_display, selected_unit, unit_price, tax_rate
+
+    Returns:
+        List of order dicts with an `items` list, in order of first appearance
+    """
+    content = content.lstrip('\ufeff')  # Excel BOM
+    try:
+        dialect = csv.Sniffer().sniff(content.split('\n', 1)[0], delimiters=',;')
+    except csv.Error:
+        dialect = csv.excel
+
+    orders = {}
+    for row in csv.DictReader(io.StringIO(content), dialect=dialect):
+        row = {key.strip(): (value or '').strip() for key, value in row.items() if key}
+        if not any(row.values()):
+            continue
+
+        order_ref = row.get('order_ref') or row.get('customer', '')
+        if order_ref not in orders:
+            orders[order_ref] = {
+                **{field: row[field] for field in ORDER_FIELDS if row.get(field)},
+                'items': [],
+            }
+        orders[order_ref]['items'].append(
+            {field: row[field] for field in LINE_FIELDS if row.get(field)}
+        )
+
+    return list(orders.values())
@@ -2,12 +2,16 @@
 import base64
 import re
 import os
-from io import BytesIO
+from functools import lru_cache
+from io import BytesIO, StringIO
 from decimal import Decimal
 from django.template.loader import render_to_string
 from weasyprint import HTML
 from django.conf import settings
 
+# Memoized QR bill slips per process (_qr_bill_svg)
+QR_BILL_CACHE_SIZE = 256
+
 
 def _get_logo_data_uri(logo_field):
     """
@@ -52,72 +56,104 @@ def _get_logo_data_uri(logo_field):
         return None
 
 
-def render_invoice_pdf(context):
+def render_invoice_html(context, external_styles=False):
     """
-    Render invoice PDF from template using WeasyPrint
+    Render the invoice HTML (user template or default template)
 
     Args:
         context (dict): Template context with invoice data
+        external_styles (bool): Leave the default stylesheet out of the
+            default template (the caller passes it pre-parsed, see html_to_pdf)
 
     Returns:
-        bytes: PDF content
+        tuple: (HTML string, True if the default stylesheet was left out)
     """
-    from django.template import Context, Template
-    from inventory.models import InvoiceTemplate
+    from django.template import Context
+    from inventory.invoice_templates import invoice_templates
 
     # Convert logo to data URI if present
     if 'supplier' in context and hasattr(context['supplier'], 'logo'):
         logo_data_uri = _get_logo_data_uri(context['supplier'].logo)
         context['logo_data_uri'] = logo_data_uri
 
-    # Try to get user-specific template
+    # Try the user-specific template (compiled with its CSS, cached per process)
     html_string = None
     invoice = context.get('invoice')
 
-    if invoice and hasattr(invoice, 'customer') and invoice.customer and hasattr(invoice.customer, 'owner'):
-        try:
-            user_template = InvoiceTemplate.objects.get(user=invoice.customer.owner, is_active=True)
-
-            # Build complete HTML with CSS inline
-            html_template = user_template.html_content
-
-            # Inject CSS into template
-            if user_template.css_content:
-                # Check if template already has a <style> tag
-                if '{% include "pdf/_styles.css" %}' in html_template:
-                    # Replace the include with actual CSS
-                    html_template = html_template.replace(
-                        '{% include "pdf/_styles.css" %}',
-                        user_template.css_content
-                    )
-                elif '<style>' not in html_template:
-                    # Add CSS to head
-                    html_template = html_template.replace(
-                        '</head>',
-                        f'<style>{user_template.css_content}</style></head>'
-                    )
-
-            # Render the template with context
-            template = Template(html_template)
-            django_context = Context(context)
-            html_string = template.render(django_context)
-
-        except InvoiceTemplate.DoesNotExist:
-            pass
+    if invoice and hasattr(invoice, 'customer') and invoice.customer and hasattr(invoice.customer, 'owner_id'):
+        template = invoice_templates.get(invoice.customer.owner_id)
+        if template is not None:
+            html_string = template.render(Context(context))
+
+    if html_string:
+        return html_string, False
 
     # Fallback to default template
-    if not html_string:
-        html_string = render_to_string('pdf/invoice.html', context)
+    context['external_styles'] = external_styles
+    return render_to_string('pdf/invoice.html', context), external_styles
+
+
+def default_stylesheet():
+    """Source of the default invoice stylesheet (pdf/_styles.css)"""
+    return render_to_string('pdf/_styles.css')
+
+
+def html_to_pdf(html_string, stylesheets=None, font_config=None):
+    """
+    Lay out an HTML string with WeasyPrint
+
+    Args:
+        html_string (str): Complete invoice HTML
+        stylesheets (list): Additional pre-parsed weasyprint.CSS stylesheets
+        font_config: weasyprint FontConfiguration shared by the stylesheets
+
+    Returns:
+        bytes: PDF content
+    """
+    return HTML(string=html_string).write_pdf(stylesheets=stylesheets, font_config=font_config)
+
+
+def render_invoice_pdf(context):
+    """
+    Render invoice PDF from template using WeasyPrint
+
+    Args:
+        context (dict): Template context with invoice data
+
+    Returns:
+        bytes: PDF content
+    """
+    html_string, _ = render_invoice_html(context)
+    return html_to_pdf(html_string)
+
 
-    html = HTML(string=html_string)
-    pdf_bytes = html.write_pdf()
-    return pdf_bytes
+# CSS properties of the qrbill SVG that WeasyPrint needs as SVG attributes
+# (it doesn't parse CSS properties in style attributes correctly)
+_SVG_STYLE_ATTRIBUTES = {'fill', 'fill-opacity', 'fill-rule', 'stroke', 'stroke-width'}
+_SVG_STYLE_RE = re.compile(r'style="([^"]*)"')
+
+
+def _style_to_attributes(match):
+    """Convert style="fill:#000000;..." to fill="#000000" ..."""
+    attrs = []
+    for prop in match.group(1).split(';'):
+        key, sep, value = prop.partition(':')
+        if not sep:
+            continue
+        key = key.strip()
+        value = value.strip()
+        if key in _SVG_STYLE_ATTRIBUTES and not (key in ('fill', 'stroke') and value == 'none'):
+            attrs.append(f'{key}="{value}"')
+    return ' '.join(attrs)
 
 
 def _qr_svg_data_uri(iban, creditor, debtor, amount, currency, reference, message):
     """
     Generate Swiss QR bill SVG as data URI using qrbill
 
+    Slips are memoized per process (see _qr_bill_svg), so re-rendering an
+    invoice reuses its slip.
+
     Args:
         iban (str): Creditor IBAN
         creditor (dict): Creditor info (name, street, postal_code, city, country)
@@ -133,13 +169,6 @@ def _qr_svg_data_uri(iban, creditor, debtor, amount, currency, reference, messag
     Raises:
         ValueError: If required data is missing or invalid
     """
-    from qrbill import QRBill
-    import logging
-    import tempfile
-    import os
-
-    logger = logging.getLogger(__name__)
-
     # Validate required fields
     if not iban:
         raise ValueError("IBAN ist erforderlich für die QR-Code-Generierung")
@@ -147,20 +176,35 @@ def _qr_svg_data_uri(iban, creditor, debtor, amount, currency, reference, messag
     if not creditor.get('name'):
         raise ValueError("Kreditor-Name ist erforderlich")
 
-    # Log the data being used
-    logger.info(f"Generating QR code with IBAN: {iban[:10]}... for amount: {amount} {currency}")
-    logger.info(f"Creditor data: {creditor}")
-    logger.info(f"Debtor data: {debtor}")
+    return _qr_bill_svg(
+        iban,
+        tuple(sorted(creditor.items())),
+        tuple(sorted(debtor.items())) if debtor else None,
+        str(amount) if amount else None,
+        currency,
+        reference,
+        message,
+    )
+
+
+@lru_cache(maxsize=QR_BILL_CACHE_SIZE)
+def _qr_bill_svg(iban, creditor_items, debtor_items, amount, currency, reference, message):
+    """QR bill SVG for hashable arguments (memoized; errors are not cached)"""
+    from qrbill import QRBill
+    import logging
+
+    logger = logging.getLogger(__name__)
+    creditor = dict(creditor_items)
+    debtor = dict(debtor_items) if debtor_items else None
 
     try:
         # Clean IBAN - remove spaces and ensure proper format
         clean_iban = iban.replace(' ', '').upper()
-        logger.info(f"Cleaned IBAN: {clean_iban}")
-        
+
         # Validate IBAN format (basic check)
         if not clean_iban.startswith('CH') or len(clean_iban) != 21:
             raise ValueError(f"Invalid IBAN format: {clean_iban}. Expected CH followed by 19 digits.")
-        
+
         # Build creditor dict (qrbill expects a dict, not Address object)
         creditor_data = {
             'name': creditor['name'][:70],  # Max 70 chars
@@ -168,7 +212,6 @@ def _qr_svg_data_uri(iban, creditor, debtor, amount, currency, reference, messag
             'line2': f"{creditor.get('postal_code', '')} {creditor.get('city', '')}"[:70],
             'country': creditor.get('country', 'CH')[:2]  # ISO 2-letter code
         }
-        logger.info(f"Creditor data for QR: {creditor_data}")
 
         # Build debtor dict if we have at least a name
         debtor_data = None
@@ -198,65 +241,15 @@ def _qr_svg_data_uri(iban, creditor, debtor, amount, currency, reference, messag
             language='de'  # Set language to German
         )
 
-        # Generate SVG to temp file (qrbill requires a file path)
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.svg', delete=False) as temp_file:
-            temp_path = temp_file.name
-
-        try:
-            qr_bill.as_svg(temp_path)
-
-            # Read the SVG content
-            with open(temp_path, 'r', encoding='utf-8') as f:
-                svg_content = f.read()
-        finally:
-            # Clean up temp file
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
-
-        # Use the full QR bill SVG from qrbill library
-        # It already contains the complete Swiss QR payment slip layout
-        logger.info(f"Using full QR bill SVG, length: {len(svg_content)} chars")
-
-        # Post-process SVG to convert CSS style attributes to SVG attributes
-        # WeasyPrint doesn't parse CSS properties in style attributes correctly
-        style_count_before = svg_content.count('style="')
-        logger.info(f"SVG before processing: {style_count_before} style attributes")
-
-        # Convert style="fill:#000000;..." to fill="#000000" ...
-        def convert_style_to_attrs(match):
-            style_content = match.group(1)
-            attrs = []
-
-            # Parse CSS properties
-            for prop in style_content.split(';'):
-                if ':' not in prop:
-                    continue
-                key, value = prop.split(':', 1)
-                key = key.strip()
-                value = value.strip()
-
-                # Map CSS properties to SVG attributes
-                if key == 'fill' and value != 'none':
-                    attrs.append(f'fill="{value}"')
-                elif key == 'fill-opacity':
-                    attrs.append(f'fill-opacity="{value}"')
-                elif key == 'fill-rule':
-                    attrs.append(f'fill-rule="{value}"')
-                elif key == 'stroke' and value != 'none':
-                    attrs.append(f'stroke="{value}"')
-                elif key == 'stroke-width':
-                    attrs.append(f'stroke-width="{value}"')
-
-            return ' '.join(attrs) if attrs else ''
-
-        # Replace all style="..." with proper SVG attributes
-        svg_content = re.sub(r'style="([^"]*)"', convert_style_to_attrs, svg_content)
-
-        style_count_after = svg_content.count('style="')
-        logger.info(f"SVG after processing: {style_count_after} style attributes remaining")
-        logger.info(f"QR code generated successfully, SVG length: {len(svg_content)} chars")
+        # Full QR bill SVG (complete Swiss QR payment slip layout), written in memory
+        buffer = StringIO()
+        qr_bill.as_svg(buffer)
+
+        # Replace all style="..." with proper SVG attributes in one pass
+        svg_content = _SVG_STYLE_RE.sub(_style_to_attributes, buffer.getvalue())
+        logger.debug(f"QR bill generated for reference {reference}, SVG length: {len(svg_content)} chars")
         return svg_content
 
     except Exception as e:
         logger.error(f"QR code generation failed: {str(e)}", exc_info=True)
-        raise ValueError(f"QR-Code-Generierung fehlgeschlagen: {str(e)}")
\ No newline at end of file
+        raise ValueError(f"QR-Code-Generierung fehlgeschlagen: {str(e)}")
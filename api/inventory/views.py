@@ -1,4 +1,4 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, mixins, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
@@ -6,23 +6,32 @@ from rest_framework.views import APIView
 from django.contrib.auth.models import User
 from django.db import transaction
 from django.core.exceptions import ValidationError
-from django.http import HttpResponse
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
 from django.utils import timezone
 from rest_framework import serializers as rf_serializers
 from rest_framework_simplejwt.tokens import RefreshToken
-from django_filters.rest_framework import DjangoFilterBackend, FilterSet, DateFilter, CharFilter
+from django_filters.rest_framework import DjangoFilterBackend, FilterSet, DateFilter, CharFilter, BooleanFilter
 from rest_framework.filters import OrderingFilter, SearchFilter
 from .exceptions import InsufficientStockError
-from .models import Category, InventoryItem, InventoryLog, StockMovement, Supplier, Customer, Expense, CompanyProfile, SalesOrder, SalesOrderItem, Invoice, InvoiceTemplate, UserSession
+from .models import Category, InventoryItem, InventoryLog, StockMovement, Supplier, Customer, Expense, CompanyProfile, SalesOrder, SalesOrderItem, Invoice, InvoiceTemplate, UserSession, OCRJob, OCRBatch, SearchEntry
 from .serializers import (
     UserRegistrationSerializer, UserSerializer,
     CategorySerializer, InventoryItemSerializer, InventoryLogSerializer,
-    StockMovementSerializer, SupplierSerializer, CustomerSerializer, ExpenseSerializer,
-    CompanyProfileSerializer, SalesOrderSerializer, SalesOrderItemSerializer, InvoiceSerializer, InvoiceTemplateSerializer
+    StockMovementSerializer, StockMovementBatchSerializer, SupplierSerializer, CustomerSerializer, ExpenseSerializer,
+    CompanyProfileSerializer, SalesOrderSerializer, SalesOrderImportSerializer, SalesOrderItemSerializer, InvoiceSerializer, InvoiceTemplateSerializer,
+    ReportPeriodSerializer, OCRJobSerializer, OCRBatchSerializer
 )
-from .services import book_stock_change, validate_stock_movement_data, StockOperationError
-from .utils.pdf import render_invoice_pdf, _qr_svg_data_uri
-from .ocr_service import ocr_service
+from .services import book_order_shipment, book_stock_movements_batch, create_sales_orders, validate_stock_movement_data, StockOperationError
+from .utils.pdf import render_invoice_html, _qr_svg_data_uri
+from .utils.order_import import parse_orders_csv
+from .ocr_jobs import BatchUploadError, enqueue_ocr_batch, enqueue_ocr_job, file_type_for, wait_for_job
+from .ocr_matching import suggest_matches
+from .ean_lookup import MAX_BATCH_CODES, ean_lookup
+from .pdf_render import pdf_renderer
+from . import analytics_export, exports, pdf_cache, reports, search, stock_history
+from .pagination import StockMovementPagination, InventoryLogPagination, InvoicePagination, ReportPagination
+from .session_cache import session_cache
 import base64
 
 
@@ -81,6 +90,7 @@ class UserViewSet(viewsets.ModelViewSet):
             # Delete user session
             if request.user and request.user.is_authenticated:
                 UserSession.objects.filter(user=request.user).delete()
+                session_cache.invalidate(request.user.id)
 
             # Blacklist refresh token
             refresh_token = request.data.get("refresh_token")
@@ -94,6 +104,7 @@ class UserViewSet(viewsets.ModelViewSet):
             try:
                 if request.user and request.user.is_authenticated:
                     UserSession.objects.filter(user=request.user).delete()
+                    session_cache.invalidate(request.user.id)
             except:
                 pass
             return Response({"message": "Logout successful"}, status=status.HTTP_200_OK)
@@ -106,47 +117,182 @@ class CategoryViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
 
-class InventoryItemViewSet(viewsets.ModelViewSet):
+class IndexedSearchFilter(SearchFilter):
+    """`?search=` through the search index (inventory.search) instead of LIKE scans; views set `search_kind`"""
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return queryset.filter(pk__in=search.matching_ids(request.user, view.search_kind, query))
+
+
+class TypeaheadMixin:
+    """`GET <list>/typeahead/?q=...&limit=10`: best matches of the search index, best first"""
+    search_kind = None
+    typeahead_max_limit = 25
+
+    @action(detail=False, methods=['get'])
+    def typeahead(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', search.DEFAULT_LIMIT)), self.typeahead_max_limit)
+        except ValueError:
+            limit = search.DEFAULT_LIMIT
+
+        hits = search.search(request.user, request.query_params.get('q', ''), kinds=[self.search_kind], limit=limit)
+        objects = self.get_queryset().in_bulk([hit.object_id for hit in hits])
+        return Response([
+            {**self.get_serializer(objects[hit.object_id]).data, 'search_score': round(hit.score, 3)}
+            for hit in hits
+            if hit.object_id in objects
+        ])
+
+
+class ExportMixin:
+    """`GET <list>/export/?file_format=csv|jsonl&compress=gzip`: the filtered list as a streamed file"""
+    export_columns = None
+    export_name = None
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        try:
+            return exports.export_response(
+                self.filter_queryset(self.get_queryset()), self.export_columns, self.export_name,
+                file_format=request.query_params.get('file_format', exports.FORMAT_CSV),
+                compress=request.query_params.get('compress', ''),
+            )
+        except exports.ExportError as e:
+            return Response(
+                {'error': {'code': 'INVALID_EXPORT', 'message': str(e)}},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+
+class InventoryItemFilter(FilterSet):
+    """Filter set for inventory items (low_stock uses the stored, indexed column)"""
+    low_stock = BooleanFilter(method="filter_low_stock")
+
+    class Meta:
+        model = InventoryItem
+        fields = ["category", "is_active", "low_stock"]
+
+    def filter_low_stock(self, queryset, name, value):
+        # Low-stock alerts only concern active items (matches the partial index)
+        if value:
+            return queryset.filter(low_stock=True, is_active=True)
+        return queryset.filter(low_stock=False)
+
+
+class AsOfMixin:
+    """`?as_of=YYYY-MM-DD` (or an ISO datetime): stock from the ledger history (inventory.stock_history)"""
+
+    def _as_of(self, request):
+        value = request.query_params.get('as_of')
+        if not value:
+            return None
+        try:
+            return stock_history.parse_as_of(value)
+        except ValueError:
+            raise rf_serializers.ValidationError({'as_of': 'Ungültiges Datum (YYYY-MM-DD).'})
+
+
+class InventoryItemViewSet(AsOfMixin, TypeaheadMixin, viewsets.ModelViewSet):
     """Inventory item management viewset"""
     queryset = InventoryItem.objects.all()
     serializer_class = InventoryItemSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, OrderingFilter, IndexedSearchFilter]
+    search_kind = SearchEntry.KIND_ITEM
+    filterset_class = InventoryItemFilter
+    ordering_fields = ['name', 'total_verpackungen', 'price', 'min_stock_level', 'last_updated', 'date_added']
+    ordering = ['name']
     
     def get_queryset(self):
         # Filter items by current user (owner)
         return InventoryItem.objects.filter(owner=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        as_of = self._as_of(request)
+        if as_of is None:
+            return super().list(request, *args, **kwargs)
+        # Filters and ordering on stock columns still see the current stock
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        items = stock_history.apply_as_of(request.user, list(page if page is not None else queryset), as_of)
+        serializer = self.get_serializer(items, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
+    def retrieve(self, request, *args, **kwargs):
+        as_of = self._as_of(request)
+        if as_of is None:
+            return super().retrieve(request, *args, **kwargs)
+        item = self.get_object()
+        stock_history.apply_as_of(request.user, [item], as_of)
+        return Response(self.get_serializer(item).data)
+
+    @action(detail=False, methods=['get'], url_path=r'by-ean/(?P<code>[^/]+)')
+    def by_ean(self, request, code=None):
+        """Resolve one scanned barcode (unit or pack EAN) to the item and its conversion factors"""
+        result = ean_lookup.lookup(request.user, code)
+        if result is None:
+            return Response(
+                {'error': {'code': 'EAN_NOT_FOUND', 'message': f'No item with EAN {code}'}},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(result)
+
+    @action(detail=False, methods=['post'], url_path='by-ean')
+    def by_ean_batch(self, request):
+        """Resolve a batch of scanned barcodes: {"codes": [...]} -> results in scan order and not_found"""
+        codes = request.data.get('codes')
+        if not isinstance(codes, list) or not all(isinstance(code, (str, int)) for code in codes):
+            return Response(
+                {'error': {'code': 'INVALID_CODES', 'message': 'codes must be a list of barcodes'}},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(codes) > MAX_BATCH_CODES:
+            return Response(
+                {'error': {'code': 'TOO_MANY_CODES', 'message': f'At most {MAX_BATCH_CODES} codes per request'}},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(ean_lookup.resolve_batch(request.user, codes))
+
 
 class InventoryLogViewSet(viewsets.ModelViewSet):
     """Inventory log viewset (read-only)"""
     queryset = InventoryLog.objects.all()
     serializer_class = InventoryLogSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = InventoryLogPagination
     http_method_names = ['get']  # Read-only
     
     def get_queryset(self):
         # Filter logs by items owned by current user
-        return InventoryLog.objects.filter(item__owner=self.request.user).order_by('-timestamp')
+        return InventoryLog.objects.filter(owner=self.request.user).order_by('-timestamp')
 
 
-class SupplierViewSet(viewsets.ModelViewSet):
+class SupplierViewSet(TypeaheadMixin, viewsets.ModelViewSet):
     """Supplier management viewset"""
     queryset = Supplier.objects.all()
     serializer_class = SupplierSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, OrderingFilter]
+    search_kind = SearchEntry.KIND_SUPPLIER
     
     def get_queryset(self):
         # Filter suppliers by current user (owner)
         return Supplier.objects.filter(owner=self.request.user)
 
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(TypeaheadMixin, viewsets.ModelViewSet):
     """Customer management viewset"""
     queryset = Customer.objects.all()
     serializer_class = CustomerSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
-    search_fields = ['name', 'contact_name', 'email', 'phone']
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, IndexedSearchFilter]
+    search_kind = SearchEntry.KIND_CUSTOMER
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
 
@@ -155,20 +301,33 @@ class CustomerViewSet(viewsets.ModelViewSet):
         return Customer.objects.filter(owner=self.request.user)
 
 
-class StockMovementViewSet(viewsets.ModelViewSet):
+class StockMovementFilter(FilterSet):
+    """Filter set for the ledger (date range on the booking date)"""
+    date_after = DateFilter(field_name="created_at", lookup_expr="date__gte")
+    date_before = DateFilter(field_name="created_at", lookup_expr="date__lte")
+
+    class Meta:
+        model = StockMovement
+        fields = ['type', 'item', 'supplier', 'customer', 'date_after', 'date_before']
+
+
+class StockMovementViewSet(ExportMixin, viewsets.ModelViewSet):
     """Stock movement management with filtering and ordering"""
     serializer_class = StockMovementSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = StockMovementPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
-    filterset_fields = ['type', 'item', 'supplier', 'customer']
+    filterset_class = StockMovementFilter
+    export_columns = exports.STOCK_MOVEMENT_COLUMNS
+    export_name = 'stock-movements'
     search_fields = ['item__name', 'note']
     ordering_fields = ['created_at', 'id']
     ordering = ['-created_at']
     
     def get_queryset(self):
-        # Filter stock movements by items owned by current user
+        # Filter stock movements by owner (denormalized, no join to the items)
         return StockMovement.objects.filter(
-            item__owner=self.request.user
+            owner=self.request.user
         ).select_related('item', 'supplier', 'customer', 'created_by')
     
     def perform_create(self, serializer):
@@ -188,11 +347,7 @@ class StockMovementViewSet(viewsets.ModelViewSet):
             ValidationError: For other validation failures (returns 400)
         """
         from django.db import transaction, IntegrityError
-        from .exceptions import (
-            InsufficientStockError,
-            IdempotencyConflictError
-        )
-        from .models import InventoryItem, StockMovement
+        from .exceptions import IdempotencyConflictError
         import uuid
 
         # ====================================================================
@@ -219,173 +374,14 @@ class StockMovementViewSet(viewsets.ModelViewSet):
             pass
 
         # ====================================================================
-        # STEP 3: BEGIN ATOMIC TRANSACTION
+        # STEP 3: Book movement (lock item, update balance, write ledger)
+        # The booking engine in services.py locks the item row, validates
+        # stock under the lock (InsufficientStockError → 422), writes one
+        # item UPDATE plus movement/log rows and the Expense for priced IN.
         # ====================================================================
         try:
             with transaction.atomic():
-                # Extract validated data
-                item = serializer.validated_data['item']
-                movement_type = serializer.validated_data['type']
-                unit = serializer.validated_data.get('unit', 'verpackung')
-                quantity = serializer.validated_data.get('quantity', 0)
-
-                # ============================================================
-                # STEP 4: Lock item row (pessimistic locking for concurrency)
-                # ============================================================
-                item = InventoryItem.objects.select_for_update().get(id=item.id)
-
-                # ============================================================
-                # STEP 5: Validate stock availability for OUT/DEFECT movements
-                # verpackung_quantity = LOSE Verpackungen (nicht in Paletten)
-                # total_quantity_in_verpackungen = GESAMTMENGE (inkl. Paletten)
-                # ============================================================
-                if movement_type in ['OUT', 'DEFECT']:
-                    if unit == 'palette':
-                        if quantity > item.palette_quantity:
-                            raise InsufficientStockError(
-                                f"Nicht genügend Paletten für {item.name}. "
-                                f"Verfügbar: {item.palette_quantity}, Angefordert: {quantity}"
-                            )
-                    elif unit == 'verpackung':
-                        # Prüfe gegen GESAMTMENGE (Paletten + lose Verpackungen)
-                        total_available = item.total_quantity_in_verpackungen
-                        if quantity > total_available:
-                            raise InsufficientStockError(
-                                f"Nicht genügend Verpackungen für {item.name}. "
-                                f"Verfügbar: {total_available} ({item.palette_quantity}P + {item.verpackung_quantity}V), Angefordert: {quantity}"
-                            )
-
-                # ============================================================
-                # STEP 6: Update item quantities based on movement type and unit
-                # KRITISCHE LOGISTIK-LOGIK: SYNCHRONISIERTE VERFOLGUNG
-                #
-                # WICHTIG: palette_quantity und verpackung_quantity sind SYNCHRONISIERT!
-                # - palette_quantity = Anzahl KOMPLETTER Paletten
-                # - verpackung_quantity = Anzahl LOSER Verpackungen (NICHT in Paletten!)
-                # - total_quantity_in_verpackungen = palette_quantity * verpackungen_pro_palette + verpackung_quantity
-                #
-                # Beispiel: 2 Paletten à 50 Verpackungen + 3 lose Verpackungen
-                #   → palette_quantity = 2
-                #   → verpackung_quantity = 3
-                #   → total = 103 Verpackungen
-                # ============================================================
-                if movement_type == 'IN':
-                    if unit == 'palette':
-                        # Wareneingang: Paletten hinzufügen
-                        item.palette_quantity += quantity
-                        # verpackung_quantity bleibt unverändert (nur lose Verpackungen)
-
-                    elif unit == 'verpackung':
-                        # Wareneingang: Verpackungen hinzufügen
-                        # Füge zu losen Verpackungen hinzu
-                        item.verpackung_quantity += quantity
-
-                        # Konvertiere komplette Paletten: wenn >= verpackungen_pro_palette
-                        neue_paletten = item.verpackung_quantity // item.verpackungen_pro_palette
-                        if neue_paletten > 0:
-                            item.palette_quantity += neue_paletten
-                            item.verpackung_quantity = item.verpackung_quantity % item.verpackungen_pro_palette
-
-                elif movement_type == 'OUT':
-                    if unit == 'palette':
-                        # Warenausgang: Paletten abziehen
-                        item.palette_quantity -= quantity
-                        # verpackung_quantity bleibt unverändert (nur lose Verpackungen)
-
-                    elif unit == 'verpackung':
-                        # Warenausgang: Verpackungen abziehen
-                        # Berechne Gesamtmenge in Verpackungen
-                        total_verpackungen = (item.palette_quantity * item.verpackungen_pro_palette) + item.verpackung_quantity
-
-                        # Ziehe angeforderte Menge ab
-                        total_verpackungen -= quantity
-
-                        # Neu verteilen: Komplette Paletten + Rest
-                        item.palette_quantity = total_verpackungen // item.verpackungen_pro_palette
-                        item.verpackung_quantity = total_verpackungen % item.verpackungen_pro_palette
-
-                elif movement_type == 'RETURN':
-                    if unit == 'palette':
-                        # Retoure: Paletten zurück ins Lager
-                        item.palette_quantity += quantity
-
-                    elif unit == 'verpackung':
-                        # Retoure: Verpackungen zurück ins Lager
-                        item.verpackung_quantity += quantity
-
-                        # Konvertiere komplette Paletten
-                        neue_paletten = item.verpackung_quantity // item.verpackungen_pro_palette
-                        if neue_paletten > 0:
-                            item.palette_quantity += neue_paletten
-                            item.verpackung_quantity = item.verpackung_quantity % item.verpackungen_pro_palette
-
-                elif movement_type == 'DEFECT':
-                    if unit == 'palette':
-                        # Defekt: Paletten als defekt markieren
-                        transfer_qty = min(quantity, item.palette_quantity)
-                        item.palette_quantity -= transfer_qty
-
-                        # Defekte in Verpackungen zählen
-                        item.defective_qty += transfer_qty * item.verpackungen_pro_palette
-
-                    elif unit == 'verpackung':
-                        # Defekt: Verpackungen als defekt markieren
-                        # Berechne Gesamtmenge
-                        total_verpackungen = (item.palette_quantity * item.verpackungen_pro_palette) + item.verpackung_quantity
-                        transfer_qty = min(quantity, total_verpackungen)
-
-                        # Ziehe von Gesamtmenge ab
-                        total_verpackungen -= transfer_qty
-
-                        # Neu verteilen
-                        item.palette_quantity = total_verpackungen // item.verpackungen_pro_palette
-                        item.verpackung_quantity = total_verpackungen % item.verpackungen_pro_palette
-
-                        # Defekte aktualisieren
-                        item.defective_qty += transfer_qty
-
-                elif movement_type == 'ADJUST':
-                    if unit == 'palette':
-                        # Korrektur: Paletten auf exakten Wert setzen
-                        item.palette_quantity = max(0, quantity)
-                        # verpackung_quantity bleibt unverändert
-
-                    elif unit == 'verpackung':
-                        # Korrektur: GESAMTMENGE auf exakten Wert setzen
-                        total_verpackungen = max(0, quantity)
-
-                        # Neu verteilen
-                        item.palette_quantity = total_verpackungen // item.verpackungen_pro_palette
-                        item.verpackung_quantity = total_verpackungen % item.verpackungen_pro_palette
-
-                item.save(update_fields=['palette_quantity', 'verpackung_quantity', 'defective_qty', 'last_updated'])
-
-                # ============================================================
-                # STEP 7: Save movement (append-only ledger)
-                # ============================================================
-                serializer.validated_data['created_by'] = self.request.user
-                # Pass skip_quantity_update via context to avoid double-updating quantity
-                serializer.context['skip_quantity_update'] = True
-                movement = serializer.save()
-
-                # ============================================================
-                # STEP 8: Auto-create Expense for IN movements with purchase_price
-                # ============================================================
-                if movement_type == 'IN' and movement.purchase_price:
-                    from .models import Expense
-                    from datetime import date
-
-                    # Create expense entry for this purchase
-                    Expense.objects.create(
-                        date=date.today(),
-                        description=f"Wareneingang: {item.name} ({quantity} {unit})",
-                        amount=movement.purchase_price,
-                        category='PURCHASE',
-                        supplier=movement.supplier,
-                        stock_movement=movement,
-                        owner=self.request.user,
-                        notes=movement.note if movement.note else None
-                    )
+                serializer.save(created_by=self.request.user)
 
                 # Transaction commits here if no exceptions
 
@@ -455,12 +451,44 @@ class StockMovementViewSet(viewsets.ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """
+        Book many stock movements in one transaction.
+
+        All lines share one idempotency key: a retry of the same batch
+        returns the already booked movements with 200 OK.
+        """
+        import uuid
+        from .exceptions import IdempotencyConflictError
+
+        serializer = StockMovementBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        idempotency_key = serializer.validated_data.get('idempotency_key') or str(uuid.uuid4())
+
+        try:
+            movements = book_stock_movements_batch(
+                request.user,
+                serializer.validated_data['movements'],
+                idempotency_key
+            )
+            response_status = status.HTTP_201_CREATED
+        except IdempotencyConflictError as e:
+            movements = e.existing_movements
+            response_status = status.HTTP_200_OK
+
+        return Response({
+            'idempotency_key': idempotency_key,
+            'count': len(movements),
+            'movements': StockMovementSerializer(movements, many=True).data,
+        }, status=response_status)
+
     @action(detail=False, methods=['delete'], url_path='clear-all')
     def clear_all(self, request):
         """Delete all stock movements for the current user's items"""
         try:
             deleted_count, _ = StockMovement.objects.filter(
-                item__owner=request.user
+                owner=request.user
             ).delete()
 
             return Response(
@@ -488,13 +516,15 @@ class ExpenseFilter(FilterSet):
         fields = ["category", "date_after", "date_before"]
 
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(ExportMixin, viewsets.ModelViewSet):
     """Expense management viewset with filtering and search"""
     queryset = Expense.objects.select_related("supplier").all().order_by("-date", "-created_at")
     serializer_class = ExpenseSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
     filterset_class = ExpenseFilter
+    export_columns = exports.EXPENSE_COLUMNS
+    export_name = 'expenses'
     search_fields = ["description", "receipt_number", "supplier__name"]
     ordering_fields = ["date", "amount", "created_at", "id"]
     ordering = ["-date", "-created_at"]
@@ -646,6 +676,40 @@ class SalesOrderViewSet(viewsets.ModelViewSet):
         """Set created_by to current user"""
         serializer.save(created_by=self.request.user)
     
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_orders(self, request):
+        """
+        Import many sales orders at once.
+
+        Accepts either JSON {"orders": [...]} or a CSV upload ("file", one row
+        per order line, grouped by order_ref). All orders are created in one
+        transaction with bulk inserts.
+        """
+        upload = request.FILES.get('file')
+        if upload:
+            try:
+                data = {'orders': parse_orders_csv(upload.read().decode('utf-8-sig'))}
+            except UnicodeDecodeError:
+                return Response(
+                    {'error': {'code': 'INVALID_FILE', 'message': 'CSV-Datei muss UTF-8 kodiert sein.'}},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            data = request.data
+
+        serializer = SalesOrderImportSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+
+        orders = create_sales_orders(request.user, serializer.validated_data['orders'])
+        orders = SalesOrder.objects.filter(
+            id__in=[order.id for order in orders]
+        ).select_related('customer', 'created_by').prefetch_related('items', 'items__item').order_by('id')
+
+        return Response(
+            {'count': len(orders), 'orders': SalesOrderSerializer(orders, many=True).data},
+            status=status.HTTP_201_CREATED
+        )
+
     @action(detail=True, methods=['post'], url_path='confirm')
     def confirm_order(self, request, pk=None):
         """Confirm order: DRAFT → CONFIRMED"""
@@ -720,31 +784,9 @@ class SalesOrderViewSet(viewsets.ModelViewSet):
                 # ============================================================
                 # KRITISCH: Warenausgang buchen für alle Artikel in der Bestellung
                 # ============================================================
-                for order_item in order.items.all():
-                    # Use pessimistic locking on inventory item
-                    inventory_item = InventoryItem.objects.select_for_update().get(id=order_item.item.id)
-
-                    # Check stock availability (in Verpackungen) - GESAMTMENGE prüfen!
-                    total_available = inventory_item.total_quantity_in_verpackungen
-                    if total_available < order_item.qty_base:
-                        return Response(
-                            {'error': {
-                                'code': 'INSUFFICIENT_STOCK',
-                                'message': f'Nicht genügend Verpackungen für {inventory_item.name}. Verfügbar: {total_available} ({inventory_item.palette_quantity}P + {inventory_item.verpackung_quantity}V), Benötigt: {order_item.qty_base}'
-                            }},
-                            status=status.HTTP_422_UNPROCESSABLE_ENTITY
-                        )
-
-                    # Create stock movement (OUT) - Warenausgang
-                    StockMovement.objects.create(
-                        item=inventory_item,
-                        type='OUT',
-                        unit='verpackung',  # Verkauf ist immer in Verpackungen
-                        quantity=order_item.qty_base,  # qty_base ist in Verpackungen
-                        customer=order.customer,
-                        note=f'Warenausgang für Rechnung {order.order_number}',
-                        created_by=request.user
-                    )
+                # All lines are locked in one sorted query and booked in bulk;
+                # InsufficientStockError rolls back the whole invoice.
+                book_order_shipment(order, request.user)
 
                 # Create invoice (model handles numbering and totals automatically)
                 invoice = Invoice.objects.create(
@@ -760,6 +802,11 @@ class SalesOrderViewSet(viewsets.ModelViewSet):
                 invoice_serializer = InvoiceSerializer(invoice)
                 return Response(invoice_serializer.data, status=status.HTTP_201_CREATED)
 
+        except InsufficientStockError as e:
+            return Response(
+                {'error': {'code': 'INSUFFICIENT_STOCK', 'message': str(e)}},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
         except InventoryItem.DoesNotExist:
             return Response(
                 {'error': {'code': 'ITEM_NOT_FOUND', 'message': 'Einer oder mehrere Artikel nicht gefunden'}},
@@ -791,12 +838,25 @@ class SalesOrderItemViewSet(viewsets.ModelViewSet):
             return SalesOrderItem.objects.filter(order__created_by=user).select_related('order', 'item')
 
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceFilter(FilterSet):
+    """Filter set for invoices (exact dates as before, plus an issue date range)"""
+    issue_date_after = DateFilter(field_name="issue_date", lookup_expr="gte")
+    issue_date_before = DateFilter(field_name="issue_date", lookup_expr="lte")
+
+    class Meta:
+        model = Invoice
+        fields = ['issue_date', 'due_date', 'currency', 'issue_date_after', 'issue_date_before']
+
+
+class InvoiceViewSet(ExportMixin, viewsets.ModelViewSet):
     """Invoice management viewset"""
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = InvoicePagination
     filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
-    filterset_fields = ['issue_date', 'due_date', 'currency']
+    filterset_class = InvoiceFilter
+    export_columns = exports.INVOICE_COLUMNS
+    export_name = 'invoices'
     search_fields = ['invoice_number', 'order__customer__name', 'order__order_number']
     ordering_fields = ['issue_date', 'due_date', 'total_gross']
     ordering = ['-issue_date']
@@ -826,8 +886,6 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         """Generate PDF for invoice with Swiss QR bill"""
         try:
             invoice = self.get_object()
-            order = invoice.order
-            customer = order.customer
             
             # Get company profile
             try:
@@ -845,99 +903,40 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Build creditor info (supplier)
-            creditor = {
-                'name': company_profile.name,
-                'street': company_profile.street,
-                'postal_code': company_profile.postal_code,
-                'city': company_profile.city,
-                'country': company_profile.country
-            }
-            
-            # Build debtor info (customer) - extract from customer address
-            customer_address_lines = customer.address.split('\n') if customer.address else []
-            debtor = {
-                'name': customer.name,
-                'street': customer_address_lines[0] if len(customer_address_lines) > 0 else '',
-                'postal_code': customer_address_lines[1].split()[0] if len(customer_address_lines) > 1 else '',
-                'city': ' '.join(customer_address_lines[1].split()[1:]) if len(customer_address_lines) > 1 else '',
-                'country': 'CH'  # Default to Switzerland
-            }
-            
-            # Build lines from order items
-            lines = []
-            for order_item in order.items.all():
-                # Get the display unit label
-                unit_label = 'Verpackung'
-                if hasattr(order_item, 'selected_unit'):
-                    if order_item.selected_unit == 'palette':
-                        unit_label = 'Palette'
-                    elif order_item.selected_unit == 'verpackung':
-                        unit_label = 'Verpackung'
-
-                # Use qty_display if available, otherwise fall back to qty_base
-                display_qty = order_item.qty_display if hasattr(order_item, 'qty_display') else order_item.qty_base
-
-                lines.append({
-                    'name': order_item.item.name,
-                    'description': order_item.item.description,
-                    'sku': order_item.item.sku,
-                    'qty_base': order_item.qty_base,
-                    'qty_display': display_qty,
-                    'selected_unit': unit_label,
-                    'unit_price': order_item.unit_price,
-                    'tax_rate': order_item.tax_rate,
-                    'line_total_net': order_item.line_total_net,
-                    'line_tax': order_item.line_tax,
-                    'line_total_gross': order_item.line_total_gross,
-                })
-            
-            # Generate QR code data URI
-            qr_data_uri = None
-            import logging
-            logger = logging.getLogger(__name__)
+            # Served from the PDF cache; rendered (in the render pool) only if
+            # invoice, profile or template changed
+            key, name = pdf_cache.entry(invoice, company_profile)
+            path = pdf_cache.cached_path(invoice, name)
+            if path is None:
+                target = pdf_cache.absolute_path(name)
+                job = pdf_renderer.job(target)
+                if job is None and not pdf_renderer.rendering(target):
+                    job = pdf_renderer.submit(target, *self._invoice_html(invoice, company_profile))
+                # ?async=1: don't wait, the client polls until the PDF is ready
+                timeout = 0 if request.query_params.get('async') in ('1', 'true') else pdf_renderer.timeout()
+                if job is not None:
+                    done = pdf_renderer.wait(job, timeout)
+                else:
+                    # Another web worker renders the file
+                    done = pdf_renderer.wait_for_file(target, timeout)
+                if done:
+                    path = pdf_cache.cached_path(invoice, name)
+                if path is None:
+                    return Response(
+                        {'status': 'PENDING', 'message': 'PDF wird erstellt.'},
+                        status=status.HTTP_202_ACCEPTED, headers={'Retry-After': '1'}
+                    )
 
-            try:
-                logger.info(f"Starting QR code generation for invoice {invoice.invoice_number}")
-                qr_data_uri = _qr_svg_data_uri(
-                    iban=company_profile.iban,
-                    creditor=creditor,
-                    debtor=debtor,
-                    amount=invoice.total_gross,
-                    currency=invoice.currency,
-                    reference=invoice.invoice_number,
-                    message=f"Rechnung {invoice.invoice_number}"
-                )
-                logger.info(f"QR code generated successfully for invoice {invoice.invoice_number}, URI length: {len(qr_data_uri)}")
-            except ValueError as e:
-                # Log the specific error but continue WITHOUT QR code
-                logger.warning(f"QR bill generation failed for invoice {invoice.invoice_number}: {str(e)}")
-                logger.warning("Continuing PDF generation without QR code")
-                qr_data_uri = None
-            except Exception as e:
-                # Unexpected error - log but continue without QR code
-                logger.error(f"Unexpected error generating QR bill for invoice {invoice.invoice_number}", exc_info=True)
-                logger.warning("Continuing PDF generation without QR code")
-                qr_data_uri = None
-            
-            # Build context for template
-            context = {
-                'supplier': company_profile,
-                'customer': customer,
-                'invoice': invoice,
-                'order': order,
-                'lines': lines,
-                'qr_data_uri': qr_data_uri,
-                'today': timezone.now().date()
-            }
-            
-            # Generate PDF
-            pdf_bytes = render_invoice_pdf(context)
-            
-            # Create HTTP response with PDF
-            response = HttpResponse(pdf_bytes, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{invoice.invoice_number}.pdf"'
-            
+            etag = f'"{key}"'
+            if etag in request.headers.get('If-None-Match', ''):
+                return HttpResponseNotModified(headers={'ETag': etag})
+
+            response = FileResponse(
+                open(path, 'rb'), as_attachment=True, filename=f'{invoice.invoice_number}.pdf',
+                content_type='application/pdf'
+            )
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
             return response
             
         except Exception as e:
@@ -946,6 +945,99 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+    def _invoice_html(self, invoice, company_profile):
+        """Invoice HTML with Swiss QR bill for the render pool (cache miss)"""
+        order = invoice.order
+        customer = order.customer
+
+        # Build creditor info (supplier)
+        creditor = {
+            'name': company_profile.name,
+            'street': company_profile.street,
+            'postal_code': company_profile.postal_code,
+            'city': company_profile.city,
+            'country': company_profile.country
+        }
+        
+        # Build debtor info (customer) - extract from customer address
+        customer_address_lines = customer.address.split('\n') if customer.address else []
+        debtor = {
+            'name': customer.name,
+            'street': customer_address_lines[0] if len(customer_address_lines) > 0 else '',
+            'postal_code': customer_address_lines[1].split()[0] if len(customer_address_lines) > 1 else '',
+            'city': ' '.join(customer_address_lines[1].split()[1:]) if len(customer_address_lines) > 1 else '',
+            'country': 'CH'  # Default to Switzerland
+        }
+        
+        # Build lines from order items
+        lines = []
+        for order_item in order.items.all():
+            # Get the display unit label
+            unit_label = 'Verpackung'
+            if hasattr(order_item, 'selected_unit'):
+                if order_item.selected_unit == 'palette':
+                    unit_label = 'Palette'
+                elif order_item.selected_unit == 'verpackung':
+                    unit_label = 'Verpackung'
+
+            # Use qty_display if available, otherwise fall back to qty_base
+            display_qty = order_item.qty_display if hasattr(order_item, 'qty_display') else order_item.qty_base
+
+            lines.append({
+                'name': order_item.item.name,
+                'description': order_item.item.description,
+                'sku': order_item.item.sku,
+                'qty_base': order_item.qty_base,
+                'qty_display': display_qty,
+                'selected_unit': unit_label,
+                'unit_price': order_item.unit_price,
+                'tax_rate': order_item.tax_rate,
+                'line_total_net': order_item.line_total_net,
+                'line_tax': order_item.line_tax,
+                'line_total_gross': order_item.line_total_gross,
+            })
+        
+        # Generate QR code data URI
+        qr_data_uri = None
+        import logging
+        logger = logging.getLogger(__name__)
+
+        try:
+            logger.info(f"Starting QR code generation for invoice {invoice.invoice_number}")
+            qr_data_uri = _qr_svg_data_uri(
+                iban=company_profile.iban,
+                creditor=creditor,
+                debtor=debtor,
+                amount=invoice.total_gross,
+                currency=invoice.currency,
+                reference=invoice.invoice_number,
+                message=f"Rechnung {invoice.invoice_number}"
+            )
+            logger.info(f"QR code generated successfully for invoice {invoice.invoice_number}, URI length: {len(qr_data_uri)}")
+        except ValueError as e:
+            # Log the specific error but continue WITHOUT QR code
+            logger.warning(f"QR bill generation failed for invoice {invoice.invoice_number}: {str(e)}")
+            logger.warning("Continuing PDF generation without QR code")
+            qr_data_uri = None
+        except Exception as e:
+            # Unexpected error - log but continue without QR code
+            logger.error(f"Unexpected error generating QR bill for invoice {invoice.invoice_number}", exc_info=True)
+            logger.warning("Continuing PDF generation without QR code")
+            qr_data_uri = None
+        
+        # Build context for template
+        context = {
+            'supplier': company_profile,
+            'customer': customer,
+            'invoice': invoice,
+            'order': order,
+            'lines': lines,
+            'qr_data_uri': qr_data_uri,
+            'today': timezone.now().date()
+        }
+        
+        return render_invoice_html(context, external_styles=pdf_renderer.pooled)
+
     @action(detail=True, methods=['post'], url_path='archive')
     def archive_invoice(self, request, pk=None):
         """Archive an invoice with comprehensive error handling"""
@@ -1126,6 +1218,76 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             )
 
 
+class ReportViewSet(AsOfMixin, viewsets.ViewSet):
+    """Report aggregates computed in SQL (owner-scoped, one query per aggregate)"""
+    permission_classes = [IsAuthenticated]
+
+    def _category(self, request):
+        category = request.query_params.get('category')
+        if category in (None, '', 'all'):
+            return None
+        if not category.isdigit():
+            raise rf_serializers.ValidationError({'category': 'Ungültige Kategorie.'})
+        return int(category)
+
+    @action(detail=False, methods=['get'], url_path='inventory-value')
+    def inventory_value(self, request):
+        """Stock quantity and value per item (paginated: ?page=, ?page_size=), totals over all items"""
+        report = reports.inventory_value(request.user, self._category(request), self._as_of(request))
+        paginator = ReportPagination()
+        rows = paginator.paginate_queryset(report['items'], request, view=self)
+        return paginator.get_report_response(rows, report['totals'])
+
+    @action(detail=False, methods=['get'], url_path='category-summary')
+    def category_summary(self, request):
+        """Valuation per category"""
+        return Response(reports.category_summary(request.user, self._category(request), self._as_of(request)))
+
+    @action(detail=False, methods=['get'], url_path='low-stock')
+    def low_stock(self, request):
+        """Items at or below their minimum stock level"""
+        return Response(reports.low_stock(request.user, self._category(request), self._as_of(request)))
+
+    @action(detail=False, methods=['get'], url_path='financials')
+    def financials(self, request):
+        """Revenue and expense totals per day/month/year (?period=, ?date_from=, ?date_to=)"""
+        params = ReportPeriodSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(reports.financials(request.user, **params.validated_data))
+
+
+class AnalyticsExportViewSet(viewsets.ViewSet):
+    """
+    Parquet partitions of the user's ledger, order lines and expenses
+    (inventory.analytics_export). Written by `manage.py export_parquet`,
+    never inside a request.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def _error(self, e, status_code=status.HTTP_400_BAD_REQUEST):
+        return Response({'error': {'code': 'ANALYTICS_EXPORT', 'message': str(e)}}, status=status_code)
+
+    def list(self, request):
+        """Exported partitions (dataset, month, bytes)"""
+        return Response(analytics_export.list_partitions(request.user.id))
+
+    @action(detail=False, methods=['get'], url_path=r'(?P<dataset>[a-z_]+)/(?P<month>\d{4}-\d{2})')
+    def download(self, request, dataset=None, month=None):
+        """One partition as a Parquet file"""
+        try:
+            path = analytics_export.partition_path(
+                analytics_export.get_dataset(dataset), request.user.id, month
+            )
+        except analytics_export.AnalyticsExportError as e:
+            return self._error(e)
+        if not path.is_file():
+            return self._error(f'No {dataset} export for {month}', status.HTTP_404_NOT_FOUND)
+        return FileResponse(
+            path.open('rb'), as_attachment=True, filename=f'{dataset}-{month}.parquet',
+            content_type=analytics_export.PARQUET_CONTENT_TYPE
+        )
+
+
 class OCRViewSet(viewsets.ViewSet):
     """OCR processing for receipt scanning"""
     permission_classes = [IsAuthenticated]
@@ -1143,27 +1305,32 @@ class OCRViewSet(viewsets.ViewSet):
                 )
             
             # Determine file type
-            file_name = file_data.name.lower()
-            if file_name.endswith('.pdf'):
-                file_type = 'pdf'
-            elif file_name.endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-                file_type = 'image'
-            else:
+            file_type = file_type_for(file_data.name)
+            if file_type is None:
                 return Response(
                     {'error': 'Unsupported file type. Please upload PDF or image files.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Read file data
-            file_bytes = file_data.read()
-            
-            # Process with OCR service
-            result = ocr_service.process_receipt(file_bytes, file_type)
+            # Processed by the OCR workers like /ocr/jobs/, never in this web worker
+            job = wait_for_job(enqueue_ocr_job(request.user, file_data, file_type))
+            if job.status == OCRJob.STATUS_FAILED:
+                raise RuntimeError(job.error)
+            if job.status != OCRJob.STATUS_DONE:
+                return Response(
+                    {
+                        'success': False,
+                        'job_id': job.pk,
+                        'status': job.status,
+                        'message': f'Receipt is still being processed, poll /api/inventory/ocr/jobs/{job.pk}/'
+                    },
+                    status=status.HTTP_202_ACCEPTED
+                )
             
             # Return extracted data
             return Response({
                 'success': True,
-                'data': result,
+                'data': job.result,
                 'message': 'Receipt processed successfully'
             })
             
@@ -1181,64 +1348,7 @@ class OCRViewSet(viewsets.ViewSet):
     def suggest_matches(self, request):
         """Suggest matching suppliers and items based on OCR data"""
         try:
-            ocr_data = request.data.get('ocr_data', {})
-            supplier_name = ocr_data.get('supplier', '').strip()
-            article_name = ocr_data.get('article_name', '').strip()
-            
-            suggestions = {
-                'suppliers': [],
-                'items': []
-            }
-            
-            # Find matching suppliers
-            if supplier_name:
-                suppliers = Supplier.objects.filter(
-                    name__icontains=supplier_name
-                )[:5]
-                suggestions['suppliers'] = [
-                    {'id': s.id, 'name': s.name}
-                    for s in suppliers
-                ]
-            
-            # Find matching items
-            if article_name:
-                # Try different search patterns
-                search_terms = [
-                    article_name,
-                    article_name.split()[0] if article_name.split() else '',
-                    ' '.join(article_name.split()[:2]) if len(article_name.split()) > 1 else ''
-                ]
-                
-                items = []
-                for term in search_terms:
-                    if term:
-                        matches = InventoryItem.objects.filter(
-                            name__icontains=term
-                        )[:5]
-                        items.extend(matches)
-                
-                # Remove duplicates and limit results
-                seen_ids = set()
-                unique_items = []
-                for item in items:
-                    if item.id not in seen_ids:
-                        unique_items.append(item)
-                        seen_ids.add(item.id)
-                        if len(unique_items) >= 5:
-                            break
-                
-                suggestions['items'] = [
-                    {
-                        'id': item.id, 
-                        'name': item.name,
-                        'sku': item.sku,
-                        'current_stock': {
-                            'palettes': item.palette_quantity,
-                            'verpackungen': item.verpackung_quantity
-                        }
-                    }
-                    for item in unique_items
-                ]
+            suggestions = suggest_matches(request.data.get('ocr_data', {}), request.user)
             
             return Response({
                 'success': True,
@@ -1254,3 +1364,65 @@ class OCRViewSet(viewsets.ViewSet):
                 },
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class OCRJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Asynchronous receipt OCR: POST a file, then poll the job until it is
+    DONE or FAILED. Jobs are processed by `manage.py ocr_worker`.
+    """
+    serializer_class = OCRJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return OCRJob.objects.filter(owner=self.request.user)
+
+    def create(self, request, *args, **kwargs):
+        file_data = request.FILES.get('file')
+        if not file_data:
+            return Response(
+                {'error': 'No file provided'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        file_type = file_type_for(file_data.name)
+        if file_type is None:
+            return Response(
+                {'error': 'Unsupported file type. Please upload PDF or image files.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        job = enqueue_ocr_job(request.user, file_data, file_type)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class OCRBatchViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Batch receipt OCR: POST several files (`files`) and/or ZIP archives in
+    one request, then poll the batch. Each receipt becomes an OCR job with
+    its own status, match suggestions and Expense draft.
+    """
+    serializer_class = OCRBatchSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return OCRBatch.objects.filter(owner=self.request.user).prefetch_related('jobs')
+
+    def create(self, request, *args, **kwargs):
+        # Spool every upload to a temp file, however small, instead of memory
+        request._request.upload_handlers = [TemporaryFileUploadHandler(request._request)]
+
+        uploaded_files = request.FILES.getlist('files') + request.FILES.getlist('file')
+        if not uploaded_files:
+            return Response(
+                {'error': 'No file provided'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            batch = enqueue_ocr_batch(request.user, uploaded_files)
+        except BatchUploadError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        batch = self.get_queryset().get(pk=batch.pk)
+        return Response(self.get_serializer(batch).data, status=status.HTTP_202_ACCEPTED)
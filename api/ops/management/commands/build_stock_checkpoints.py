@@ -0,0 +1,38 @@
+"""
+Management Command: build_stock_checkpoints
+Writes the monthly stock checkpoints (inventory.stock_history) for the closed
+months since each owner's latest checkpoint, so `as_of` queries only replay
+the movements after the last month boundary. Run after the month change;
+scripts/nightly-jobs.sh runs it daily.
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Writes the monthly stock checkpoints of the ledger"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only build the checkpoints of this username')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Delete the existing checkpoints first and replay the whole ledger')
+
+    def handle(self, *args, **options):
+        from inventory import stock_history
+        from inventory.models import StockMovement
+
+        if options['user']:
+            owners = list(User.objects.filter(username=options['user']))
+            if not owners:
+                raise CommandError(f"User {options['user']} not found")
+        else:
+            owners = list(User.objects.filter(
+                pk__in=StockMovement.objects.order_by().values('owner_id').distinct()
+            ))
+
+        total = 0
+        for owner in owners:
+            if options['rebuild']:
+                stock_history.clear(owner)
+            total += stock_history.build_checkpoints(owner)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {total} checkpoint(s) for {len(owners)} user(s)"))
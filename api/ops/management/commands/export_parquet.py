@@ -0,0 +1,45 @@
+"""
+Management Command: export_parquet
+Writes the closed months of the stock ledger, order lines and expenses as
+Parquet files partitioned by owner and month (inventory.analytics_export).
+Incremental: only months after the latest exported one are added, plus
+the months of order lines whose orders were still open (DRAFT/CONFIRMED)
+at the last run, which are rewritten.
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = "Exports stock movements, order lines and expenses as partitioned Parquet files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dataset', action='append', dest='datasets',
+                            help='Dataset to export (repeatable; default: all)')
+        parser.add_argument('--user', help='Only export this username')
+        parser.add_argument('--full', action='store_true',
+                            help='Delete and rewrite the existing partitions')
+
+    def handle(self, *args, **options):
+        from inventory import analytics_export
+
+        owner_id = None
+        if options['user']:
+            owner_id = User.objects.filter(username=options['user']).values_list('id', flat=True).first()
+            if owner_id is None:
+                raise CommandError(f"User {options['user']} not found")
+
+        try:
+            written = analytics_export.export(
+                datasets=options['datasets'], owner_id=owner_id, full=options['full']
+            )
+        except analytics_export.AnalyticsExportError as e:
+            raise CommandError(str(e))
+
+        for partition in written:
+            self.stdout.write(
+                f"{partition['dataset']} owner {partition['owner_id']} {partition['month']}: {partition['rows']} rows"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {len(written)} partition(s) to {analytics_export.export_root()}"
+        ))
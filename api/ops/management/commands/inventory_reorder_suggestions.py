@@ -4,12 +4,11 @@ Identifies inventory items below minimum stock level (idempotent, dry-run defaul
 """
 from django.core.management.base import BaseCommand
 from django.db import transaction
-from django.db.models import F
 from django.apps import apps
 
 
 class Command(BaseCommand):
-    help = "Identifies inventory items needing reorder (quantity < min_stock_level). Default: --dry-run"
+    help = "Identifies inventory items needing reorder (total stock <= min_stock_level). Default: --dry-run"
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -52,19 +51,18 @@ class Command(BaseCommand):
         flagged_count = 0
 
         with transaction.atomic():
-            # Find items where current stock < minimum stock level
-            # Using palette_quantity as current stock indicator
+            # Find items where total stock (in Verpackungen) <= minimum stock level
+            # using the stored low_stock column (partial index on active items)
             queryset = (
                 InventoryItem.objects
-                .filter(is_active=True, min_stock_level__gt=0)
-                .filter(palette_quantity__lt=F('min_stock_level'))
+                .filter(is_active=True, low_stock=True, min_stock_level__gt=0)
                 .order_by('id')[:limit]
             )
 
             found_count = queryset.count()
 
             for item in queryset:
-                current = getattr(item, 'palette_quantity', 0) or 0
+                current = getattr(item, 'total_verpackungen', 0) or 0
                 minimum = getattr(item, 'min_stock_level', 0) or 0
                 deficit = minimum - current
 
@@ -0,0 +1,25 @@
+"""
+Management Command: ocr_cache_stats
+Shows size and hit counts of the OCR result cache (for sizing OCR_RESULT_CACHE_MAX_BYTES).
+"""
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Shows entries, size and hits of the OCR result cache"
+
+    def handle(self, *args, **options):
+        from inventory.ocr_service import ocr_service
+
+        stats = ocr_service.result_cache.stats()
+        entries = stats['entries']
+        hits = stats['total_hits']
+
+        self.stdout.write(f"Entries:     {entries}")
+        self.stdout.write(
+            f"Size:        {stats['total_bytes'] / 1024:.1f} KB of {stats['max_bytes'] / 1024:.1f} KB"
+        )
+        self.stdout.write(f"Hits:        {hits} (on entries still cached)")
+        # Every entry was stored by one miss; evicted entries are not counted
+        if entries:
+            self.stdout.write(f"Hit ratio:   ~{hits / (hits + entries):.1%}")
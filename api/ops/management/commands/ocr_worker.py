@@ -0,0 +1,74 @@
+"""
+Management Command: ocr_worker
+Processes queued OCR jobs (POST /api/inventory/ocr/jobs/). Run several
+processes for more throughput; jobs are claimed with SKIP LOCKED.
+"""
+import signal
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+
+class Command(BaseCommand):
+    help = "Processes queued OCR jobs. Runs until stopped unless --once is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs currently queued, then exit'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait when the queue is empty (default: 1.0)'
+        )
+        parser.add_argument(
+            '--stale-after',
+            type=int,
+            default=600,
+            help='Seconds after which a RUNNING job of a dead worker is retried (default: 600)'
+        )
+
+    def handle(self, *args, **options):
+        from inventory.ocr_jobs import process_next_job, fail_abandoned_jobs
+        from inventory.ocr_service import ocr_service
+
+        stale_after = timedelta(seconds=options['stale_after'])
+        self.stopping = False
+        previous_handlers = {
+            signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        # Fork the PDF page pool (OCR_PDF_WORKERS) before loading the engine
+        ocr_service.pdf_pool()
+
+        # Load the OCR engine once, before the first job
+        engine = 'PaddleOCR' if ocr_service.warm_up() else 'Tesseract'
+        self.stdout.write(f"OCR worker ready ({engine})")
+
+        processed = 0
+        while not self.stopping:
+            close_old_connections()
+            fail_abandoned_jobs(stale_after)
+            job = process_next_job(stale_after)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+            processed += 1
+            self.stdout.write(f"Job {job.pk}: {job.status}")
+
+        for signum, handler in previous_handlers.items():
+            signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} job(s)"))
+        if ocr_service.result_cache is not None:
+            self.stdout.write(f"OCR result cache: {ocr_service.result_cache.counters}")
+
+    def stop(self, signum, frame):
+        # Finish the current job, then exit
+        self.stopping = True
@@ -0,0 +1,28 @@
+"""
+Management Command: rebuild_search_index
+Rebuilds the search index of items, suppliers and customers (inventory.search),
+e.g. after imports that bypass model signals (bulk_create, raw SQL).
+"""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the search index of items, suppliers and customers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the entries of this username')
+
+    def handle(self, *args, **options):
+        from inventory import search
+
+        owner = None
+        if options['user']:
+            owner = User.objects.filter(username=options['user']).first()
+            if owner is None:
+                raise CommandError(f"User {options['user']} not found")
+
+        with transaction.atomic():
+            total = search.rebuild(owner=owner)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} object(s)"))
@@ -4,6 +4,7 @@ import { useEffect, useState } from "react";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { AlertTriangle, TrendingUp, TrendingDown } from "lucide-react";
 import { useAuth } from "@/lib/auth";
+import { reportsAPI } from "@/lib/api";
 
 export default function Dashboard() {
   const { user } = useAuth();
@@ -17,45 +18,10 @@ export default function Dashboard() {
       try {
         setIsLoading(true);
 
-        // Get auth token from localStorage
-        const tokensStr = localStorage.getItem("auth_tokens");
-        const tokens = tokensStr ? JSON.parse(tokensStr) : null;
-        const token = tokens?.access;
-
-        if (!token) {
-          throw new Error('Keine Authentifizierung vorhanden');
-        }
-
-        // Fetch Invoices (Einnahmen)
-        const invoicesResponse = await fetch('/api/invoices/', {
-          headers: {
-            'Authorization': `Bearer ${token}`,
-          },
-        });
-
-        // Fetch Expenses (Ausgaben)
-        const expensesResponse = await fetch('/api/expenses/', {
-          headers: {
-            'Authorization': `Bearer ${token}`,
-          },
-        });
-
-        if (!invoicesResponse.ok || !expensesResponse.ok) {
-          throw new Error('Fehler beim Laden der Finanzdaten');
-        }
-
-        const invoicesData = await invoicesResponse.json();
-        const expensesData = await expensesResponse.json();
-
-        // Berechne Gesamtsumme aller Rechnungen (Einnahmen)
-        const totalEinnahmen = Array.isArray(invoicesData)
-          ? invoicesData.reduce((sum, invoice) => sum + Number(invoice.total_gross || 0), 0)
-          : (invoicesData.results || []).reduce((sum: number, invoice: any) => sum + Number(invoice.total_gross || 0), 0);
-
-        // Berechne Gesamtsumme aller Ausgaben
-        const totalAusgaben = Array.isArray(expensesData)
-          ? expensesData.reduce((sum, expense) => sum + Number(expense.amount || 0), 0)
-          : (expensesData.results || []).reduce((sum: number, expense: any) => sum + Number(expense.amount || 0), 0);
+        // Totals are summed on the server across all invoices and expenses
+        const { totals } = await reportsAPI.financials({ period: "year" });
+        const totalEinnahmen = Number(totals.revenue || 0);
+        const totalAusgaben = Number(totals.expenses || 0);
 
         setEinnahmen(totalEinnahmen);
         setAusgaben(totalAusgaben);
@@ -5,8 +5,8 @@ import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card"
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select"
 import { Label } from "@/components/ui/label"
 import { Button } from "@/components/ui/button"
-import { AlertTriangle, Download } from "lucide-react"
-import { inventoryAPI, categoryAPI } from "@/lib/api"
+import { AlertTriangle, ChevronLeft, ChevronRight, Download } from "lucide-react"
+import { categoryAPI, reportsAPI } from "@/lib/api"
 import { useTranslation } from "@/lib/i18n"
 import { DateRangePicker } from "@/components/date-range-picker"
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from "@/components/ui/table"
@@ -14,22 +14,80 @@ import type { DateRange } from "react-day-picker"
 
 export default function ReportsPage() {
   const { t, formatCurrency } = useTranslation()
-  const [inventoryItems, setInventoryItems] = useState<InventoryItem[]>([])
+  const [reportData, setReportData] = useState<InventoryValueReportItem[] | LowStockReportItem[] | CategorySummaryReportItem[]>([])
+  const [totals, setTotals] = useState<ReportTotals>({})
   const [categories, setCategories] = useState<Category[]>([])
   const [isLoading, setIsLoading] = useState(true)
   const [error, setError] = useState<string | null>(null)
   const [reportType, setReportType] = useState<string>("inventory-value")
   const [categoryFilter, setCategoryFilter] = useState<string>("all")
   const [dateRange, setDateRange] = useState<DateRange | undefined>(undefined)
+  // The inventory value rows are paginated on the server (totals cover all items)
+  const [currentPage, setCurrentPage] = useState(1)
+  const [hasNextPage, setHasNextPage] = useState(false)
+  const [hasPrevPage, setHasPrevPage] = useState(false)
 
   useEffect(() => {
-    const fetchData = async () => {
+    categoryAPI
+      .getCategories()
+      .then((categoriesData) => setCategories(Array.isArray(categoriesData) ? categoriesData : []))
+      .catch((err) => console.error(err))
+  }, [])
+
+  // Reports are aggregated on the server; only the rows of the selected report are loaded
+  useEffect(() => {
+    const fetchReport = async () => {
+      const category = categoryFilter === "all" ? undefined : Number(categoryFilter)
       try {
         setIsLoading(true)
-        const [itemsData, categoriesData] = await Promise.all([inventoryAPI.getItems(), categoryAPI.getCategories()])
-        // Ensure data is an array
-        setInventoryItems(Array.isArray(itemsData) ? itemsData : [])
-        setCategories(Array.isArray(categoriesData) ? categoriesData : [])
+        if (reportType === "inventory-value") {
+          const data = await reportsAPI.inventoryValue(category, currentPage)
+          setHasNextPage(!!data.next)
+          setHasPrevPage(!!data.previous)
+          setReportData(data.items.map((item): InventoryValueReportItem => ({
+            id: item.id,
+            name: item.name,
+            sku: item.sku,
+            quantity: item.quantity,
+            price: Number(item.price),
+            value: Number(item.value),
+            category: item.category_name || "-",
+          })))
+          setTotals({
+            totalItems: data.totals.total_items,
+            totalQuantity: data.totals.total_quantity,
+            totalValue: Number(data.totals.total_value),
+          })
+        } else if (reportType === "low-stock") {
+          const data = await reportsAPI.lowStock(category)
+          setReportData(data.items.map((item): LowStockReportItem => ({
+            id: item.id,
+            name: item.name,
+            sku: item.sku,
+            quantity: item.quantity,
+            threshold: item.threshold,
+            needed: item.needed,
+            category: item.category_name || "-",
+          })))
+          setTotals({
+            totalItems: data.totals.total_items,
+            totalNeeded: data.totals.total_needed,
+          })
+        } else {
+          const data = await reportsAPI.categorySummary(category)
+          setReportData(data.categories.map((row): CategorySummaryReportItem => ({
+            category: row.category_name || "Uncategorized",
+            itemCount: row.item_count,
+            totalValue: Number(row.total_value),
+            avgPrice: Number(row.avg_price),
+          })))
+          setTotals({
+            totalCategories: data.totals.total_categories,
+            totalItems: data.totals.total_items,
+            totalValue: Number(data.totals.total_value),
+          })
+        }
+        setError(null)
       } catch (err) {
         setError(t('reports.loadError'))
         console.error(err)
@@ -38,109 +96,19 @@ export default function ReportsPage() {
       }
     }
 
-    fetchData()
-  }, [])
-
-  // Filter items based on category filter - ensure inventoryItems is an array
-  const filteredItems = Array.isArray(inventoryItems)
-    ? inventoryItems.filter((item) => {
-        return categoryFilter === "all" || item.category?.toString() === categoryFilter
-      })
-    : []
-
-  // Generate report data based on report type
-  const generateReportData = () => {
-    switch (reportType) {
-      case "inventory-value":
-        return filteredItems.map((item): InventoryValueReportItem => ({
-          id: item.id,
-          name: item.name,
-          sku: item.sku,
-          quantity: item.available_qty ?? 0,
-          price: Number.parseFloat(item.price) || 0,
-          value: (item.available_qty ?? 0) * (Number.parseFloat(item.price) || 0),
-          category: categories.find((c) => c.id === item.category)?.name || "-",
-        }))
-      case "low-stock":
-        return filteredItems
-          .filter((item) => item.is_low_stock)
-          .map((item): LowStockReportItem => ({
-            id: item.id,
-            name: item.name,
-            sku: item.sku,
-            quantity: item.available_qty ?? 0,
-            threshold: item.low_stock_threshold ?? item.min_stock_level ?? 10,
-            needed: (item.low_stock_threshold ?? item.min_stock_level ?? 10) - (item.available_qty ?? 0),
-            category: categories.find((c) => c.id === item.category)?.name || "-",
-          }))
-      case "category-summary":
-        const categorySummary: Record<string, { count: number; totalValue: number; avgPrice: number }> = {}
-
-        filteredItems.forEach((item) => {
-          const categoryName = categories.find((c) => c.id === item.category)?.name || "Uncategorized"
-
-          if (!categorySummary[categoryName]) {
-            categorySummary[categoryName] = {
-              count: 0,
-              totalValue: 0,
-              avgPrice: 0,
-            }
-          }
+    fetchReport()
+  }, [reportType, categoryFilter, currentPage])
 
-          categorySummary[categoryName].count += 1
-          categorySummary[categoryName].totalValue += (item.available_qty ?? 0) * (Number.parseFloat(item.price) || 0)
-        })
-
-        // Calculate average price
-        Object.keys(categorySummary).forEach((key) => {
-          categorySummary[key].avgPrice = categorySummary[key].totalValue / categorySummary[key].count
-        })
-
-        return Object.entries(categorySummary).map(([category, data]): CategorySummaryReportItem => ({
-          category,
-          itemCount: data.count,
-          totalValue: data.totalValue,
-          avgPrice: data.avgPrice,
-        }))
-      default:
-        return []
-    }
-  }
-
-  const reportData = generateReportData()
+  // A different report or filter starts on the first page
+  useEffect(() => {
+    setCurrentPage(1)
+  }, [reportType, categoryFilter])
 
   // Type-safe report data based on report type
   const inventoryValueData = reportType === "inventory-value" ? reportData as InventoryValueReportItem[] : []
   const lowStockData = reportType === "low-stock" ? reportData as LowStockReportItem[] : []
   const categorySummaryData = reportType === "category-summary" ? reportData as CategorySummaryReportItem[] : []
 
-  // Calculate totals for inventory value report
-  const calculateTotals = (): ReportTotals => {
-    if (reportType === "inventory-value") {
-      return {
-        totalItems: inventoryValueData.length,
-        totalQuantity: inventoryValueData.reduce((sum, item) => sum + item.quantity, 0),
-        totalValue: inventoryValueData.reduce((sum, item) => sum + item.value, 0),
-      }
-    }
-    if (reportType === "low-stock") {
-      return {
-        totalItems: lowStockData.length,
-        totalNeeded: lowStockData.reduce((sum, item) => sum + item.needed, 0),
-      }
-    }
-    if (reportType === "category-summary") {
-      return {
-        totalCategories: categorySummaryData.length,
-        totalItems: categorySummaryData.reduce((sum, item) => sum + item.itemCount, 0),
-        totalValue: categorySummaryData.reduce((sum, item) => sum + item.totalValue, 0),
-      }
-    }
-    return {}
-  }
-
-  const totals = calculateTotals()
-
   // Function to export report as CSV
   const exportReportCSV = () => {
     let csvContent = ""
@@ -303,6 +271,29 @@ export default function ReportsPage() {
                   </div>
                 </div>
               )}
+              {(hasNextPage || hasPrevPage) && (
+                <div className="mt-4 flex items-center justify-end space-x-2">
+                  <span className="text-sm text-gray-500">Seite {currentPage}</span>
+                  <Button
+                    variant="outline"
+                    size="sm"
+                    onClick={() => setCurrentPage(prev => prev - 1)}
+                    disabled={!hasPrevPage || isLoading}
+                  >
+                    <ChevronLeft className="h-4 w-4" />
+                    Zurück
+                  </Button>
+                  <Button
+                    variant="outline"
+                    size="sm"
+                    onClick={() => setCurrentPage(prev => prev + 1)}
+                    disabled={!hasNextPage || isLoading}
+                  >
+                    Weiter
+                    <ChevronRight className="h-4 w-4" />
+                  </Button>
+                </div>
+              )}
             </>
           )}
 
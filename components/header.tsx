@@ -94,11 +94,9 @@ export default function Header() {
     // Debounce search to avoid too many API calls
     searchTimeoutRef.current = setTimeout(async () => {
       try {
-        const items = await inventoryAPI.getItems({ search: query })
-        
-        const filteredItems = Array.isArray(items.results) ? items.results.slice(0, 10) : []
+        const items = await inventoryAPI.typeaheadItems(query, 10)
 
-        setSearchResults(filteredItems) 
+        setSearchResults(Array.isArray(items) ? items : [])
       } catch (error) {
         console.error("Error searching items:", error)
         setSearchResults([])
@@ -54,6 +54,8 @@ export function MultiItemMovementModal({ isOpen, onClose, onSuccess }: MultiItem
   const [globalError, setGlobalError] = useState<string>("")
   const [showOCRUpload, setShowOCRUpload] = useState(false)
   const [isProcessingOCR, setIsProcessingOCR] = useState(false)
+  // One idempotency key per submission, kept across retries of the same form
+  const [submissionKey, setSubmissionKey] = useState(() => `batch-${Date.now()}`)
 
   // Load data on modal open
   useEffect(() => {
@@ -107,6 +109,7 @@ export function MultiItemMovementModal({ isOpen, onClose, onSuccess }: MultiItem
     setUseCurrentDateTime(true)
     setGlobalError("")
     setShowOCRUpload(false)
+    setSubmissionKey(`batch-${Date.now()}`)
   }
 
   const handleOCRDataExtracted = async (ocrData: any) => {
@@ -226,7 +229,8 @@ export function MultiItemMovementModal({ isOpen, onClose, onSuccess }: MultiItem
     setGlobalError("")
 
     try {
-      // Process each item sequentially
+      // Collect all lines and book them in a single transaction
+      const lines: any[] = []
       for (const movItem of movementItems) {
         const itemDetails = getItemDetails(movItem.item)
         if (!itemDetails) continue
@@ -253,30 +257,36 @@ export function MultiItemMovementModal({ isOpen, onClose, onSuccess }: MultiItem
           totalPurchasePrice = purchasePrice * effectiveQty
         }
 
-        // Create movement
-        const payload: any = {
+        // Create movement line
+        const line: any = {
           item: parseInt(movItem.item),
           type: 'IN',
           unit: unitType,
           quantity: quantity,
           note: note || `Wareneingang: ${itemDetails.name}`,
-          supplier: supplier ? parseInt(supplier) : null,
-          idempotency_key: `${Date.now()}-${movItem.id}-${unitType}`,
           currency: movItem.currency || 'CHF'
         }
 
         // Add total purchase price if calculated
         if (totalPurchasePrice !== null) {
-          payload.purchase_price = totalPurchasePrice
+          line.purchase_price = Number(totalPurchasePrice.toFixed(2))
         }
 
-        if (!useCurrentDateTime && movementDate && movementTime) {
-          payload.movement_timestamp = `${movementDate}T${movementTime}:00`
-        }
+        lines.push(line)
+      }
 
-        await stockMovementAPI.createMovement(payload)
+      const payload: any = {
+        idempotency_key: submissionKey,
+        supplier: supplier ? parseInt(supplier) : null,
+        movements: lines
       }
 
+      if (!useCurrentDateTime && movementDate && movementTime) {
+        payload.movement_timestamp = `${movementDate}T${movementTime}:00`
+      }
+
+      await stockMovementAPI.createBatch(payload)
+
       toast.success(`${movementItems.length} Artikel erfolgreich verbucht`)
       resetForm()
       onClose()
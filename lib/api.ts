@@ -171,6 +171,16 @@ async function fetchAPI(endpoint: string, options: RequestInit = {}) {
   }
 }
 
+// Scanned barcode resolved by /inventory/items/by-ean/ (unit = one Stück, pack = one Verpackung)
+export type EANMatch = {
+  code: string
+  match: 'unit' | 'pack'
+  stueck_per_scan: number
+  item: Pick<InventoryItem, 'id' | 'name' | 'sku' | 'brand' | 'ean_unit' | 'ean_pack' | 'volume_ml' | 'deposit_chf'
+    | 'is_active' | 'stueck_pro_verpackung' | 'verpackungen_pro_palette' | 'unit_base' | 'unit_package_factor'
+    | 'unit_pallet_factor'>
+}
+
 // API functions for inventory items
 export const inventoryAPI = {
   getItems: (params = {}) => {
@@ -182,6 +192,17 @@ export const inventoryAPI = {
     return fetchAPI(`/inventory/items/${queryString}`)
   },
   getItem: (id: number) => fetchAPI(`/inventory/items/${id}/`),
+  // Ranked fuzzy matches on name, brand, SKU, EAN and supplier SKU
+  typeaheadItems: (query: string, limit = 10): Promise<InventoryItem[]> =>
+    fetchAPI(`/inventory/items/typeahead/?${new URLSearchParams({ q: query, limit: String(limit) })}`),
+  getItemByEAN: (code: string): Promise<EANMatch> =>
+    fetchAPI(`/inventory/items/by-ean/${encodeURIComponent(code)}/`),
+  // Up to 500 scanned codes in one call
+  resolveEANs: (codes: string[]): Promise<{ results: EANMatch[]; not_found: string[] }> =>
+    fetchAPI("/inventory/items/by-ean/", {
+      method: "POST",
+      body: JSON.stringify({ codes }),
+    }),
   createItem: (data: InventoryItem) =>
     fetchAPI("/inventory/items/", {
       method: "POST",
@@ -332,6 +353,9 @@ export const stockMovementAPI = {
     const queryString = queryParams.toString() ? `?${queryParams.toString()}` : ""
     return fetchAPI(`/inventory/stock-movements/${queryString}`)
   },
+  // Whole filtered ledger as a file (file_format: csv | jsonl)
+  exportMovements: (params: Record<string, string> = {}): Promise<void> =>
+    downloadPDF(`/inventory/stock-movements/export/?${new URLSearchParams(params)}`),
 
   createMovement: (data: {
     type: "IN" | "OUT" | "RETURN"
@@ -349,6 +373,30 @@ export const stockMovementAPI = {
       body: JSON.stringify(data),
     }),
 
+  // Book many movements in one transaction (single idempotency key)
+  createBatch: (data: {
+    idempotency_key?: string
+    supplier?: number | null
+    customer?: number | null
+    note?: string
+    movement_timestamp?: string
+    movements: Array<{
+      item: number
+      type: "IN" | "OUT" | "RETURN" | "DEFECT" | "ADJUST"
+      unit: "palette" | "verpackung"
+      quantity: number
+      purchase_price?: number
+      currency?: string
+      note?: string
+      supplier?: number | null
+      customer?: number | null
+    }>
+  }) =>
+    fetchAPI("/inventory/stock-movements/batch/", {
+      method: "POST",
+      body: JSON.stringify(data),
+    }),
+
   // Convenience wrapper for RETURN movements
   createReturn: (data: {
     item: number
@@ -412,6 +460,8 @@ export const expensesAPI = {
     const queryString = queryParams.toString() ? `?${queryParams.toString()}` : "";
     return fetchAPI(`/inventory/expenses/${queryString}`);
   },
+  export: (params: Record<string, string> = {}): Promise<void> =>
+    downloadPDF(`/inventory/expenses/export/?${new URLSearchParams(params)}`),
   create: (data: Expense) =>
     fetchAPI("/inventory/expenses/", {
       method: "POST",
@@ -561,6 +611,62 @@ export const ordersAPI = {
     fetchAPI(`/inventory/orders/${id}/invoice/`, {
       method: "POST",
     }),
+  // Create many orders in one request (lines are written in bulk)
+  importOrders: (data: {
+    orders: Array<{
+      customer: number
+      status?: "DRAFT" | "CONFIRMED" | "DELIVERED"
+      delivery_date?: string | null
+      currency?: string
+      items: Array<{
+        item: number
+        qty_base: number
+        qty_display?: number
+        selected_unit?: "palette" | "verpackung"
+        unit_price: string | number
+        tax_rate?: string | number
+      }>
+    }>
+  }): Promise<{count: number, orders: SalesOrder[]}> =>
+    fetchAPI("/inventory/orders/import/", {
+      method: "POST",
+      body: JSON.stringify(data),
+    }),
+}
+
+// API functions for reports (aggregated on the server)
+export const reportsAPI = {
+  inventoryValue: (category?: number, page?: number): Promise<{
+    count: number, next: string | null, previous: string | null
+    items: Array<{id: number, name: string, sku: string | null, price: number, quantity: number, value: number, category_name: string | null}>
+    totals: {total_items: number, total_quantity: number, total_value: number}
+  }> => {
+    const queryParams = new URLSearchParams();
+    if (category) queryParams.append("category", String(category));
+    if (page) queryParams.append("page", String(page));
+    const queryString = queryParams.toString() ? `?${queryParams.toString()}` : "";
+    return fetchAPI(`/inventory/reports/inventory-value/${queryString}`);
+  },
+  categorySummary: (category?: number): Promise<{
+    categories: Array<{category_id: number | null, category_name: string | null, item_count: number, total_quantity: number, total_value: number, avg_price: number}>
+    totals: {total_categories: number, total_items: number, total_value: number}
+  }> => fetchAPI(`/inventory/reports/category-summary/${category ? `?category=${category}` : ""}`),
+  lowStock: (category?: number): Promise<{
+    items: Array<{id: number, name: string, sku: string | null, quantity: number, threshold: number, needed: number, category_name: string | null}>
+    totals: {total_items: number, total_needed: number}
+  }> => fetchAPI(`/inventory/reports/low-stock/${category ? `?category=${category}` : ""}`),
+  financials: (params: {period?: "day" | "month" | "year", date_from?: string, date_to?: string} = {}): Promise<{
+    period: string
+    periods: Array<{period: string, revenue: number, expenses: number}>
+    totals: {revenue: number, expenses: number, balance: number}
+  }> => {
+    const queryParams = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value !== undefined) queryParams.append(key, String(value));
+    });
+    const queryString = queryParams.toString() ? `?${queryParams.toString()}` : "";
+    return fetchAPI(`/inventory/reports/financials/${queryString}`);
+  },
 }
 
 // Helper function for PDF downloads
@@ -575,9 +681,15 @@ async function downloadPDF(endpoint: string): Promise<void> {
     ...(tokens?.access ? { Authorization: `Bearer ${tokens.access}` } : {}),
   }
   
-  const response = await fetch(url, { headers })
+  let response = await fetch(url, { headers })
+  // 202: the document is still being rendered, poll until it is ready
+  for (let attempt = 0; response.status === 202 && attempt < 60; attempt++) {
+    const retryAfter = Number(response.headers.get("Retry-After")) || 1
+    await new Promise((resolve) => setTimeout(resolve, retryAfter * 1000))
+    response = await fetch(url, { headers })
+  }
   
-  if (!response.ok) {
+  if (!response.ok || response.status === 202) {
     const errorText = await response.text().catch(() => "")
     const germanMessage = getGermanErrorMessage(errorText)
     throw new Error(`${germanMessage} (Status ${response.status})`)
@@ -626,6 +738,8 @@ export const invoicesAPI = {
   },
   get: (id: number): Promise<Invoice> => fetchAPI(`/inventory/invoices/${id}/`),
   pdf: (id: number): Promise<void> => downloadPDF(`/inventory/invoices/${id}/pdf/`),
+  export: (params: Record<string, string> = {}): Promise<void> =>
+    downloadPDF(`/inventory/invoices/export/?${new URLSearchParams(params)}`),
 
   // Enhanced archive function with existence validation
   archive: async (id: number): Promise<{message: string, is_archived: boolean}> => {
@@ -716,24 +830,69 @@ export const invoicesAPI = {
 }
 
 // OCR API functions
-export const ocrAPI = {
-  async processReceipt(file: File): Promise<{
-    success: boolean
-    data: {
-      supplier: string
-      article_name: string
-      quantity: number
-      unit_price: number
-      total_price: number
-      currency: string
-      confidence: number
-      raw_text: string
-      processing_success: boolean
+export type OCRReceiptData = {
+  supplier: string
+  article_name: string
+  quantity: number
+  unit_price: number
+  total_price: number
+  currency: string
+  confidence: number
+  raw_text: string
+  processing_success: boolean
+}
+
+export type OCRJob = {
+  id: number
+  file_name: string
+  file_type: 'pdf' | 'image'
+  status: 'PENDING' | 'RUNNING' | 'DONE' | 'FAILED'
+  result: (OCRReceiptData & { error?: string }) | null
+  error: string
+  attempts: number
+  created_at: string
+  started_at: string | null
+  finished_at: string | null
+}
+
+export type OCRMatchSuggestions = {
+  suppliers: Array<{ id: number; name: string }>
+  items: Array<{
+    id: number
+    name: string
+    sku: string | null
+    current_stock: {
+      palettes: number
+      verpackungen: number
     }
-    message?: string
-    error?: string
-  }> {
-    const url = `${API_BASE}/inventory/ocr/process-receipt/`
+  }>
+}
+
+export type OCRBatch = {
+  id: number
+  status: 'PENDING' | 'RUNNING' | 'DONE'
+  total: number
+  counts: Record<OCRJob['status'], number>
+  jobs: Array<Pick<OCRJob, 'id' | 'file_name' | 'file_type' | 'status' | 'result' | 'error' | 'finished_at'> & {
+    suggestions: OCRMatchSuggestions | null
+    expense_draft: {
+      date: string
+      description: string
+      amount: string | null
+      category: string
+      supplier: number | null
+      receipt_number: string | null
+      notes: string
+    } | null
+  }>
+  skipped: Array<{ file_name: string; reason: string }>
+  created_at: string
+}
+
+export const ocrAPI = {
+  // Queue a receipt for the OCR workers; poll with getJob()
+  async createJob(file: File): Promise<OCRJob> {
+    const url = `${API_BASE}/inventory/ocr/jobs/`
     const tokensStr = typeof window !== "undefined" ? localStorage.getItem("auth_tokens") : null
     const tokens = tokensStr ? JSON.parse(tokensStr) : null
 
@@ -756,6 +915,68 @@ export const ocrAPI = {
     return response.json()
   },
 
+  async getJob(id: number): Promise<OCRJob> {
+    return fetchAPI(`/inventory/ocr/jobs/${id}/`)
+  },
+
+  // Queue several receipts (images, PDFs or ZIP archives) in one request; poll with getBatch()
+  async createBatch(files: File[]): Promise<OCRBatch> {
+    const url = `${API_BASE}/inventory/ocr/batches/`
+    const tokensStr = typeof window !== "undefined" ? localStorage.getItem("auth_tokens") : null
+    const tokens = tokensStr ? JSON.parse(tokensStr) : null
+
+    const formData = new FormData()
+    files.forEach((file) => formData.append('files', file))
+
+    const response = await fetch(url, {
+      method: 'POST',
+      headers: {
+        ...(tokens?.access ? { Authorization: `Bearer ${tokens.access}` } : {}),
+      },
+      body: formData,
+    })
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}))
+      throw new Error(errorData.error || 'OCR batch upload failed')
+    }
+
+    return response.json()
+  },
+
+  async getBatch(id: number): Promise<OCRBatch> {
+    return fetchAPI(`/inventory/ocr/batches/${id}/`)
+  },
+
+  // Runs OCR as a background job and waits for the result
+  async processReceipt(file: File, pollIntervalMs = 1000, timeoutMs = 120000): Promise<{
+    success: boolean
+    data: OCRReceiptData
+    message?: string
+    error?: string
+  }> {
+    let job = await ocrAPI.createJob(file)
+    const deadline = Date.now() + timeoutMs
+
+    while (job.status === 'PENDING' || job.status === 'RUNNING') {
+      if (Date.now() > deadline) {
+        throw new Error('OCR processing timed out')
+      }
+      await new Promise((resolve) => setTimeout(resolve, pollIntervalMs))
+      job = await ocrAPI.getJob(job.id)
+    }
+
+    if (job.status === 'FAILED' || !job.result) {
+      throw new Error(job.error || 'OCR processing failed')
+    }
+
+    return {
+      success: true,
+      data: job.result,
+      message: 'Receipt processed successfully',
+    }
+  },
+
   async suggestMatches(ocrData: {
     supplier?: string
     article_name?: string
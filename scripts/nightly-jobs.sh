@@ -0,0 +1,29 @@
+#!/bin/bash
+# Depotix Nightly Jobs
+# Batch work that must not run inside a web request
+# Run daily via cron, e.g. 30 2 * * * /home/deploy/Depotix/server/scripts/nightly-jobs.sh
+
+set -euo pipefail
+
+echo "=== Depotix Nightly Jobs ==="
+echo "Date: $(date)"
+echo ""
+
+# Navigate to project directory
+cd /home/deploy/Depotix/server
+
+run() {
+    docker compose exec -T backend python manage.py "$@"
+}
+
+# Parquet partitions of the closed months (incremental, inventory.analytics_export)
+echo "=== Exporting Analytics Partitions ==="
+run export_parquet
+echo ""
+
+# Monthly ledger checkpoints of the closed months (inventory.stock_history)
+echo "=== Building Stock Checkpoints ==="
+run build_stock_checkpoints
+echo ""
+
+echo "✅ Nightly jobs completed"